@@ -0,0 +1,136 @@
+import weakref
+import threading
+
+import fitz
+
+from .ExtractedDocument import ExtractedDocument
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+STATE_WAITING = 'waiting'
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+STATE_CANCELLED = 'cancelled'
+STATE_FAILED = 'failed'
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class _JobStatus:
+    """State of a job shared with its thread, the thread does not hold on to
+    the BackgroundExtraction object so the job is cancelled once nobody
+    references it any more
+    """
+
+    __slots__ = ('state', 'error')
+
+    def __init__(self):
+        self.state = STATE_WAITING
+        self.error = None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _run(generator_pool,
+         pdf_bytes : bytes,
+         include_labels,
+         extracted_doc : ExtractedDocument,
+         status : _JobStatus,
+         cancel_event : threading.Event) -> None:
+
+    try:
+        with generator_pool.acquire() as doc_gen:
+            document = doc_gen.open_stream(pdf_bytes, include_labels=include_labels)
+
+        with document:
+            for page_number in document.page_numbers:
+
+                # a generator is only borrowed for one page, the jobs of
+                # other sessions get their turn in between
+                with generator_pool.acquire() as doc_gen:
+
+                    if cancel_event.is_set():
+                        status.state = STATE_CANCELLED
+                        return
+
+                    status.state = STATE_RUNNING
+                    extracted_page = document.extract_page(page_number, doc_gen=doc_gen)
+
+                extracted_doc.add_page(extracted_page)
+
+        status.state = STATE_DONE
+
+    except Exception as error:
+        status.error = error
+        status.state = STATE_FAILED
+
+# =============================================================================
+
+class BackgroundExtraction:
+    """Extracts a pdf on a background thread using generators borrowed from a
+    GeneratorPool, one page at a time. The pages are added to extracted_doc as
+    soon as each one is done, so a user interface can show the first pages
+    while the rest of the document is still being processed. The job is
+    cancelled when it is cancelled explicitly or when the object is no
+    longer referenced, e.g. once the session which started it is gone.
+    """
+
+    def __init__(self,
+                 generator_pool,
+                 pdf_bytes : bytes,
+                 file_name = 'stream',
+                 include_labels = None):
+
+        self.generator_pool = generator_pool
+        self.pdf_bytes = pdf_bytes
+        self.include_labels = include_labels
+
+        with fitz.open('pdf', pdf_bytes) as fitz_doc:
+            self.num_pages = fitz_doc.page_count
+
+        self.extracted_doc = ExtractedDocument(file_name)
+        self.status = _JobStatus()
+
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=_run,
+                                       args=(generator_pool, pdf_bytes, include_labels,
+                                             self.extracted_doc, self.status, self.cancel_event),
+                                       daemon=True)
+
+        weakref.finalize(self, self.cancel_event.set)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    @property
+    def state(self) -> str:
+        return self.status.state
+
+    @property
+    def error(self) -> Exception:
+        return self.status.error
+
+    @property
+    def pages_done(self) -> int:
+        return self.extracted_doc.num_pages
+
+    @property
+    def progress(self) -> float:
+        """returns the fraction of the pages extracted, between 0 and 1"""
+
+        if self.num_pages == 0:
+            return 1.
+        return self.pages_done / self.num_pages
+
+    @property
+    def is_active(self) -> bool:
+        """true while the job is waiting for a generator or extracting"""
+        return self.state in (STATE_WAITING, STATE_RUNNING)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def start(self) -> None:
+        self.thread.start()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def cancel(self) -> None:
+        """asks the job to stop, it stops after the page being extracted"""
+        self.cancel_event.set()
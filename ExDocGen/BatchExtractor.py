@@ -0,0 +1,699 @@
+import os
+import sys
+import glob
+import json
+import time
+import multiprocessing
+from multiprocessing.util import Finalize
+
+import fitz
+
+from .BoundingBox import LABEL_DICT
+from .RuntimeConfig import RuntimeConfig
+from .ExtractedDocument import ExtractedDocumentWriter, read_json_settings
+from .PageSelection import resolve_pages, split_pages, format_page_spec
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+EXIT_SUCCESS = 0
+EXIT_DOCUMENT_ERRORS = 1
+EXIT_USAGE_ERROR = 2
+EXIT_INTERRUPTED = 130
+
+STATUS_OK = 'ok'
+STATUS_SKIPPED = 'skipped'
+STATUS_FAILED = 'failed'
+
+OUTPUT_EXTENSION = '.json'
+MANIFEST_EXTENSIONS = ('.txt', '.lst', '.jsonl')
+
+ALL_LABELS = list(LABEL_DICT.values())
+
+# keys of the jobs of a document split into page ranges, they are not part of
+# the result of the document
+PART_KEYS = ('part', 'num_parts', 'part_pages', 'part_output')
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def read_manifest(manifest_path : str) -> list:
+    """reads a manifest file and returns the pdf file paths listed in it. A
+    manifest is either a plain text file with one path per line (blank lines
+    and lines starting with # are ignored) or a JSON lines file where each
+    line is an object with a 'path' key. Relative paths are resolved against
+    the directory holding the manifest.
+
+    Args:
+        manifest_path (str): path to the manifest file
+
+    Returns:
+        list: list of pdf file paths
+    """
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    pdf_file_paths = []
+
+    with open(manifest_path, 'r') as manifest:
+        for line in manifest:
+            line = line.strip()
+
+            if len(line) == 0 or line.startswith('#'):
+                continue
+
+            if manifest_path.endswith('.jsonl'):
+                line = json.loads(line)['path']
+
+            if not os.path.isabs(line):
+                line = os.path.join(manifest_dir, line)
+
+            pdf_file_paths.append(line)
+
+    return pdf_file_paths
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def collect_input_paths(inputs : list) -> list:
+    """expands the inputs given on the command line into a sorted list of
+    unique pdf file paths. Each input can be a directory (searched recursively
+    for pdf files), a glob pattern, a manifest file or a single pdf file.
+
+    Args:
+        inputs (list): list of directories, glob patterns, manifests or pdfs
+
+    Returns:
+        list: sorted list of unique absolute pdf file paths
+    """
+    pdf_file_paths = []
+
+    for input_path in inputs:
+        if os.path.isdir(input_path):
+            pattern = os.path.join(input_path, '**', '*.pdf')
+            pdf_file_paths.extend(glob.glob(pattern, recursive=True))
+        elif os.path.isfile(input_path) and input_path.lower().endswith(MANIFEST_EXTENSIONS):
+            pdf_file_paths.extend(read_manifest(input_path))
+        elif os.path.isfile(input_path):
+            pdf_file_paths.append(input_path)
+        else:
+            pdf_file_paths.extend(glob.glob(input_path, recursive=True))
+
+    return sorted(set(os.path.abspath(path) for path in pdf_file_paths))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_output_path(pdf_file_path : str,
+                    input_root : str,
+                    output_dir : str) -> str:
+    """returns the path of the JSON file for a pdf. The directory layout below
+    input_root is mirrored under output_dir so that pdfs with the same file
+    name in different directories do not overwrite each other.
+
+    Args:
+        pdf_file_path (str): absolute path to the pdf file
+        input_root (str): common root directory of all the inputs
+        output_dir (str): directory the JSON files are written to
+
+    Returns:
+        str: path to the JSON file
+    """
+    relative_path = os.path.relpath(pdf_file_path, input_root)
+    return os.path.join(output_dir, os.path.splitext(relative_path)[0] + OUTPUT_EXTENSION)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_output_settings(include_pages = None,
+                        include_labels = None) -> dict:
+    """returns the settings recorded in the JSON file of a document, which
+    have to match for the output to be reused
+
+    Args:
+        include_pages (optional): pages extracted from the document, see
+            PageSelection.resolve_pages. Defaults to None.
+        include_labels (list, optional): labels extracted. Defaults to None.
+
+    Returns:
+        dict: page specification and sorted labels, None for every page or
+            label
+    """
+    return {'pages' : format_page_spec(include_pages),
+            'labels' : sorted(include_labels) if include_labels is not None else None}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def is_up_to_date(pdf_file_path : str,
+                  output_path : str,
+                  settings : dict = None) -> bool:
+    """returns true if the output exists, is newer than the pdf file and was
+    extracted with the same settings
+
+    Args:
+        pdf_file_path (str): path to the pdf file
+        output_path (str): path to the JSON file
+        settings (dict, optional): settings of this run, see
+            get_output_settings. An output without settings, or with other
+            ones, is not up to date. Defaults to None which only compares the
+            modification times.
+
+    Returns:
+        bool: true if the pdf does not need to be processed again
+    """
+    if not os.path.isfile(output_path):
+        return False
+
+    if os.path.getmtime(output_path) < os.path.getmtime(pdf_file_path):
+        return False
+
+    return settings is None or read_json_settings(output_path) == settings
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def count_pages(pdf_file_path : str) -> int:
+    """returns the number of pages in a pdf, or 0 if the file can not be opened.
+    The error itself is reported when the document is processed.
+
+    Args:
+        pdf_file_path (str): path to the pdf file
+
+    Returns:
+        int: number of pages
+    """
+    try:
+        with fitz.open(pdf_file_path) as fitz_doc:
+            return fitz_doc.page_count
+    except Exception:
+        return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def merge_json_parts(part_paths : list,
+                     output_path : str,
+                     pdf_file_path : str,
+                     remove_parts = True,
+                     settings : dict = None) -> int:
+    """joins the JSON files of the page ranges of a document, in the given
+    order, into the JSON file of the document and removes them
+
+    Args:
+        part_paths (list): JSON files written by extract_to_json
+        output_path (str): JSON file of the document
+        pdf_file_path (str): path to the pdf file
+        remove_parts (bool, optional): remove the part files once the
+            document is written. Defaults to True.
+        settings (dict, optional): settings recorded in the JSON file of the
+            document, see get_output_settings. Defaults to None.
+
+    Returns:
+        int: number of pages written
+    """
+    with ExtractedDocumentWriter(output_path, pdf_file_path, settings) as writer:
+        for part_path in part_paths:
+            with open(part_path, 'r') as part_file:
+                for page_dict in json.load(part_file)['document_pages']:
+                    writer.write_page_dict(page_dict)
+
+    if remove_parts:
+        for part_path in part_paths:
+            os.remove(part_path)
+
+    return writer.num_pages
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def format_duration(seconds : float) -> str:
+    """formats a duration in seconds as HH:MM:SS
+
+    Args:
+        seconds (float): duration in seconds
+
+    Returns:
+        str: formatted duration
+    """
+    seconds = int(max(seconds, 0))
+    return f'{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}'
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# worker side. Every worker process loads the models once in _init_worker and
+# reuses the same generator for all of the documents it is given.
+
+_worker_doc_gen = None
+_worker_include_labels = None
+_worker_include_pages = None
+_worker_settings = None
+
+def _init_worker(generator_kwargs : dict,
+                 include_labels : list,
+                 worker_counter = None,
+                 include_pages = None,
+                 settings = None) -> None:
+
+    # imported here so the parent process does not need to load torch when all
+    # of the work is done by the worker processes
+    from .ExtractedDocumentGenerator import ExtractedDocumentGenerator
+
+    # every worker takes the next index, which selects its cpus
+    runtime_config = generator_kwargs.get('runtime_config')
+    if runtime_config is not None and worker_counter is not None:
+        with worker_counter.get_lock():
+            worker_index = worker_counter.value
+            worker_counter.value += 1
+
+        runtime_config.set_worker_affinity(worker_index)
+
+    global _worker_doc_gen, _worker_include_labels, _worker_include_pages, _worker_settings
+    _worker_doc_gen = ExtractedDocumentGenerator(**generator_kwargs)
+
+    # a worker process which exits normally commits its OCR cache entries
+    Finalize(None, _close_worker, exitpriority=10)
+    _worker_include_labels = include_labels
+    _worker_include_pages = include_pages
+    _worker_settings = settings
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _close_worker() -> None:
+
+    global _worker_doc_gen
+    if _worker_doc_gen is not None:
+        _worker_doc_gen.close()
+        _worker_doc_gen = None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _process_job(job : dict) -> dict:
+
+    result = dict(job)
+    start_time = time.perf_counter()
+
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(job['output'])), exist_ok=True)
+
+        # pages are streamed to the output so a worker only holds one page at
+        # a time, and the file only appears once the document is complete
+        # a job with part_pages extracts one page range of a document, the
+        # settings are recorded when the parts are joined
+        num_pages = _worker_doc_gen.extract_to_json(pdf_file_path=job['input'],
+                                                    json_file_path=job.get('part_output', job['output']),
+                                                    include_pages=job.get('part_pages', _worker_include_pages),
+                                                    include_labels=_worker_include_labels,
+                                                    settings=None if 'part' in job else _worker_settings)
+
+        result['status'] = STATUS_OK
+        result['pages'] = num_pages
+    except Exception as error:
+        result['status'] = STATUS_FAILED
+        result['error'] = f'{type(error).__name__}: {error}'
+
+    result['seconds'] = time.perf_counter() - start_time
+
+    return result
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class ProgressReporter:
+    """Keeps track of the documents and pages processed during a batch run and
+    prints the throughput and estimated time remaining.
+    """
+
+    def __init__(self,
+                 total_docs : int,
+                 total_pages : int,
+                 stream = sys.stderr):
+
+        self.total_docs = total_docs
+        self.total_pages = total_pages
+        self.stream = stream
+
+        self.docs_done = 0
+        self.pages_done = 0
+        self.num_errors = 0
+
+        # input -> page ranges done, of the documents split into page ranges
+        self.parts_done = {}
+        self.start_time = time.perf_counter()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages_done / max(self.elapsed, 1e-9)
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs_done / max(self.elapsed, 1e-9)
+
+    @property
+    def eta(self) -> float:
+        """returns the estimated seconds remaining based on the page rate, this
+        is more stable than the document rate when document sizes vary.
+        """
+        if self.pages_done == 0:
+            return float('nan')
+
+        return (self.total_pages - self.pages_done) / self.pages_per_sec
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def update(self,
+               result : dict) -> None:
+
+        self.pages_done += result.get('expected_pages', 0)
+
+        if result['status'] == STATUS_FAILED:
+            self.num_errors += 1
+
+        # a document split into page ranges is done with its last range
+        if 'part' in result:
+            self.parts_done[result['input']] = self.parts_done.get(result['input'], 0) + 1
+            if self.parts_done[result['input']] == result['num_parts']:
+                self.docs_done += 1
+        else:
+            self.docs_done += 1
+
+        self.display()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def display(self) -> None:
+
+        eta = 'unknown' if self.pages_done == 0 else format_duration(self.eta)
+
+        self.stream.write(f'\r[{self.docs_done}/{self.total_docs} docs] '
+                          f'[{self.pages_done}/{self.total_pages} pages] '
+                          f'{self.pages_per_sec:.2f} pages/s '
+                          f'{self.docs_per_sec:.2f} docs/s '
+                          f'ETA {eta} '
+                          f'errors: {self.num_errors}')
+        self.stream.flush()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def finish(self) -> None:
+        self.stream.write('\n')
+        self.stream.flush()
+
+# =============================================================================
+
+class BatchExtractor:
+    """Runs the ExtractedDocumentGenerator over many pdf files, writing one JSON
+    file per pdf to the output directory.
+    """
+
+    def __init__(self,
+                 output_dir : str,
+                 num_workers = 1,
+                 batch_size = 1,
+                 include_labels = None,
+                 overwrite = False,
+                 generator_kwargs = None,
+                 progress_stream = sys.stderr,
+                 runtime_config : RuntimeConfig = None,
+                 include_pages = None,
+                 pages_per_job = None):
+        """
+        Args:
+            output_dir (str): directory the JSON files are written to
+            num_workers (int, optional): worker processes. Defaults to 1.
+            batch_size (int, optional): jobs handed to a worker at a time.
+                Defaults to 1.
+            include_labels (list, optional): labels to extract. Defaults to
+                None which extracts every block.
+            overwrite (bool, optional): process documents whose output is up
+                to date, i.e. newer than the pdf and extracted with the same
+                pages and labels. Defaults to False.
+            generator_kwargs (dict, optional): arguments of the generator of
+                every worker. Defaults to None.
+            progress_stream (optional): stream the progress is printed to.
+                Defaults to sys.stderr.
+            runtime_config (RuntimeConfig, optional): threads and affinity of
+                the workers. Defaults to None which splits the cpus evenly.
+            include_pages (optional): pages extracted from every document,
+                see PageSelection.resolve_pages. Defaults to None which
+                extracts every page.
+            pages_per_job (int, optional): documents with more selected pages
+                are split into jobs of this many pages, run by any worker
+                and joined into one JSON file. Defaults to None which keeps
+                every document in one job.
+        """
+        self.output_dir = output_dir
+        self.batch_size = max(int(batch_size), 1)
+        self.include_labels = include_labels
+        self.include_pages = include_pages
+        self.pages_per_job = pages_per_job
+        self.overwrite = overwrite
+        self.progress_stream = progress_stream
+        self.settings = get_output_settings(include_pages, include_labels)
+
+        # without a runtime configuration the cpus are split evenly between
+        # the workers so they do not oversubscribe the node
+        if runtime_config is None:
+            num_workers = max(int(num_workers), 1)
+            runtime_config = RuntimeConfig.for_workers(num_workers) if num_workers > 1 else RuntimeConfig()
+
+        self.runtime_config = runtime_config
+        self.num_workers = runtime_config.num_workers
+
+        self.generator_kwargs = dict(generator_kwargs) if generator_kwargs is not None else {}
+        self.generator_kwargs['runtime_config'] = runtime_config
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _create_jobs(self,
+                     pdf_file_paths : list) -> tuple:
+        """splits the pdf files into jobs that need to be run and results for
+        documents which are skipped because their output is up to date.
+
+        Args:
+            pdf_file_paths (list): absolute paths of the pdfs to process
+
+        Returns:
+            tuple: list of jobs, list of skipped results
+        """
+        input_root = os.path.commonpath([os.path.dirname(path) for path in pdf_file_paths])
+
+        jobs = []
+        skipped = []
+
+        for pdf_file_path in pdf_file_paths:
+            job = { 'input' : pdf_file_path,
+                    'output' : get_output_path(pdf_file_path, input_root, self.output_dir)}
+
+            if not self.overwrite and is_up_to_date(job['input'], job['output'], self.settings):
+                job['status'] = STATUS_SKIPPED
+                skipped.append(job)
+            else:
+                page_numbers = resolve_pages(self.include_pages, count_pages(pdf_file_path))
+                job['expected_pages'] = len(page_numbers)
+
+                if self.pages_per_job is None or len(page_numbers) <= self.pages_per_job:
+                    jobs.append(job)
+                    continue
+
+                parts = split_pages(page_numbers, self.pages_per_job)
+                for part, part_pages in enumerate(parts):
+                    jobs.append(dict(job,
+                                     expected_pages=len(part_pages),
+                                     part=part,
+                                     num_parts=len(parts),
+                                     part_pages=part_pages,
+                                     part_output=f'{job["output"]}.part{part:04d}'))
+
+        return jobs, skipped
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _merge_parts(self,
+                     part_results : list) -> dict:
+        """returns the result of a document from the results of its page
+        ranges, joining their outputs if all of them succeeded
+        """
+        part_results = sorted(part_results, key=lambda part_result: part_result['part'])
+
+        result = {key : value for key, value in part_results[0].items() if key not in PART_KEYS}
+        result['num_parts'] = len(part_results)
+        result['expected_pages'] = sum(part_result['expected_pages'] for part_result in part_results)
+        result['seconds'] = sum(part_result['seconds'] for part_result in part_results)
+
+        part_paths = [part_result['part_output'] for part_result in part_results]
+        failed = [part_result for part_result in part_results if part_result['status'] == STATUS_FAILED]
+
+        if len(failed) == 0:
+            try:
+                result['pages'] = merge_json_parts(part_paths, result['output'], result['input'],
+                                                   settings=self.settings)
+                result['status'] = STATUS_OK
+                return result
+            except Exception as error:
+                result['error'] = f'{type(error).__name__}: {error}'
+        else:
+            part_pages = failed[0]['part_pages']
+            result['error'] = f'pages {part_pages[0]}-{part_pages[-1]}: {failed[0]["error"]}'
+
+        result['status'] = STATUS_FAILED
+        result.pop('pages', None)
+
+        for part_path in part_paths:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+        return result
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _add_result(self,
+                    result : dict,
+                    results : list,
+                    parts : dict,
+                    progress : ProgressReporter) -> None:
+
+        progress.update(result)
+
+        if 'part' not in result:
+            results.append(result)
+            return
+
+        # the document is done once all of its page ranges are
+        document_parts = parts.setdefault(result['input'], [])
+        document_parts.append(result)
+
+        if len(document_parts) == result['num_parts']:
+            results.append(self._merge_parts(parts.pop(result['input'])))
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _run_jobs(self,
+                  jobs : list,
+                  progress : ProgressReporter,
+                  results : list,
+                  parts : dict) -> None:
+        """runs the jobs, adding the result of every document to results as
+        soon as it is done so they are kept when the run is interrupted.
+        parts holds the results of the page ranges of unfinished documents.
+        """
+        worker_counter = multiprocessing.Value('i', 0)
+
+        if self.num_workers == 1:
+            # run in this process so the models are only loaded once
+            _init_worker(self.generator_kwargs, self.include_labels, worker_counter, self.include_pages,
+                         self.settings)
+            try:
+                for job in jobs:
+                    self._add_result(_process_job(job), results, parts, progress)
+            finally:
+                # stops the post-processing workers of the generator
+                _close_worker()
+            return
+
+        with multiprocessing.Pool(processes=self.num_workers,
+                                  initializer=_init_worker,
+                                  initargs=(self.generator_kwargs, self.include_labels, worker_counter,
+                                            self.include_pages, self.settings)) as pool:
+
+            for result in pool.imap_unordered(_process_job, jobs, chunksize=self.batch_size):
+                self._add_result(result, results, parts, progress)
+
+            # let the workers exit on their own so they close their generators
+            pool.close()
+            pool.join()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def run(self,
+            pdf_file_paths : list) -> dict:
+        """processes the pdf files and returns the run report
+
+        Args:
+            pdf_file_paths (list): absolute paths of the pdfs to process
+
+        Returns:
+            dict: machine readable report of the run
+        """
+        start_time = time.time()
+
+        jobs, skipped = self._create_jobs(pdf_file_paths)
+
+        progress = ProgressReporter(total_docs=len(set(job['input'] for job in jobs)),
+                                    total_pages=sum(job['expected_pages'] for job in jobs),
+                                    stream=self.progress_stream)
+        interrupted = False
+        results = []
+        parts = {}
+
+        try:
+            self._run_jobs(jobs, progress, results, parts)
+        except KeyboardInterrupt:
+            interrupted = True
+
+            # the page ranges of unfinished documents are never joined
+            for part_results in parts.values():
+                for part_result in part_results:
+                    if os.path.exists(part_result['part_output']):
+                        os.remove(part_result['part_output'])
+        finally:
+            progress.finish()
+
+        return self._create_report(start_time, results, skipped, progress, interrupted)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _create_report(self,
+                       start_time : float,
+                       results : list,
+                       skipped : list,
+                       progress : ProgressReporter,
+                       interrupted : bool) -> dict:
+
+        failed = [result for result in results if result['status'] == STATUS_FAILED]
+
+        if interrupted:
+            exit_code = EXIT_INTERRUPTED
+        elif len(failed) > 0:
+            exit_code = EXIT_DOCUMENT_ERRORS
+        else:
+            exit_code = EXIT_SUCCESS
+
+        report = {  'start_time' : start_time,
+                    'end_time' : time.time(),
+                    'elapsed_seconds' : progress.elapsed,
+                    'num_workers' : self.num_workers,
+                    'runtime_config' : self.runtime_config.to_dict(),
+                    'batch_size' : self.batch_size,
+                    'include_labels' : self.include_labels,
+                    'include_pages' : self.settings['pages'],
+                    'pages_per_job' : self.pages_per_job,
+                    'interrupted' : interrupted,
+                    'exit_code' : exit_code,
+                    'num_documents' : len(results) + len(skipped),
+                    'num_processed' : len(results) - len(failed),
+                    'num_skipped' : len(skipped),
+                    'num_failed' : len(failed),
+                    'num_pages' : sum(result.get('pages', 0) for result in results),
+                    'pages_per_sec' : progress.pages_per_sec,
+                    'docs_per_sec' : progress.docs_per_sec,
+                    'errors' : {result['input'] : result['error'] for result in failed},
+                    'documents' : sorted(results + skipped, key=lambda result: result['input'])}
+
+        return report
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def print_error_summary(report : dict,
+                        stream = sys.stderr) -> None:
+    """prints a short summary of the run and the error of every failed document
+
+    Args:
+        report (dict): report returned by BatchExtractor.run
+        stream (optional): stream to print to. Defaults to sys.stderr.
+    """
+    stream.write(f'processed: {report["num_processed"]} '
+                 f'skipped: {report["num_skipped"]} '
+                 f'failed: {report["num_failed"]} '
+                 f'pages: {report["num_pages"]} '
+                 f'({report["pages_per_sec"]:.2f} pages/s, {report["docs_per_sec"]:.2f} docs/s) '
+                 f'in {format_duration(report["elapsed_seconds"])}\n')
+
+    for pdf_file_path, error in report['errors'].items():
+        stream.write(f'  FAILED {pdf_file_path}: {error}\n')
+
+    stream.flush()
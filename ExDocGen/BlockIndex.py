@@ -0,0 +1,123 @@
+import math
+
+from .ExtractedDocument import DocumentPage
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# side of a grid cell in pdf points, about the height of two lines of text
+DEFAULT_CELL_SIZE = 32.
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def image_to_pdf_point(x : float,
+                       y : float,
+                       zoom = 1.) -> tuple:
+    """converts a point of a page image rendered at zoom to pdf points, which
+    is the space the bounding boxes of the text blocks are stored in
+
+    Args:
+        x (float): horizontal image coordinate (pixels)
+        y (float): vertical image coordinate (pixels)
+        zoom (float, optional): zoom the image was rendered at. Defaults to 1.
+
+    Returns:
+        tuple: x, y in pdf points
+    """
+    return x / zoom, y / zoom
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class BlockIndex:
+    """Uniform grid over the bounding boxes of the text blocks of a page. Every
+    block is registered in each cell it covers, so a point lookup only tests
+    the few blocks of a single cell instead of every block of the page.
+    Blocks without a bounding box are not indexed.
+    """
+
+    def __init__(self,
+                 document_page : DocumentPage,
+                 cell_size = DEFAULT_CELL_SIZE):
+
+        self.cell_size = float(cell_size)
+        self.bboxes = {}
+        self.cells = {}
+
+        for block_num, text_block in enumerate(document_page.document_text_blocks):
+            if text_block.bbox is None:
+                continue
+
+            x0, y0, x1, y1 = text_block.bbox
+            self.bboxes[block_num] = (x0, y0, x1, y1)
+
+            for cell_x in range(self._cell(x0), self._cell(x1) + 1):
+                for cell_y in range(self._cell(y0), self._cell(y1) + 1):
+                    self.cells.setdefault((cell_x, cell_y), []).append(block_num)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def __len__(self) -> int:
+        return len(self.bboxes)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _cell(self,
+              value : float) -> int:
+        return int(math.floor(value / self.cell_size))
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def query(self,
+              x : float,
+              y : float) -> list:
+        """returns the index of every block containing the point (x, y), given
+        in pdf points, the smallest block first
+
+        Args:
+            x (float): horizontal position in pdf points
+            y (float): vertical position in pdf points
+
+        Returns:
+            list: indices into document_page.document_text_blocks
+        """
+        hits = []
+
+        for block_num in self.cells.get((self._cell(x), self._cell(y)), []):
+            x0, y0, x1, y1 = self.bboxes[block_num]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                hits.append(block_num)
+
+        # nested blocks (e.g. a caption inside a picture) select the innermost
+        hits.sort(key=lambda block_num: self._area(block_num))
+
+        return hits
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _area(self,
+              block_num : int) -> float:
+        x0, y0, x1, y1 = self.bboxes[block_num]
+        return (x1 - x0) * (y1 - y0)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def find_block(self,
+                   image_x : float,
+                   image_y : float,
+                   zoom = 1.):
+        """returns the block under a point of the page image rendered at zoom
+
+        Args:
+            image_x (float): horizontal image coordinate (pixels)
+            image_y (float): vertical image coordinate (pixels)
+            zoom (float, optional): zoom the image was rendered at. Defaults to 1.
+
+        Returns:
+            int: index into document_page.document_text_blocks, None when the
+                point is not inside any block
+        """
+        hits = self.query(*image_to_pdf_point(image_x, image_y, zoom))
+
+        if len(hits) == 0:
+            return None
+
+        return hits[0]
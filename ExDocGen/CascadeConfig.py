@@ -0,0 +1,67 @@
+import numpy as np
+
+from .BoundingBox import LABEL_DICT
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# detector size of the first, cheap pass. A letter page at 72 dpi is scaled
+# from 792 to 512 pixels on its long side, less than half of the pixels
+DEFAULT_COARSE_SIZE = (512,396)
+
+# small blocks which are easily missed or mislabelled at a low resolution
+DEFAULT_ESCALATE_LABELS = ['Footnote', 'Formula', 'Page-footer']
+
+DEFAULT_MIN_CONFIDENCE = 0.5
+DEFAULT_MAX_BOXES = 30
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class CascadeConfig:
+    """Settings of coarse-to-fine detection. Every page is first detected at
+    coarse_size, and only the pages whose coarse detections are uncertain are
+    detected again at the full size. The boxes of the full size pass replace
+    the coarse ones of that page.
+
+    A page is escalated when any of its coarse detections
+        - has a confidence below min_confidence,
+        - is one of the escalate_labels,
+    or when it has more than max_boxes detections (crowded page) or, with
+    escalate_empty, none at all.
+    """
+
+    def __init__(self,
+                 coarse_size = DEFAULT_COARSE_SIZE,
+                 min_confidence = DEFAULT_MIN_CONFIDENCE,
+                 max_boxes = DEFAULT_MAX_BOXES,
+                 escalate_labels = None,
+                 escalate_empty = True):
+
+        self.coarse_size = coarse_size
+        self.min_confidence = min_confidence
+        self.max_boxes = max_boxes
+        self.escalate_labels = escalate_labels if escalate_labels is not None else list(DEFAULT_ESCALATE_LABELS)
+        self.escalate_empty = escalate_empty
+
+        # class ids of the labels, the detections only hold the ids
+        self.escalate_class_ids = [int(class_id) for class_id, label in LABEL_DICT.items()
+                                   if label in self.escalate_labels]
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def needs_full_resolution(self,
+                              labels : np.array) -> bool:
+        """returns true if the coarse detections of a page are not trusted
+
+        Args:
+            labels (np.array): rows of [xmin, ymin, xmax, ymax, confidence, class]
+        """
+        if len(labels) == 0:
+            return self.escalate_empty
+
+        if len(labels) > self.max_boxes:
+            return True
+
+        if labels[:, 4].min() < self.min_confidence:
+            return True
+
+        return bool(np.isin(labels[:, 5].astype(int), self.escalate_class_ids).any())
@@ -0,0 +1,250 @@
+import os
+import json
+
+import numpy as np
+
+from .BoundingBox import LABEL_DICT
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# the categories of the COCO files are the classes of the layout detector,
+# files from annotation tools are matched to them by name
+COCO_CATEGORIES = [{'id' : int(class_id), 'name' : label} for class_id, label in LABEL_DICT.items()]
+LABEL_CLASSES = {label : int(class_id) for class_id, label in LABEL_DICT.items()}
+
+# the COCO evaluation: AP averaged over the IoU thresholds 0.5, 0.55, ... 0.95,
+# each the mean precision at 101 recall levels
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+RECALL_LEVELS = np.linspace(0., 1., 101)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_image_file_name(pdf_file_path : str,
+                        page_number : int) -> str:
+    """returns the file name of a page image, the same name the generator
+    saves the page image under so the saved images can be annotated
+    """
+    pdf_file_name = os.path.basename(pdf_file_path).split('.')[0]
+
+    return f'{pdf_file_name}_page_{page_number:03d}_image.png'
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def create_coco_image(image_id : int,
+                      pdf_file_path : str,
+                      page_number : int,
+                      page_img : np.array) -> dict:
+
+    return {'id' : image_id,
+            'file_name' : get_image_file_name(pdf_file_path, page_number),
+            'width' : int(page_img.shape[1]),
+            'height' : int(page_img.shape[0])}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def boxes_to_coco(bounding_boxes : list,
+                  image_id : int) -> list:
+    """returns the boxes of generate_bounding_boxes as COCO detection results
+
+    Args:
+        bounding_boxes (list): BoundingBox objects of a page image
+        image_id (int): id of the page image
+
+    Returns:
+        list: dicts with image_id, category_id, bbox [x, y, width, height]
+            and score
+    """
+    return [{'image_id' : image_id,
+             'category_id' : LABEL_CLASSES[box.label],
+             'bbox' : [box.x0, box.y0, box.x1 - box.x0, box.y1 - box.y0],
+             'score' : round(box.confidence, 5)}
+            for box in bounding_boxes]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def create_coco_dataset(images : list,
+                        detections : list) -> dict:
+    """returns a COCO dataset with detections as its annotations, e.g. to be
+    corrected by hand into the ground truth of a set of documents
+    """
+    annotations = []
+
+    for annotation_id, detection in enumerate(detections, start=1):
+        annotation = {key : value for key, value in detection.items() if key != 'score'}
+        annotation.update({'id' : annotation_id,
+                           'area' : detection['bbox'][2] * detection['bbox'][3],
+                           'iscrowd' : 0})
+        annotations.append(annotation)
+
+    return {'images' : images,
+            'annotations' : annotations,
+            'categories' : COCO_CATEGORIES}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def load_coco_dataset(file_path : str) -> dict:
+    """loads a COCO dataset and maps its categories to the detector classes
+    by name
+
+    Raises:
+        ValueError: for a category which is not a detector class
+
+    Returns:
+        dict: the dataset, the category_id of every annotation is the class
+            of the detector
+    """
+    with open(file_path, 'r') as dataset_file:
+        dataset = json.load(dataset_file)
+
+    classes = {}
+    for category in dataset['categories']:
+        if category['name'] not in LABEL_CLASSES:
+            raise ValueError(f'category {category["name"]} is not one of {list(LABEL_CLASSES)}')
+        classes[category['id']] = LABEL_CLASSES[category['name']]
+
+    for annotation in dataset['annotations']:
+        annotation['category_id'] = classes[annotation['category_id']]
+    dataset['categories'] = COCO_CATEGORIES
+
+    return dataset
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _get_ious(box : np.array,
+              boxes : np.array) -> np.array:
+    """IoU of an [x, y, width, height] box with every row of boxes"""
+
+    inter_w = np.clip(np.minimum(box[0] + box[2], boxes[:, 0] + boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0., None)
+    inter_h = np.clip(np.minimum(box[1] + box[3], boxes[:, 1] + boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0., None)
+    inter = inter_w * inter_h
+
+    return inter / (box[2] * box[3] + boxes[:, 2] * boxes[:, 3] - inter + 1e-9)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _get_average_precision(true_positives : np.array,
+                           num_ground_truth : int) -> float:
+
+    if len(true_positives) == 0:
+        return 0.
+
+    tp_sum = np.cumsum(true_positives)
+    recall = tp_sum / num_ground_truth
+    precision = tp_sum / np.arange(1, len(true_positives) + 1)
+
+    # the precision at a recall is the best precision at that recall or above
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+
+    indices = np.searchsorted(recall, RECALL_LEVELS, side='left')
+    sampled = np.where(indices < len(precision), precision[np.minimum(indices, len(precision) - 1)], 0.)
+
+    return float(sampled.mean())
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _evaluate_class(detections : list,
+                    ground_truth : dict) -> dict:
+    """returns the AP of the detections of one class
+
+    Args:
+        detections (list): COCO detections of the class
+        ground_truth (dict): image id -> array of the ground truth boxes of
+            the class
+    """
+    num_ground_truth = sum(len(boxes) for boxes in ground_truth.values())
+    no_boxes = np.zeros((0, 4))
+
+    detections = sorted(detections, key=lambda detection: -detection['score'])
+    ious = [_get_ious(np.array(detection['bbox'], dtype=np.float64),
+                      ground_truth.get(detection['image_id'], no_boxes))
+            for detection in detections]
+
+    average_precisions = []
+
+    for iou_threshold in IOU_THRESHOLDS:
+        matched = {image_id : np.zeros(len(boxes), dtype=bool) for image_id, boxes in ground_truth.items()}
+        true_positives = np.zeros(len(detections))
+
+        # the most confident detections first take the ground truth box they
+        # overlap most
+        for detection_num, detection in enumerate(detections):
+            if len(ious[detection_num]) == 0:
+                continue
+
+            candidates = np.where(matched[detection['image_id']], -1., ious[detection_num])
+            best = int(candidates.argmax())
+
+            if candidates[best] >= iou_threshold:
+                matched[detection['image_id']][best] = True
+                true_positives[detection_num] = 1.
+
+        average_precisions.append(_get_average_precision(true_positives, num_ground_truth))
+
+    return {'ap' : float(np.mean(average_precisions)),
+            'ap50' : average_precisions[0],
+            'num_ground_truth' : num_ground_truth,
+            'num_detections' : len(detections)}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def evaluate_detections(dataset : dict,
+                        detections : list) -> dict:
+    """scores COCO detections against the ground truth of a dataset the way
+    the COCO evaluation does (one box per ground truth box, AP at 101 recall
+    levels averaged over the IoU thresholds 0.5 to 0.95), without crowd
+    regions or a limit of detections per image. Only the detections of the
+    images of the dataset are scored.
+
+    Args:
+        dataset (dict): ground truth, see load_coco_dataset
+        detections (list): COCO detection results, see boxes_to_coco
+
+    Returns:
+        dict: 'map' and 'map50' over the classes with ground truth boxes,
+            and 'classes': label -> {'ap', 'ap50', 'num_ground_truth',
+            'num_detections'}, None for a class without ground truth boxes
+    """
+    image_ids = set(image['id'] for image in dataset['images'])
+
+    per_class = {}
+    for category in COCO_CATEGORIES:
+
+        ground_truth = {}
+        for annotation in dataset['annotations']:
+            if annotation['category_id'] == category['id'] and annotation['image_id'] in image_ids:
+                ground_truth.setdefault(annotation['image_id'], []).append(annotation['bbox'])
+        ground_truth = {image_id : np.array(boxes, dtype=np.float64) for image_id, boxes in ground_truth.items()}
+
+        if len(ground_truth) == 0:
+            per_class[category['name']] = None
+            continue
+
+        per_class[category['name']] = _evaluate_class([detection for detection in detections
+                                                       if detection['category_id'] == category['id'] and
+                                                          detection['image_id'] in image_ids],
+                                                      ground_truth)
+
+    scored = [result for result in per_class.values() if result is not None]
+
+    return {'map' : float(np.mean([result['ap'] for result in scored])) if len(scored) > 0 else 0.,
+            'map50' : float(np.mean([result['ap50'] for result in scored])) if len(scored) > 0 else 0.,
+            'classes' : per_class}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_pareto_front(results : list,
+                     speed_key = 'pages_per_sec',
+                     accuracy_key = 'map') -> list:
+    """returns the results no other result is both faster and more accurate
+    than, fastest first
+    """
+    front = []
+
+    for result in results:
+        dominated = any(other[speed_key] >= result[speed_key] and other[accuracy_key] >= result[accuracy_key] and
+                        (other[speed_key] > result[speed_key] or other[accuracy_key] > result[accuracy_key])
+                        for other in results)
+        if not dominated:
+            front.append(result)
+
+    return sorted(front, key=lambda result: -result[speed_key])
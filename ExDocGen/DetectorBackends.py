@@ -0,0 +1,552 @@
+import os
+import json
+
+import numpy as np
+from PIL import Image
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+BACKEND_TORCH = 'torch'
+BACKEND_ONNX = 'onnx'
+BACKEND_TORCHSCRIPT = 'torchscript'
+DETECTOR_BACKENDS = [BACKEND_TORCH, BACKEND_ONNX, BACKEND_TORCHSCRIPT]
+
+QUANTIZATION_DYNAMIC = 'dynamic'
+QUANTIZATION_STATIC = 'static'
+
+# the size passed to the yolov5 AutoShape model, the longest side of a page
+# image is scaled to 792 pixels (a letter page at 72 dpi)
+DETECTION_SIZE = (792,612)
+
+# input of the exported model (height, width). AutoShape rounds the scaled
+# page up to a multiple of the model stride (32), the same shape is used for
+# every page of the ONNX model so it can be exported with static axes
+ONNX_INPUT_SHAPE = (800, 640)
+ONNX_OPSET = 12
+
+# the traced model keeps its input shape next to the graph
+TORCHSCRIPT_SHAPE_FILE = 'input_shape.json'
+
+# defaults of the yolov5 AutoShape model, so both backends keep the same boxes
+CONF_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.45
+MAX_DETECTIONS = 1000
+LETTERBOX_COLOUR = 114
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def letterbox(page_img : np.array,
+              input_shape = ONNX_INPUT_SHAPE) -> tuple:
+    """scales a page image to fit input_shape, keeping its aspect ratio, and
+    pads the rest of the image with grey like yolov5 does
+
+    Args:
+        page_img (np.array): page image (height x width x 3)
+        input_shape (tuple, optional): (height, width) of the model input.
+            Defaults to ONNX_INPUT_SHAPE.
+
+    Returns:
+        tuple: (model input (1 x 3 x height x width float32), gain, (pad_x, pad_y))
+    """
+    height, width = page_img.shape[:2]
+    gain = min(input_shape[0] / height, input_shape[1] / width)
+
+    new_width = int(round(width * gain))
+    new_height = int(round(height * gain))
+
+    img = page_img[:, :, :3]
+    if (new_width, new_height) != (width, height):
+        img = np.asarray(Image.fromarray(img).resize((new_width, new_height), Image.BILINEAR))
+
+    pad_x = (input_shape[1] - new_width) // 2
+    pad_y = (input_shape[0] - new_height) // 2
+
+    input_img = np.full((input_shape[0], input_shape[1], 3), LETTERBOX_COLOUR, dtype=np.uint8)
+    input_img[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = img
+
+    input_tensor = input_img.transpose(2, 0, 1)[np.newaxis].astype(np.float32) / 255.
+
+    return input_tensor, gain, (pad_x, pad_y)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def create_warm_up_page(shape = (DETECTION_SIZE[0], DETECTION_SIZE[1], 3)) -> np.array:
+    """returns a synthetic page image, a white letter page with a title and
+    two columns of dark bars standing in for lines of text, so the warm-up
+    of a detector goes through the same shapes and post-processing as a page
+    with boxes on it
+    """
+    page_img = np.full(shape, 255, dtype=np.uint8)
+    height, width = shape[:2]
+    margin = width // 10
+
+    page_img[margin:margin + 24, margin:width - margin] = 0
+
+    column_width = (width - 3 * margin) // 2
+    for column_x in (margin, 2 * margin + column_width):
+        for line_y in range(margin + 60, height - margin, 14):
+            page_img[line_y:line_y + 8, column_x:column_x + column_width] = 64
+
+    return page_img
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def non_max_suppression(boxes : np.array,
+                        scores : np.array,
+                        iou_threshold = IOU_THRESHOLD) -> np.array:
+    """greedy non maximum suppression
+
+    Args:
+        boxes (np.array): N x 4 array of (x0, y0, x1, y1)
+        scores (np.array): N scores
+        iou_threshold (float, optional): Defaults to IOU_THRESHOLD.
+
+    Returns:
+        np.array: indices of the boxes kept, highest score first
+    """
+    x0, y0, x1, y1 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x1 - x0) * (y1 - y0)
+
+    order = scores.argsort()[::-1]
+    keep = []
+
+    while order.size > 0:
+        best = order[0]
+        keep.append(best)
+
+        inter_w = np.maximum(0., np.minimum(x1[best], x1[order[1:]]) - np.maximum(x0[best], x0[order[1:]]))
+        inter_h = np.maximum(0., np.minimum(y1[best], y1[order[1:]]) - np.maximum(y0[best], y0[order[1:]]))
+        inter = inter_w * inter_h
+        iou = inter / (areas[best] + areas[order[1:]] - inter + 1e-9)
+
+        order = order[1:][iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def postprocess(prediction : np.array,
+                gain : float,
+                pad : tuple,
+                page_shape : tuple,
+                conf_threshold = CONF_THRESHOLD,
+                iou_threshold = IOU_THRESHOLD) -> np.array:
+    """turns the raw output of the yolov5 model for one image into labelled
+    boxes in page image coordinates
+
+    Args:
+        prediction (np.array): N x (5 + classes) rows of (cx, cy, w, h, obj, class scores)
+        gain (float): scale applied by letterbox
+        pad (tuple): (pad_x, pad_y) added by letterbox
+        page_shape (tuple): shape of the page image
+
+    Returns:
+        np.array: rows of [xmin, ymin, xmax, ymax, confidence, class], the
+            format of the xyxy results of the torch model
+    """
+    prediction = prediction[prediction[:, 4] > conf_threshold]
+
+    class_scores = prediction[:, 5:] * prediction[:, 4:5]
+    classes = class_scores.argmax(1)
+    scores = class_scores[np.arange(len(classes)), classes]
+
+    mask = scores > conf_threshold
+    prediction, classes, scores = prediction[mask], classes[mask], scores[mask]
+
+    if len(prediction) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+
+    boxes = np.empty((len(prediction), 4), dtype=np.float32)
+    boxes[:, 0] = prediction[:, 0] - prediction[:, 2] / 2
+    boxes[:, 1] = prediction[:, 1] - prediction[:, 3] / 2
+    boxes[:, 2] = prediction[:, 0] + prediction[:, 2] / 2
+    boxes[:, 3] = prediction[:, 1] + prediction[:, 3] / 2
+
+    # boxes of different classes never suppress each other, the offset spans
+    # every coordinate whatever the input shape of the model
+    offsets = classes[:, np.newaxis].astype(np.float32) * (boxes.max() - boxes.min() + 1)
+    keep = non_max_suppression(boxes + offsets, scores, iou_threshold)[:MAX_DETECTIONS]
+
+    boxes = boxes[keep]
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / gain
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / gain
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, page_shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, page_shape[0])
+
+    return np.concatenate([boxes,
+                           scores[keep, np.newaxis],
+                           classes[keep, np.newaxis].astype(np.float32)], axis=1)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class TorchDetector:
+    """The fine-tuned yolov5 model run by PyTorch through torch.hub"""
+
+    # detect can run at any input size
+    supports_size = True
+
+    def __init__(self,
+                 path_to_weights : str,
+                 model_path : str,
+                 model_type : str):
+
+        import torch
+
+        self.model = torch.hub.load(repo_or_dir=model_path,
+                                    model=model_type,
+                                    path=path_to_weights)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def set_thresholds(self,
+                       conf_threshold = CONF_THRESHOLD,
+                       iou_threshold = IOU_THRESHOLD) -> None:
+        """sets the smallest confidence of a box and the IoU above which the
+        non max suppression drops the less confident of two boxes
+        """
+        self.model.conf = conf_threshold
+        self.model.iou = iou_threshold
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def detect(self,
+               page_imgs : list,
+               size = DETECTION_SIZE) -> list:
+        """returns one array of [xmin, ymin, xmax, ymax, confidence, class]
+        rows per page image, in page image coordinates
+
+        Args:
+            page_imgs (list): page images (numpy.ndarray)
+            size (tuple, optional): the longest side of every image is scaled
+                to the largest value. Defaults to DETECTION_SIZE.
+        """
+        results = self.model(   page_imgs,
+                                size=size)
+
+        return [xyxy.cpu().numpy() for xyxy in results.xyxy]
+
+# =============================================================================
+
+class OnnxDetector:
+    """The yolov5 model exported to ONNX (see export_onnx) and run by ONNX
+    Runtime, optionally quantized to int8 (see quantize_onnx). The model input
+    has a static shape so pages are letterboxed to ONNX_INPUT_SHAPE and run
+    one at a time.
+    """
+
+    # the input size is fixed when the model is exported
+    supports_size = False
+
+    def __init__(self,
+                 onnx_path : str,
+                 num_threads = None,
+                 conf_threshold = CONF_THRESHOLD,
+                 iou_threshold = IOU_THRESHOLD):
+
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads is not None:
+            options.intra_op_num_threads = num_threads
+
+        self.session = onnxruntime.InferenceSession(onnx_path,
+                                                    sess_options=options,
+                                                    providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.input_shape = tuple(self.session.get_inputs()[0].shape[2:])
+
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def set_thresholds(self,
+                       conf_threshold = CONF_THRESHOLD,
+                       iou_threshold = IOU_THRESHOLD) -> None:
+        """same as TorchDetector.set_thresholds"""
+
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def detect(self,
+               page_imgs : list) -> list:
+        """returns one array of [xmin, ymin, xmax, ymax, confidence, class]
+        rows per page image
+        """
+        labels = []
+
+        for page_img in page_imgs:
+            input_tensor, gain, pad = letterbox(page_img, self.input_shape)
+            prediction = self.session.run(None, {self.input_name : input_tensor})[0][0]
+
+            labels.append(postprocess(prediction,
+                                      gain,
+                                      pad,
+                                      page_img.shape,
+                                      self.conf_threshold,
+                                      self.iou_threshold))
+
+        return labels
+
+# =============================================================================
+
+class TorchScriptDetector:
+    """The yolov5 model traced with TorchScript (see trace_detector) and
+    frozen for inference, run by PyTorch without the python code of yolov5
+    and AutoShape. Like the ONNX model the trace has a static input shape, so
+    pages are letterboxed and run one at a time with the same pre and post
+    processing as OnnxDetector.
+
+    The model is loaded from torchscript_path (see export_torchscript) when
+    the file exists and traced from the weights otherwise, which takes a few
+    seconds when the generator starts.
+    """
+
+    # the input size is fixed when the model is traced
+    supports_size = False
+
+    def __init__(self,
+                 torchscript_path = None,
+                 path_to_weights = None,
+                 model_path = None,
+                 model_type = None,
+                 conf_threshold = CONF_THRESHOLD,
+                 iou_threshold = IOU_THRESHOLD):
+
+        import torch
+
+        if torchscript_path is not None and os.path.isfile(torchscript_path):
+            extra_files = {TORCHSCRIPT_SHAPE_FILE : ''}
+            model = torch.jit.load(torchscript_path, map_location='cpu', _extra_files=extra_files)
+            self.input_shape = tuple(json.loads(extra_files[TORCHSCRIPT_SHAPE_FILE]))
+        else:
+            model = trace_detector(path_to_weights, model_path, model_type)
+            self.input_shape = ONNX_INPUT_SHAPE
+
+        # folds the batch norms into the convolutions and fuses what the cpu
+        # backend can run as one operation
+        self.model = torch.jit.optimize_for_inference(model.eval())
+
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def set_thresholds(self,
+                       conf_threshold = CONF_THRESHOLD,
+                       iou_threshold = IOU_THRESHOLD) -> None:
+        """same as TorchDetector.set_thresholds"""
+
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def detect(self,
+               page_imgs : list) -> list:
+        """returns one array of [xmin, ymin, xmax, ymax, confidence, class]
+        rows per page image
+        """
+        import torch
+
+        labels = []
+
+        for page_img in page_imgs:
+            input_tensor, gain, pad = letterbox(page_img, self.input_shape)
+
+            with torch.inference_mode():
+                prediction = self.model(torch.from_numpy(input_tensor))[0][0].numpy()
+
+            labels.append(postprocess(prediction,
+                                      gain,
+                                      pad,
+                                      page_img.shape,
+                                      self.conf_threshold,
+                                      self.iou_threshold))
+
+        return labels
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def create_detector(backend = BACKEND_TORCH,
+                    path_to_weights = None,
+                    model_path = None,
+                    model_type = None,
+                    onnx_path = None,
+                    num_threads = None,
+                    torchscript_path = None):
+    """creates the layout detector of the given backend
+
+    Args:
+        backend (str, optional): one of DETECTOR_BACKENDS. Defaults to BACKEND_TORCH.
+        path_to_weights, model_path, model_type: torch.hub model (torch
+            backend, and torchscript backend without a traced model)
+        onnx_path (str, optional): exported (and possibly quantized) model
+            (onnx backend). Defaults to None.
+        num_threads (int, optional): intra-op threads of the onnx backend.
+            Defaults to None which lets ONNX Runtime decide.
+        torchscript_path (str, optional): traced model (torchscript
+            backend), traced from the weights when the file does not exist.
+            Defaults to None.
+
+    Returns:
+        TorchDetector, OnnxDetector or TorchScriptDetector
+    """
+    if backend == BACKEND_TORCH:
+        return TorchDetector(path_to_weights, model_path, model_type)
+
+    if backend == BACKEND_ONNX:
+        if onnx_path is None or not os.path.isfile(onnx_path):
+            raise FileNotFoundError(f'ONNX model {onnx_path} not found, create it with export_onnx')
+        return OnnxDetector(onnx_path, num_threads=num_threads)
+
+    if backend == BACKEND_TORCHSCRIPT:
+        return TorchScriptDetector(torchscript_path, path_to_weights, model_path, model_type)
+
+    raise ValueError(f'unknown detector backend {backend}')
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _load_raw_model(path_to_weights : str,
+                    model_path : str,
+                    model_type : str):
+    """loads the yolov5 model without the AutoShape pre and post processing,
+    with the detection head returning a single tensor like the export
+    script of yolov5 sets it up
+    """
+    import torch
+
+    model = torch.hub.load(repo_or_dir=model_path,
+                           model=model_type,
+                           path=path_to_weights,
+                           autoshape=False)
+    model = model.float().eval()
+
+    for module in model.modules():
+        if module.__class__.__name__ == 'Detect':
+            module.inplace = False
+            module.export = True
+
+    return model
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def export_onnx(path_to_weights : str,
+                onnx_path : str,
+                model_path : str,
+                model_type : str,
+                input_shape = ONNX_INPUT_SHAPE,
+                opset = ONNX_OPSET) -> None:
+    """exports the yolov5 weights to an ONNX model with a static input shape
+
+    Args:
+        path_to_weights (str): yolov5 weights (e.g. weights/best.pt)
+        onnx_path (str): ONNX file to create
+        model_path (str): torch.hub repository of yolov5
+        model_type (str): torch.hub model name
+        input_shape (tuple, optional): (height, width). Defaults to ONNX_INPUT_SHAPE.
+        opset (int, optional): ONNX opset. Defaults to ONNX_OPSET.
+    """
+    import torch
+
+    model = _load_raw_model(path_to_weights, model_path, model_type)
+    dummy_input = torch.zeros(1, 3, *input_shape)
+
+    with torch.no_grad():
+        torch.onnx.export(model,
+                          dummy_input,
+                          onnx_path,
+                          opset_version=opset,
+                          do_constant_folding=True,
+                          input_names=['images'],
+                          output_names=['output0'])
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def trace_detector(path_to_weights : str,
+                   model_path : str,
+                   model_type : str,
+                   input_shape = ONNX_INPUT_SHAPE):
+    """traces the yolov5 weights with TorchScript at a static input shape,
+    the detection head bakes the grid of that shape into the trace
+
+    Returns:
+        torch.jit.ScriptModule: the traced model
+    """
+    import torch
+
+    model = _load_raw_model(path_to_weights, model_path, model_type)
+    dummy_input = torch.zeros(1, 3, *input_shape)
+
+    with torch.no_grad():
+        return torch.jit.trace(model, dummy_input)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def export_torchscript(path_to_weights : str,
+                       torchscript_path : str,
+                       model_path : str,
+                       model_type : str,
+                       input_shape = ONNX_INPUT_SHAPE) -> None:
+    """saves the traced model (see trace_detector), so the torchscript
+    backend does not trace it every time it starts
+
+    Args:
+        path_to_weights (str): yolov5 weights (e.g. weights/best.pt)
+        torchscript_path (str): TorchScript file to create
+        model_path (str): torch.hub repository of yolov5
+        model_type (str): torch.hub model name
+        input_shape (tuple, optional): (height, width). Defaults to ONNX_INPUT_SHAPE.
+    """
+    import torch
+
+    model = trace_detector(path_to_weights, model_path, model_type, input_shape)
+    torch.jit.save(model, torchscript_path, _extra_files={TORCHSCRIPT_SHAPE_FILE : json.dumps(list(input_shape))})
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def quantize_onnx(onnx_path : str,
+                  quantized_path : str,
+                  mode = QUANTIZATION_DYNAMIC,
+                  calibration_images = None) -> None:
+    """quantizes the weights (dynamic) or the weights and activations (static)
+    of an exported model to int8
+
+    Args:
+        onnx_path (str): exported float model
+        quantized_path (str): ONNX file to create
+        mode (str, optional): QUANTIZATION_DYNAMIC or QUANTIZATION_STATIC.
+            Defaults to QUANTIZATION_DYNAMIC.
+        calibration_images (list, optional): page images used to calibrate the
+            activation ranges, required by static quantization. Defaults to None.
+    """
+    from onnxruntime.quantization import (quantize_dynamic, quantize_static, QuantType,
+                                          QuantFormat, CalibrationDataReader)
+
+    if mode == QUANTIZATION_DYNAMIC:
+        quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QUInt8)
+        return
+
+    if mode != QUANTIZATION_STATIC:
+        raise ValueError(f'unknown quantization mode {mode}')
+
+    if not calibration_images:
+        raise ValueError('static quantization needs calibration images')
+
+    class PageCalibrationReader(CalibrationDataReader):
+
+        def __init__(self):
+            self.inputs = iter([{'images' : letterbox(page_img)[0]} for page_img in calibration_images])
+
+        def get_next(self):
+            return next(self.inputs, None)
+
+    quantize_static(onnx_path,
+                    quantized_path,
+                    PageCalibrationReader(),
+                    quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8)
@@ -1,4 +1,7 @@
+import os
+import io
 import json
+import gzip
 
 from dataclasses import dataclass
 from pprint import pprint
@@ -7,6 +10,61 @@ import pysbd
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
+FORMAT_JSON = 'json'
+FORMAT_JSONL = 'jsonl'
+
+# the pieces of the JSON document written around the pages when a document is
+# serialized a page at a time, these match the output of json.dump
+JSON_PAGE_SEPARATOR = ', '
+JSON_FOOTER = ']}'
+
+JSON_PAGES_KEY = ', "document_pages": ['
+
+# bytes read at a time when looking for the end of the header of a file
+JSON_HEADER_CHUNK_SIZE = 4096
+
+def _get_json_header(pdf_file_path : str,
+                     settings = None) -> str:
+
+    header = '{"file_path": ' + json.dumps(pdf_file_path)
+    if settings is not None:
+        header += ', "settings": ' + json.dumps(settings)
+
+    return header + JSON_PAGES_KEY
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def read_json_settings(json_file_path : str) -> dict:
+    """returns the settings an ExtractedDocumentWriter wrote in the header of a
+    JSON file, without reading the pages
+
+    Args:
+        json_file_path (str): path to the JSON file
+
+    Returns:
+        dict: the settings, or None if the file has none or is not a JSON
+            file of a document
+    """
+    header = ''
+
+    with open(json_file_path, 'r') as json_file:
+        # quotes inside of the strings are escaped, so the first match is the
+        # key of the pages
+        while JSON_PAGES_KEY not in header:
+            chunk = json_file.read(JSON_HEADER_CHUNK_SIZE)
+            if len(chunk) == 0:
+                return None
+            header += chunk
+
+    try:
+        header_dict = json.loads(header[:header.index(JSON_PAGES_KEY)] + '}')
+    except ValueError:
+        return None
+
+    return header_dict.get('settings') if isinstance(header_dict, dict) else None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
 class color:
    PURPLE = '\033[95m'
    CYAN = '\033[96m'
@@ -55,12 +113,35 @@ class DocumentTextBlock:
     def __init__(self,
                  text : str,
                  conf = 0.,
-                 label = 'UNKNOWN'):
+                 label = 'UNKNOWN',
+                 bbox = None):
 
         self.sentences = self._split_sentences(text)
         self.conf = float(conf)
         self.label = label
 
+        # (x0, y0, x1, y1) of the block in pdf page coordinates, if known
+        self.bbox = bbox
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    @classmethod
+    def from_sentences(cls,
+                       sentences : list,
+                       conf = 0.,
+                       label = 'UNKNOWN',
+                       bbox = None):
+        """creates a text block from already segmented sentences, the list is
+        not copied so blocks repeated on many pages can share it
+        """
+        text_block = cls.__new__(cls)
+        text_block.sentences = sentences
+        text_block.conf = float(conf)
+        text_block.label = label
+        text_block.bbox = bbox
+
+        return text_block
+
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     def __str__(self):
@@ -172,14 +253,25 @@ class DocumentPage:
     def add_text_block( self,
                         text : str,
                         conf = 0.,
-                        label = 'UNKNOWN') -> None:
+                        label = 'UNKNOWN',
+                        bbox = None) -> None:
         """Add a text block to the document
 
         Args:
             text_block (DocumentTextBlock): text block to be added
+            bbox (tuple, optional): (x0, y0, x1, y1) of the block on the page.
+                Defaults to None.
         """
 
-        self.document_text_blocks.append(DocumentTextBlock(text, conf, label))
+        self.document_text_blocks.append(DocumentTextBlock(text, conf, label, bbox))
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def append_text_block(self,
+                          text_block : DocumentTextBlock) -> None:
+        """Add an already created text block to the page"""
+
+        self.document_text_blocks.append(text_block)
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -253,6 +345,9 @@ class ExtractedDocument:
         self.document_pages = []
         self.current_page_num = 0
 
+        # DocumentMetrics set by the ExtractedDocumentGenerator
+        self.metrics = None
+
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     def __iter__(self):
@@ -342,4 +437,139 @@ class ExtractedDocument:
         with open(file_path, "w+") as final:
             json.dump(self.get_json_dict(), final)
 
-    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
\ No newline at end of file
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def iter_json_chunks(self,
+                         output_format = FORMAT_JSON):
+        """yields the serialized document one page at a time so it never has
+        to be held in memory as a single string.
+
+        Args:
+            output_format (str, optional): FORMAT_JSON gives the same text as
+                json.dumps(self.get_json_dict()), FORMAT_JSONL gives one line
+                per page with the file_path added to every line.
+                Defaults to FORMAT_JSON.
+        """
+        if output_format == FORMAT_JSONL:
+            for page in self.document_pages:
+                page_dict = page.to_dict()
+                page_dict['file_path'] = self.pdf_file_path
+                yield json.dumps(page_dict) + '\n'
+            return
+
+        if output_format != FORMAT_JSON:
+            raise ValueError(f'unknown output format {output_format}')
+
+        yield _get_json_header(self.pdf_file_path)
+        for page_num, page in enumerate(self.document_pages):
+            if page_num > 0:
+                yield JSON_PAGE_SEPARATOR
+            yield json.dumps(page.to_dict())
+        yield JSON_FOOTER
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def write(self,
+              binary_file,
+              output_format = FORMAT_JSON,
+              compress = False) -> None:
+        """serializes the document into an open binary file object
+
+        Args:
+            binary_file: file object opened for writing bytes
+            output_format (str, optional): FORMAT_JSON or FORMAT_JSONL.
+                Defaults to FORMAT_JSON.
+            compress (bool, optional): gzip the output. Defaults to False.
+        """
+        if compress:
+            with gzip.GzipFile(fileobj=binary_file, mode='wb') as gzip_file:
+                for chunk in self.iter_json_chunks(output_format):
+                    gzip_file.write(chunk.encode())
+        else:
+            for chunk in self.iter_json_chunks(output_format):
+                binary_file.write(chunk.encode())
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def to_bytes(self,
+                 output_format = FORMAT_JSON,
+                 compress = False) -> bytes:
+        """returns the serialized (and optionally gzipped) document as bytes,
+        built a page at a time so only the output itself is held in memory.
+        """
+        buffer = io.BytesIO()
+        self.write(buffer, output_format, compress)
+        return buffer.getvalue()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# =============================================================================
+
+class ExtractedDocumentWriter:
+    """Writes the pages of an extracted document to a JSON file one at a time,
+    so a document never has to be held in memory in full. The file has the
+    same layout as ExtractedDocument.save_as_json, with the settings the pages
+    were extracted with added to the header when they are given (see
+    read_json_settings). The output is written to a temporary file which only
+    replaces file_path once the writer is closed without an error.
+    """
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def __init__(self,
+                 file_path : str,
+                 pdf_file_path : str,
+                 settings : dict = None):
+
+        self.file_path = file_path
+        self.tmp_file_path = file_path + '.tmp'
+        self.num_pages = 0
+
+        self.file = open(self.tmp_file_path, 'w')
+        self.file.write(_get_json_header(pdf_file_path, settings))
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def write_page(self,
+                   page : DocumentPage) -> None:
+        self.write_page_dict(page.to_dict())
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def write_page_dict(self,
+                        page_dict : dict) -> None:
+        """writes a page already converted with DocumentPage.to_dict, e.g. read
+        back from another JSON file
+        """
+        if self.num_pages > 0:
+            self.file.write(JSON_PAGE_SEPARATOR)
+
+        json.dump(page_dict, self.file)
+        self.num_pages += 1
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def close(self) -> None:
+
+        self.file.write(JSON_FOOTER)
+        self.file.close()
+        os.replace(self.tmp_file_path, self.file_path)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def abort(self) -> None:
+
+        self.file.close()
+        if os.path.exists(self.tmp_file_path):
+            os.remove(self.tmp_file_path)
@@ -1,17 +1,33 @@
 import os
-import io
+import time
+import multiprocessing
+from collections import deque
 
 from pprint import pprint
 import pandas as pd 
 import numpy as np
-import torch
 from PIL import Image, ImageDraw
 import fitz
+import pysbd
 
 from .BoundingBox import generate_bounding_boxes, BoundingBox
-from .TableExtractor import TableExtractor
-from .ExtractedDocument import ExtractedDocument, DocumentPage
+from .TableExtractor import TableExtractor, table_to_text, TABLE_BACKEND_EAGER
+from .ExtractedDocument import (ExtractedDocument, DocumentPage, DocumentTextBlock, DocumentSentence,
+                                ExtractedDocumentWriter)
 from .Colours import COLOURS
+from .Metrics import DocumentMetrics, NULL_METRICS
+from .MemoryBudget import MemoryBudget
+from .DetectorBackends import create_detector, create_warm_up_page, BACKEND_TORCH
+from .RuntimeConfig import RuntimeConfig
+from .CascadeConfig import CascadeConfig
+from .TableResolution import TableResolution
+from .OcrCache import OcrCache
+from .RunningBlocks import RunningBlocks, RunningBlockConfig
+from .TextProcessing import clean_text, clean_texts, segment_text, PostProcessor
+from .Pipeline import Pipeline, Stage, STAGE_CPU, STAGE_IO, STAGE_MODEL
+from .PdfInput import open_pdf, close_pdf
+from .PageSelection import resolve_pages
+from .TextLayout import classify_page, TextLayoutConfig, LAYOUT_DETECTOR, LAYOUT_TEXT, LAYOUT_AUTO, LAYOUT_MODES
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -19,6 +35,8 @@ DIR_PATH = os.path.dirname(os.path.realpath(__file__))
 DEFAULT_MODEL_WEIGHTS_PATH = os.path.join(DIR_PATH,'weights/best.pt')
 DEFAULT_MODEL_LOCATION = 'ultralytics/yolov5'
 DEFAULT_MODEL_TYPE = 'custom'
+DEFAULT_ONNX_MODEL_PATH = os.path.join(DIR_PATH,'weights/best.onnx')
+DEFAULT_TORCHSCRIPT_MODEL_PATH = os.path.join(DIR_PATH,'weights/best.torchscript')
 
 DEFAULT_ROOT_OUTPUT_PATH = '.output/'
 PDF_IMAGE_DIR_PATH = 'pdf_page_images'
@@ -26,57 +44,151 @@ ANNOTATED_IMAGE_PATH = 'annotated_images'
 DEFAULT_PDF_PAGE_IMAGE_OUTPUT_PATH = os.path.join(DEFAULT_ROOT_OUTPUT_PATH, PDF_IMAGE_DIR_PATH)
 DEFAULT_ANNOTATED_IMAGE_OUTPUT_PATH = os.path.join(DEFAULT_ROOT_OUTPUT_PATH, ANNOTATED_IMAGE_PATH)
 
-# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+TABLE_RENDER_DPI = 300
 
-def clean_texts(original_texts : list) -> list:
-    """this function cleans the input list of strings by removing new lines and
-    non printable ascii characters
+# the first run of a model pays for the allocator growth, the kernel and
+# algorithm selection and the lazy initialization of the framework, and
+# TorchScript optimizes the graph over its first runs
+DEFAULT_WARM_UP_RUNS = 2
 
-    Args:
-        original_texts (list): list of strings which require cleaning
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-    Returns:
-        list: list of cleaned strings
+class RawTextBlock:
+    """Text of a block as extracted from the pdf, before it is cleaned and
+    segmented
     """
-    cleaned_texts = []
 
-    for text in original_texts:
-        if len(text) > 0:
-            cleaned_texts.append(clean_text(text))
+    __slots__ = ('raw_text', 'bb', 'is_running')
 
-    return cleaned_texts
+    def __init__(self,
+                 raw_text : str,
+                 bb : BoundingBox,
+                 is_running = False):
 
-# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.raw_text = raw_text
+        self.bb = bb
+        self.is_running = is_running
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_raw_texts(blocks : list) -> list:
+    """returns the texts of the blocks still to be cleaned and segmented"""
 
-def clean_text(original_text : str) -> str:
-    """this function returns cleaned version of the input string with new
-    lines and non printable ascii characters removed.
+    return [block.raw_text for block in blocks if isinstance(block, RawTextBlock)]
 
-    Args:
-        original_text (str): string which required cleaning
+# =============================================================================
 
-    Returns:
-        str: cleaned string
+class DocumentStream:
+    """A document opened by ExtractedDocumentGenerator.open_stream whose
+    selected pages are extracted one at a time by the caller. The caller may
+    find the layouts of the pages itself, e.g. in detector batches shared
+    with other documents, and may extract each page with a different
+    generator of a pool. The pages are selected, the running blocks kept and
+    the metrics collected as in iter_pages_from_stream. close() releases the
+    pdf and emits the metrics of the document.
     """
-    cleaned_text = ''
 
-    for char in original_text:
+    def __init__(self,
+                 doc_gen,
+                 fitz_doc : fitz.Document,
+                 include_pages = [],
+                 include_labels = None):
 
-        # skip empty characters (not sure how that can happen but it does)
-        if len(char) == 0:
-            continue
-        
-        # replace newline character with space
-        if ord(char) == 10:
-                char = ' '
+        self.doc_gen = doc_gen
+        self.fitz_doc = fitz_doc
+        self.include_labels = include_labels
+
+        self.page_numbers = resolve_pages(include_pages, fitz_doc.page_count)
+        self.running_blocks = doc_gen.create_running_blocks()
+        self.metrics = doc_gen._create_metrics(fitz_doc.name)
+        self.start_time = time.perf_counter()
+        self.closed = False
 
-        # only add printable ascii characters
-        if ord(char) > 31 and ord(char) < 127:
-            cleaned_text += char
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-    return cleaned_text.strip()
+    def __enter__(self):
+        return self
 
-# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_text_layout(self,
+                        page_number : int) -> np.array:
+        """returns the layout of a page from its text layer, None when the
+        page has to go to the detector
+        """
+        if self.doc_gen.layout_mode == LAYOUT_DETECTOR:
+            return None
+
+        return self.doc_gen._get_text_layout(self.fitz_doc[page_number], self.metrics)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def render_page(self,
+                    page_number : int) -> np.array:
+        """returns the image of a page for the detector"""
+
+        return self.doc_gen._render_page(self.fitz_doc[page_number], self.metrics)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def extract_page(self,
+                     page_number : int,
+                     labels : np.array = None,
+                     doc_gen = None) -> DocumentPage:
+        """extracts the blocks of a page
+
+        Args:
+            page_number (int): page to extract
+            labels (np.array, optional): layout of the page. Defaults to None
+                which finds the layout with the generator, as _iter_pages does.
+            doc_gen (ExtractedDocumentGenerator, optional): generator the page
+                is extracted with, e.g. one borrowed from a GeneratorPool for
+                this page only. Defaults to None which uses the generator that
+                opened the document.
+
+        Returns:
+            DocumentPage: the extracted page
+        """
+        doc_gen = doc_gen if doc_gen is not None else self.doc_gen
+
+        if doc_gen.memory_budget is not None:
+            doc_gen.memory_budget.check_headroom(self.metrics)
+
+        if labels is None:
+            extracted_page = doc_gen._extract_page(page=self.fitz_doc.load_page(page_number),
+                                                   page_number=page_number,
+                                                   include_labels=self.include_labels,
+                                                   metrics=self.metrics,
+                                                   running_blocks=self.running_blocks)
+        else:
+            extracted_page = doc_gen._extract_text_from_page(fitz_page=self.fitz_doc[page_number],
+                                                             page_number=page_number,
+                                                             labels=labels,
+                                                             include_labels=self.include_labels,
+                                                             metrics=self.metrics,
+                                                             running_blocks=self.running_blocks)
+        self.metrics.increment('pages')
+
+        return extracted_page
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def close(self) -> None:
+
+        if self.closed:
+            return
+
+        self.closed = True
+        close_pdf(self.fitz_doc)
+
+        self.metrics.add_time('document', time.perf_counter() - self.start_time)
+        self.doc_gen._emit_metrics(self.metrics)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 class ExtractedDocumentGenerator:
     """This classes uses the a fine-tuned object detection model to extract
@@ -87,30 +199,168 @@ class ExtractedDocumentGenerator:
                     path_to_weights = DEFAULT_MODEL_WEIGHTS_PATH,
                     model_path = DEFAULT_MODEL_LOCATION,
                     model_type = DEFAULT_MODEL_TYPE,
-                    output_path = DEFAULT_ROOT_OUTPUT_PATH):
-
-        self.model = None
-        self._load_model(   path_to_weights=path_to_weights,
-                            model_type=model_type,
-                            model_path=model_path)
+                    output_path = DEFAULT_ROOT_OUTPUT_PATH,
+                    collect_metrics = False,
+                    metrics_sinks = None,
+                    memory_budget : MemoryBudget = None,
+                    detector_backend = BACKEND_TORCH,
+                    onnx_path = DEFAULT_ONNX_MODEL_PATH,
+                    table_backend = TABLE_BACKEND_EAGER,
+                    runtime_config : RuntimeConfig = None,
+                    cascade_config : CascadeConfig = None,
+                    table_resolution : TableResolution = None,
+                    ocr_cache : OcrCache = None,
+                    running_block_config : RunningBlockConfig = None,
+                    postprocess_workers = 0,
+                    pipeline : Pipeline = None,
+                    layout_mode = LAYOUT_DETECTOR,
+                    text_layout_config : TextLayoutConfig = None,
+                    torchscript_path = DEFAULT_TORCHSCRIPT_MODEL_PATH,
+                    warm_up_runs = 0):
+
+        # the thread counts have to be set before the models are loaded
+        self.runtime_config = runtime_config if runtime_config is not None else RuntimeConfig()
+        self.runtime_config.apply()
+
+        # the layout of a page comes from the detector, the text layer of the
+        # pdf, or the text layer and the detector for the pages it is not
+        # sure about. The detector is not loaded for the text layer only
+        if layout_mode not in LAYOUT_MODES:
+            raise ValueError(f'layout_mode {layout_mode} is not one of {LAYOUT_MODES}')
+        self.layout_mode = layout_mode
+        self.text_layout_config = text_layout_config if text_layout_config is not None else TextLayoutConfig()
+
+        self.detector = None
+        if self.layout_mode != LAYOUT_TEXT:
+            self._load_model(   path_to_weights=path_to_weights,
+                                model_type=model_type,
+                                model_path=model_path,
+                                detector_backend=detector_backend,
+                                onnx_path=onnx_path,
+                                torchscript_path=torchscript_path)
         
-        self.table_extractor = TableExtractor()
+        # optional coarse-to-fine detection
+        if cascade_config is not None and self.detector is not None and not self.detector.supports_size:
+            raise ValueError(f'the {detector_backend} detector has a fixed input size and can not run a cascade')
+        self.cascade_config = cascade_config
+
+        # repeated table cells are read once, by default the cache is only
+        # kept in memory
+        self.table_extractor = TableExtractor(backend=table_backend,
+                                              ocr_threads=self.runtime_config.ocr_threads,
+                                              ocr_cache=ocr_cache if ocr_cache is not None else OcrCache())
 
         self.output_path = output_path
         self.pdf_image_output_path =  os.path.join(self.output_path, PDF_IMAGE_DIR_PATH)
         self.annoted_image_output_path = os.path.join(self.output_path, ANNOTATED_IMAGE_PATH)
         self._check_output_directory_paths()
 
+        # metrics are always collected when there is somewhere to send them
+        self.metrics_sinks = metrics_sinks if metrics_sinks is not None else []
+        self.collect_metrics = collect_metrics or len(self.metrics_sinks) > 0
+
+        # optional limits on table render size and process RSS
+        self.memory_budget = memory_budget
+
+        # optional per table render resolutions, otherwise TABLE_RENDER_DPI
+        self.table_resolution = table_resolution
+
+        # running headers and footers are segmented once per document
+        self.running_block_config = running_block_config if running_block_config is not None else RunningBlockConfig()
+
+        # optional process pool for the text cleaning and segmentation. The
+        # worker processes of a batch are daemons, which can not start one
+        self.postprocessor = None
+        if postprocess_workers > 0 and not multiprocessing.current_process().daemon:
+            self.postprocessor = PostProcessor(postprocess_workers)
+
+        # the stages a page goes through, see create_default_pipeline
+        self.pipeline = pipeline if pipeline is not None else self.create_default_pipeline()
+
+        # optionally the models run over synthetic inputs before the first
+        # page, so it is not slower than the ones after it
+        self.warm_up_seconds = {}
+        if warm_up_runs > 0:
+            self.warm_up(warm_up_runs)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def close(self) -> None:
+        """stops the post-processing workers and commits the pending entries
+        of a persistent OCR cache. The generator can still be used, the
+        workers are started again by the next page that needs them.
+        """
+        if self.postprocessor is not None:
+            self.postprocessor.close()
+
+        if self.table_extractor.ocr_cache is not None:
+            self.table_extractor.ocr_cache.flush()
+
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     
     def _load_model(self,
                     path_to_weights = DEFAULT_MODEL_WEIGHTS_PATH,
                     model_path = DEFAULT_MODEL_LOCATION,
-                    model_type = DEFAULT_MODEL_TYPE) -> None:
+                    model_type = DEFAULT_MODEL_TYPE,
+                    detector_backend = BACKEND_TORCH,
+                    onnx_path = DEFAULT_ONNX_MODEL_PATH,
+                    torchscript_path = DEFAULT_TORCHSCRIPT_MODEL_PATH) -> None:
+
+        # the layout detector is either the yolov5 model run by PyTorch, the
+        # same model exported to (a possibly quantized) ONNX model or traced
+        # with TorchScript
+        self.detector = create_detector(backend=detector_backend,
+                                        path_to_weights=path_to_weights,
+                                        model_path=model_path,
+                                        model_type=model_type,
+                                        onnx_path=onnx_path,
+                                        num_threads=self.runtime_config.intra_op_threads,
+                                        torchscript_path=torchscript_path)
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def warm_up(self,
+                num_runs = DEFAULT_WARM_UP_RUNS) -> dict:
+        """runs the detector (at both sizes of a cascade), the table
+        transformer and the OCR over synthetic inputs num_runs times. Called
+        from __init__ with warm_up_runs, or before a service takes traffic.
+
+        Args:
+            num_runs (int, optional): Defaults to DEFAULT_WARM_UP_RUNS.
+
+        Returns:
+            dict: the seconds of every run per stage (detection,
+                detection_coarse, table_structure, ocr), the first run is
+                the cold one. Also kept in warm_up_seconds.
+        """
+        page_img = create_warm_up_page()
+
+        for _ in range(num_runs):
+            metrics = DocumentMetrics('warm_up')
+
+            if self.detector is not None:
+                with metrics.time('detection'):
+                    self.detector.detect([page_img])
+
+                if self.cascade_config is not None:
+                    with metrics.time('detection_coarse'):
+                        self.detector.detect([page_img], size=self.cascade_config.coarse_size)
+
+            self.table_extractor.warm_up(metrics)
+
+            for stage, seconds in metrics.stage_seconds.items():
+                self.warm_up_seconds.setdefault(stage, []).append(seconds)
+
+        return self.warm_up_seconds
 
-        self.model = torch.hub.load(repo_or_dir=model_path,
-                                    model=model_type,
-                                    path=path_to_weights)
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     def _check_pdf_file_path(   self,
@@ -139,52 +389,429 @@ class ExtractedDocumentGenerator:
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
+    def _create_metrics(self,
+                        document_name : str) -> DocumentMetrics:
+
+        if self.collect_metrics:
+            return DocumentMetrics(document_name)
+        
+        return NULL_METRICS
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _emit_metrics(self,
+                      metrics : DocumentMetrics) -> None:
+
+        for sink in self.metrics_sinks:
+            sink.emit(metrics)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _render_page(   self,
+                        page : fitz.Page,
+                        metrics = NULL_METRICS) -> np.array:
+
+        # load the page as a numpy.ndarray
+        with metrics.time('pixmap_render'):
+            pix = page.get_pixmap()
+            page_img = np.frombuffer(buffer=pix.samples, dtype=np.uint8).reshape((pix.height, pix.width, -1))
+
+        return page_img
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _detect(self,
+                page_imgs : list,
+                metrics = NULL_METRICS) -> list:
+        """runs the layout detector over a batch of page images
+
+        Args:
+            page_imgs (list): list of page images (numpy.ndarray)
+            metrics (DocumentMetrics, optional): Defaults to NULL_METRICS.
+
+        Returns:
+            list: one array of labelled bounding boxes per image, each row is
+                [xmin, ymin, xmax, ymax, confidence, class]
+        """
+
+        if self.cascade_config is not None:
+            return self._detect_cascade(page_imgs, metrics)
+
+        # pass the page images (numpy.ndarray) to the model to get the results
+        with metrics.time('detection'):
+            labels = self.detector.detect(page_imgs)
+
+        metrics.observe('detection_batch_size', len(page_imgs))
+
+        return labels
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _detect_cascade(self,
+                        page_imgs : list,
+                        metrics = NULL_METRICS) -> list:
+        """detects the pages at the coarse size of the cascade configuration
+        and again at full size only the pages the coarse boxes are not good
+        enough for
+        """
+        with metrics.time('detection_coarse'):
+            labels = self.detector.detect(page_imgs, size=self.cascade_config.coarse_size)
+
+        escalated = [img_num for img_num, page_labels in enumerate(labels)
+                     if self.cascade_config.needs_full_resolution(page_labels)]
+
+        if len(escalated) > 0:
+            with metrics.time('detection'):
+                full_labels = self.detector.detect([page_imgs[img_num] for img_num in escalated])
+
+            for img_num, page_labels in zip(escalated, full_labels):
+                labels[img_num] = page_labels
+
+        metrics.observe('detection_batch_size', len(page_imgs))
+        metrics.increment('pages_detected', len(page_imgs))
+        metrics.increment('pages_escalated', len(escalated))
+
+        return labels
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _get_text_layout(self,
+                         page : fitz.Page,
+                         metrics = NULL_METRICS) -> np.array:
+        """finds the layout of a page from its text layer, see TextLayout
+
+        Returns:
+            np.array: labelled bounding boxes like _detect, or None when the
+                page has to go to the detector (LAYOUT_AUTO and a page
+                confidence below the min_page_confidence of the config)
+        """
+        with metrics.time('text_layout'):
+            labels, confidence = classify_page(page, self.text_layout_config)
+
+        metrics.observe('text_layout_confidence', confidence)
+
+        if self.layout_mode == LAYOUT_AUTO and confidence < self.text_layout_config.min_page_confidence:
+            metrics.increment('pages_layout_detected')
+            return None
+
+        metrics.increment('pages_text_layout')
+
+        return labels
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _detect_layout(self,
+                       page : fitz.Page,
+                       metrics = NULL_METRICS) -> np.array:
+        """the detect stage of the text layer layout modes, the page is
+        only rendered when it goes to the detector
+        """
+        labels = self._get_text_layout(page, metrics)
+
+        if labels is None:
+            labels = self._detect([self._render_page(page, metrics)], metrics)[0]
+
+        return labels
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def create_running_blocks(self) -> RunningBlocks:
+        """returns the (empty) running block templates of a new document"""
+
+        return RunningBlocks(self.running_block_config)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def create_default_pipeline(self) -> Pipeline:
+        """returns the graph of the stages a page goes through:
+
+            render:     fitz_page -> page_img
+            detect:     page_img -> labels (fitz_page -> labels for the text
+                        layer layout modes)
+            save:       output_name, page_number, page_img, labels -> saved_images (file names)
+            boxes:      labels -> bounding_boxes
+            extract:    fitz_page, page_number, bounding_boxes, include_labels,
+                        running_blocks -> blocks
+            postprocess: blocks -> sentence_lists
+            assemble:   page_number, blocks, sentence_lists, running_blocks -> document_page
+
+        every stage also reads metrics. The stages run on the calling
+        thread, fitz documents and the models are not shared between threads.
+        """
+        pipeline = Pipeline()
+
+        pipeline.add_stage(Stage('render',
+                                 lambda fitz_page, metrics: self._render_page(fitz_page, metrics),
+                                 inputs={'fitz_page' : fitz.Page, 'metrics' : DocumentMetrics},
+                                 outputs={'page_img' : np.ndarray},
+                                 kind=STAGE_CPU))
+
+        if self.layout_mode == LAYOUT_DETECTOR:
+            pipeline.add_stage(Stage('detect',
+                                     lambda page_img, metrics: self._detect([page_img], metrics)[0],
+                                     inputs={'page_img' : np.ndarray, 'metrics' : DocumentMetrics},
+                                     outputs={'labels' : np.ndarray},
+                                     kind=STAGE_MODEL))
+        else:
+            # the page is only rendered to save its images, or by the auto
+            # mode for the detector
+            pipeline.add_stage(Stage('detect',
+                                     lambda fitz_page, metrics: self._detect_layout(fitz_page, metrics),
+                                     inputs={'fitz_page' : fitz.Page, 'metrics' : DocumentMetrics},
+                                     outputs={'labels' : np.ndarray},
+                                     kind=STAGE_CPU if self.layout_mode == LAYOUT_TEXT else STAGE_MODEL))
+
+        pipeline.add_stage(Stage('save',
+                                 lambda output_name, page_number, page_img, labels:
+                                    self._save_images(output_name, page_number, page_img, labels),
+                                 inputs={'output_name' : str, 'page_number' : int,
+                                         'page_img' : np.ndarray, 'labels' : np.ndarray},
+                                 outputs={'saved_images' : list},
+                                 kind=STAGE_IO))
+
+        pipeline.add_stage(Stage('boxes',
+                                 lambda labels, metrics: self._generate_boxes(labels, metrics),
+                                 inputs={'labels' : np.ndarray, 'metrics' : DocumentMetrics},
+                                 outputs={'bounding_boxes' : list},
+                                 kind=STAGE_CPU))
+
+        # tables run the table transformer and easyocr
+        pipeline.add_stage(Stage('extract',
+                                 lambda fitz_page, page_number, bounding_boxes, include_labels, metrics, running_blocks:
+                                    self._extract_blocks(fitz_page, page_number, bounding_boxes,
+                                                         include_labels, metrics, running_blocks),
+                                 inputs={'fitz_page' : fitz.Page, 'page_number' : int, 'bounding_boxes' : list,
+                                         'include_labels' : object, 'metrics' : DocumentMetrics,
+                                         'running_blocks' : object},
+                                 outputs={'blocks' : list},
+                                 kind=STAGE_MODEL))
+
+        pipeline.add_stage(Stage('postprocess',
+                                 lambda blocks, metrics: self._process_texts(get_raw_texts(blocks), metrics),
+                                 inputs={'blocks' : list, 'metrics' : DocumentMetrics},
+                                 outputs={'sentence_lists' : list},
+                                 kind=STAGE_CPU))
+
+        pipeline.add_stage(Stage('assemble',
+                                 lambda page_number, blocks, sentence_lists, running_blocks:
+                                    self._finish_page(page_number, blocks, sentence_lists, running_blocks),
+                                 inputs={'page_number' : int, 'blocks' : list,
+                                         'sentence_lists' : list, 'running_blocks' : object},
+                                 outputs={'document_page' : DocumentPage},
+                                 kind=STAGE_CPU))
+
+        return pipeline
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _run_page_pipeline( self,
+                            page : fitz.Page,
+                            page_number : int,
+                            output : str,
+                            output_name = None,
+                            include_labels = None,
+                            metrics = NULL_METRICS,
+                            running_blocks = None):
+        """runs the stages of the pipeline needed for output (and the saved
+        images when output_name is given) on a page and returns output
+        """
+        outputs = [output]
+        if output_name != None:
+            outputs.append('saved_images')
+
+        values = self.pipeline.run({'fitz_page' : page,
+                                    'page_number' : page_number,
+                                    'output_name' : output_name,
+                                    'include_labels' : include_labels,
+                                    'metrics' : metrics,
+                                    'running_blocks' : running_blocks},
+                                   outputs)
+        metrics.increment('pages')
+
+        return values[output]
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _extract_page(  self,
+                        page : fitz.Page,
+                        page_number : int,
+                        output_name = None,
+                        include_labels = None,
+                        metrics = NULL_METRICS,
+                        running_blocks = None) -> DocumentPage:
+
+        return self._run_page_pipeline( page=page,
+                                        page_number=page_number,
+                                        output='document_page',
+                                        output_name=output_name,
+                                        include_labels=include_labels,
+                                        metrics=metrics,
+                                        running_blocks=running_blocks)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _extract_page_blocks(self,
+                             page : fitz.Page,
+                             page_number : int,
+                             output_name = None,
+                             include_labels = None,
+                             metrics = NULL_METRICS,
+                             running_blocks = None) -> list:
+        """renders and detects a page and extracts the raw text of its blocks,
+        without the cleaning and segmentation stages, see _extract_blocks
+        """
+        return self._run_page_pipeline( page=page,
+                                        page_number=page_number,
+                                        output='blocks',
+                                        output_name=output_name,
+                                        include_labels=include_labels,
+                                        metrics=metrics,
+                                        running_blocks=running_blocks)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _iter_pages(self,
+                    fitz_doc : fitz.Document,
+                    include_pages = [],
+                    output_name = None,
+                    include_labels = None,
+                    metrics = NULL_METRICS):
+        """yields the extracted pages of fitz_doc one at a time, only the
+        selected pages are loaded (see PageSelection.resolve_pages)
+        """
+
+        running_blocks = self.create_running_blocks()
+
+        # pages whose text is being cleaned and segmented by the post-processor
+        pending = deque()
+
+        for page_number in resolve_pages(include_pages, fitz_doc.page_count):
+
+            if self.memory_budget is not None:
+                self.memory_budget.check_headroom(metrics)
+
+            page = fitz_doc.load_page(page_number)
+
+            if self.postprocessor is None:
+                yield self._extract_page(   page=page,
+                                            page_number=page_number,
+                                            output_name=output_name,
+                                            include_labels=include_labels,
+                                            metrics=metrics,
+                                            running_blocks=running_blocks)
+                continue
+
+            blocks = self._extract_page_blocks( page=page,
+                                                page_number=page_number,
+                                                output_name=output_name,
+                                                include_labels=include_labels,
+                                                metrics=metrics,
+                                                running_blocks=running_blocks)
+            pending.append((page_number, blocks, self.postprocessor.submit(get_raw_texts(blocks))))
+
+            # the next page is rendered and detected while the pool works,
+            # finished pages are handed on in page order
+            while len(pending) > 0 and (pending[0][2].done() or
+                                        len(pending) >= self.postprocessor.max_pages_in_flight):
+                yield self._finish_pending_page(pending.popleft(), metrics, running_blocks)
+
+        while len(pending) > 0:
+            yield self._finish_pending_page(pending.popleft(), metrics, running_blocks)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _finish_pending_page(self,
+                             pending_page : tuple,
+                             metrics = NULL_METRICS,
+                             running_blocks = None) -> DocumentPage:
+
+        page_number, blocks, future = pending_page
+
+        with metrics.time('postprocess_wait'):
+            sentence_lists = future.result()
+
+        return self._finish_page(page_number, blocks, sentence_lists, running_blocks)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
     def _extract(   self,
                     fitz_doc : fitz.Document,
                     include_pages = [],
-                    output_name = None) -> ExtractedDocument:
+                    output_name = None,
+                    include_labels = None) -> ExtractedDocument:
         
         extracted_doc = ExtractedDocument(fitz_doc.name)
 
-        for page_number, page in enumerate(fitz_doc):
-            
-            if page_number in include_pages or len(include_pages) == 0:
+        metrics = self._create_metrics(fitz_doc.name)
+        extracted_doc.metrics = metrics
 
-                # load the page as a numpy.ndarray
-                pix = page.get_pixmap()
-                page_img = np.frombuffer(buffer=pix.samples, dtype=np.uint8).reshape((pix.height, pix.width, -1))
+        try:
+            with metrics.time('document'):
+                for extracted_page in self._iter_pages( fitz_doc=fitz_doc,
+                                                        include_pages=include_pages,
+                                                        output_name=output_name,
+                                                        include_labels=include_labels,
+                                                        metrics=metrics):
+                    extracted_doc.add_page(extracted_page)
+        finally:
+            close_pdf(fitz_doc)
 
-                # pass the page_img(numpy.ndarray) to the model to get the results
-                results = self.model(   page_img,
-                                        size=(792,612))
+        self._emit_metrics(metrics)
 
-                extracted_page = self._extract_text_from_page(  fitz_page=page,
-                                                                page_number=page_number,
-                                                                labels=results.xyxy[0].cpu().numpy())
+        return extracted_doc
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-                extracted_doc.add_page(extracted_page)
+    def _stream(self,
+                fitz_doc : fitz.Document,
+                include_pages = [],
+                include_labels = None):
 
-                # save the intermediate images if requested
-                if output_name != None:
-                    self._save_images(  output_name,
-                                        page_number,
-                                        page_img,
-                                        results.xyxy[0].cpu().numpy())
+        metrics = self._create_metrics(fitz_doc.name)
 
-        return extracted_doc
+        try:
+            with metrics.time('document'):
+                yield from self._iter_pages(fitz_doc=fitz_doc,
+                                            include_pages=include_pages,
+                                            include_labels=include_labels,
+                                            metrics=metrics)
+        finally:
+            close_pdf(fitz_doc)
+
+        self._emit_metrics(metrics)
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     def extract_from_stream(self,
-                            pdf_file_stream : io.BytesIO,
+                            pdf_file_stream,
                             include_pages = [],
-                            output_name = None) -> ExtractedDocument:
-        
-        fitz_doc = fitz.open('pdf',io.BytesIO(pdf_file_stream))
+                            output_name = None,
+                            include_labels = None) -> ExtractedDocument:
+        """extracts a pdf held in memory or read from an open file.
+
+        Args:
+            pdf_file_stream (bytes, memoryview, bytearray, mmap.mmap,
+                io.BytesIO or file object): the pdf, read without copying it
+                (see PdfInput.open_pdf). It must not change until the
+                extraction is done.
+            include_pages (list, optional): pages to extract, page numbers
+                (negative from the end), slices, ranges or a page
+                specification such as '0:10,-1', see
+                PageSelection.resolve_pages. Defaults to [] which extracts
+                every page.
+            output_name (str, optional): name of the saved images. Defaults
+                to None.
+            include_labels (list, optional): labels to extract. Defaults to None.
+
+        Returns:
+            ExtractedDocument: the extracted document
+        """
+        fitz_doc = open_pdf(pdf_file_stream)
 
         return self._extract(fitz_doc=fitz_doc,
                              include_pages=include_pages,
-                             output_name=output_name) 
+                             output_name=output_name,
+                             include_labels=include_labels) 
 
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -192,13 +819,24 @@ class ExtractedDocumentGenerator:
     def extract_from_path(  self,
                             pdf_file_path : str,
                             include_pages = [],
-                            output_name = None) -> ExtractedDocument:
+                            output_name = None,
+                            include_labels = None,
+                            memory_map = False) -> ExtractedDocument:
         """_summary_
 
         Args:
             pdf_file_path (str): _description_
-            include_pages (list, optional): _description_. Defaults to [].
+            include_pages (list, optional): pages to extract, page numbers
+                (negative from the end), slices, ranges or a page
+                specification such as '0:10,-1', see
+                PageSelection.resolve_pages. Defaults to [] which extracts
+                every page.
             save_steps (bool, optional): _description_. Defaults to False.
+            include_labels (list, optional): only text blocks with these labels
+                are extracted, all other blocks are skipped. Defaults to None
+                which extracts every block.
+            memory_map (bool, optional): memory map the file instead of
+                reading it, for very large pdfs. Defaults to False.
 
         Returns:
             ExtractedDocument: _description_
@@ -206,11 +844,106 @@ class ExtractedDocumentGenerator:
 
         # make sure the pdf file exists
         self._check_pdf_file_path(pdf_file_path)
-        fitz_doc = fitz.open(pdf_file_path)
+        fitz_doc = open_pdf(pdf_file_path, memory_map=memory_map)
 
         return self._extract(fitz_doc=fitz_doc,
                              include_pages=include_pages,
-                             output_name=output_name)        
+                             output_name=output_name,
+                             include_labels=include_labels)        
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def iter_pages_from_stream( self,
+                                pdf_file_stream,
+                                include_pages = [],
+                                include_labels = None):
+        """same as extract_from_stream but yields the DocumentPage objects one
+        at a time instead of collecting them in an ExtractedDocument. The
+        stream is released when the generator is exhausted or closed.
+        """
+
+        fitz_doc = open_pdf(pdf_file_stream)
+
+        return self._stream(fitz_doc=fitz_doc,
+                            include_pages=include_pages,
+                            include_labels=include_labels)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def open_stream(self,
+                    pdf_file_stream,
+                    include_pages = [],
+                    include_labels = None) -> DocumentStream:
+        """opens a pdf held in memory (see extract_from_stream) for a caller
+        which finds the layouts of its pages itself, see DocumentStream
+        """
+        fitz_doc = open_pdf(pdf_file_stream)
+
+        try:
+            return DocumentStream(self, fitz_doc, include_pages, include_labels)
+        except Exception:
+            close_pdf(fitz_doc)
+            raise
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def iter_pages_from_path(   self,
+                                pdf_file_path : str,
+                                include_pages = [],
+                                include_labels = None,
+                                memory_map = False):
+        """same as extract_from_path but yields the DocumentPage objects one
+        at a time instead of collecting them in an ExtractedDocument.
+        """
+
+        self._check_pdf_file_path(pdf_file_path)
+        fitz_doc = open_pdf(pdf_file_path, memory_map=memory_map)
+
+        return self._stream(fitz_doc=fitz_doc,
+                            include_pages=include_pages,
+                            include_labels=include_labels)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def extract_to_json(self,
+                        pdf_file_path : str,
+                        json_file_path : str,
+                        include_pages = [],
+                        include_labels = None,
+                        memory_map = False,
+                        settings : dict = None) -> int:
+        """extracts a pdf straight into a JSON file, writing every page as soon
+        as it is done. The file has the same layout as
+        ExtractedDocument.save_as_json but only one page is held in memory.
+
+        Args:
+            pdf_file_path (str): path to the pdf file
+            json_file_path (str): path to the JSON file
+            include_pages (list, optional): pages to extract, page numbers
+                (negative from the end), slices, ranges or a page
+                specification such as '0:10,-1', see
+                PageSelection.resolve_pages. Defaults to [] which extracts
+                every page.
+            include_labels (list, optional): labels to extract. Defaults to None.
+            memory_map (bool, optional): memory map the pdf file. Defaults to
+                False.
+            settings (dict, optional): settings recorded in the header of the
+                file, see read_json_settings. Defaults to None.
+
+        Returns:
+            int: number of pages written
+        """
+
+        pages = self.iter_pages_from_path(  pdf_file_path=pdf_file_path,
+                                            include_pages=include_pages,
+                                            include_labels=include_labels,
+                                            memory_map=memory_map)
+
+        with ExtractedDocumentWriter(json_file_path, pdf_file_path, settings) as writer:
+            for extracted_page in pages:
+                writer.write_page(extracted_page)
+
+        return writer.num_pages
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -218,8 +951,10 @@ class ExtractedDocumentGenerator:
                         pdf_file_path : str,
                         page_number : int,
                         page_img : np.array,
-                        labels : np.array) -> None:
-
+                        labels : np.array) -> list:
+        """saves the page image and the annotated page image, returns their
+        file names
+        """
         page_image_filename = self._get_page_image_file_name(pdf_file_path, page_number)
         self._save_page_image(  page_image_filename,
                                 page_img)
@@ -228,6 +963,8 @@ class ExtractedDocumentGenerator:
         self._save_annotated_image( annotated_image_filename,
                                     page_img,
                                     labels)
+
+        return [page_image_filename, annotated_image_filename]
         
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -302,56 +1039,201 @@ class ExtractedDocumentGenerator:
     
     def _extract_regular_text(  self,
                                 fitz_page : fitz.Page,
-                                rect : fitz.Rect) -> str:
+                                rect : fitz.Rect,
+                                metrics = NULL_METRICS) -> str:
         
-        return fitz_page.get_textbox(rect)
+        with metrics.time('get_textbox'):
+            return fitz_page.get_textbox(rect)
     
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     
+    def _render_table(self,
+                      fitz_page : fitz.Page,
+                      rect : fitz.Rect,
+                      dpi : int) -> np.array:
+
+        table_pixmap = fitz_page.get_pixmap(clip=rect,dpi=dpi)
+        # table_pixmap.save('table.png')
+
+        return np.frombuffer(buffer=table_pixmap.samples, dtype=np.uint8).reshape((table_pixmap.height, table_pixmap.width, -1))
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
     def _extract_table_text(self,
                             fitz_page : fitz.Page,
-                            rect : fitz.Rect) -> str:
-        
-        table_pixmap = fitz_page.get_pixmap(clip=rect,dpi=300)
-        # table_pixmap.save('table.png')
-        
-        table_img = np.frombuffer(buffer=table_pixmap.samples, dtype=np.uint8).reshape((table_pixmap.height, table_pixmap.width, -1))
+                            rect : fitz.Rect,
+                            metrics = NULL_METRICS) -> str:
         
-        table =  self.table_extractor.extract_table(table_img)
-        
-        table_text = ''
-        for row in table:
-            for cell in row:
-                if len(cell) > 0:
-                    table_text += cell
-                    
-                    if table_text[-1] != '.':
-                        table_text += '. '
+        structure_dpi = ocr_dpi = TABLE_RENDER_DPI
+        if self.table_resolution is not None:
+            structure_dpi, ocr_dpi = self.table_resolution.get_table_dpis(fitz_page, rect)
+
+        tiles = [rect]
+        if self.memory_budget is not None:
+            tiles, ocr_dpi = self.memory_budget.get_table_tiles(rect, ocr_dpi)
+            structure_dpi = min(structure_dpi, ocr_dpi)
+
+        # huge tables are recognised one horizontal tile at a time so only a
+        # single capped size image is alive at once
+        table = []
+        for tile in tiles:
+            with metrics.time('table_render'):
+                table_img = self._render_table(fitz_page, tile, structure_dpi)
+
+                # the cells are read on a second, sharper image when the
+                # structure is recognised at a lower resolution
+                ocr_img = table_img
+                if ocr_dpi != structure_dpi:
+                    ocr_img = self._render_table(fitz_page, tile, ocr_dpi)
+            
+            table.extend(self.table_extractor.extract_table(table_img,
+                                                            metrics=metrics,
+                                                            ocr_image=ocr_img,
+                                                            ocr_dpi=ocr_dpi))
+            del table_img, ocr_img
+
+        metrics.increment('tables')
+        metrics.increment('table_tiles', len(tiles))
+        metrics.observe('table_structure_dpi', structure_dpi)
+        metrics.observe('table_ocr_dpi', ocr_dpi)
         
-        return table_text
+        return table_to_text(table)
     
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
        
     def _extract_text_from_page(self,
                                 fitz_page : fitz.Page,
                                 page_number : int,
-                                labels : np.array) -> DocumentPage:
+                                labels : np.array,
+                                include_labels = None,
+                                metrics = NULL_METRICS,
+                                running_blocks : RunningBlocks = None) -> DocumentPage:
+
+        # the labels are given, the render and detect stages are skipped
+        values = self.pipeline.run({'fitz_page' : fitz_page,
+                                    'page_number' : page_number,
+                                    'labels' : labels,
+                                    'include_labels' : include_labels,
+                                    'metrics' : metrics,
+                                    'running_blocks' : running_blocks},
+                                   ['document_page'])
+
+        return values['document_page']
 
-        bb_list = generate_bounding_boxes(labels)
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-        extracted_page = DocumentPage(page_number)
+    def _generate_boxes(self,
+                        labels : np.array,
+                        metrics = NULL_METRICS) -> list:
+
+        with metrics.time('box_generation'):
+            bb_list = generate_bounding_boxes(labels)
+
+        metrics.observe('boxes_per_page', len(bb_list))
+        metrics.increment('boxes', len(bb_list))
+
+        return bb_list
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _extract_blocks(self,
+                        fitz_page : fitz.Page,
+                        page_number : int,
+                        bb_list : list,
+                        include_labels = None,
+                        metrics = NULL_METRICS,
+                        running_blocks : RunningBlocks = None) -> list:
+        """extracts the text of the blocks of a page, in reading order. A block
+        reused from a running block template is a DocumentTextBlock, any
+        other block is a RawTextBlock whose text still has to be cleaned and
+        segmented.
+        """
+        blocks = []
         
         for bb in bb_list:           
             
+            # skip the (possibly expensive) extraction of unwanted blocks
+            if include_labels is not None and bb.label not in include_labels:
+                continue
+
+            is_running = running_blocks is not None and running_blocks.is_running(bb.label)
+
+            # the repeats of a running header/footer reuse its first page
+            if is_running:
+                text_block = running_blocks.predict_block(bb.label, bb.get_definition(), bb.confidence, page_number)
+                if text_block is not None:
+                    blocks.append(text_block)
+                    metrics.increment('running_blocks_predicted')
+                    continue
+
             if bb.label == 'Table':            
-                bb_text = self._extract_table_text(fitz_page, bb.get_rect()) 
+                bb_text = self._extract_table_text(fitz_page, bb.get_rect(), metrics) 
             else:     
-                bb_text = self._extract_regular_text(fitz_page, bb.get_rect())                 
-                                         
-            extracted_page.add_text_block(  text=clean_text(bb_text),
-                                            conf=bb.confidence,
-                                            label=bb.label )
+                bb_text = self._extract_regular_text(fitz_page, bb.get_rect(), metrics)                 
+
+            if is_running:
+                text_block = running_blocks.match_block(bb_text, bb.label, bb.get_definition(), bb.confidence, page_number)
+                if text_block is not None:
+                    blocks.append(text_block)
+                    metrics.increment('running_blocks_reused')
+                    continue
+
+            blocks.append(RawTextBlock(bb_text, bb, is_running))
     
+        return blocks
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _process_texts(self,
+                       raw_texts : list,
+                       metrics = NULL_METRICS) -> list:
+        """cleans and segments raw_texts on this thread, returns the sentences
+        of every text
+        """
+        sentence_lists = []
+
+        # a segmenter is not thread safe, one is shared by the blocks of a page
+        segmenter = None
+
+        for raw_text in raw_texts:
+            with metrics.time('clean_text'):
+                text = clean_text(raw_text)
+
+            with metrics.time('segmentation'):
+                if segmenter is None:
+                    segmenter = pysbd.Segmenter(language='en', clean=False)
+                sentence_lists.append(segment_text(text, segmenter))
+
+        return sentence_lists
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _finish_page(self,
+                     page_number : int,
+                     blocks : list,
+                     sentence_lists : list,
+                     running_blocks : RunningBlocks = None) -> DocumentPage:
+        """joins the blocks of a page with the sentences of its raw blocks
+        (in the same order) into a DocumentPage
+        """
+        extracted_page = DocumentPage(page_number)
+        sentence_lists = iter(sentence_lists)
+
+        for block in blocks:
+            if isinstance(block, DocumentTextBlock):
+                extracted_page.append_text_block(block)
+                continue
+
+            bb = block.bb
+            text_block = DocumentTextBlock.from_sentences([DocumentSentence(sentence) for sentence in next(sentence_lists)],
+                                                          conf=bb.confidence,
+                                                          label=bb.label,
+                                                          bbox=bb.get_definition())
+            extracted_page.append_text_block(text_block)
+
+            if block.is_running:
+                running_blocks.add_template(block.raw_text, text_block, page_number)
+
         return extracted_page
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -0,0 +1,513 @@
+import json
+import time
+import asyncio
+import logging
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+from .PageSelection import parse_page_spec
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+DEFAULT_MAX_BATCH_SIZE = 8
+DEFAULT_MAX_WAIT_MS = 20.
+DEFAULT_MAX_QUEUED_REQUESTS = 16
+DEFAULT_PAGES_IN_FLIGHT = 4
+DEFAULT_MAX_UPLOAD_MB = 512
+RETRY_AFTER_SECONDS = 1
+
+HTTP_REASONS = {100 : 'Continue',
+                200 : 'OK',
+                400 : 'Bad Request',
+                404 : 'Not Found',
+                405 : 'Method Not Allowed',
+                411 : 'Length Required',
+                413 : 'Payload Too Large',
+                503 : 'Service Unavailable'}
+
+logger = logging.getLogger(__name__)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class HttpError(Exception):
+    """Raised while handling a request to send an error response"""
+
+    def __init__(self,
+                 status : int,
+                 message : str,
+                 headers = None):
+
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers if headers is not None else {}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class PageJob:
+    """A single page of an uploaded document waiting to be extracted"""
+
+    def __init__(self,
+                 document,
+                 page_number : int):
+
+        # the DocumentStream of the request, see
+        # ExtractedDocumentGenerator.open_stream
+        self.document = document
+        self.page_number = page_number
+
+# =============================================================================
+
+class MicroBatcher:
+    """Collects pages from all of the requests in flight and runs them through
+    the detector together. A batch is started as soon as max_batch_size pages
+    are waiting, or max_wait_ms after the first page of the batch arrived.
+
+    All of the work on the models and on the documents happens on the
+    single thread of the executor, so the generator is never used by two
+    threads at once. The time of a detector batch is shared out to the
+    metrics of its documents by their number of pages in the batch.
+    """
+
+    def __init__(self,
+                 doc_gen,
+                 executor : ThreadPoolExecutor,
+                 max_batch_size = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms = DEFAULT_MAX_WAIT_MS):
+
+        self.doc_gen = doc_gen
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.
+
+        self.queue = asyncio.Queue()
+        self.num_batches = 0
+        self.num_pages = 0
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def submit(self,
+               job : PageJob) -> asyncio.Future:
+        """queues a page and returns a future for its extracted page dictionary"""
+
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((job, future))
+        return future
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    async def _next_batch(self) -> list:
+
+        loop = asyncio.get_running_loop()
+
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # pages of requests that went away while they were queued are dropped
+        return [(job, future) for job, future in batch if not future.cancelled()]
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    async def run(self) -> None:
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = await self._next_batch()
+            if len(batch) == 0:
+                continue
+
+            results = await loop.run_in_executor(self.executor,
+                                                 self._process_batch,
+                                                 [job for job, _ in batch])
+
+            self.num_batches += 1
+            self.num_pages += len(batch)
+
+            for (job, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _process_batch(self,
+                       jobs : list) -> list:
+        """runs on the executor thread. Returns a page dictionary or an
+        exception for every job.
+        """
+        results = [None] * len(jobs)
+        labels = [None] * len(jobs)
+        page_imgs = []
+        rendered = []
+
+        # in the text layer layout modes only the pages the text layer is
+        # not good enough for are rendered and detected
+        for i, job in enumerate(jobs):
+            try:
+                labels[i] = job.document.get_text_layout(job.page_number)
+                if labels[i] is None:
+                    page_imgs.append(job.document.render_page(job.page_number))
+                    rendered.append(i)
+            except Exception as error:
+                results[i] = error
+
+        if len(page_imgs) > 0:
+            start_time = time.perf_counter()
+            try:
+                for i, page_labels in zip(rendered, self.doc_gen._detect(page_imgs)):
+                    labels[i] = page_labels
+            except Exception as error:
+                for i in rendered:
+                    results[i] = error
+
+            seconds = time.perf_counter() - start_time
+            for i in rendered:
+                jobs[i].document.metrics.add_time('detection', seconds / len(rendered))
+                jobs[i].document.metrics.observe('detection_batch_size', len(rendered))
+
+        del page_imgs
+
+        for i, (job, page_labels) in enumerate(zip(jobs, labels)):
+            if results[i] is not None:
+                continue
+            try:
+                results[i] = job.document.extract_page(job.page_number, page_labels).to_dict()
+            except Exception as error:
+                results[i] = error
+
+        return results
+
+# =============================================================================
+
+class ExtractionService:
+    """Local HTTP service around a single ExtractedDocumentGenerator.
+
+    POST /extract with the raw pdf bytes as the body. The optional query
+    parameters pages (e.g. pages=0,1,5 or pages=10:20,-1) and labels (e.g.
+    labels=Text,Title) have the same meaning as include_pages and include_labels of the
+    generator. The response is a stream of JSON lines, one per page as soon as
+    the page is done, followed by a final {"done": true, ...} line.
+
+    GET /health returns the queue state and the warm-up times of the models
+    (see ExtractedDocumentGenerator.warm_up). When more than max_queued_requests
+    extractions are in progress new ones are refused with 503 and a
+    Retry-After header.
+
+    Every upload is opened with ExtractedDocumentGenerator.open_stream, so it
+    is read without a copy, its pages are selected and its running blocks
+    kept as in iter_pages_from_stream, and the metrics of the document are
+    sent to the metrics_sinks of the generator when the request ends.
+    """
+
+    def __init__(self,
+                 doc_gen = None,
+                 generator_kwargs = None,
+                 host = DEFAULT_HOST,
+                 port = DEFAULT_PORT,
+                 max_batch_size = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms = DEFAULT_MAX_WAIT_MS,
+                 max_queued_requests = DEFAULT_MAX_QUEUED_REQUESTS,
+                 pages_in_flight = DEFAULT_PAGES_IN_FLIGHT,
+                 max_upload_mb = DEFAULT_MAX_UPLOAD_MB):
+
+        # a generator created here is closed when the service stops
+        self.owns_generator = doc_gen is None
+        if doc_gen is None:
+            from .ExtractedDocumentGenerator import ExtractedDocumentGenerator
+            doc_gen = ExtractedDocumentGenerator(**(generator_kwargs if generator_kwargs is not None else {}))
+
+        self.doc_gen = doc_gen
+        self.host = host
+        self.port = port
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queued_requests = max_queued_requests
+        self.pages_in_flight = max(pages_in_flight, 1)
+        self.max_upload_bytes = int(max_upload_mb * 1024 * 1024)
+
+        # one thread owns the models and every fitz document
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='extraction')
+        self.batcher = None
+        self.server = None
+        self.active_requests = 0
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    async def start(self) -> None:
+
+        self.batcher = MicroBatcher(doc_gen=self.doc_gen,
+                                    executor=self.executor,
+                                    max_batch_size=self.max_batch_size,
+                                    max_wait_ms=self.max_wait_ms)
+        self.batcher_task = asyncio.create_task(self.batcher.run())
+
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f'listening on http://{self.host}:{self.port}')
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    async def serve_forever(self) -> None:
+
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def run(self) -> None:
+        """blocks serving requests until interrupted"""
+
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.owns_generator:
+                # the page being extracted finishes before the generator closes
+                self.executor.shutdown(cancel_futures=True)
+                self.doc_gen.close()
+            else:
+                self.executor.shutdown(wait=False)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    async def _read_head(self,
+                         reader : asyncio.StreamReader) -> tuple:
+        """reads the request line and headers of a HTTP/1.1 request
+
+        Returns:
+            tuple: method, target, headers (lower case names)
+        """
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise HttpError(400, 'malformed request line')
+        method, target, _ = parts
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        return method, target, headers
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    async def _read_body(self,
+                         reader : asyncio.StreamReader,
+                         writer : asyncio.StreamWriter,
+                         headers : dict) -> bytes:
+        """reads the body of a POST request, up to max_upload_bytes"""
+
+        if 'content-length' not in headers:
+            raise HttpError(411, 'Content-Length is required')
+
+        try:
+            content_length = int(headers['content-length'])
+        except ValueError:
+            raise HttpError(400, 'Content-Length is not a number')
+
+        if content_length < 0:
+            raise HttpError(400, 'Content-Length is negative')
+
+        if content_length > self.max_upload_bytes:
+            raise HttpError(413, f'uploads are limited to {self.max_upload_bytes} bytes')
+
+        if headers.get('expect', '').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+            await writer.drain()
+
+        return await reader.readexactly(content_length)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _write_head(self,
+                    writer : asyncio.StreamWriter,
+                    status : int,
+                    headers : dict) -> None:
+
+        lines = [f'HTTP/1.1 {status} {HTTP_REASONS.get(status, "")}']
+        headers = dict(headers)
+        headers['Connection'] = 'close'
+        for name, value in headers.items():
+            lines.append(f'{name}: {value}')
+
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    async def _send_json(self,
+                         writer : asyncio.StreamWriter,
+                         status : int,
+                         json_dict : dict,
+                         headers = None) -> None:
+
+        body = json.dumps(json_dict).encode()
+        response_headers = {'Content-Type' : 'application/json',
+                            'Content-Length' : str(len(body))}
+        response_headers.update(headers if headers is not None else {})
+
+        self._write_head(writer, status, response_headers)
+        writer.write(body)
+        await writer.drain()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    async def _write_chunk(self,
+                           writer : asyncio.StreamWriter,
+                           json_dict : dict) -> None:
+
+        data = (json.dumps(json_dict) + '\n').encode()
+        writer.write(f'{len(data):X}\r\n'.encode() + data + b'\r\n')
+        await writer.drain()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    async def _handle_connection(self,
+                                 reader : asyncio.StreamReader,
+                                 writer : asyncio.StreamWriter) -> None:
+        try:
+            method, target, headers = await self._read_head(reader)
+            url = urlsplit(target)
+
+            if url.path == '/health':
+                await self._send_json(writer, 200, self.get_status())
+            elif url.path == '/extract':
+                if method != 'POST':
+                    raise HttpError(405, 'use POST to upload a pdf')
+
+                # the slot is taken before the upload is read, with no await
+                # between the check and the increment
+                if self.active_requests >= self.max_queued_requests:
+                    raise HttpError(503, 'too many requests in progress',
+                                    {'Retry-After' : str(RETRY_AFTER_SECONDS)})
+                self.active_requests += 1
+
+                try:
+                    body = await self._read_body(reader, writer, headers)
+                    await self._handle_extract(writer, parse_qs(url.query), body)
+                finally:
+                    self.active_requests -= 1
+            else:
+                raise HttpError(404, f'unknown path {url.path}')
+
+        except HttpError as error:
+            await self._send_json(writer, error.status, {'error' : error.message}, error.headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            logger.exception('error while handling a request')
+        finally:
+            writer.close()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_status(self) -> dict:
+
+        return {'active_requests' : self.active_requests,
+                'max_queued_requests' : self.max_queued_requests,
+                'queued_pages' : self.batcher.queue.qsize(),
+                'batches' : self.batcher.num_batches,
+                'pages' : self.batcher.num_pages,
+                'warm_up_seconds' : self.doc_gen.warm_up_seconds}
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _parse_query(self,
+                     query : dict) -> tuple:
+        """returns the page selection (see PageSelection.resolve_pages) and
+        the labels of a request
+        """
+        include_pages = []
+        if 'pages' in query:
+            try:
+                include_pages = [part for value in query['pages'] for part in parse_page_spec(value)]
+            except ValueError:
+                raise HttpError(400, 'pages must be a comma separated list of page numbers and slices')
+
+        include_labels = None
+        if 'labels' in query:
+            include_labels = [label for value in query['labels'] for label in value.split(',') if label != '']
+
+        return include_pages, include_labels
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    async def _handle_extract(self,
+                              writer : asyncio.StreamWriter,
+                              query : dict,
+                              body : bytes) -> None:
+        """streams the pages of an uploaded pdf, the caller holds a slot of
+        active_requests for it
+        """
+        loop = asyncio.get_running_loop()
+        include_pages, include_labels = self._parse_query(query)
+
+        try:
+            document = await loop.run_in_executor(self.executor, self.doc_gen.open_stream,
+                                                  body, include_pages, include_labels)
+        except Exception as error:
+            raise HttpError(400, f'could not open the pdf: {error}')
+
+        page_numbers = document.page_numbers
+        pending = []
+
+        try:
+            self._write_head(writer, 200, {'Content-Type' : 'application/x-ndjson',
+                                           'Transfer-Encoding' : 'chunked'})
+
+            # only a few pages of each request are queued at a time so pages of
+            # concurrent requests are interleaved in the detector batches
+            next_page = 0
+            num_pages = 0
+            num_errors = 0
+
+            while next_page < len(page_numbers) or len(pending) > 0:
+
+                while next_page < len(page_numbers) and len(pending) < self.pages_in_flight:
+                    job = PageJob(document, page_numbers[next_page])
+                    pending.append((job.page_number, self.batcher.submit(job)))
+                    next_page += 1
+
+                page_number, future = pending.pop(0)
+                try:
+                    page_dict = await future
+                    num_pages += 1
+                except Exception as error:
+                    page_dict = {'page_number' : page_number,
+                                 'error' : f'{type(error).__name__}: {error}'}
+                    num_errors += 1
+
+                await self._write_chunk(writer, page_dict)
+
+            await self._write_chunk(writer, {'done' : True,
+                                             'num_pages' : num_pages,
+                                             'num_errors' : num_errors})
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+            # closed on the executor thread after any batch still using it,
+            # which also emits the metrics of the document
+            loop.run_in_executor(self.executor, document.close)
@@ -0,0 +1,118 @@
+import queue
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DEFAULT_POOL_SIZE = 1
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class _Waiter:
+    """A thread waiting in line for a generator"""
+
+    __slots__ = ('event', 'doc_gen')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.doc_gen = None
+
+# =============================================================================
+
+class GeneratorPool:
+    """A fixed size, thread-safe pool of ExtractedDocumentGenerator objects
+    shared by every thread of a process. A generator is only ever used by the
+    thread which acquired it, callers wait in line when all of them are busy.
+    A returned generator is handed to the caller which waited longest, so
+    callers which borrow a generator per page take turns page by page.
+    """
+
+    def __init__(self,
+                 size = DEFAULT_POOL_SIZE,
+                 generator_kwargs = None,
+                 generators = None):
+
+        self.lock = threading.Lock()
+        self.waiters = deque()
+
+        if generators is None:
+            # imported here so the pool can be created lazily by the web app
+            from .ExtractedDocumentGenerator import ExtractedDocumentGenerator
+
+            generator_kwargs = generator_kwargs if generator_kwargs is not None else {}
+            generators = [ExtractedDocumentGenerator(**generator_kwargs) for _ in range(max(int(size), 1))]
+
+        self.size = len(generators)
+        self.generators = deque(generators)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    @property
+    def num_available(self) -> int:
+        return len(self.generators)
+
+    @property
+    def num_waiting(self) -> int:
+        return len(self.waiters)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _get(self,
+             timeout = None):
+
+        with self.lock:
+            # a free generator only goes to a newcomer when nobody is waiting
+            if len(self.generators) > 0 and len(self.waiters) == 0:
+                return self.generators.popleft()
+
+            waiter = _Waiter()
+            self.waiters.append(waiter)
+
+        if waiter.event.wait(timeout):
+            return waiter.doc_gen
+
+        with self.lock:
+            if waiter.doc_gen is not None:
+                # handed over just as the wait timed out
+                return waiter.doc_gen
+
+            self.waiters.remove(waiter)
+
+        raise queue.Empty
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _put(self,
+             doc_gen) -> None:
+
+        with self.lock:
+            if len(self.waiters) == 0:
+                self.generators.append(doc_gen)
+                return
+
+            waiter = self.waiters.popleft()
+            waiter.doc_gen = doc_gen
+
+        waiter.event.set()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    @contextmanager
+    def acquire(self,
+                timeout = None):
+        """context manager lending a generator to the calling thread
+
+        Args:
+            timeout (float, optional): seconds to wait for a free generator.
+                Defaults to None which waits forever.
+
+        Raises:
+            queue.Empty: no generator became free within timeout
+        """
+        doc_gen = self._get(timeout)
+
+        try:
+            yield doc_gen
+        finally:
+            self._put(doc_gen)
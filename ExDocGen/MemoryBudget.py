@@ -0,0 +1,226 @@
+import os
+import gc
+import sys
+import time
+import logging
+import resource
+
+import fitz
+
+from .Metrics import NULL_METRICS
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# 300 dpi letter page is ~8.4 million pixels, so a normal full page table is
+# rendered in one piece and only large format tables are tiled
+DEFAULT_MAX_TABLE_PIXELS = 16_000_000
+MIN_TABLE_TILE_HEIGHT_PX = 256
+
+# the table size cap is halved every time the process stays above the ceiling
+# after releasing memory, down to this many pixels
+MIN_TABLE_PIXELS = 1_000_000
+
+DEFAULT_BACKPRESSURE_TIMEOUT = 30.
+DEFAULT_POLL_INTERVAL = 0.25
+
+# memory is only released again above the ceiling once the RSS has grown by
+# this much since the last release, a gc of a large heap is not free
+DEFAULT_RELEASE_STEP_MB = 256.
+
+MB = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_rss_bytes() -> int:
+    """returns the current resident set size of this process. On systems without
+    /proc the peak resident set size is returned instead.
+
+    Returns:
+        int: resident set size in bytes
+    """
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    if sys.platform == 'darwin':
+        return peak_rss
+    return peak_rss * 1024
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def release_memory() -> None:
+    """frees the memory held by unreachable python objects and empties the
+    MuPDF object store (cached fonts, images and display lists).
+    """
+    gc.collect()
+    fitz.TOOLS.store_shrink(100)
+
+# =============================================================================
+
+class MemoryBudgetExceeded(MemoryError):
+    """Raised by MemoryBudget.check_headroom when the process can not get back
+    under its RSS ceiling and the budget is set to fail.
+    """
+
+# =============================================================================
+
+class MemoryBudget:
+    """Limits used by the ExtractedDocumentGenerator to keep the memory of a
+    single extraction bounded.
+
+    max_table_pixels caps the size of a rendered table image, larger tables
+    are rendered and recognised in horizontal tiles. When rss_ceiling_mb is
+    set, the generator calls check_headroom before every page. Above the
+    ceiling the caches are released once, and again only after the RSS grew
+    by another release_step_mb. If that is not enough the work is made
+    smaller: the table size cap is halved (down to MIN_TABLE_PIXELS) until
+    the process is back under the ceiling, or MemoryBudgetExceeded is raised
+    when fail_over_ceiling is set.
+
+    Waiting only helps when other threads of the process free memory, e.g.
+    concurrent extractions sharing the budget. Only then should
+    wait_for_release be set, check_headroom then waits (applying
+    backpressure to whoever is feeding it) for up to backpressure_timeout
+    before making the work smaller. A single extraction never waits, nothing
+    else would free its memory while it sleeps.
+    """
+
+    def __init__(self,
+                 rss_ceiling_mb = None,
+                 max_table_pixels = DEFAULT_MAX_TABLE_PIXELS,
+                 backpressure_timeout = DEFAULT_BACKPRESSURE_TIMEOUT,
+                 poll_interval = DEFAULT_POLL_INTERVAL,
+                 wait_for_release = False,
+                 fail_over_ceiling = False,
+                 release_step_mb = DEFAULT_RELEASE_STEP_MB):
+
+        self.rss_ceiling_mb = rss_ceiling_mb
+        self.max_table_pixels = max_table_pixels
+        self.backpressure_timeout = backpressure_timeout
+        self.poll_interval = poll_interval
+        self.wait_for_release = wait_for_release
+        self.fail_over_ceiling = fail_over_ceiling
+        self.release_step_mb = release_step_mb
+
+        # table size cap in use, lowered while the process is over the ceiling
+        self.table_pixels = max_table_pixels
+
+        # RSS after the last release of memory that did not get the process
+        # under the ceiling, None while it is under
+        self._released_at_bytes = None
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def is_over_ceiling(self) -> bool:
+
+        if self.rss_ceiling_mb is None:
+            return False
+
+        return get_rss_bytes() > self.rss_ceiling_mb * MB
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def check_headroom(self,
+                       metrics = NULL_METRICS) -> None:
+        """releases memory, waits or makes the work smaller while the process
+        is above the RSS ceiling, see the class docstring
+
+        Args:
+            metrics (DocumentMetrics, optional): metrics the releases and
+                waits are recorded in. Defaults to NULL_METRICS.
+
+        Raises:
+            MemoryBudgetExceeded: if fail_over_ceiling is set and the process
+                stays above the ceiling
+        """
+        if not self.is_over_ceiling():
+            # back under the ceiling, the tables are rendered at full size again
+            self._released_at_bytes = None
+            self.table_pixels = self.max_table_pixels
+            return
+
+        # the memory was already released at about this size
+        if (self._released_at_bytes is not None and
+                get_rss_bytes() < self._released_at_bytes + self.release_step_mb * MB):
+            return
+
+        metrics.increment('memory_releases')
+        with metrics.time('memory_release'):
+            release_memory()
+
+        if self.wait_for_release and self.is_over_ceiling():
+            metrics.increment('backpressure_waits')
+
+            with metrics.time('backpressure'):
+                waited = 0.
+                while self.is_over_ceiling() and waited < self.backpressure_timeout:
+                    time.sleep(self.poll_interval)
+                    waited += self.poll_interval
+
+        if not self.is_over_ceiling():
+            self._released_at_bytes = None
+            return
+
+        rss_bytes = get_rss_bytes()
+        self._released_at_bytes = rss_bytes
+
+        if self.fail_over_ceiling:
+            raise MemoryBudgetExceeded(f'RSS {rss_bytes / MB:.0f} MB is above the ceiling of '
+                                       f'{self.rss_ceiling_mb} MB after releasing memory')
+
+        if self.table_pixels > MIN_TABLE_PIXELS:
+            self.table_pixels = max(self.table_pixels // 2, MIN_TABLE_PIXELS)
+            metrics.increment('table_pixels_reductions')
+
+        logger.warning(f'RSS {rss_bytes / MB:.0f} MB is above the ceiling of {self.rss_ceiling_mb} MB after '
+                       f'releasing memory, tables are capped at {self.table_pixels} pixels')
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_table_tiles(self,
+                        rect : fitz.Rect,
+                        dpi : int) -> tuple:
+        """splits a table into horizontal tiles which can each be rendered at
+        dpi without going over the table size cap (max_table_pixels, or less
+        while the process is over the ceiling). If even a thin tile of the
+        full table width is too large the dpi is lowered.
+
+        Args:
+            rect (fitz.Rect): extents of the table on the page
+            dpi (int): requested render resolution
+
+        Returns:
+            tuple: list of fitz.Rect tiles (top to bottom), dpi to render at
+        """
+        scale = dpi / 72.
+        width_px = rect.width * scale
+        height_px = rect.height * scale
+
+        if width_px * height_px <= self.table_pixels:
+            return [rect], dpi
+
+        max_width_px = self.table_pixels / MIN_TABLE_TILE_HEIGHT_PX
+        if width_px > max_width_px:
+            # fitz only accepts whole number resolutions
+            dpi = max(int(dpi * max_width_px / width_px), 1)
+            scale = dpi / 72.
+            width_px = rect.width * scale
+
+        tile_height = (self.table_pixels / width_px) / scale
+
+        tiles = []
+        y0 = rect.y0
+        while y0 < rect.y1:
+            y1 = min(y0 + tile_height, rect.y1)
+            tiles.append(fitz.Rect(rect.x0, y0, rect.x1, y1))
+            y0 = y1
+
+        return tiles, dpi
@@ -0,0 +1,292 @@
+import os
+import time
+import logging
+import threading
+from collections import defaultdict
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+METRIC_PREFIX = 'nipigon'
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class _StageTimer:
+    """Context manager which adds the time spent inside the with block to a
+    stage of a DocumentMetrics object.
+    """
+
+    __slots__ = ('metrics', 'stage', 'start_time')
+
+    def __init__(self,
+                 metrics,
+                 stage : str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.stage, time.perf_counter() - self.start_time)
+        return False
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class _NullTimer:
+    """Shared do-nothing context manager returned when metrics are disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+# =============================================================================
+
+class DocumentMetrics:
+    """Timers and counters collected while a single document is extracted.
+
+    Timers accumulate seconds and calls per stage, counters are plain integer
+    totals and observations keep the count, sum, min and max of a value that
+    is recorded once per page (e.g. the number of boxes on a page).
+    """
+
+    enabled = True
+
+    def __init__(self,
+                 document_name = ''):
+
+        self.document_name = document_name
+
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.observations = {}
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def time(self,
+             stage : str) -> _StageTimer:
+        """returns a context manager which times the code in the with block
+
+        Args:
+            stage (str): name of the stage being timed
+
+        Returns:
+            _StageTimer: context manager
+        """
+        return _StageTimer(self, stage)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def add_time(self,
+                 stage : str,
+                 seconds : float) -> None:
+
+        self.stage_seconds[stage] += seconds
+        self.stage_calls[stage] += 1
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def increment(self,
+                  counter : str,
+                  value = 1) -> None:
+
+        self.counters[counter] += value
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def observe(self,
+                name : str,
+                value : float) -> None:
+
+        if name not in self.observations:
+            self.observations[name] = {'count' : 0, 'sum' : 0., 'min' : value, 'max' : value}
+
+        observation = self.observations[name]
+        observation['count'] += 1
+        observation['sum'] += value
+        observation['min'] = min(observation['min'], value)
+        observation['max'] = max(observation['max'], value)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def merge(self,
+              other) -> None:
+        """adds the timers, counters and observations of other to this object
+
+        Args:
+            other (DocumentMetrics): metrics to add
+        """
+        for stage, seconds in other.stage_seconds.items():
+            self.stage_seconds[stage] += seconds
+            self.stage_calls[stage] += other.stage_calls[stage]
+
+        for counter, value in other.counters.items():
+            self.counters[counter] += value
+
+        for name, other_observation in other.observations.items():
+            if name not in self.observations:
+                self.observations[name] = dict(other_observation)
+                continue
+
+            observation = self.observations[name]
+            observation['count'] += other_observation['count']
+            observation['sum'] += other_observation['sum']
+            observation['min'] = min(observation['min'], other_observation['min'])
+            observation['max'] = max(observation['max'], other_observation['max'])
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def to_dict(self) -> dict:
+        """returns the contains of the object in dictionary form
+
+        Returns:
+            dict: dictionary containing all the data of the object
+        """
+        return {'document_name' : self.document_name,
+                'stage_seconds' : dict(self.stage_seconds),
+                'stage_calls' : dict(self.stage_calls),
+                'counters' : dict(self.counters),
+                'observations' : {name : dict(value) for name, value in self.observations.items()}}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class NullMetrics(DocumentMetrics):
+    """Metrics object used when collection is disabled. Every method returns
+    straight away so the instrumented code paths cost close to nothing.
+    """
+
+    enabled = False
+
+    def time(self, stage : str) -> _NullTimer:
+        return _NULL_TIMER
+
+    def add_time(self, stage : str, seconds : float) -> None:
+        pass
+
+    def increment(self, counter : str, value = 1) -> None:
+        pass
+
+    def observe(self, name : str, value : float) -> None:
+        pass
+
+NULL_METRICS = NullMetrics()
+
+# =============================================================================
+
+class MetricsSink:
+    """Base class for the destinations DocumentMetrics are exported to. emit is
+    called once for every extracted document.
+    """
+
+    def emit(self,
+             metrics : DocumentMetrics) -> None:
+        raise NotImplementedError
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class LoggingMetricsSink(MetricsSink):
+    """Writes one key=value log line per document"""
+
+    def __init__(self,
+                 logger = None,
+                 level = logging.INFO):
+
+        self.logger = logger if logger is not None else logging.getLogger(METRIC_PREFIX)
+        self.level = level
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def emit(self,
+             metrics : DocumentMetrics) -> None:
+
+        fields = [f'document="{metrics.document_name}"']
+
+        for stage, seconds in sorted(metrics.stage_seconds.items()):
+            fields.append(f'{stage}_seconds={seconds:.4f}')
+
+        for counter, value in sorted(metrics.counters.items()):
+            fields.append(f'{counter}={value}')
+
+        for name, observation in sorted(metrics.observations.items()):
+            fields.append(f'{name}_max={observation["max"]}')
+
+        self.logger.log(self.level, ' '.join(fields))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class PrometheusTextFileSink(MetricsSink):
+    """Keeps running totals over every document and rewrites a text file in the
+    Prometheus exposition format after each one, ready to be picked up by the
+    node_exporter textfile collector.
+    """
+
+    def __init__(self,
+                 file_path : str,
+                 prefix = METRIC_PREFIX):
+
+        self.file_path = file_path
+        self.prefix = prefix
+
+        self.num_documents = 0
+        self.last_document_seconds = 0.
+        self.totals = DocumentMetrics()
+        self.lock = threading.Lock()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def emit(self,
+             metrics : DocumentMetrics) -> None:
+
+        with self.lock:
+            self.num_documents += 1
+            self.last_document_seconds = metrics.stage_seconds.get('document', 0.)
+            self.totals.merge(metrics)
+            self._write()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_text(self) -> str:
+        """returns the running totals in the Prometheus text format"""
+
+        prefix = self.prefix
+        lines = [f'# TYPE {prefix}_documents_total counter',
+                 f'{prefix}_documents_total {self.num_documents}',
+                 f'# TYPE {prefix}_last_document_seconds gauge',
+                 f'{prefix}_last_document_seconds {self.last_document_seconds}',
+                 f'# TYPE {prefix}_stage_seconds_total counter']
+
+        for stage, seconds in sorted(self.totals.stage_seconds.items()):
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{stage}"}} {seconds}')
+
+        lines.append(f'# TYPE {prefix}_stage_calls_total counter')
+        for stage, calls in sorted(self.totals.stage_calls.items()):
+            lines.append(f'{prefix}_stage_calls_total{{stage="{stage}"}} {calls}')
+
+        for counter, value in sorted(self.totals.counters.items()):
+            lines.append(f'# TYPE {prefix}_{counter}_total counter')
+            lines.append(f'{prefix}_{counter}_total {value}')
+
+        for name, observation in sorted(self.totals.observations.items()):
+            lines.append(f'# TYPE {prefix}_{name} summary')
+            lines.append(f'{prefix}_{name}_count {observation["count"]}')
+            lines.append(f'{prefix}_{name}_sum {observation["sum"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _write(self) -> None:
+
+        # write to a temporary file first so a scrape never sees a partial file
+        tmp_file_path = self.file_path + '.tmp'
+        with open(tmp_file_path, 'w') as tmp_file:
+            tmp_file.write(self.get_text())
+
+        os.replace(tmp_file_path, self.file_path)
@@ -0,0 +1,272 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DEFAULT_MAX_ENTRIES = 20000
+
+# pixels darker than this (grey level) are ink
+INK_GREY_LEVEL = 200
+
+# the ink of a cell is scaled to this height before it is hashed, so the same
+# text with other cell margins has the same key
+NORMALIZED_HEIGHT_PX = 32
+MAX_NORMALIZED_WIDTH_PX = 1024
+
+# scaling the ink loses the size and place of the glyphs (x and X, o, O and
+# 0, l, I and |, . and the middle dot have the same shape once scaled), so
+# the height and the vertical centre of the ink relative to the crop and the
+# height of the crop are part of the key as well, rounded to these steps to
+# allow for a jitter of the cell box
+INK_BOX_STEPS = 20
+CROP_HEIGHT_STEP_PX = 4
+
+# rows/columns of a crop with more ink than this are rule lines
+RULE_LINE_FRACTION = 0.9
+
+# rule lines and the neighbouring cells bleed into the edges of a cell crop,
+# ink in this fraction of the width/height along each edge does not make a
+# cell non blank
+BLANK_CELL_MARGIN = 0.05
+MIN_INK_PIXELS = 4
+
+# pending writes to the persistent layer are committed every this many puts
+PERSISTENT_COMMIT_EVERY = 100
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def to_grey(cell_image : np.array) -> np.array:
+    """returns the cell image as a 2D array of grey levels"""
+
+    if cell_image.ndim == 2:
+        return cell_image
+
+    return np.asarray(Image.fromarray(cell_image).convert('L'))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def is_blank_cell(cell_grey : np.array) -> bool:
+    """returns true if a cell holds no text, i.e. it has (almost) no ink once
+    the edges of the crop are left out
+
+    Args:
+        cell_grey (np.array): grey levels of the cell crop
+    """
+    if cell_grey.size == 0:
+        return True
+
+    height, width = cell_grey.shape
+    margin_y = int(height * BLANK_CELL_MARGIN)
+    margin_x = int(width * BLANK_CELL_MARGIN)
+
+    inner = cell_grey[margin_y:height - margin_y, margin_x:width - margin_x]
+
+    return int(np.count_nonzero(inner < INK_GREY_LEVEL)) < MIN_INK_PIXELS
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _find_rule_lines(ink_fractions : np.array) -> np.array:
+    """returns a mask of the rows (or columns) of a crop that belong to rule
+    lines, with the anti-aliased row either side of them
+    """
+    rule_lines = ink_fractions > RULE_LINE_FRACTION
+
+    rule_lines[1:] |= rule_lines[:-1].copy()
+    rule_lines[:-1] |= rule_lines[1:].copy()
+
+    return rule_lines
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_cell_key(cell_grey : np.array,
+                 namespace = '') -> str:
+    """returns the cache key of a cell. The crop is binarized halfway between
+    its lightest and darkest grey (so the text and background colours do not
+    matter), rule lines are dropped, it is trimmed to the remaining ink and
+    scaled to NORMALIZED_HEIGHT_PX before it is hashed together with the
+    height and centre of the ink relative to the crop and the height of the
+    crop.
+
+    Args:
+        cell_grey (np.array): grey levels of a non blank cell crop
+        namespace (str, optional): prefix of the key, e.g. the OCR mode the
+            text is read with. Defaults to ''.
+
+    Returns:
+        str: cache key
+    """
+    threshold = (int(cell_grey.min()) + int(cell_grey.max())) / 2.
+    ink = cell_grey < threshold
+
+    # whether the crop of a cell catches the rules around it depends on the
+    # detected cell box, not on the text
+    ink[_find_rule_lines(ink.mean(axis=1)), :] = False
+    ink[:, _find_rule_lines(ink.mean(axis=0))] = False
+
+    crop_height = max(ink.shape[0], 1)
+    ink_box = (0, 0, 0)
+
+    rows = np.flatnonzero(ink.any(axis=1))
+    columns = np.flatnonzero(ink.any(axis=0))
+
+    if len(rows) > 0:
+        ink = ink[rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1]
+        ink_box = (int(round(ink.shape[0] / crop_height * INK_BOX_STEPS)),
+                   int(round((rows[0] + rows[-1] + 1) / 2 / crop_height * INK_BOX_STEPS)),
+                   int(round(crop_height / CROP_HEIGHT_STEP_PX)))
+
+    height, width = ink.shape
+    normalized_width = min(max(int(round(width * NORMALIZED_HEIGHT_PX / height)), 1), MAX_NORMALIZED_WIDTH_PX)
+
+    normalized = Image.fromarray(ink.astype(np.uint8) * 255).resize((normalized_width, NORMALIZED_HEIGHT_PX),
+                                                                   Image.BILINEAR)
+    normalized = np.asarray(normalized) > 127
+
+    digest = hashlib.blake2b(np.packbits(normalized).tobytes(), digest_size=16)
+    digest.update(np.array(normalized.shape + ink_box, dtype=np.int32).tobytes())
+
+    return f'{namespace}:{digest.hexdigest()}'
+
+# =============================================================================
+
+class OcrCache:
+    """Text read from table cells keyed on the content of the cell crop.
+    Statistical tables repeat the same headers, units and row labels on many
+    pages, a repeated cell is read once.
+
+    The entries are kept in memory with least recently used eviction and,
+    given persistent_path, in a sqlite database so they are shared by the
+    workers of a batch and kept between runs. Every entry holds the seconds
+    the OCR took, a hit reports them as saved.
+    """
+
+    def __init__(self,
+                 max_entries = DEFAULT_MAX_ENTRIES,
+                 persistent_path = None):
+        """
+        Args:
+            max_entries (int, optional): entries kept in memory. Defaults to
+                DEFAULT_MAX_ENTRIES.
+            persistent_path (str, optional): sqlite file the entries are also
+                saved to. Defaults to None.
+        """
+        self.max_entries = max_entries
+        self.persistent_path = persistent_path
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        # opened on first use, the cache is pickled into the batch workers
+        self.connection = None
+        self.num_pending = 0
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def __getstate__(self) -> dict:
+        return {'max_entries' : self.max_entries,
+                'persistent_path' : self.persistent_path}
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def __setstate__(self,
+                     state : dict) -> None:
+        self.__init__(**state)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _get_connection(self) -> sqlite3.Connection:
+
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.persistent_path, timeout=30., check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS ocr_cache '
+                                    '(key TEXT PRIMARY KEY, text TEXT, seconds REAL)')
+            self.connection.commit()
+
+        return self.connection
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _remember(self,
+                  key : str,
+                  entry : tuple) -> None:
+
+        if self.max_entries <= 0:
+            return
+
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get(self,
+            key : str) -> tuple:
+        """returns the (text, OCR seconds) of key, None if it is not cached"""
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+
+            if self.persistent_path is None:
+                return None
+
+            row = self._get_connection().execute('SELECT text, seconds FROM ocr_cache WHERE key = ?',
+                                                 (key,)).fetchone()
+            if row is None:
+                return None
+
+            entry = (row[0], row[1])
+            self._remember(key, entry)
+
+            return entry
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def put(self,
+            key : str,
+            text : str,
+            seconds : float) -> None:
+
+        with self.lock:
+            self._remember(key, (text, seconds))
+
+            if self.persistent_path is None:
+                return
+
+            self._get_connection().execute('INSERT OR REPLACE INTO ocr_cache VALUES (?, ?, ?)',
+                                           (key, text, seconds))
+            self.num_pending += 1
+
+            if self.num_pending >= PERSISTENT_COMMIT_EVERY:
+                self._commit()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _commit(self) -> None:
+
+        if self.connection is not None and self.num_pending > 0:
+            self.connection.commit()
+        self.num_pending = 0
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def flush(self) -> None:
+        """commits the pending writes to the persistent layer"""
+
+        with self.lock:
+            self._commit()
@@ -0,0 +1,74 @@
+import numpy as np
+from PIL import Image, ImageDraw
+import fitz
+
+from .BoundingBox import LABEL_DICT
+from .Colours import COLOURS
+from .ExtractedDocument import DocumentPage
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# label name -> class id, the same colour is used for a label as in the
+# annotated images saved by the ExtractedDocumentGenerator
+LABEL_IDS = {label : int(class_id) for class_id, label in LABEL_DICT.items()}
+
+DEFAULT_OUTLINE_COLOUR = 'black'
+SELECTED_OUTLINE_WIDTH = 4
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_label_colour(label : str) -> str:
+
+    if label not in LABEL_IDS:
+        return DEFAULT_OUTLINE_COLOUR
+
+    return COLOURS[LABEL_IDS[label]]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def render_page_image(fitz_page : fitz.Page,
+                      zoom = 1.) -> np.array:
+    """renders a pdf page to an RGB image
+
+    Args:
+        fitz_page (fitz.Page): page to render
+        zoom (float, optional): scale from pdf points to pixels. Defaults to 1.
+
+    Returns:
+        np.array: page image (height x width x 3)
+    """
+    pix = fitz_page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return np.frombuffer(buffer=pix.samples, dtype=np.uint8).reshape((pix.height, pix.width, -1))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def annotate_page_image(page_img : np.array,
+                        document_page : DocumentPage,
+                        zoom = 1.,
+                        selected_block = None) -> Image.Image:
+    """draws the bounding box of every text block of document_page on a copy
+    of the page image. Blocks without a bounding box are skipped.
+
+    Args:
+        page_img (np.array): page image rendered at zoom
+        document_page (DocumentPage): extracted page holding the boxes
+        zoom (float, optional): zoom the image was rendered at. Defaults to 1.
+        selected_block (int, optional): index of a block drawn with a thick
+            outline. Defaults to None.
+
+    Returns:
+        Image.Image: annotated image
+    """
+    img = Image.fromarray(page_img)
+    img_draw = ImageDraw.Draw(img)
+
+    for block_num, text_block in enumerate(document_page.document_text_blocks):
+        if text_block.bbox is None:
+            continue
+
+        x0, y0, x1, y1 = text_block.bbox
+        img_draw.rectangle([(x0 * zoom, y0 * zoom), (x1 * zoom, y1 * zoom)],
+                           outline=get_label_colour(text_block.label),
+                           width=SELECTED_OUTLINE_WIDTH if block_num == selected_block else 1)
+
+    return img
@@ -0,0 +1,150 @@
+# separates the parts of a page specification, e.g. '0:10,15,-1'
+SPEC_SEPARATOR = ','
+SLICE_SEPARATOR = ':'
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def parse_page_spec(spec : str) -> list:
+    """parses a page specification given on the command line or in a query
+    into a page selection. The parts are separated by commas and each is a
+    page number or a python slice of the page numbers, both 0 based and
+    negative from the end of the document: '0:10,15,-1' selects the first
+    ten pages, page 15 and the last page, '::2' every other page.
+
+    Args:
+        spec (str): page specification
+
+    Raises:
+        ValueError: if a part is neither a page number nor a slice
+
+    Returns:
+        list: page numbers and slices, see resolve_pages
+    """
+    selection = []
+
+    for part in spec.split(SPEC_SEPARATOR):
+        part = part.strip()
+        if len(part) == 0:
+            continue
+
+        if SLICE_SEPARATOR not in part:
+            selection.append(int(part))
+            continue
+
+        values = part.split(SLICE_SEPARATOR)
+        if len(values) > 3:
+            raise ValueError(f'{part} is not a slice of pages')
+
+        selection.append(slice(*[int(value) if value.strip() != '' else None for value in values]))
+
+    return selection
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _format_part(item) -> str:
+
+    if isinstance(item, range):
+        item = slice(item.start, item.stop, item.step if item.step != 1 else None)
+
+    if not isinstance(item, slice):
+        return str(int(item))
+
+    values = [item.start, item.stop] if item.step is None else [item.start, item.stop, item.step]
+    return SLICE_SEPARATOR.join('' if value is None else str(value) for value in values)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def format_page_spec(include_pages) -> str:
+    """returns the page specification of a page selection, the reverse of
+    parse_page_spec, e.g. to record which pages an output was extracted with
+
+    Args:
+        include_pages: page selection, see resolve_pages
+
+    Returns:
+        str: page specification, or None for a selection of every page
+    """
+    if include_pages is None:
+        return None
+
+    if isinstance(include_pages, str):
+        include_pages = parse_page_spec(include_pages)
+    elif not isinstance(include_pages, (list, tuple, set, frozenset)):
+        include_pages = [include_pages]
+
+    parts = []
+    for item in include_pages:
+        if isinstance(item, str):
+            parts.extend(_format_part(part) for part in parse_page_spec(item))
+        else:
+            parts.append(_format_part(item))
+
+    return SPEC_SEPARATOR.join(parts) if len(parts) > 0 else None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _add_pages(selected : set,
+               item,
+               page_count : int) -> None:
+
+    if isinstance(item, slice):
+        selected.update(range(page_count)[item])
+    elif isinstance(item, range):
+        if item.step > 0 and item.start >= 0:
+            selected.update(range(item.start, min(item.stop, page_count), item.step))
+        else:
+            # negative page numbers of a range count from the end as well
+            for page_number in item:
+                _add_pages(selected, page_number, page_count)
+    elif isinstance(item, str):
+        for part in parse_page_spec(item):
+            _add_pages(selected, part, page_count)
+    elif -page_count <= int(item) < page_count:
+        selected.add(int(item) % page_count)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def resolve_pages(include_pages,
+                  page_count : int) -> list:
+    """returns the sorted page numbers selected from a document, without
+    looking at any of its pages. Page numbers outside of the document are
+    left out, as slices do.
+
+    Args:
+        include_pages: None or an empty selection for every page, a page
+            number (negative from the end), a slice, a range, a page
+            specification string (see parse_page_spec), or a list, tuple or
+            set of any of these
+        page_count (int): number of pages of the document
+
+    Returns:
+        list: 0 based page numbers in document order
+    """
+    if include_pages is None:
+        return list(range(page_count))
+
+    if isinstance(include_pages, slice):
+        return sorted(range(page_count)[include_pages])
+
+    if not isinstance(include_pages, (list, tuple, set, frozenset)):
+        include_pages = [include_pages]
+
+    if len(include_pages) == 0:
+        return list(range(page_count))
+
+    selected = set()
+    for item in include_pages:
+        _add_pages(selected, item, page_count)
+
+    return sorted(selected)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def split_pages(page_numbers : list,
+                pages_per_part : int) -> list:
+    """splits page numbers into consecutive parts of at most pages_per_part
+    pages, e.g. to spread the pages of one large document over workers
+    """
+    pages_per_part = max(int(pages_per_part), 1)
+
+    return [page_numbers[start:start + pages_per_part] for start in range(0, len(page_numbers), pages_per_part)]
@@ -0,0 +1,138 @@
+import io
+import os
+import mmap
+
+import fitz
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _map_file(file_object) -> mmap.mmap:
+    """returns a read only memory map of a whole file, None if the file can
+    not be mapped (pipes, sockets, empty files ...)
+    """
+    try:
+        file_number = file_object.fileno()
+        if os.fstat(file_number).st_size == 0:
+            return None
+
+        return mmap.mmap(file_number, 0, access=mmap.ACCESS_READ)
+
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _open_buffer(buffer,
+                 view = None,
+                 pdf_mmap = None) -> fitz.Document:
+
+    fitz_doc = fitz.open('pdf', buffer)
+
+    # released by close_pdf, the document reads from the buffer until then
+    fitz_doc.pdf_view = view
+    fitz_doc.pdf_mmap = pdf_mmap
+
+    return fitz_doc
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def open_pdf(source,
+             memory_map = False) -> fitz.Document:
+    """opens a pdf without copying it. MuPDF reads the pdf straight from the
+    memory of the source:
+
+    - bytes and memoryview are used as they are
+    - bytearray, mmap and io.BytesIO (e.g. an upload) are read through a
+      memoryview of their buffer
+    - a file object backed by a regular file is memory mapped, the position
+      of the file is ignored; other file objects (pipes, sockets, ...) are
+      read once into bytes
+    - a path is opened by MuPDF, which reads the pages from the file as
+      they are needed, or with memory_map it is memory mapped
+
+    Ownership: the document keeps a reference to the buffer it reads from
+    until close_pdf. The bytes of a bytearray, mmap or BytesIO source must
+    not change while the document is open; the source can not be resized,
+    and an mmap or BytesIO can not be closed, before close_pdf (python
+    raises BufferError). The caller keeps owning the source. The memory maps
+    open_pdf creates itself (paths, file objects) belong to the document and
+    are closed by close_pdf, the file object can be closed right after
+    open_pdf.
+
+    Args:
+        source (str, bytes, memoryview, bytearray, mmap.mmap, file object):
+            the pdf
+        memory_map (bool, optional): memory map a path instead of letting
+            MuPDF read it. Defaults to False.
+
+    Returns:
+        fitz.Document: the open document, close it with close_pdf
+    """
+    if isinstance(source, (str, os.PathLike)):
+        if not memory_map:
+            fitz_doc = fitz.open(source)
+            fitz_doc.pdf_view = None
+            fitz_doc.pdf_mmap = None
+            return fitz_doc
+
+        with open(source, 'rb') as pdf_file:
+            pdf_mmap = _map_file(pdf_file)
+
+        if pdf_mmap is None:
+            raise fitz.EmptyFileError(f'{source} can not be memory mapped')
+
+        view = memoryview(pdf_mmap)
+        return _open_buffer(view, view, pdf_mmap)
+
+    if isinstance(source, bytes):
+        return _open_buffer(source)
+
+    if isinstance(source, memoryview):
+        # MuPDF needs the bytes in one piece, only a strided view is copied
+        if not source.c_contiguous:
+            return _open_buffer(source.tobytes())
+        if source.format != 'B' or source.ndim != 1:
+            view = source.cast('B')
+            return _open_buffer(view, view)
+        return _open_buffer(source)
+
+    if isinstance(source, (bytearray, mmap.mmap)):
+        view = memoryview(source)
+        return _open_buffer(view, view)
+
+    if isinstance(source, io.BytesIO):
+        view = source.getbuffer()
+        return _open_buffer(view, view)
+
+    if hasattr(source, 'read'):
+        pdf_mmap = _map_file(source)
+
+        if pdf_mmap is None:
+            return _open_buffer(source.read())
+
+        view = memoryview(pdf_mmap)
+        return _open_buffer(view, view, pdf_mmap)
+
+    raise TypeError(f'can not open a pdf from {type(source).__name__}')
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def close_pdf(fitz_doc : fitz.Document) -> None:
+    """closes a document of open_pdf and releases its buffer, the source can
+    be changed or closed afterwards
+    """
+    if not fitz_doc.is_closed:
+        fitz_doc.close()
+
+    view = getattr(fitz_doc, 'pdf_view', None)
+    pdf_mmap = getattr(fitz_doc, 'pdf_mmap', None)
+
+    fitz_doc.stream = None
+    fitz_doc.pdf_view = None
+    fitz_doc.pdf_mmap = None
+
+    if view is not None:
+        view.release()
+
+    if pdf_mmap is not None:
+        pdf_mmap.close()
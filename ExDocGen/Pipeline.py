@@ -0,0 +1,357 @@
+from collections import OrderedDict
+from concurrent.futures import wait, FIRST_COMPLETED
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# what bounds the time of a stage, the scheduler runs every kind on its own
+# executor (or on the calling thread when there is none)
+STAGE_CPU = 'cpu'
+STAGE_IO = 'io'
+STAGE_MODEL = 'model'
+STAGE_KINDS = [STAGE_CPU, STAGE_IO, STAGE_MODEL]
+
+DEFAULT_CACHE_ENTRIES = 128
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class PipelineError(Exception):
+    """Raised for a graph which can not produce the requested values or a
+    stage returning a value of the wrong type
+    """
+    pass
+
+# =============================================================================
+
+class Stage:
+    """A named step of a pipeline. function is called with the inputs as
+    keyword arguments and returns the value of its single output, or a tuple
+    with a value for every output.
+    """
+
+    def __init__(self,
+                 name : str,
+                 function,
+                 inputs : dict,
+                 outputs : dict,
+                 kind = STAGE_CPU,
+                 cache_key = None):
+        """
+        Args:
+            name (str): unique name of the stage
+            function (callable): the work of the stage
+            inputs (dict): name -> type of every argument of function
+            outputs (dict): name -> type of every value function returns, in
+                order
+            kind (str, optional): STAGE_CPU, STAGE_IO or STAGE_MODEL.
+                Defaults to STAGE_CPU.
+            cache_key (callable, optional): called with the inputs, returns a
+                hashable key under which the outputs are cached, or None to
+                not cache them. Defaults to None which never caches.
+        """
+        if kind not in STAGE_KINDS:
+            raise ValueError(f'unknown stage kind {kind}')
+
+        self.name = name
+        self.function = function
+        self.inputs = dict(inputs)
+        self.outputs = dict(outputs)
+        self.kind = kind
+        self.cache_key = cache_key
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def __repr__(self) -> str:
+        return f'Stage({self.name}: {list(self.inputs)} -> {list(self.outputs)}, {self.kind})'
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def run(self,
+            arguments : dict,
+            check_types = True) -> dict:
+        """runs the stage and returns its outputs by name"""
+
+        result = self.function(**arguments)
+
+        if len(self.outputs) == 1:
+            result = (result,)
+
+        values = dict(zip(self.outputs, result))
+
+        if check_types:
+            for name, value in values.items():
+                if not isinstance(value, self.outputs[name]):
+                    raise PipelineError(f'stage {self.name} returned {type(value).__name__} '
+                                        f'for {name}, expected {self.outputs[name].__name__}')
+
+        return values
+
+# =============================================================================
+
+class StageCache:
+    """Outputs of cached stages with least recently used eviction"""
+
+    def __init__(self,
+                 max_entries = DEFAULT_CACHE_ENTRIES):
+
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get(self,
+            key) -> dict:
+
+        values = self.entries.get(key)
+
+        if values is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return values
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def put(self,
+            key,
+            values : dict) -> None:
+
+        self.entries[key] = values
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+# =============================================================================
+
+class Pipeline:
+    """Graph of stages connected by the names of their inputs and outputs.
+
+    run is given the initial values and the names of the values wanted and
+    only runs the stages needed for them. A stage starts as soon as its
+    inputs are available, on the executor of its kind; stages of a kind
+    without an executor run on the calling thread, in the order they were
+    added. A value is released as soon as no remaining stage needs it.
+    """
+
+    def __init__(self,
+                 executors = None,
+                 cache : StageCache = None,
+                 check_types = True):
+        """
+        Args:
+            executors (dict, optional): stage kind -> concurrent.futures
+                executor. Defaults to None which runs every stage on the
+                calling thread.
+            cache (StageCache, optional): cache of the stages with a
+                cache_key. Defaults to None.
+            check_types (bool, optional): check the type of every stage
+                output. Defaults to True.
+        """
+        self.stages = []
+        self.executors = executors if executors is not None else {}
+        self.cache = cache
+        self.check_types = check_types
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def __repr__(self) -> str:
+        return 'Pipeline(\n' + ''.join(f'    {stage}\n' for stage in self.stages) + ')'
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_stage(self,
+                  name : str) -> Stage:
+
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+
+        raise KeyError(f'no stage {name}')
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _get_producer(self,
+                      value_name : str) -> Stage:
+
+        for stage in self.stages:
+            if value_name in stage.outputs:
+                return stage
+
+        return None
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def add_stage(self,
+                  stage : Stage,
+                  before = None) -> None:
+        """adds a stage at the end of the graph or before the stage named
+        before. Every value has a single producer.
+        """
+        if any(existing.name == stage.name for existing in self.stages):
+            raise PipelineError(f'there already is a stage {stage.name}')
+
+        for value_name in stage.outputs:
+            if self._get_producer(value_name) is not None:
+                raise PipelineError(f'{value_name} is already produced by {self._get_producer(value_name).name}')
+
+        if before is None:
+            self.stages.append(stage)
+        else:
+            self.stages.insert(self.stages.index(self.get_stage(before)), stage)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def replace_stage(self,
+                      stage : Stage) -> None:
+        """replaces the stage with the same name, it has to produce the same
+        values
+        """
+        old_stage = self.get_stage(stage.name)
+
+        if set(old_stage.outputs) != set(stage.outputs):
+            raise PipelineError(f'stage {stage.name} has to produce {list(old_stage.outputs)}')
+
+        self.stages[self.stages.index(old_stage)] = stage
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def remove_stage(self,
+                     name : str) -> None:
+        self.stages.remove(self.get_stage(name))
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_required_stages(self,
+                            outputs : list,
+                            available = ()) -> list:
+        """returns, in graph order, the stages needed to produce outputs from
+        the available values
+        """
+        required = set()
+        needed = [name for name in outputs if name not in available]
+
+        while len(needed) > 0:
+            value_name = needed.pop()
+
+            stage = self._get_producer(value_name)
+            if stage is None:
+                raise PipelineError(f'no stage produces {value_name}')
+
+            if stage.name in required:
+                continue
+            required.add(stage.name)
+
+            needed.extend(name for name in stage.inputs if name not in available)
+
+        return [stage for stage in self.stages if stage.name in required]
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _run_stage(self,
+                   stage : Stage,
+                   arguments : dict) -> dict:
+
+        key = None
+        if self.cache is not None and stage.cache_key is not None:
+            key = stage.cache_key(**arguments)
+
+            if key is not None:
+                values = self.cache.get((stage.name, key))
+                if values is not None:
+                    return values
+
+        values = stage.run(arguments, self.check_types)
+
+        if key is not None:
+            self.cache.put((stage.name, key), values)
+
+        return values
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def run(self,
+            inputs : dict,
+            outputs : list) -> dict:
+        """runs the stages needed for outputs
+
+        Args:
+            inputs (dict): name -> initial value
+            outputs (list): names of the values to return
+
+        Returns:
+            dict: name -> value of every name in outputs
+        """
+        pending = self.get_required_stages(outputs, available=inputs)
+        values = dict(inputs)
+
+        if self.check_types:
+            for stage in pending:
+                for name, value_type in stage.inputs.items():
+                    if name in inputs and not isinstance(inputs[name], value_type):
+                        raise PipelineError(f'{name} is a {type(inputs[name]).__name__}, stage {stage.name} '
+                                            f'expects {value_type.__name__}')
+
+        # the number of stages still to read every value
+        readers = {}
+        for stage in pending:
+            for name in stage.inputs:
+                readers[name] = readers.get(name, 0) + 1
+
+        running = {}
+
+        while len(pending) > 0 or len(running) > 0:
+
+            started = True
+            while started:
+                started = False
+
+                for stage in pending:
+                    if not all(name in values for name in stage.inputs):
+                        continue
+
+                    pending.remove(stage)
+                    started = True
+
+                    arguments = {name : values[name] for name in stage.inputs}
+                    executor = self.executors.get(stage.kind)
+
+                    if executor is None:
+                        self._finish_stage(stage, self._run_stage(stage, arguments), values, readers, outputs)
+                    else:
+                        running[executor.submit(self._run_stage, stage, arguments)] = stage
+
+                    # the inputs of later stages may have changed
+                    break
+
+            if len(running) == 0:
+                if len(pending) > 0:
+                    raise PipelineError(f'stages {[stage.name for stage in pending]} can not run')
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                self._finish_stage(running.pop(future), future.result(), values, readers, outputs)
+
+        return {name : values[name] for name in outputs}
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _finish_stage(self,
+                      stage : Stage,
+                      stage_values : dict,
+                      values : dict,
+                      readers : dict,
+                      outputs : list) -> None:
+
+        values.update(stage_values)
+
+        # e.g. the page image is released before the tables are rendered
+        for name in stage.inputs:
+            readers[name] -= 1
+            if readers[name] == 0 and name not in outputs:
+                del values[name]
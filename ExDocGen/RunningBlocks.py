@@ -0,0 +1,266 @@
+import re
+
+from .ExtractedDocument import DocumentTextBlock, DocumentSentence
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DEFAULT_RUNNING_LABELS = ['Page-header', 'Page-footer']
+
+# largest difference (points) of a box coordinate from the template box
+DEFAULT_GEOMETRY_TOLERANCE = 6.
+
+# pages a template has to be seen on before its text is predicted instead of
+# extracted (skip_extraction)
+DEFAULT_MIN_PAGES = 3
+
+# blocks at the place of a running block whose text keeps changing (e.g.
+# section titles) would otherwise add a template on every page
+MAX_TEMPLATES = 64
+
+# page numbers, dates, issue numbers ... every run of digits is a slot of the
+# template, the rest of the text has to match exactly
+DIGITS_PATTERN = re.compile(r'[0-9]+')
+SLOT = '0'
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def fill_slots(text : str,
+               slot_values : list) -> str:
+    """replaces the slots of text, in order, with slot_values"""
+
+    slot_values = iter(slot_values)
+    return DIGITS_PATTERN.sub(lambda match: next(slot_values), text)
+
+# =============================================================================
+
+class RunningBlockConfig:
+    """Settings of the reuse of running page headers and footers.
+
+    Blocks with one of the labels are matched against the templates found so
+    far in the document, by their box (every coordinate within
+    geometry_tolerance points) and by their text with the runs of digits left
+    out. A matching block reuses the cleaned and segmented text of the
+    template, with its own numbers put back, and shares the sentences of the
+    template when the text is the same.
+
+    With skip_extraction a template seen on min_pages pages whose numbers are
+    constant or follow the page number is not extracted from the pdf at all
+    any more, its text is predicted. This trusts the layout detector, a block
+    at the same place with other text is then missed.
+    """
+
+    def __init__(self,
+                 labels = None,
+                 geometry_tolerance = DEFAULT_GEOMETRY_TOLERANCE,
+                 min_pages = DEFAULT_MIN_PAGES,
+                 skip_extraction = False):
+
+        self.labels = labels if labels is not None else list(DEFAULT_RUNNING_LABELS)
+        self.geometry_tolerance = geometry_tolerance
+        self.min_pages = min_pages
+        self.skip_extraction = skip_extraction
+
+# =============================================================================
+
+class _Template:
+    """A running block of a document, the sentences are segmented once from
+    the text with its digits replaced by slots
+    """
+
+    def __init__(self,
+                 label : str,
+                 bbox : tuple,
+                 raw_pattern : str,
+                 sentences : list,
+                 page_number : int,
+                 slot_values : list):
+
+        self.label = label
+        self.bbox = bbox
+        self.raw_pattern = raw_pattern
+
+        # sentences of the first page the template was seen on, shared by
+        # the pages with the same text
+        self.sentences = sentences
+        self.slot_values = slot_values
+        self.sentence_patterns = [DIGITS_PATTERN.sub(SLOT, sentence.text) for sentence in sentences]
+        self.sentence_num_slots = [len(DIGITS_PATTERN.findall(pattern)) for pattern in self.sentence_patterns]
+
+        self.page_numbers = [page_number]
+        # per slot, the value constant over the pages seen or its offset from
+        # the page number, None once it is neither
+        self.constant_slots = list(slot_values)
+        self.page_offsets = [int(value) - page_number if str(int(value)) == value else None
+                             for value in slot_values]
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def matches_box(self,
+                    label : str,
+                    bbox : tuple,
+                    tolerance : float) -> bool:
+
+        return label == self.label and all(abs(a - b) <= tolerance for a, b in zip(bbox, self.bbox))
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def add_page(self,
+                 page_number : int,
+                 slot_values : list) -> None:
+
+        if page_number in self.page_numbers:
+            return
+        self.page_numbers.append(page_number)
+
+        for i, value in enumerate(slot_values):
+            if self.constant_slots[i] != value:
+                self.constant_slots[i] = None
+            if self.page_offsets[i] is not None and int(value) - page_number != self.page_offsets[i]:
+                self.page_offsets[i] = None
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def predict_slots(self,
+                      page_number : int) -> list:
+        """returns the slot values of the template on page_number, None when
+        they do not follow from the pages seen
+        """
+        slot_values = []
+
+        for constant, offset in zip(self.constant_slots, self.page_offsets):
+            if constant is not None:
+                slot_values.append(constant)
+            elif offset is not None:
+                slot_values.append(str(page_number + offset))
+            else:
+                return None
+
+        return slot_values
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_sentences(self,
+                      slot_values : list) -> list:
+        """returns the sentences of the template with slot_values, the
+        sentences without a changed number are the shared ones
+        """
+        if slot_values == self.slot_values:
+            return self.sentences
+
+        sentences = []
+        first_slot = 0
+
+        for sentence, pattern, num_slots in zip(self.sentences, self.sentence_patterns, self.sentence_num_slots):
+            values = slot_values[first_slot:first_slot + num_slots]
+
+            if values == self.slot_values[first_slot:first_slot + num_slots]:
+                sentences.append(sentence)
+            else:
+                sentences.append(DocumentSentence(fill_slots(pattern, values)))
+
+            first_slot += num_slots
+
+        return sentences
+
+# =============================================================================
+
+class RunningBlocks:
+    """Templates of the running headers and footers of one document"""
+
+    def __init__(self,
+                 config : RunningBlockConfig):
+
+        self.config = config
+        self.templates = []
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def is_running(self,
+                   label : str) -> bool:
+        return label in self.config.labels
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _find_templates(self,
+                        label : str,
+                        bbox : tuple) -> list:
+
+        return [template for template in self.templates
+                if template.matches_box(label, bbox, self.config.geometry_tolerance)]
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def predict_block(self,
+                      label : str,
+                      bbox : tuple,
+                      conf : float,
+                      page_number : int) -> DocumentTextBlock:
+        """returns the block of a confirmed template at bbox without looking
+        at the pdf, None if there is none or skip_extraction is off
+        """
+        if not self.config.skip_extraction:
+            return None
+
+        # with several templates at the same place the text can not be told
+        templates = self._find_templates(label, bbox)
+        if len(templates) != 1 or len(templates[0].page_numbers) < self.config.min_pages:
+            return None
+
+        slot_values = templates[0].predict_slots(page_number)
+        if slot_values is None:
+            return None
+
+        return DocumentTextBlock.from_sentences(templates[0].get_sentences(slot_values), conf, label, bbox)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def match_block(self,
+                    raw_text : str,
+                    label : str,
+                    bbox : tuple,
+                    conf : float,
+                    page_number : int) -> DocumentTextBlock:
+        """returns the block of the template matching the extracted (not yet
+        cleaned) text at bbox, None if no template matches
+        """
+        raw_pattern = DIGITS_PATTERN.sub(SLOT, raw_text)
+
+        for template in self._find_templates(label, bbox):
+            if template.raw_pattern == raw_pattern:
+                slot_values = DIGITS_PATTERN.findall(raw_text)
+                template.add_page(page_number, slot_values)
+                return DocumentTextBlock.from_sentences(template.get_sentences(slot_values), conf, label, bbox)
+
+        return None
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def add_template(self,
+                     raw_text : str,
+                     text_block : DocumentTextBlock,
+                     page_number : int) -> None:
+        """starts a template from a block extracted the normal way"""
+
+        if len(self.templates) >= MAX_TEMPLATES:
+            return
+
+        # with a post-processor the blocks of later pages may have been
+        # extracted before this one was finished
+        raw_pattern = DIGITS_PATTERN.sub(SLOT, raw_text)
+        for template in self._find_templates(text_block.label, text_block.bbox):
+            if template.raw_pattern == raw_pattern:
+                return
+
+        slot_values = DIGITS_PATTERN.findall(raw_text)
+
+        # cleaning and segmenting keep the digits, unless the text had
+        # digits next to characters removed by the cleaning
+        if sum(len(DIGITS_PATTERN.findall(sentence.text)) for sentence in text_block.sentences) != len(slot_values):
+            return
+
+        self.templates.append(_Template(text_block.label,
+                                        text_block.bbox,
+                                        raw_pattern,
+                                        text_block.sentences,
+                                        page_number,
+                                        slot_values))
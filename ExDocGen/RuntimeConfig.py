@@ -0,0 +1,177 @@
+import os
+from contextlib import contextmanager
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+AFFINITY_NONE = 'none'
+AFFINITY_AUTO = 'auto'
+
+# environment variables read by the OpenMP/BLAS thread pools when they start
+THREAD_ENV_VARS = ['OMP_NUM_THREADS',
+                   'MKL_NUM_THREADS',
+                   'OPENBLAS_NUM_THREADS']
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_available_cpus() -> list:
+    """returns the cpus this process may run on, sorted"""
+
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+
+    return list(range(os.cpu_count() or 1))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+@contextmanager
+def torch_threads(num_threads = None):
+    """context manager running the enclosed torch code with num_threads
+    intra-op threads, nothing changes when num_threads is None
+    """
+    if num_threads is None:
+        yield
+        return
+
+    import torch
+
+    previous_threads = torch.get_num_threads()
+    torch.set_num_threads(num_threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous_threads)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class RuntimeConfig:
+    """Thread budget and worker topology of the extraction processes on a node.
+    Left alone torch, easyocr (torch and OpenCV) and ONNX Runtime each start
+    as many threads as there are cores, which oversubscribes the node as soon
+    as more than one generator process runs on it.
+
+    A value of None keeps the default of the library.
+    """
+
+    def __init__(self,
+                 intra_op_threads = None,
+                 inter_op_threads = None,
+                 ocr_threads = None,
+                 num_workers = 1,
+                 cpu_affinity = AFFINITY_NONE):
+        """
+        Args:
+            intra_op_threads (int, optional): threads of a single torch/ONNX
+                Runtime operation (detector and table transformer). Defaults to None.
+            inter_op_threads (int, optional): torch threads running independent
+                operations. Defaults to None.
+            ocr_threads (int, optional): torch threads used by easyocr.
+                Defaults to None which uses intra_op_threads.
+            num_workers (int, optional): extraction processes on the node. Defaults to 1.
+            cpu_affinity (optional): AFFINITY_NONE, AFFINITY_AUTO to give every
+                worker its own equal share of the cpus, or a list with the list
+                of cpus of every worker. Defaults to AFFINITY_NONE.
+        """
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.ocr_threads = ocr_threads if ocr_threads is not None else intra_op_threads
+        self.num_workers = max(int(num_workers), 1)
+        self.cpu_affinity = cpu_affinity
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    @classmethod
+    def for_workers(cls,
+                    num_workers : int,
+                    intra_op_threads = None,
+                    inter_op_threads = None,
+                    ocr_threads = None,
+                    cpu_affinity = AFFINITY_NONE):
+        """returns a config splitting the cpus of the node evenly between
+        num_workers processes, the thread counts which are not given are
+        derived from the share of each worker
+        """
+        num_workers = max(int(num_workers), 1)
+        cpus_per_worker = max(len(get_available_cpus()) // num_workers, 1)
+
+        return cls(intra_op_threads=intra_op_threads if intra_op_threads is not None else cpus_per_worker,
+                   inter_op_threads=inter_op_threads if inter_op_threads is not None else 1,
+                   ocr_threads=ocr_threads,
+                   num_workers=num_workers,
+                   cpu_affinity=cpu_affinity)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def to_dict(self) -> dict:
+
+        return {'intra_op_threads' : self.intra_op_threads,
+                'inter_op_threads' : self.inter_op_threads,
+                'ocr_threads' : self.ocr_threads,
+                'num_workers' : self.num_workers,
+                'cpu_affinity' : self.cpu_affinity}
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_worker_cpus(self,
+                        worker_index : int) -> list:
+        """returns the cpus the worker is pinned to, None when it is not pinned
+
+        Args:
+            worker_index (int): index of the worker, wraps around num_workers
+        """
+        if self.cpu_affinity is None or self.cpu_affinity == AFFINITY_NONE:
+            return None
+
+        worker_index = worker_index % self.num_workers
+
+        if self.cpu_affinity == AFFINITY_AUTO:
+            cpus = get_available_cpus()
+            cpus_per_worker = max(len(cpus) // self.num_workers, 1)
+            start = (worker_index * cpus_per_worker) % len(cpus)
+            return cpus[start:start + cpus_per_worker]
+
+        return list(self.cpu_affinity[worker_index % len(self.cpu_affinity)])
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def set_worker_affinity(self,
+                            worker_index : int) -> None:
+        """pins the calling process to the cpus of the worker, called once by
+        every worker process before the models are loaded
+        """
+        cpus = self.get_worker_cpus(worker_index)
+
+        if cpus is not None and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cpus)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def apply(self) -> None:
+        """sets the thread counts of torch and OpenCV in the calling process,
+        called by the ExtractedDocumentGenerator before it loads the models
+        """
+        if self.intra_op_threads is not None:
+            # read by thread pools which have not started yet (e.g. the
+            # OpenMP pool of a library imported later)
+            for env_var in THREAD_ENV_VARS:
+                os.environ[env_var] = str(self.intra_op_threads)
+
+        import torch
+
+        if self.intra_op_threads is not None:
+            torch.set_num_threads(self.intra_op_threads)
+
+        if self.inter_op_threads is not None:
+            try:
+                torch.set_interop_threads(self.inter_op_threads)
+            except RuntimeError:
+                # the inter-op pool can only be sized once, before it is used,
+                # a second generator in the same process keeps the first size
+                pass
+
+        # easyocr prepares the images with OpenCV which has its own pool
+        if self.ocr_threads is not None:
+            try:
+                import cv2
+                cv2.setNumThreads(self.ocr_threads)
+            except ImportError:
+                pass
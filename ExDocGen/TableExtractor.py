@@ -1,15 +1,59 @@
 
-import easyocr
-import torch
-from transformers import TableTransformerForObjectDetection, DetrFeatureExtractor
+import time
+
 from PIL import Image, ImageDraw
 import numpy as np
 
 from pprint import pprint
 
+from .Metrics import NULL_METRICS
+from .RuntimeConfig import torch_threads
+from .OcrCache import to_grey, is_blank_cell, get_cell_key
+
+ # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+TABLE_STRUCTURE_MODEL = "microsoft/table-structure-recognition-v1.1-all"
+
+# eager runs the models as they are loaded. optimized runs the table
+# transformer with int8 linear layers and reads single line cells with the
+# easyocr recognizer only, skipping its text detection network
+TABLE_BACKEND_EAGER = 'eager'
+TABLE_BACKEND_OPTIMIZED = 'optimized'
+TABLE_BACKENDS = [TABLE_BACKEND_EAGER, TABLE_BACKEND_OPTIMIZED]
+
+# resolution the table images are rendered at unless told otherwise
+DEFAULT_TABLE_DPI = 300
+
+# cells up to this height hold a single line of text, two lines of 10pt text
+# need about 24 points
+MAX_SINGLE_LINE_CELL_POINTS = 23
+
+# rows, columns and cell size (pixels) of the synthetic warm-up table
+WARM_UP_TABLE_SHAPE = (6, 4)
+WARM_UP_CELL_SIZE = (60, 160)
+
+ # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def table_to_text(table : list) -> str:
+    """joins the cells of a table (list of rows of cell strings) into a
+    single string, every non empty cell ends with a full stop
+    """
+    table_text = ''
+    for row in table:
+        for cell in row:
+            if len(cell) > 0:
+                table_text += cell
+                
+                if table_text[-1] != '.':
+                    table_text += '. '
+    
+    return table_text
+
  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 def box_cxcywh_to_xyxy(x):
+    import torch
+
     x_c, y_c, w, h = x.unbind(-1)
     b = [(x_c - 0.5 * w), (y_c - 0.5 * h), (x_c + 0.5 * w), (y_c + 0.5 * h)]
     return torch.stack(b, dim=1)
@@ -17,6 +61,8 @@ def box_cxcywh_to_xyxy(x):
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 def rescale_bboxes(out_bbox, size):
+    import torch
+
     img_h, img_w, _ = size
     b = box_cxcywh_to_xyxy(out_bbox)
     b = b * torch.tensor([img_w, img_h, img_w, img_h], dtype=torch.float32)
@@ -79,46 +125,166 @@ def get_cell_coordinates_by_row(table_data):
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
+def create_warm_up_table() -> tuple:
+    """draws a synthetic ruled table with a number in every cell, the
+    input of TableExtractor.warm_up
+
+    Returns:
+        tuple: (table image (np.array), bounding box of the first body cell)
+    """
+    num_rows, num_columns = WARM_UP_TABLE_SHAPE
+    cell_height, cell_width = WARM_UP_CELL_SIZE
+
+    img = Image.new('RGB', (num_columns * cell_width + 1, num_rows * cell_height + 1), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+
+    for row_num in range(num_rows):
+        for column_num in range(num_columns):
+            x0, y0 = column_num * cell_width, row_num * cell_height
+            draw.rectangle([(x0, y0), (x0 + cell_width, y0 + cell_height)], outline=(0, 0, 0))
+            draw.text((x0 + 20, y0 + cell_height // 3), f'{row_num * 1000 + column_num * 17:,}', fill=(0, 0, 0))
+
+    return np.array(img), (0, cell_height, cell_width, 2 * cell_height)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
 class TableExtractor:
 
-    def __init__(self):
-        self.table_transformer = TableTransformerForObjectDetection.from_pretrained("microsoft/table-structure-recognition-v1.1-all")
-        self.reader = easyocr.Reader(['en']) 
+    def __init__(self,
+                 backend = TABLE_BACKEND_EAGER,
+                 ocr_threads = None,
+                 ocr_cache = None):
+        """
+        Args:
+            backend (str, optional): TABLE_BACKEND_EAGER or TABLE_BACKEND_OPTIMIZED.
+                Defaults to TABLE_BACKEND_EAGER.
+            ocr_threads (int, optional): torch threads used by easyocr.
+                Defaults to None which uses the threads of the process.
+            ocr_cache (OcrCache, optional): cache of the text of cell crops.
+                Defaults to None which reads every cell.
+        """
+        if backend not in TABLE_BACKENDS:
+            raise ValueError(f'unknown table backend {backend}')
+
+        # imported here so the scripts which only need the names of the
+        # backends, and the processes they spawn, do not load torch
+        import easyocr
+        import torch
+        from transformers import TableTransformerForObjectDetection, DetrFeatureExtractor
+
+        self.backend = backend
+        self.ocr_threads = ocr_threads
+        self.ocr_cache = ocr_cache
+
+        self.table_transformer = TableTransformerForObjectDetection.from_pretrained(TABLE_STRUCTURE_MODEL)
+        self.table_transformer.eval()
+
+        # the feature extractor has no state, one is enough for every table
+        self.feature_extractor = DetrFeatureExtractor()
+
+        if backend == TABLE_BACKEND_OPTIMIZED:
+            # the encoder/decoder of the table transformer is mostly linear
+            # layers, they run with int8 weights and dynamically quantized
+            # activations. The convolutional backbone stays in fp32
+            self.table_transformer = torch.ao.quantization.quantize_dynamic(self.table_transformer,
+                                                                            {torch.nn.Linear},
+                                                                            dtype=torch.qint8)
+
+        # on the cpu easyocr runs its detector and recognizer with dynamically
+        # quantized (int8) LSTM and linear layers
+        self.reader = easyocr.Reader(['en'], quantize=True)
     
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def warm_up(self,
+                metrics = NULL_METRICS) -> None:
+        """runs the table transformer and the OCR over a synthetic table
+        once, the way extract_table does but without the OCR cache, so the
+        first real table does not pay for the first calls of the models
+
+        Args:
+            metrics (DocumentMetrics, optional): the table_structure and ocr
+                times of the run are added to it. Defaults to NULL_METRICS.
+        """
+        import torch
+
+        image, cell_bbox = create_warm_up_table()
+
+        with metrics.time('table_structure'):
+            encoding = self.feature_extractor(image, return_tensors="pt")
+
+            with torch.inference_mode():
+                self.table_transformer(**encoding)
+
+        cell_image = np.array(Image.fromarray(image).crop(cell_bbox))
+
+        # both ways the optimized backend reads a cell
+        self._read_text(cell_image, to_grey(cell_image), metrics, cell_image.shape[0])
+        if self.backend == TABLE_BACKEND_OPTIMIZED:
+            self._read_text(cell_image, to_grey(cell_image), metrics, 0)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         
     def extract_table(self, 
-                      image):
-        
-        feature_extractor = DetrFeatureExtractor()
-        encoding = feature_extractor(image, return_tensors="pt")
-        
-        with torch.no_grad():
-            tables = self.table_transformer(**encoding)
+                      image,
+                      metrics = NULL_METRICS,
+                      ocr_image = None,
+                      ocr_dpi = DEFAULT_TABLE_DPI):
+        """recognises the structure of a table and reads the text of its cells
+
+        Args:
+            image (np.array): table image the structure is recognised on
+            metrics (DocumentMetrics, optional): Defaults to NULL_METRICS.
+            ocr_image (np.array, optional): the same table at a (higher)
+                resolution the cells are read on. Defaults to None which
+                reads the cells on image.
+            ocr_dpi (int, optional): resolution of the image the cells are
+                read on. Defaults to DEFAULT_TABLE_DPI.
+
+        Returns:
+            list: rows of cell strings
+        """
+        import torch
+
+        if ocr_image is None:
+            ocr_image = image
 
-        structure_id2label = self.table_transformer.config.id2label
+        with metrics.time('table_structure'):
+            encoding = self.feature_extractor(image, return_tensors="pt")
+            
+            with torch.inference_mode():
+                tables = self.table_transformer(**encoding)
+
+        structure_id2label = dict(self.table_transformer.config.id2label)
         structure_id2label[len(structure_id2label)] = "no object"
         
         table = outputs_to_objects(tables, 
                                    image.shape, 
                                    structure_id2label)
         
-        self._annotate_image(image, table)
-        
         cell_coordinates = get_cell_coordinates_by_row(table)
         
-        img = Image.fromarray(image)
+        img = Image.fromarray(ocr_image)
+
+        # the cells are found on the structure image and read on the ocr image
+        scale_x = ocr_image.shape[1] / image.shape[1]
+        scale_y = ocr_image.shape[0] / image.shape[0]
+        max_single_line_height = MAX_SINGLE_LINE_CELL_POINTS * ocr_dpi / 72.
         
         table_text = []
         
         for row in cell_coordinates:
             row_text = []
             for cell in row["cells"]:
-                cell_bbox = cell["cell"]
-                cell_text = self.read_text_from_rectangle(img, cell_bbox)
+                x0, y0, x1, y1 = cell["cell"]
+                cell_bbox = (x0 * scale_x, y0 * scale_y, x1 * scale_x, y1 * scale_y)
+                cell_text = self.read_text_from_rectangle(img, cell_bbox, metrics, max_single_line_height)
                 row_text.append(cell_text)
             
             table_text.append(row_text)
+
+        if self.ocr_cache is not None:
+            self.ocr_cache.flush()
                       
         return table_text
    
@@ -126,14 +292,61 @@ class TableExtractor:
     
     def read_text_from_rectangle(self,
                                  image, 
-                                 rectangle):        
+                                 rectangle,
+                                 metrics = NULL_METRICS,
+                                 max_single_line_height = MAX_SINGLE_LINE_CELL_POINTS * DEFAULT_TABLE_DPI / 72.):        
                 
         # Crop the image to the specified rectangle
         # Rectangle format: (x_min, y_min, x_max, y_max)
-        cropped_image = image.crop(rectangle)
-                
+        cropped_image = np.array(image.crop(rectangle))
+        cell_grey = to_grey(cropped_image) if cropped_image.size > 0 else cropped_image
+
+        # empty cells are common in statistical tables, there is nothing to read
+        if is_blank_cell(cell_grey):
+            metrics.increment('ocr_blank_cells')
+            return ''
+
+        if self.ocr_cache is None:
+            return self._read_text(cropped_image, cell_grey, metrics, max_single_line_height)
+
+        # the optimized backend reads single line cells another way, the
+        # text of a cell depends on it
+        namespace = self.backend
+        if self.backend == TABLE_BACKEND_OPTIMIZED:
+            namespace += ':line' if cell_grey.shape[0] <= max_single_line_height else ':block'
+
+        key = get_cell_key(cell_grey, namespace)
+
+        entry = self.ocr_cache.get(key)
+        if entry is not None:
+            text, seconds = entry
+            metrics.increment('ocr_cache_hits')
+            metrics.add_time('ocr_saved', seconds)
+            return text
+
+        start_time = time.perf_counter()
+        text = self._read_text(cropped_image, cell_grey, metrics, max_single_line_height)
+        self.ocr_cache.put(key, text, time.perf_counter() - start_time)
+        metrics.increment('ocr_cache_misses')
+
+        return text
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _read_text(self,
+                   cell_image : np.array,
+                   cell_grey : np.array,
+                   metrics,
+                   max_single_line_height : float) -> str:
+        """runs the OCR over a (non blank) cell and joins the text it reads"""
+
         # Read text from the cropped image
-        results = self.reader.readtext(np.array(cropped_image))
+        with metrics.time('ocr'), torch_threads(self.ocr_threads):
+            if self.backend == TABLE_BACKEND_OPTIMIZED:
+                results = self._read_cell(cell_image, cell_grey, max_single_line_height)
+            else:
+                results = self.reader.readtext(cell_image)
+        metrics.increment('ocr_calls')
         
         # Extracting text from the results
         text_list = [result[1] for result in results]
@@ -144,11 +357,32 @@ class TableExtractor:
         return text
     
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _read_cell(self,
+                   cell_image : np.array,
+                   cell_grey : np.array,
+                   max_single_line_height : float) -> list:
+        """reads a cell like easyocr.Reader.readtext, single line cells are
+        passed to the recognizer as one text box instead of running the text
+        detector over them first
+        """
+        if cell_grey.shape[0] > max_single_line_height:
+            return self.reader.readtext(cell_image)
+
+        height, width = cell_grey.shape
+        return self.reader.recognize(cell_grey,
+                                     horizontal_list=[[0, width, 0, height]],
+                                     free_list=[])
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     
     def _annotate_image(self, 
                         image, 
-                        table):
-        
+                        table,
+                        file_path : str):
+        """debugging aid, saves the table image with the recognised columns
+        drawn on it to file_path
+        """
         colours =   {   'table column' :(255,0,0), 
                         'table row' : (0,255,0), 
                         'table column header' : (0,0,255), 
@@ -172,6 +406,6 @@ class TableExtractor:
                 
             img1.rectangle([(x0,y0),(x1,y1)], outline = color)
 
-        img.save('annotated_image.png')
+        img.save(file_path)
         
      # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
\ No newline at end of file
@@ -0,0 +1,118 @@
+import fitz
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+POINTS_PER_INCH = 72.
+
+# DetrFeatureExtractor resizes an image so its short side is 800 pixels
+# without the long side going over 1333 pixels, rendering the table any
+# larger only costs time
+STRUCTURE_SHORT_SIDE_PX = 800
+STRUCTURE_LONG_SIDE_PX = 1333
+
+DEFAULT_MIN_DPI = 72
+DEFAULT_MAX_DPI = 300
+
+# height in pixels the body text of a table is rendered at for easyocr, text
+# of 10pt is then rendered at about 230 dpi and text of 7pt or less at 300 dpi
+DEFAULT_OCR_TEXT_HEIGHT_PX = 32
+
+# the small text of a table decides the OCR resolution, the smallest sizes
+# (superscripts, footnote markers) are ignored
+FONT_SIZE_PERCENTILE = 0.1
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def estimate_font_size(fitz_page : fitz.Page,
+                       rect : fitz.Rect) -> float:
+    """estimates the size of the small text inside rect from the text layer
+    of the page
+
+    Args:
+        fitz_page (fitz.Page): page holding the table
+        rect (fitz.Rect): extents of the table
+
+    Returns:
+        float: font size in points, None when there is no text in the text
+            layer (e.g. scanned pages)
+    """
+    font_sizes = []
+
+    for block in fitz_page.get_text('dict', clip=rect)['blocks']:
+        for line in block.get('lines', []):
+            for span in line['spans']:
+                num_chars = len(span['text'].strip())
+                if num_chars > 0:
+                    # every character counts so long cells weigh more than markers
+                    font_sizes.extend([span['size']] * num_chars)
+
+    if len(font_sizes) == 0:
+        return None
+
+    font_sizes.sort()
+    return font_sizes[int(FONT_SIZE_PERCENTILE * (len(font_sizes) - 1))]
+
+# =============================================================================
+
+class TableResolution:
+    """Chooses the resolutions a table is rendered at. The table structure is
+    recognised on an image no larger than the table transformer uses, and
+    the cells are read on an image with a resolution chosen from the font
+    size of the table, so large tables of normal size text are rendered at
+    less than the fixed 300 dpi and only tables of small text keep it.
+    """
+
+    def __init__(self,
+                 min_dpi = DEFAULT_MIN_DPI,
+                 max_dpi = DEFAULT_MAX_DPI,
+                 ocr_text_height_px = DEFAULT_OCR_TEXT_HEIGHT_PX):
+
+        self.min_dpi = min_dpi
+        self.max_dpi = max_dpi
+        self.ocr_text_height_px = ocr_text_height_px
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _clamp(self,
+               dpi : float) -> int:
+        return int(min(max(dpi, self.min_dpi), self.max_dpi))
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_structure_dpi(self,
+                          rect : fitz.Rect) -> int:
+        """returns the dpi at which the table matches the input size of the
+        table transformer
+        """
+        short_side = max(min(rect.width, rect.height), 1.)
+        long_side = max(rect.width, rect.height, 1.)
+
+        pixels_per_point = min(STRUCTURE_SHORT_SIDE_PX / short_side,
+                               STRUCTURE_LONG_SIDE_PX / long_side)
+
+        return self._clamp(pixels_per_point * POINTS_PER_INCH)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_ocr_dpi(self,
+                    font_size : float) -> int:
+        """returns the dpi at which text of font_size points is rendered
+        ocr_text_height_px high, max_dpi when the font size is unknown
+        """
+        if font_size is None or font_size <= 0:
+            return self.max_dpi
+
+        return self._clamp(self.ocr_text_height_px / font_size * POINTS_PER_INCH)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_table_dpis(self,
+                       fitz_page : fitz.Page,
+                       rect : fitz.Rect) -> tuple:
+        """returns the (structure dpi, ocr dpi) of a table. The structure is
+        never rendered at a higher resolution than the text.
+        """
+        ocr_dpi = self.get_ocr_dpi(estimate_font_size(fitz_page, rect))
+        structure_dpi = min(self.get_structure_dpi(rect), ocr_dpi)
+
+        return structure_dpi, ocr_dpi
@@ -0,0 +1,435 @@
+import re
+
+import fitz
+import numpy as np
+
+from .BoundingBox import LABEL_DICT
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# where the layout of a page comes from: the detector (the default), the text
+# layer of the pdf only, or the text layer with the detector for the pages it
+# is not sure about
+LAYOUT_DETECTOR = 'detector'
+LAYOUT_TEXT = 'text'
+LAYOUT_AUTO = 'auto'
+LAYOUT_MODES = [LAYOUT_DETECTOR, LAYOUT_TEXT, LAYOUT_AUTO]
+
+# fractions of the page height holding the running headers and footers
+DEFAULT_HEADER_BAND = 0.08
+DEFAULT_FOOTER_BAND = 0.08
+
+# font sizes relative to the body text size of the page
+DEFAULT_TITLE_SIZE_RATIO = 1.6
+DEFAULT_HEADING_SIZE_RATIO = 1.12
+DEFAULT_FOOTNOTE_SIZE_RATIO = 0.9
+
+# blocks with this fraction of digits (of their non blank characters) are
+# parts of tables
+DEFAULT_TABLE_DIGIT_FRACTION = 0.4
+
+# below this (text weighted) confidence LAYOUT_AUTO detects the page
+DEFAULT_MIN_PAGE_CONFIDENCE = 0.7
+
+# longest text of a heading, title, header or footer
+MAX_HEADING_CHARS = 150
+
+# images smaller than this fraction of the page are left out (logos, rules)
+MIN_PICTURE_AREA = 0.01
+
+# table parts closer than this many body text lines are one table
+TABLE_JOIN_LINES = 2.5
+
+# lines whose middles are this close (in points) are on the same row, a
+# block of TABLE_MIN_ROWS rows with TABLE_LINES_PER_ROW lines on each is a
+# table
+ROW_TOLERANCE = 2.
+TABLE_MIN_ROWS = 3
+TABLE_LINES_PER_ROW = 1.5
+
+IMAGE_BLOCK = 1
+
+BOLD_FLAG = 16
+
+BULLET_PATTERN = re.compile(r'^\s*([•●▪◦‣–—\-\*·]|'
+                            r'\(?[0-9]{1,3}[.)]|\(?[a-zA-Z][.)]|\(?[ivxIVX]{1,4}[.)])(\s+|$)')
+CAPTION_PATTERN = re.compile(r'^\s*(Table|Figure|Fig\.|Chart|Graph|Exhibit|Map)\s*[0-9IVXA-Z]', re.IGNORECASE)
+MATH_FONT_PATTERN = re.compile(r'CMMI|CMSY|CMEX|MSBM|Math|Symbol', re.IGNORECASE)
+
+# confidence of a block of every rule
+CONFIDENCE_CERTAIN = 0.9
+CONFIDENCE_LIKELY = 0.8
+CONFIDENCE_GUESS = 0.6
+CONFIDENCE_UNSURE = 0.4
+
+LABEL_CLASSES = {label : int(class_id) for class_id, label in LABEL_DICT.items()}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class TextLayoutConfig:
+    """Settings of the layout found from the text layer of a pdf instead of
+    the detector. Every text block of fitz get_text('dict') is labelled from
+    its spans:
+
+        - Page-header / Page-footer: short blocks in the header_band or
+          footer_band at the top or bottom of the page
+        - Caption: blocks starting with 'Table 1', 'Figure 2' ...
+        - List-item: lines starting with a bullet, number or letter
+        - Table: blocks with table_digit_fraction digits or with their lines
+          in columns, with the blocks between them
+        - Title: short blocks title_size_ratio times the body text size
+        - Section-header: short bold blocks or blocks heading_size_ratio
+          times the body text size
+        - Footnote: small text in the lower half of the page
+        - Formula: blocks mostly set in math fonts
+        - Text: everything else
+
+    and images larger than MIN_PICTURE_AREA of the page are Pictures. Every
+    block gets the confidence of its rule, the confidence of a page is the
+    mean over its blocks weighted by their characters, LAYOUT_AUTO detects
+    the pages below min_page_confidence and the pages without text.
+    """
+
+    def __init__(self,
+                 header_band = DEFAULT_HEADER_BAND,
+                 footer_band = DEFAULT_FOOTER_BAND,
+                 title_size_ratio = DEFAULT_TITLE_SIZE_RATIO,
+                 heading_size_ratio = DEFAULT_HEADING_SIZE_RATIO,
+                 footnote_size_ratio = DEFAULT_FOOTNOTE_SIZE_RATIO,
+                 table_digit_fraction = DEFAULT_TABLE_DIGIT_FRACTION,
+                 min_page_confidence = DEFAULT_MIN_PAGE_CONFIDENCE):
+
+        self.header_band = header_band
+        self.footer_band = footer_band
+        self.title_size_ratio = title_size_ratio
+        self.heading_size_ratio = heading_size_ratio
+        self.footnote_size_ratio = footnote_size_ratio
+        self.table_digit_fraction = table_digit_fraction
+        self.min_page_confidence = min_page_confidence
+
+# =============================================================================
+
+class _TextBlock:
+    """The text, size and lines of a block of get_text('dict')"""
+
+    def __init__(self,
+                 lines : list):
+
+        self.lines = lines
+        self.bbox = fitz.Rect(min(line['bbox'][0] for line in lines), min(line['bbox'][1] for line in lines),
+                              max(line['bbox'][2] for line in lines), max(line['bbox'][3] for line in lines))
+
+        self.line_texts = [''.join(span['text'] for span in line['spans']).strip() for line in lines]
+        self.text = ' '.join(text for text in self.line_texts if text != '')
+
+        # the sizes and fonts weighted by the characters set in them
+        self.num_chars = 0
+        size_sum = bold_chars = math_chars = 0.
+        for line in lines:
+            for span in line['spans']:
+                num_chars = len(span['text'].strip())
+                self.num_chars += num_chars
+                size_sum += num_chars * span['size']
+                if span['flags'] & BOLD_FLAG or 'bold' in span['font'].lower():
+                    bold_chars += num_chars
+                if MATH_FONT_PATTERN.search(span['font']):
+                    math_chars += num_chars
+
+        self.size = size_sum / max(self.num_chars, 1)
+        self.bold = bold_chars / max(self.num_chars, 1)
+        self.math = math_chars / max(self.num_chars, 1)
+
+        non_blank = self.text.replace(' ', '')
+        self.digits = sum(char.isdigit() for char in non_blank) / max(len(non_blank), 1)
+
+        # lines side by side in a block are the cells of a table
+        rows = []
+        for line in lines:
+            middle = (line['bbox'][1] + line['bbox'][3]) / 2.
+            if not any(abs(middle - row) <= ROW_TOLERANCE for row in rows):
+                rows.append(middle)
+        self.num_rows = len(rows)
+        self.lines_per_row = len(lines) / max(len(rows), 1)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _get_body_size(blocks : list) -> float:
+    """returns the font size most of the characters of the page are set in"""
+
+    sizes = {}
+    for block in blocks:
+        for line in block.lines:
+            for span in line['spans']:
+                size = round(span['size'] * 2.) / 2.
+                sizes[size] = sizes.get(size, 0) + len(span['text'].strip())
+
+    if len(sizes) == 0:
+        return 0.
+
+    return max(sizes, key=sizes.get)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _split_list_items(block : _TextBlock) -> list:
+    """returns the blocks of the list items of a block, a line starting with
+    a bullet starts an item and the lines after it continue it
+    """
+    items = []
+
+    for line, line_text in zip(block.lines, block.line_texts):
+        if len(items) == 0 or BULLET_PATTERN.match(line_text):
+            items.append([line])
+        else:
+            items[-1].append(line)
+
+    return [_TextBlock(lines) for lines in items]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _classify_block(block : _TextBlock,
+                    body_size : float,
+                    max_size : float,
+                    page_rect : fitz.Rect,
+                    config : TextLayoutConfig) -> list:
+    """returns the (bbox, label, confidence, characters) of the block, or of
+    its list items
+    """
+    height = page_rect.height
+    num_lines = len([text for text in block.line_texts if text != ''])
+    is_short = num_lines <= 2 and len(block.text) <= MAX_HEADING_CHARS
+    relative_size = block.size / body_size if body_size > 0 else 1.
+
+    if block.bbox.y1 <= page_rect.y0 + height * config.header_band and is_short:
+        return [(block.bbox, 'Page-header', CONFIDENCE_CERTAIN, block.num_chars)]
+
+    if block.bbox.y0 >= page_rect.y1 - height * config.footer_band and is_short:
+        return [(block.bbox, 'Page-footer', CONFIDENCE_CERTAIN, block.num_chars)]
+
+    if CAPTION_PATTERN.match(block.text) and num_lines <= 3:
+        return [(block.bbox, 'Caption', CONFIDENCE_LIKELY, block.num_chars)]
+
+    if BULLET_PATTERN.match(block.line_texts[0]) and not (num_lines == 1 and block.digits >= config.table_digit_fraction):
+        return [(item.bbox, 'List-item', CONFIDENCE_LIKELY, item.num_chars) for item in _split_list_items(block)]
+
+    if block.num_rows >= TABLE_MIN_ROWS and block.lines_per_row >= TABLE_LINES_PER_ROW:
+        return [(block.bbox, 'Table', CONFIDENCE_LIKELY, block.num_chars)]
+
+    if block.digits >= config.table_digit_fraction:
+        return [(block.bbox, 'Table', CONFIDENCE_GUESS, block.num_chars)]
+
+    if block.math >= 0.3:
+        return [(block.bbox, 'Formula', CONFIDENCE_GUESS, block.num_chars)]
+
+    if relative_size >= config.title_size_ratio and num_lines <= 3:
+        # the largest text of the page is the title, other large text heads
+        # a section
+        if block.size >= max_size - 0.5:
+            return [(block.bbox, 'Title', CONFIDENCE_LIKELY, block.num_chars)]
+        return [(block.bbox, 'Section-header', CONFIDENCE_LIKELY, block.num_chars)]
+
+    if is_short and not block.text.endswith('.') and (relative_size >= config.heading_size_ratio or
+                                                      (block.bold >= 0.8 and relative_size >= 0.95)):
+        return [(block.bbox, 'Section-header', CONFIDENCE_LIKELY, block.num_chars)]
+
+    if relative_size <= config.footnote_size_ratio and block.bbox.y0 >= page_rect.y0 + height * 0.5:
+        return [(block.bbox, 'Footnote', CONFIDENCE_GUESS, block.num_chars)]
+
+    # body text set in the body size is the easy case, short blocks in
+    # other sizes could be anything
+    if abs(relative_size - 1.) <= 0.1:
+        return [(block.bbox, 'Text', CONFIDENCE_CERTAIN if num_lines >= 2 else CONFIDENCE_LIKELY, block.num_chars)]
+
+    return [(block.bbox, 'Text', CONFIDENCE_GUESS if num_lines >= 2 else CONFIDENCE_UNSURE, block.num_chars)]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _absorb_items(items : list,
+                  containers : list,
+                  confidence = None) -> tuple:
+    """adds the items whose middle is inside a container to it
+
+    Args:
+        items (list): (bbox, label, confidence, characters) of the blocks
+        containers (list): (bbox, label, confidence, characters) of the
+            tables or pictures
+        confidence (float, optional): confidence of a container holding
+            items. Defaults to None which keeps the confidence.
+
+    Returns:
+        tuple: the items outside of every container and the containers
+    """
+    containers = list(containers)
+    outside_items = []
+
+    for item in items:
+        x = (item[0].x0 + item[0].x1) / 2.
+        y = (item[0].y0 + item[0].y1) / 2.
+        container_num = next((container_num for container_num, container in enumerate(containers)
+                              if container[0].x0 <= x < container[0].x1 and container[0].y0 <= y < container[0].y1), None)
+
+        if container_num is None:
+            outside_items.append(item)
+            continue
+
+        rect, label, container_confidence, num_chars = containers[container_num]
+        if confidence is not None:
+            container_confidence = min(container_confidence, confidence)
+        containers[container_num] = (rect, label, container_confidence, num_chars + item[3])
+
+    return outside_items, containers
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _join_tables(items : list,
+                 body_size : float) -> list:
+    """joins the table parts (usually a block per cell or column) which are
+    close to each other into tables, the other blocks inside a table are its
+    row labels and headers. A single table part of a line or two is a number
+    in the text rather than a table.
+    """
+    join_distance = TABLE_JOIN_LINES * max(body_size, 1.)
+
+    tables = []
+    for bbox, label, confidence, num_chars in items:
+        if label != 'Table':
+            continue
+
+        rect = fitz.Rect(bbox)
+        joined = [table for table in tables
+                  if fitz.Rect(table[0].x0 - join_distance, table[0].y0 - join_distance,
+                               table[0].x1 + join_distance, table[0].y1 + join_distance).intersects(rect)]
+
+        for table in joined:
+            rect |= table[0]
+            num_chars += table[2]
+            confidence = max(confidence, table[3])
+            tables.remove(table)
+
+        tables.append((rect, 1 + sum(table[1] for table in joined), num_chars, confidence))
+
+    table_items = []
+    other_items = [item for item in items if item[1] != 'Table']
+    for rect, num_parts, num_chars, confidence in tables:
+        if num_parts == 1 and rect.height < 3 * max(body_size, 1.):
+            other_items.append((rect, 'Text', CONFIDENCE_UNSURE, num_chars))
+        else:
+            table_items.append((rect, 'Table', CONFIDENCE_LIKELY if num_parts >= 4 or confidence == CONFIDENCE_LIKELY
+                                               else CONFIDENCE_GUESS, num_chars))
+
+    # the row labels and headers
+    other_items, table_items = _absorb_items(other_items, table_items)
+
+    return other_items + table_items
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _absorb_nested_items(items : list) -> list:
+    """adds the items whose middle is inside a larger item to it, e.g. a
+    line PyMuPDF put in a block of its own inside another block
+    """
+    outer_items = []
+
+    for item in sorted(items, key=lambda item: -item[0].get_area()):
+        _, outer_items = _absorb_items([item], outer_items)
+        if len(_) > 0:
+            outer_items.append(item)
+
+    return outer_items
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _separate_boxes(boxes : np.array) -> None:
+    """moves the touching or overlapping edges of the boxes apart, so that
+    generate_bounding_boxes (which works on whole points) does not drop any
+    of them as an overlap. The overlap is split in the middle, a box inside
+    another is left to generate_bounding_boxes.
+    """
+    for i in range(len(boxes)):
+        for j in range(i + 1, len(boxes)):
+            a, b = boxes[i], boxes[j]
+
+            overlap_x = min(a[2], b[2]) - max(a[0], b[0])
+            overlap_y = min(a[3], b[3]) - max(a[1], b[1])
+
+            if overlap_x < -1. or overlap_y < -1.:
+                continue
+
+            upper, lower = (a, b) if a[1] + a[3] <= b[1] + b[3] else (b, a)
+            left, right = (a, b) if a[0] + a[2] <= b[0] + b[2] else (b, a)
+
+            # blocks are stacked more often than side by side
+            if overlap_y <= overlap_x:
+                middle = (upper[3] + lower[1]) / 2.
+                if upper[1] < middle - 1.5 and lower[3] > middle + 1.5:
+                    upper[3] = min(upper[3], middle - 0.5)
+                    lower[1] = max(lower[1], middle + 0.5)
+            else:
+                middle = (left[2] + right[0]) / 2.
+                if left[0] < middle - 1.5 and right[2] > middle + 1.5:
+                    left[2] = min(left[2], middle - 0.5)
+                    right[0] = max(right[0], middle + 0.5)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def classify_page(fitz_page : fitz.Page,
+                  config : TextLayoutConfig = None) -> tuple:
+    """finds the blocks of a page from its text layer
+
+    Args:
+        fitz_page (fitz.Page): the page
+        config (TextLayoutConfig, optional): Defaults to None which uses the
+            default settings.
+
+    Returns:
+        tuple: rows of [xmin, ymin, xmax, ymax, confidence, class] in page
+            points, like the detector output for a page rendered at 72 dpi,
+            and the confidence of the page (0 for a page without text)
+    """
+    if config is None:
+        config = TextLayoutConfig()
+
+    page_rect = fitz_page.rect
+    text_dict = fitz_page.get_text('dict')
+
+    blocks = []
+    image_blocks = []
+    for block in text_dict['blocks']:
+        if block['type'] == IMAGE_BLOCK:
+            image_blocks.append(block)
+            continue
+
+        lines = [line for line in block.get('lines', []) if any(span['text'].strip() != '' for span in line['spans'])]
+        if len(lines) > 0:
+            blocks.append(_TextBlock(lines))
+
+    body_size = _get_body_size(blocks)
+    max_size = max((block.size for block in blocks), default=0.)
+
+    items = []
+    for block in blocks:
+        items.extend(_classify_block(block, body_size, max_size, page_rect, config))
+
+    items = _join_tables(items, body_size)
+
+    pictures = []
+    for image_block in image_blocks:
+        bbox = fitz.Rect(image_block['bbox']) & page_rect
+        if not bbox.is_empty and bbox.get_area() >= MIN_PICTURE_AREA * page_rect.get_area():
+            pictures.append((bbox, 'Picture', CONFIDENCE_CERTAIN, 0))
+
+    # text on a picture labels a figure, or is set over a background image
+    # which the detector tells apart better
+    items, pictures = _absorb_items(items, pictures, CONFIDENCE_GUESS)
+    items = _absorb_nested_items(items) + pictures
+
+    confidence = 0.
+    if len(items) > 0:
+        confidence = float(np.average([item[2] for item in items], weights=[max(item[3], 1) for item in items]))
+
+    labels = np.array([[bbox.x0 - page_rect.x0, bbox.y0 - page_rect.y0, bbox.x1 - page_rect.x0, bbox.y1 - page_rect.y0,
+                        conf, LABEL_CLASSES[label]]
+                       for bbox, label, conf, _ in items], dtype=np.float32).reshape((-1, 6))
+
+    _separate_boxes(labels)
+
+    return labels, confidence
@@ -0,0 +1,143 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pysbd
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# pages whose text may be waiting in the pool before the extraction waits for
+# the oldest one, per post-processing worker
+PAGES_IN_FLIGHT_PER_WORKER = 4
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def clean_texts(original_texts : list) -> list:
+    """this function cleans the input list of strings by removing new lines and
+    non printable ascii characters
+
+    Args:
+        original_texts (list): list of strings which require cleaning
+
+    Returns:
+        list: list of cleaned strings
+    """
+    cleaned_texts = []
+
+    for text in original_texts:
+        if len(text) > 0:
+            cleaned_texts.append(clean_text(text))
+
+    return cleaned_texts
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def clean_text(original_text : str) -> str:
+    """this function returns cleaned version of the input string with new
+    lines and non printable ascii characters removed.
+
+    Args:
+        original_text (str): string which required cleaning
+
+    Returns:
+        str: cleaned string
+    """
+    cleaned_text = ''
+
+    for char in original_text:
+
+        # skip empty characters (not sure how that can happen but it does)
+        if len(char) == 0:
+            continue
+        
+        # replace newline character with space
+        if ord(char) == 10:
+                char = ' '
+
+        # only add printable ascii characters
+        if ord(char) > 31 and ord(char) < 127:
+            cleaned_text += char
+
+    return cleaned_text.strip()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def segment_text(text : str,
+                 segmenter = None) -> list:
+    """splits text into sentences with pysbd
+
+    Args:
+        text (str): cleaned text
+        segmenter (pysbd.Segmenter, optional): Defaults to None which
+            creates one.
+
+    Returns:
+        list: sentence strings
+    """
+    if segmenter is None:
+        segmenter = pysbd.Segmenter(language='en', clean=False)
+
+    return segmenter.segment(text)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+_worker_segmenter = None
+
+def _process_texts(raw_texts : list) -> list:
+    """runs in a post-processing worker, cleans and segments a chunk of raw
+    block texts and returns the sentences of every text
+    """
+    global _worker_segmenter
+    if _worker_segmenter is None:
+        _worker_segmenter = pysbd.Segmenter(language='en', clean=False)
+
+    return [segment_text(clean_text(raw_text), _worker_segmenter) for raw_text in raw_texts]
+
+# =============================================================================
+
+class PostProcessor:
+    """Process pool which cleans and segments the text of the blocks, so this
+    pure Python work runs next to the detector instead of holding the GIL of
+    the extraction thread. The texts of a page are sent as one chunk and the
+    sentences are returned in the same order.
+
+    The workers are started with spawn. Besides this module and pysbd every
+    worker imports the __main__ module of the program again: the scripts of
+    this repository only load torch and the models once they run, a program
+    which imports ExtractedDocumentGenerator at the top loads them in every
+    worker unless the import is under `if __name__ == '__main__':`. The
+    generator owning the pool stops it in ExtractedDocumentGenerator.close.
+    """
+
+    def __init__(self,
+                 num_workers : int):
+
+        self.num_workers = num_workers
+        self.executor = None
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    @property
+    def max_pages_in_flight(self) -> int:
+        return self.num_workers * PAGES_IN_FLIGHT_PER_WORKER
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def submit(self,
+               raw_texts : list):
+        """returns a future of the sentences of every text of raw_texts"""
+
+        # started on first use so a generator which never extracts (or is
+        # copied into a worker) does not start processes
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.num_workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+
+        return self.executor.submit(_process_texts, raw_texts)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def close(self) -> None:
+
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,856 @@
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import threading
+import multiprocessing
+
+from .RuntimeConfig import RuntimeConfig
+from .PageSelection import resolve_pages, split_pages
+from .BatchExtractor import get_output_path, get_output_settings, is_up_to_date, count_pages, merge_json_parts
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# a lease not renewed for lease_seconds is taken over by another worker, the
+# holder renews it every heartbeat_seconds
+DEFAULT_LEASE_SECONDS = 600.
+DEFAULT_HEARTBEAT_SECONDS = 60.
+
+# a task is given up after this many failed or expired attempts
+DEFAULT_MAX_ATTEMPTS = 3
+
+# how often an idle worker looks for work again
+DEFAULT_POLL_SECONDS = 10.
+
+TASK_EXTRACT = 'extract'
+TASK_MERGE = 'merge'
+
+# the layout of the queue directory
+QUEUE_FILE = 'queue.json'
+TASK_DIR = 'tasks'
+LEASE_DIR = 'leases'
+DONE_DIR = 'done'
+ATTEMPT_DIR = 'attempts'
+SHARD_DIR = 'shards'
+CLOCK_DIR = 'clock'
+QUEUE_DIRS = (TASK_DIR, LEASE_DIR, DONE_DIR, ATTEMPT_DIR, SHARD_DIR, CLOCK_DIR)
+
+JSON_EXTENSION = '.json'
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_document_id(pdf_file_path : str) -> str:
+    """returns the id of a document in the queue, the same on every node"""
+
+    return hashlib.sha1(os.path.abspath(pdf_file_path).encode('utf-8')).hexdigest()[:16]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_worker_id() -> str:
+    """returns an id for a worker unique across the nodes"""
+
+    return f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _write_json(file_path : str,
+                value) -> None:
+    """writes a JSON file all at once, readers never see half of it"""
+
+    tmp_file_path = f'{file_path}.{uuid.uuid4().hex}.tmp'
+
+    with open(tmp_file_path, 'w') as json_file:
+        json.dump(value, json_file)
+        json_file.flush()
+        os.fsync(json_file.fileno())
+
+    os.replace(tmp_file_path, file_path)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _read_json(file_path : str):
+
+    with open(file_path, 'r') as json_file:
+        return json.load(json_file)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _remove(file_path : str) -> None:
+
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+# =============================================================================
+
+class Lease:
+    """A task claimed by a worker, one generation of the leases of the task.
+    The lease file holds the token of the worker, and a worker whose lease
+    was taken over finds a lease of a later generation next to its own.
+    """
+
+    __slots__ = ('task', 'token', 'path', 'generation')
+
+    def __init__(self,
+                 task : dict,
+                 token : str,
+                 path : str,
+                 generation : int):
+
+        self.task = task
+        self.token = token
+        self.path = path
+        self.generation = generation
+
+# =============================================================================
+
+class WorkQueue:
+    """A queue of extraction tasks in a directory shared by the nodes (e.g.
+    on a network filesystem), needing nothing but the filesystem:
+
+        tasks/<id>.json             a document, a page range (shard) of a
+                                    document, or the merge of the shards
+        leases/<id>.<generation>    the worker running a task, created with
+                                    O_EXCL so only one worker claims a
+                                    generation, and kept alive by touching it
+                                    (heartbeat)
+        done/<id>.json              the result of a task, written after its
+                                    output
+        attempts/<id>.<generation>.json
+                                    failed attempts and the leases of
+                                    workers which stopped renewing them
+        shards/<id>.json            the output of a shard until the merge
+
+    A lease is expired when its file was not touched for lease_seconds. The
+    time is read from the filesystem (the mtime of a file just touched) so
+    the clocks of the nodes do not have to agree. An expired lease is taken
+    over by creating the lease of the next generation, only one worker can
+    create it, and the task is claimed again until it failed max_attempts
+    times. The expired lease itself is left alone, a worker which was only
+    slow finds the later generation and its output is not touched while it
+    may still be writing it.
+
+    Outputs are written to a file of their own and renamed over the target,
+    so a task run twice (a slow worker whose lease was taken over) commits
+    the same file twice and the first result in done/ is kept. The merge of a
+    split document is a task of its own, claimable once all of its shards are
+    done, and removes the shards only after the document is written.
+
+    The settings of the queue are kept in queue.json by the first WorkQueue
+    created on the directory, later ones read them.
+    """
+
+    def __init__(self,
+                 queue_dir : str,
+                 lease_seconds = DEFAULT_LEASE_SECONDS,
+                 max_attempts = DEFAULT_MAX_ATTEMPTS):
+
+        self.queue_dir = os.path.abspath(queue_dir)
+
+        for dir_name in QUEUE_DIRS:
+            os.makedirs(os.path.join(self.queue_dir, dir_name), exist_ok=True)
+
+        settings_path = os.path.join(self.queue_dir, QUEUE_FILE)
+        if not os.path.isfile(settings_path):
+            _write_json(settings_path, {'lease_seconds' : lease_seconds,
+                                        'max_attempts' : max_attempts})
+
+        settings = _read_json(settings_path)
+        self.lease_seconds = settings['lease_seconds']
+        self.max_attempts = settings['max_attempts']
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _path(self,
+              dir_name : str,
+              file_name : str) -> str:
+        return os.path.join(self.queue_dir, dir_name, file_name)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _list(self,
+              dir_name : str) -> list:
+        """returns the ids of the files in a queue directory"""
+
+        return [file_name.split('.')[0] for file_name in os.listdir(os.path.join(self.queue_dir, dir_name))
+                if not file_name.endswith('.tmp')]
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def get_time(self,
+                 worker_id : str) -> float:
+        """returns the time of the filesystem, which the lease times are in"""
+
+        clock_path = self._path(CLOCK_DIR, worker_id)
+        with open(clock_path, 'a'):
+            os.utime(clock_path)
+
+        return os.stat(clock_path).st_mtime
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _reset_task(self,
+                    task_id : str) -> None:
+
+        _remove(self._path(DONE_DIR, task_id + JSON_EXTENSION))
+
+        # the leases left behind by failed and taken over generations would
+        # be taken over again and cost the new task an attempt
+        for dir_name in (ATTEMPT_DIR, LEASE_DIR):
+            for file_name in os.listdir(os.path.join(self.queue_dir, dir_name)):
+                if file_name.split('.')[0] == task_id:
+                    _remove(self._path(dir_name, file_name))
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def submit(self,
+               pdf_file_paths : list,
+               output_dir : str,
+               include_pages = None,
+               include_labels = None,
+               pages_per_shard = None,
+               overwrite = False) -> dict:
+        """adds the tasks of the pdf files to the queue. A document whose
+        output is up to date is skipped, unless overwrite is given. A document
+        submitted again starts over.
+
+        Args:
+            pdf_file_paths (list): absolute paths of the pdfs, the same on
+                every node
+            output_dir (str): directory the JSON files are written to, the
+                same on every node
+            include_pages (optional): pages extracted from every document,
+                see PageSelection.resolve_pages. Defaults to None which
+                extracts every page.
+            include_labels (list, optional): labels to extract. Defaults to
+                None which extracts every block.
+            pages_per_shard (int, optional): documents with more selected
+                pages are split into shards of this many pages and merged
+                again. Defaults to None which keeps every document in one
+                task.
+            overwrite (bool, optional): submit documents whose output is up
+                to date. Defaults to False.
+
+        Returns:
+            dict: number of documents, tasks and skipped documents
+        """
+        input_root = os.path.commonpath([os.path.dirname(path) for path in pdf_file_paths])
+        settings = get_output_settings(include_pages, include_labels)
+        num_documents = num_tasks = num_skipped = 0
+
+        for pdf_file_path in pdf_file_paths:
+            output_path = os.path.abspath(get_output_path(pdf_file_path, input_root, output_dir))
+
+            if not overwrite and is_up_to_date(pdf_file_path, output_path, settings):
+                num_skipped += 1
+                continue
+
+            document_id = get_document_id(pdf_file_path)
+            page_numbers = resolve_pages(include_pages, count_pages(pdf_file_path))
+
+            task = {'document' : document_id,
+                    'input' : os.path.abspath(pdf_file_path),
+                    'include_labels' : include_labels}
+
+            if pages_per_shard is None or len(page_numbers) <= pages_per_shard:
+                tasks = [dict(task,
+                              id=f'{document_id}-0000',
+                              type=TASK_EXTRACT,
+                              output=output_path,
+                              pages=page_numbers if include_pages is not None else None,
+                              settings=settings,
+                              expected_pages=len(page_numbers))]
+            else:
+                tasks = [dict(task,
+                              id=f'{document_id}-{part:04d}',
+                              type=TASK_EXTRACT,
+                              output=self._path(SHARD_DIR, f'{document_id}-{part:04d}{JSON_EXTENSION}'),
+                              pages=part_pages,
+                              expected_pages=len(part_pages))
+                         for part, part_pages in enumerate(split_pages(page_numbers, pages_per_shard))]
+
+                # the merge sorts after the shards of its document
+                tasks.append(dict(task,
+                                  id=f'{document_id}-merge',
+                                  type=TASK_MERGE,
+                                  output=output_path,
+                                  shards=[shard['id'] for shard in tasks],
+                                  settings=settings,
+                                  expected_pages=0))
+
+            for task in tasks:
+                self._reset_task(task['id'])
+                _write_json(self._path(TASK_DIR, task['id'] + JSON_EXTENSION), task)
+
+            num_documents += 1
+            num_tasks += len(tasks)
+
+        return {'documents' : num_documents,
+                'tasks' : num_tasks,
+                'skipped' : num_skipped}
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _list_generations(self,
+                          dir_name : str) -> dict:
+        """returns the generations of the leases or attempts of every task"""
+
+        generations = {}
+        for file_name in os.listdir(os.path.join(self.queue_dir, dir_name)):
+            parts = file_name.split('.')
+            if file_name.endswith('.tmp') or len(parts) < 2 or not parts[1].isdigit():
+                continue
+            generations.setdefault(parts[0], []).append(int(parts[1]))
+
+        return generations
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _lease_path(self,
+                    task_id : str,
+                    generation : int) -> str:
+        return self._path(LEASE_DIR, f'{task_id}.{generation:04d}')
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _attempt_path(self,
+                      task_id : str,
+                      generation : int) -> str:
+        return self._path(ATTEMPT_DIR, f'{task_id}.{generation:04d}{JSON_EXTENSION}')
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _try_lease(self,
+                   task : dict,
+                   worker_id : str,
+                   lease_generations : list,
+                   attempt_generations : list,
+                   now : float) -> Lease:
+        """claims a task which is not leased or whose lease expired by
+        creating the lease of the next generation, returns None when another
+        worker holds it or created that generation first
+        """
+        task_id = task['id']
+        last_lease = max(lease_generations, default=0)
+        last_attempt = max(attempt_generations, default=0)
+        num_attempts = len(attempt_generations)
+
+        # a lease is current unless a later attempt was recorded, the
+        # leases of failed and taken over generations are left behind
+        expired = None
+        if last_lease > last_attempt:
+            try:
+                lease_time = os.stat(self._lease_path(task_id, last_lease)).st_mtime
+            except FileNotFoundError:
+                # released since the listing, committed or failed
+                return None
+
+            if now - lease_time <= self.lease_seconds:
+                return None
+
+            expired = last_lease
+
+        generation = max(last_lease, last_attempt) + 1
+        lease_path = self._lease_path(task_id, generation)
+
+        try:
+            lease_fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+
+        token = uuid.uuid4().hex
+        with os.fdopen(lease_fd, 'w') as lease_file:
+            json.dump({'task' : task_id,
+                       'worker' : worker_id,
+                       'token' : token,
+                       'generation' : generation}, lease_file)
+
+        lease = Lease(task, token, lease_path, generation)
+
+        # committed or failed by another worker between the listing and the
+        # claim, the result is written before the lease is released
+        if (os.path.exists(self._path(DONE_DIR, task_id + JSON_EXTENSION)) or
+            os.path.exists(self._attempt_path(task_id, generation))):
+            self.release(lease)
+            return None
+
+        if expired is not None:
+            # only the worker which created the next generation records the
+            # expired one, the record of a generation is written once
+            try:
+                expired_worker = _read_json(self._lease_path(task_id, expired))['worker']
+            except (FileNotFoundError, ValueError, KeyError):
+                expired_worker = None
+
+            attempt_path = self._attempt_path(task_id, expired)
+            if not os.path.exists(attempt_path):
+                _write_json(attempt_path, {'task' : task_id,
+                                           'worker' : expired_worker})
+                num_attempts += 1
+
+        if num_attempts >= self.max_attempts:
+            self.release(lease)
+            return None
+
+        return lease
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def claim(self,
+              worker_id : str) -> Lease:
+        """claims the next task which is neither done, given up nor leased by
+        a live worker. A merge is claimable once all of its shards are done.
+
+        Args:
+            worker_id (str): id of the worker, see get_worker_id
+
+        Returns:
+            Lease: the claimed task, None when there is nothing to claim now
+        """
+        done = set(self._list(DONE_DIR))
+        leases = self._list_generations(LEASE_DIR)
+        attempts = self._list_generations(ATTEMPT_DIR)
+        now = self.get_time(worker_id)
+
+        for task_id in sorted(self._list(TASK_DIR)):
+            if task_id in done or len(attempts.get(task_id, [])) >= self.max_attempts:
+                continue
+
+            try:
+                task = _read_json(self._path(TASK_DIR, task_id + JSON_EXTENSION))
+            except FileNotFoundError:
+                continue
+
+            if task['type'] == TASK_MERGE and not all(shard_id in done for shard_id in task['shards']):
+                continue
+
+            lease = self._try_lease(task, worker_id, leases.get(task_id, []), attempts.get(task_id, []), now)
+            if lease is not None:
+                return lease
+
+        return None
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _owns(self,
+              lease : Lease) -> bool:
+        """returns true while the lease file of the generation is the one of
+        the lease
+        """
+        try:
+            return _read_json(lease.path)['token'] == lease.token
+        except (FileNotFoundError, ValueError, KeyError):
+            return False
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def holds(self,
+              lease : Lease) -> bool:
+        """returns true while the lease is the current one of its task, no
+        later generation was created and its attempt was not recorded
+        """
+        if not self._owns(lease) or os.path.exists(self._attempt_path(lease.task['id'], lease.generation)):
+            return False
+
+        generations = self._list_generations(LEASE_DIR).get(lease.task['id'], [])
+        return max(generations, default=0) <= lease.generation
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def heartbeat(self,
+                  lease : Lease) -> bool:
+        """renews a lease, returns false when it was taken over. A lease
+        taken over is still touched, it tells that its worker is alive and
+        may still be writing its output (see remove_stale_output)
+        """
+        if not self._owns(lease):
+            return False
+
+        try:
+            os.utime(lease.path)
+        except FileNotFoundError:
+            return False
+
+        return self.holds(lease)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def release(self,
+                lease : Lease) -> None:
+
+        # the generation is the lease's own, no other worker writes it
+        if self._owns(lease):
+            _remove(lease.path)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def remove_stale_output(self,
+                            lease : Lease,
+                            now : float) -> None:
+        """removes the leases of the other generations of a committed task
+        and the output files their workers left behind, once the lease was
+        not touched for lease_seconds. A worker whose lease was taken over
+        keeps touching it, so the files of a worker still writing are kept.
+        """
+        task = lease.task
+
+        for generation in self._list_generations(LEASE_DIR).get(task['id'], []):
+            lease_path = self._lease_path(task['id'], generation)
+            if generation == lease.generation:
+                continue
+
+            try:
+                if now - os.stat(lease_path).st_mtime <= self.lease_seconds:
+                    continue
+                token = _read_json(lease_path)['token']
+            except (FileNotFoundError, ValueError, KeyError):
+                continue
+
+            # the ExtractedDocumentWriter writes the output to a .tmp file first
+            _remove(f'{task["output"]}.{token}')
+            _remove(f'{task["output"]}.{token}.tmp')
+            _remove(lease_path)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def commit(self,
+               lease : Lease,
+               result : dict) -> bool:
+        """records the result of a task whose output is in place and releases
+        its lease. Committing a task again keeps the first result.
+
+        Returns:
+            bool: true if this was the first commit of the task
+        """
+        done_path = self._path(DONE_DIR, lease.task['id'] + JSON_EXTENSION)
+
+        first = not os.path.exists(done_path)
+        if first:
+            _write_json(done_path, result)
+
+        self.release(lease)
+
+        return first
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def fail(self,
+             lease : Lease,
+             error : str,
+             worker_id : str) -> None:
+        """records a failed attempt of a task and releases its lease"""
+
+        _write_json(self._attempt_path(lease.task['id'], lease.generation),
+                    {'task' : lease.task['id'],
+                     'worker' : worker_id,
+                     'error' : error})
+
+        self.release(lease)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _get_errors(self,
+                    task_id : str) -> list:
+
+        errors = []
+        for file_name in sorted(os.listdir(os.path.join(self.queue_dir, ATTEMPT_DIR))):
+            if file_name.split('.')[0] != task_id or file_name.endswith('.tmp'):
+                continue
+            try:
+                attempt = _read_json(self._path(ATTEMPT_DIR, file_name))
+            except (FileNotFoundError, ValueError):
+                attempt = {}
+            errors.append(attempt.get('error', f'lease of {attempt.get("worker", "a worker")} expired'))
+
+        return errors
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def status(self) -> dict:
+        """returns the state of the tasks and documents of the queue
+
+        Returns:
+            dict: numbers of tasks done, leased, pending and failed (given up,
+                or a merge of a document with a failed shard), numbers of
+                documents done and failed, finished when no task can run any
+                more, and the errors of the failed tasks of every pdf
+        """
+        done = set(self._list(DONE_DIR))
+        attempt_generations = self._list_generations(ATTEMPT_DIR)
+        attempts = {task_id : len(generations) for task_id, generations in attempt_generations.items()}
+
+        # the current lease of a task is later than its last attempt
+        leased = set(task_id for task_id, generations in self._list_generations(LEASE_DIR).items()
+                     if max(generations) > max(attempt_generations.get(task_id, []), default=0))
+
+        tasks = {}
+        for task_id in self._list(TASK_DIR):
+            try:
+                tasks[task_id] = _read_json(self._path(TASK_DIR, task_id + JSON_EXTENSION))
+            except FileNotFoundError:
+                continue
+
+        failed = set(task_id for task_id in tasks
+                     if task_id not in done and attempts.get(task_id, 0) >= self.max_attempts)
+        failed.update(task_id for task_id, task in tasks.items()
+                      if task['type'] == TASK_MERGE and task_id not in done and
+                         any(shard_id in failed for shard_id in task['shards']))
+
+        # the last task of a document is its merge, or its only task
+        documents = {}
+        for task_id in sorted(tasks):
+            documents[tasks[task_id]['document']] = task_id
+
+        pages_done = 0
+        for task_id in done:
+            if task_id in tasks and tasks[task_id]['type'] == TASK_EXTRACT:
+                pages_done += tasks[task_id]['expected_pages']
+
+        errors = {}
+        for task_id in sorted(failed):
+            task_errors = self._get_errors(task_id)
+            if len(task_errors) > 0:
+                errors.setdefault(tasks[task_id]['input'], []).extend(task_errors)
+
+        return {'tasks' : len(tasks),
+                'done' : len(done & set(tasks)),
+                'leased' : len((leased - done) & set(tasks)),
+                'failed' : len(failed),
+                'pending' : len(set(tasks) - done - leased - failed),
+                'documents' : len(documents),
+                'documents_done' : sum(task_id in done for task_id in documents.values()),
+                'documents_failed' : sum(task_id in failed for task_id in documents.values()),
+                'pages' : sum(task['expected_pages'] for task in tasks.values()),
+                'pages_done' : pages_done,
+                'finished' : len(set(tasks) - done - failed) == 0,
+                'errors' : errors}
+
+# =============================================================================
+
+class _Heartbeat(threading.Thread):
+    """Renews a lease in the background while its task runs"""
+
+    def __init__(self,
+                 work_queue : WorkQueue,
+                 lease : Lease,
+                 interval : float):
+
+        super().__init__(daemon=True)
+        self.work_queue = work_queue
+        self.lease = lease
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.lost = False
+
+    def run(self) -> None:
+        # a lease taken over is still touched until the task is done
+        while not self.stop_event.wait(self.interval):
+            if not self.work_queue.heartbeat(self.lease):
+                self.lost = True
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.join()
+
+# =============================================================================
+
+class QueueWorker:
+    """Claims and runs the tasks of a WorkQueue until none are left. The
+    generator (and its models) is only created for the first extraction, a
+    worker which only merges does not load them.
+    """
+
+    def __init__(self,
+                 work_queue : WorkQueue,
+                 generator_kwargs = None,
+                 worker_id = None,
+                 heartbeat_seconds = DEFAULT_HEARTBEAT_SECONDS,
+                 poll_seconds = DEFAULT_POLL_SECONDS,
+                 wait = False,
+                 doc_gen = None):
+        """
+        Args:
+            work_queue (WorkQueue): the queue
+            generator_kwargs (dict, optional): arguments of the generator.
+                Defaults to None.
+            worker_id (str, optional): Defaults to None which creates one,
+                see get_worker_id.
+            heartbeat_seconds (float, optional): time between two renewals
+                of a lease, well below the lease_seconds of the queue.
+            poll_seconds (float, optional): time between two looks for work
+                while other workers hold the remaining tasks.
+            wait (bool, optional): keep waiting for new tasks when the queue
+                is finished. Defaults to False which returns.
+            doc_gen (ExtractedDocumentGenerator, optional): generator to use
+                instead of creating one.
+        """
+        self.work_queue = work_queue
+        self.generator_kwargs = generator_kwargs if generator_kwargs is not None else {}
+        self.worker_id = worker_id if worker_id is not None else get_worker_id()
+        self.heartbeat_seconds = min(heartbeat_seconds, work_queue.lease_seconds / 3.)
+        self.poll_seconds = poll_seconds
+        self.wait = wait
+        self.doc_gen = doc_gen
+        self.owns_generator = doc_gen is None
+
+        self.tasks_done = 0
+        self.tasks_failed = 0
+        self.leases_lost = 0
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _get_generator(self):
+
+        if self.doc_gen is None:
+            # imported here so a worker which only merges does not load torch
+            from .ExtractedDocumentGenerator import ExtractedDocumentGenerator
+            self.doc_gen = ExtractedDocumentGenerator(**self.generator_kwargs)
+
+        return self.doc_gen
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _run_task(self,
+                  lease : Lease) -> dict:
+        """writes the output of a task to a file of this attempt and renames
+        it over the output once it is complete
+        """
+        task = lease.task
+        attempt_path = f'{task["output"]}.{lease.token}'
+        os.makedirs(os.path.dirname(task['output']), exist_ok=True)
+
+        try:
+            if task['type'] == TASK_MERGE:
+                shard_paths = [self.work_queue._path(SHARD_DIR, shard_id + JSON_EXTENSION) for shard_id in task['shards']]
+                num_pages = merge_json_parts(shard_paths, attempt_path, task['input'], remove_parts=False,
+                                             settings=task.get('settings'))
+            else:
+                num_pages = self._get_generator().extract_to_json(pdf_file_path=task['input'],
+                                                                  json_file_path=attempt_path,
+                                                                  include_pages=task['pages'] if task['pages'] is not None else [],
+                                                                  include_labels=task['include_labels'],
+                                                                  settings=task.get('settings'))
+            os.replace(attempt_path, task['output'])
+        finally:
+            _remove(attempt_path)
+
+        return {'worker' : self.worker_id,
+                'pages' : num_pages}
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def run_task(self,
+                 lease : Lease) -> bool:
+        """runs a claimed task while renewing its lease and commits or fails
+        it, returns true if it succeeded
+        """
+        heartbeat = _Heartbeat(self.work_queue, lease, self.heartbeat_seconds)
+        heartbeat.start()
+        start_time = time.perf_counter()
+
+        try:
+            result = self._run_task(lease)
+        except Exception as error:
+            heartbeat.stop()
+            self.work_queue.fail(lease, f'{type(error).__name__}: {error}', self.worker_id)
+            self.tasks_failed += 1
+            return False
+
+        heartbeat.stop()
+
+        # the output is complete even when the lease was taken over, the
+        # commit keeps whichever result came first
+        result['seconds'] = time.perf_counter() - start_time
+        result['lease_lost'] = heartbeat.lost
+        self.leases_lost += heartbeat.lost
+
+        if self.work_queue.commit(lease, result):
+            self.work_queue.remove_stale_output(lease, self.work_queue.get_time(self.worker_id))
+
+            if lease.task['type'] == TASK_MERGE:
+                for shard_id in lease.task['shards']:
+                    _remove(self.work_queue._path(SHARD_DIR, shard_id + JSON_EXTENSION))
+
+        self.tasks_done += 1
+        return True
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def run(self) -> dict:
+        """runs tasks until the queue is finished (or forever with wait)
+
+        Returns:
+            dict: the id of the worker and the tasks it ran
+        """
+        try:
+            while True:
+                lease = self.work_queue.claim(self.worker_id)
+
+                if lease is not None:
+                    self.run_task(lease)
+                    continue
+
+                if not self.wait and self.work_queue.status()['finished']:
+                    break
+
+                # the remaining tasks are leased by other workers, or are
+                # merges waiting for their shards
+                time.sleep(self.poll_seconds)
+        finally:
+            # stops the post-processing workers of a generator it created
+            if self.owns_generator and self.doc_gen is not None:
+                self.doc_gen.close()
+
+        return {'worker' : self.worker_id,
+                'tasks_done' : self.tasks_done,
+                'tasks_failed' : self.tasks_failed,
+                'leases_lost' : self.leases_lost}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _run_worker_process(queue_dir : str,
+                        generator_kwargs : dict,
+                        worker_index : int,
+                        worker_kwargs : dict) -> None:
+
+    runtime_config = generator_kwargs.get('runtime_config')
+    if runtime_config is not None:
+        runtime_config.set_worker_affinity(worker_index)
+
+    QueueWorker(WorkQueue(queue_dir), generator_kwargs, **worker_kwargs).run()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def run_local_workers(queue_dir : str,
+                      num_workers : int,
+                      generator_kwargs = None,
+                      runtime_config : RuntimeConfig = None,
+                      **worker_kwargs) -> list:
+    """runs num_workers worker processes on this node until the queue is
+    finished, e.g. one call per node, or several on one machine to test the
+    queue. The cpus are split between the workers like BatchExtractor does.
+
+    Returns:
+        list: the exit codes of the worker processes
+    """
+    num_workers = max(int(num_workers), 1)
+    if runtime_config is None:
+        runtime_config = RuntimeConfig.for_workers(num_workers) if num_workers > 1 else RuntimeConfig()
+
+    generator_kwargs = dict(generator_kwargs) if generator_kwargs is not None else {}
+    generator_kwargs['runtime_config'] = runtime_config
+
+    processes = [multiprocessing.Process(target=_run_worker_process,
+                                         args=(queue_dir, generator_kwargs, worker_index, worker_kwargs))
+                 for worker_index in range(num_workers)]
+
+    for process in processes:
+        process.start()
+
+    for process in processes:
+        process.join()
+
+    return [process.exitcode for process in processes]
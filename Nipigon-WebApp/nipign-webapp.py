@@ -1,33 +1,83 @@
-import os, shutil
-import base64
-import json
+import os
+import time
+import hashlib
+import tempfile
 
 from streamlit_image_coordinates import streamlit_image_coordinates
-import streamlit.components.v1 as components
 import streamlit as st
 
-from PIL import Image
-import glob
+import fitz
+import numpy as np
 
 from pprint import pprint
 
-from ExDocGen.ExtractedDocumentGenerator import ExtractedDocumentGenerator
+from ExDocGen.GeneratorPool import GeneratorPool
+from ExDocGen.PageRenderer import render_page_image, annotate_page_image
+from ExDocGen.BlockIndex import BlockIndex
+from ExDocGen.BackgroundExtraction import BackgroundExtraction, STATE_FAILED
+from ExDocGen.ExtractedDocument import FORMAT_JSON, FORMAT_JSONL
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-DOC_GEN_KEY = 'DOC_GEN_KEY'
 EXTRACTED_DOC_KEY = 'EXTRACTED_DOC_KEY'
+EXTRACTION_JOB_KEY = 'EXTRACTION_JOB_KEY'
+DOWNLOAD_KEY = 'DOWNLOAD_KEY'
 IMAGE_INDEX_CUR_KEY = 'IMAGE_INDEX_CUR_KEY'
 IMAGE_INDEX_MAX_KEY = 'IMAGE_INDEX_MAX_KEY'
-IMAGE_FILE_PATHS_KEY = 'IMAGE_FILE_PATHS_KEY'
+PDF_BYTES_KEY = 'PDF_BYTES_KEY'
+PDF_DIGEST_KEY = 'PDF_DIGEST_KEY'
+BLOCK_INDEXES_KEY = 'BLOCK_INDEXES_KEY'
+SELECTED_BLOCK_KEY = 'SELECTED_BLOCK_KEY'
+LAST_CLICK_KEY = 'LAST_CLICK_KEY'
 
 OUTPUT_DIR_PATH = '.output'
 
-if DOC_GEN_KEY not in st.session_state:
-    st.session_state[DOC_GEN_KEY] = ExtractedDocumentGenerator(output_path=OUTPUT_DIR_PATH)
+# zoom the pages are displayed at and the number of rendered pages kept in
+# the (process wide) page image cache
+PAGE_ZOOM = 1.
+PAGE_IMAGE_CACHE_ENTRIES = 256
+
+# download formats offered in the side bar -> (format, file extension)
+DOWNLOAD_FORMATS = {'JSON' : (FORMAT_JSON, '.json'),
+                    'JSON lines' : (FORMAT_JSONL, '.jsonl')}
+
+# seconds between refreshes of the page while an extraction is running
+PROGRESS_POLL_INTERVAL = 1.
+
+# number of generators (copies of the models) shared by all of the sessions
+GENERATOR_POOL_SIZE = int(os.environ.get('NIPIGON_GENERATOR_POOL_SIZE', 1))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+@st.cache_resource
+def get_generator_pool() -> GeneratorPool:
+    # created once per process and shared by every browser session, the
+    # session state only holds the results of that session
+    return GeneratorPool(size=GENERATOR_POOL_SIZE,
+                         generator_kwargs={'output_path' : OUTPUT_DIR_PATH})
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+@st.cache_data(max_entries=PAGE_IMAGE_CACHE_ENTRIES)
+def render_page(pdf_digest : str,
+                page_number : int,
+                zoom : float,
+                _pdf_bytes : bytes) -> np.ndarray:
+    # the digest identifies the upload in the cache key, the bytes themselves
+    # are not hashed (leading underscore) as they can be very large
+    with fitz.open('pdf', _pdf_bytes) as fitz_doc:
+        return render_page_image(fitz_doc[page_number], zoom)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 if EXTRACTED_DOC_KEY not in st.session_state:
     st.session_state[EXTRACTED_DOC_KEY] = None
+
+if EXTRACTION_JOB_KEY not in st.session_state:
+    st.session_state[EXTRACTION_JOB_KEY] = None
+
+if DOWNLOAD_KEY not in st.session_state:
+    st.session_state[DOWNLOAD_KEY] = None
     
 if IMAGE_INDEX_CUR_KEY not in st.session_state:
     st.session_state[IMAGE_INDEX_CUR_KEY] = 0
@@ -35,80 +85,144 @@ if IMAGE_INDEX_CUR_KEY not in st.session_state:
 if IMAGE_INDEX_MAX_KEY not in st.session_state:
     st.session_state[IMAGE_INDEX_MAX_KEY] = 0
 
-if IMAGE_FILE_PATHS_KEY not in st.session_state:
-    st.session_state[IMAGE_FILE_PATHS_KEY] = []
+if PDF_BYTES_KEY not in st.session_state:
+    st.session_state[PDF_BYTES_KEY] = None
+
+if PDF_DIGEST_KEY not in st.session_state:
+    st.session_state[PDF_DIGEST_KEY] = None
+
+if BLOCK_INDEXES_KEY not in st.session_state:
+    st.session_state[BLOCK_INDEXES_KEY] = {}
+
+if SELECTED_BLOCK_KEY not in st.session_state:
+    st.session_state[SELECTED_BLOCK_KEY] = None
+
+if LAST_CLICK_KEY not in st.session_state:
+    st.session_state[LAST_CLICK_KEY] = None
+
+def get_block_index(page_number : int) -> BlockIndex:
+    # a page never changes once extracted so its index is built on the first
+    # click and kept for the rest of the session
+    block_indexes = st.session_state[BLOCK_INDEXES_KEY]
+    
+    if page_number not in block_indexes:
+        document_page = st.session_state[EXTRACTED_DOC_KEY].get_page(page_number)
+        block_indexes[page_number] = BlockIndex(document_page)
+    
+    return block_indexes[page_number]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def reset_selection() -> None:
+    st.session_state[SELECTED_BLOCK_KEY] = None
+    st.session_state[LAST_CLICK_KEY] = None
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # Define all callback functions
 
 def process_pdf_file(pdf_file) -> None:
 
-    doc_gen = st.session_state[DOC_GEN_KEY]
-
     if pdf_file != None:
-        st.session_state[EXTRACTED_DOC_KEY] = doc_gen.extract_from_stream(  pdf_file.getvalue(),
-                                                                            output_name='test')
-                
-        st.session_state[IMAGE_FILE_PATHS_KEY] = glob.glob(OUTPUT_DIR_PATH+'/annotated_images/*.png')
-        st.session_state[IMAGE_FILE_PATHS_KEY].sort()
-                
-        st.session_state[IMAGE_INDEX_MAX_KEY] = len(st.session_state[IMAGE_FILE_PATHS_KEY])-1
+        pdf_bytes = pdf_file.getvalue()
+
+        # stop any extraction this session still has running
+        if st.session_state[EXTRACTION_JOB_KEY] != None:
+            st.session_state[EXTRACTION_JOB_KEY].cancel()
+
+        # the extraction runs on a background thread which fills the document
+        # page by page, the viewer shows every page as soon as it is ready.
+        # Nothing is written to disk, the pages are rendered and annotated on
+        # demand from the upload kept in this session
+        job = BackgroundExtraction(get_generator_pool(), pdf_bytes, file_name=pdf_file.name)
+        job.start()
+
+        st.session_state[EXTRACTION_JOB_KEY] = job
+        st.session_state[EXTRACTED_DOC_KEY] = job.extracted_doc
+        discard_download()
+        st.session_state[PDF_BYTES_KEY] = pdf_bytes
+        st.session_state[PDF_DIGEST_KEY] = hashlib.sha1(pdf_bytes).hexdigest()
+        st.session_state[IMAGE_INDEX_CUR_KEY] = 0
+        st.session_state[IMAGE_INDEX_MAX_KEY] = 0
+        st.session_state[BLOCK_INDEXES_KEY] = {}
+        reset_selection()
     else:
         st.sidebar.error(f'No file selected for processing!')
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ 
 
-def download() -> None:
+def discard_download() -> None:
+    """removes the prepared download file of the session"""
+
+    if st.session_state[DOWNLOAD_KEY] != None:
+        _, _, file_path = st.session_state[DOWNLOAD_KEY]
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    st.session_state[DOWNLOAD_KEY] = None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ 
+
+def prepare_download(download_format : str,
+                     compress : bool) -> None:
        
+    job = st.session_state[EXTRACTION_JOB_KEY]
+    if job != None and job.is_active:
+        st.sidebar.error(f'The document is still being processed!')
+        return
+
     if st.session_state[EXTRACTED_DOC_KEY] != None:
-        
-        object_to_download = json.dumps(st.session_state[EXTRACTED_DOC_KEY].get_json_dict())
-        b64 = base64.b64encode(object_to_download.encode()).decode()
-        download_filename = 'extracted_document.json'
-        dl_link = f"""
-                    <html>
-                    <head>
-                    <title>Start Auto Download file</title>
-                    <script src="http://code.jquery.com/jquery-3.2.1.min.js"></script>
-                    <script>
-                    $('<a href="data:text/csv;base64,{b64}" download="{download_filename}">')[0].click()
-                    </script>
-                    </head>
-                    </html>
-                    """
-        components.html(dl_link,height=0)
+        discard_download()
+
+        # the document is serialized a page at a time into a temporary file,
+        # the session only keeps its path. Streamlit reads the file once when
+        # the button is shown, the file is removed once it was downloaded
+        output_format, extension = DOWNLOAD_FORMATS[download_format]
+        file_name = 'extracted_document' + extension + ('.gz' if compress else '')
+        mime = 'application/gzip' if compress else 'application/json'
+
+        with tempfile.NamedTemporaryFile(suffix=file_name, delete=False) as download_file:
+            st.session_state[EXTRACTED_DOC_KEY].write(download_file, output_format, compress)
+
+        st.session_state[DOWNLOAD_KEY] = (file_name, mime, download_file.name)
     else:
         st.sidebar.error(f'No file available for download!')
-    
-    
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ 
+
+def cancel() -> None:
+
+    if st.session_state[EXTRACTION_JOB_KEY] != None:
+        st.session_state[EXTRACTION_JOB_KEY].cancel()
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ 
 
 def clear() -> None:
     
+    cancel()
+
+    st.session_state[EXTRACTION_JOB_KEY] = None
     st.session_state[EXTRACTED_DOC_KEY] = None
+    discard_download()
     st.session_state[IMAGE_INDEX_CUR_KEY] = 0
-    st.session_state[IMAGE_FILE_PATHS_KEY] = []
     st.session_state[IMAGE_INDEX_MAX_KEY] = 0
-    
-    dir_path = os.path.join(OUTPUT_DIR_PATH+'/annotated_images')
-    
-    for filename in os.listdir(dir_path):
-        file_path = os.path.join(dir_path, filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    st.session_state[PDF_BYTES_KEY] = None
+    st.session_state[PDF_DIGEST_KEY] = None
+    st.session_state[BLOCK_INDEXES_KEY] = {}
+    reset_selection()
                
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ 
 
 def increase_current_page():
     if st.session_state[IMAGE_INDEX_CUR_KEY] < st.session_state[IMAGE_INDEX_MAX_KEY]:
         st.session_state[IMAGE_INDEX_CUR_KEY] = st.session_state[IMAGE_INDEX_CUR_KEY] + 1
+        reset_selection()
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ 
 
 def decrease_current_page():
     if st.session_state[IMAGE_INDEX_CUR_KEY] > 0:
         st.session_state[IMAGE_INDEX_CUR_KEY] = st.session_state[IMAGE_INDEX_CUR_KEY] - 1
+        reset_selection()
         
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -124,9 +238,31 @@ st.sidebar.markdown("## PDF File Picker")
 uploaded_file = st.sidebar.file_uploader("Choose a file")
 
 st.sidebar.button('Process', on_click=process_pdf_file, args=(uploaded_file,))
-st.sidebar.button('Download', on_click=download)
+st.sidebar.button('Cancel', on_click=cancel)
 st.sidebar.button('Clear', on_click=clear)
 
+st.sidebar.markdown("## Download")
+download_format = st.sidebar.selectbox('Format', list(DOWNLOAD_FORMATS.keys()))
+download_compress = st.sidebar.checkbox('gzip')
+st.sidebar.button('Prepare Download', on_click=prepare_download, args=(download_format, download_compress))
+
+if st.session_state[DOWNLOAD_KEY] != None and os.path.exists(st.session_state[DOWNLOAD_KEY][2]):
+    file_name, mime, file_path = st.session_state[DOWNLOAD_KEY]
+    with open(file_path, 'rb') as download_file:
+        st.sidebar.download_button(f'Download {file_name}', data=download_file, file_name=file_name, mime=mime,
+                                   on_click=discard_download)
+
+job = st.session_state[EXTRACTION_JOB_KEY]
+
+if job != None:
+    # only the pages which are already extracted can be viewed
+    st.session_state[IMAGE_INDEX_MAX_KEY] = max(job.pages_done-1, 0)
+
+    st.sidebar.progress(job.progress, text=f'{job.state}: {job.pages_done} of {job.num_pages} pages')
+
+    if job.state == STATE_FAILED:
+        st.sidebar.error(f'Extraction failed: {job.error}')
+
 
 prev, next, trash = st.columns([1,1,15])
 prev.button('Prev',on_click=decrease_current_page)
@@ -139,31 +275,63 @@ col_2, col_3 = st.columns(2)
 # Column 2 - PDF Page Images and Annotations
 col_2.markdown("## PDF Images")
 
-if st.session_state[EXTRACTED_DOC_KEY] != None:
+if st.session_state[EXTRACTED_DOC_KEY] != None and st.session_state[EXTRACTED_DOC_KEY].num_pages > 0:
     
     current_page = st.session_state[IMAGE_INDEX_CUR_KEY]
     max_page = st.session_state[IMAGE_INDEX_MAX_KEY]
-            
-    image_file_path = st.session_state[IMAGE_FILE_PATHS_KEY][current_page]
     
-    image = Image.open(image_file_path)
+    page_img = render_page( st.session_state[PDF_DIGEST_KEY],
+                            current_page,
+                            PAGE_ZOOM,
+                            st.session_state[PDF_BYTES_KEY])
+    
+    # the boxes are drawn from the geometry saved on the text blocks
+    image = annotate_page_image(page_img,
+                                st.session_state[EXTRACTED_DOC_KEY].get_page(current_page),
+                                PAGE_ZOOM,
+                                st.session_state[SELECTED_BLOCK_KEY])
   
     # this gets the location in image coordinates where the click has
     # happened on the image.
     with col_2:
-        value =  streamlit_image_coordinates(image)  
-        print(value)
+        value =  streamlit_image_coordinates(image, key=f'page_image_{current_page}')
+
+    # the component keeps returning the last click, only a new one changes
+    # the selection
+    if value != None and value != st.session_state[LAST_CLICK_KEY]:
+        st.session_state[LAST_CLICK_KEY] = value
+
+        # the click is in displayed pixels, which differ from the image
+        # pixels when the browser scales the image down
+        display_scale = image.width / value.get('width', image.width)
+
+        st.session_state[SELECTED_BLOCK_KEY] = get_block_index(current_page).find_block(value['x'] * display_scale,
+                                                                                        value['y'] * display_scale,
+                                                                                        PAGE_ZOOM)
+        st.rerun()
 
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # Column 3 - Extract text in a JSON viewer
 col_3.markdown("## Extracted Text")
 
-if st.session_state[EXTRACTED_DOC_KEY] != None:
+if st.session_state[EXTRACTED_DOC_KEY] != None and st.session_state[EXTRACTED_DOC_KEY].num_pages > 0:
     
     extracted_document = st.session_state[EXTRACTED_DOC_KEY]
     current_page = extracted_document.get_page(st.session_state[IMAGE_INDEX_CUR_KEY])
     
-    col_3.markdown(current_page.get_labelled_text())
-   
+    for block_num, text_block in enumerate(current_page.document_text_blocks):
+        block_text = '**' + text_block.label + '**' + ' : ' + text_block.text
+
+        # the block clicked on in the page image is highlighted
+        if block_num == st.session_state[SELECTED_BLOCK_KEY]:
+            col_3.info(block_text)
+        else:
+            col_3.markdown(block_text)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# keep refreshing while the background extraction adds pages
 
+if job != None and job.is_active:
+    time.sleep(PROGRESS_POLL_INTERVAL)
+    st.rerun()
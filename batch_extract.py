@@ -0,0 +1,185 @@
+import sys
+import json
+import argparse
+
+from ExDocGen.MemoryBudget import MemoryBudget
+from ExDocGen.DetectorBackends import DETECTOR_BACKENDS, BACKEND_TORCH
+from ExDocGen.TableExtractor import TABLE_BACKENDS, TABLE_BACKEND_EAGER
+from ExDocGen.TextLayout import TextLayoutConfig, LAYOUT_MODES, LAYOUT_DETECTOR, DEFAULT_MIN_PAGE_CONFIDENCE
+from ExDocGen.RuntimeConfig import RuntimeConfig, AFFINITY_NONE, AFFINITY_AUTO
+from ExDocGen.CascadeConfig import CascadeConfig
+from ExDocGen.TableResolution import TableResolution
+from ExDocGen.OcrCache import OcrCache
+from ExDocGen.RunningBlocks import RunningBlockConfig
+from ExDocGen.PageSelection import parse_page_spec
+from ExDocGen.BatchExtractor import (BatchExtractor, collect_input_paths, print_error_summary,
+                                     ALL_LABELS, EXIT_USAGE_ERROR)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def add_generator_arguments(parser : argparse.ArgumentParser) -> None:
+    """adds the options of the generator and the workers, see
+    get_generator_kwargs
+    """
+    parser.add_argument('--max-rss-mb', type=float,
+                        help='RSS ceiling of each worker, above it the worker waits before starting the next page')
+    parser.add_argument('--detector-backend', choices=DETECTOR_BACKENDS, default=BACKEND_TORCH,
+                        help='run the layout detector with PyTorch, ONNX Runtime or as a TorchScript trace')
+    parser.add_argument('--onnx-path',
+                        help='exported (possibly quantized) ONNX model used by the onnx backend')
+    parser.add_argument('--torchscript-path',
+                        help='traced model used by the torchscript backend, traced from the weights when missing')
+    parser.add_argument('--warm-up-runs', type=int, default=0,
+                        help='run the models this many times over synthetic inputs before the first page')
+    parser.add_argument('--cascade', action='store_true',
+                        help='detect pages at a low resolution first and again at full resolution only when needed')
+    parser.add_argument('--adaptive-table-dpi', action='store_true',
+                        help='choose the table render resolutions from the table size and font size')
+    parser.add_argument('--layout', choices=LAYOUT_MODES, default=LAYOUT_DETECTOR,
+                        help='find the blocks of the pages with the detector, from the text layer of the pdf only, '
+                             'or from the text layer and the detector for the pages it is not sure about (auto)')
+    parser.add_argument('--min-layout-confidence', type=float, default=DEFAULT_MIN_PAGE_CONFIDENCE,
+                        help='text layer confidence below which --layout auto detects a page')
+    parser.add_argument('--table-backend', choices=TABLE_BACKENDS, default=TABLE_BACKEND_EAGER,
+                        help='run the table transformer and OCR models as loaded or optimized for the cpu')
+    parser.add_argument('--predict-running-blocks', action='store_true',
+                        help='predict the text of page headers/footers repeated on every page instead of extracting it')
+    parser.add_argument('--ocr-cache',
+                        help='sqlite file the text of table cells is cached in, shared by the workers and kept between runs')
+    parser.add_argument('--postprocess-workers', type=int, default=0,
+                        help='processes cleaning and segmenting the text next to the extraction (only with --workers 1)')
+    parser.add_argument('--intra-op-threads', type=int,
+                        help='threads of every model operation in a worker, defaults to the cpus divided by the workers')
+    parser.add_argument('--inter-op-threads', type=int,
+                        help='torch inter-op threads of a worker, defaults to 1')
+    parser.add_argument('--ocr-threads', type=int,
+                        help='threads used by easyocr in a worker, defaults to --intra-op-threads')
+    parser.add_argument('--cpu-affinity', choices=[AFFINITY_NONE, AFFINITY_AUTO], default=AFFINITY_NONE,
+                        help='pin every worker to its own share of the cpus')
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def parse_args(argv = None) -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(description='Extract the text from a batch of pdf files into JSON files.')
+
+    parser.add_argument('inputs', nargs='+',
+                        help='directories, glob patterns, manifest files (.txt, .lst, .jsonl) or pdf files')
+    parser.add_argument('-o', '--output-dir', required=True,
+                        help='directory the JSON files are written to')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='number of worker processes, each loads its own copy of the models')
+    parser.add_argument('-b', '--batch-size', type=int, default=1,
+                        help='number of documents handed to a worker at a time')
+    parser.add_argument('--labels', nargs='+', choices=ALL_LABELS,
+                        help='only extract text blocks with these labels')
+    parser.add_argument('--exclude-labels', nargs='+', choices=ALL_LABELS, default=[],
+                        help='do not extract text blocks with these labels')
+    parser.add_argument('--pages',
+                        help='pages to extract from every document, 0 based page numbers and python slices '
+                             'separated by commas, negative from the end (e.g. 0:10,-1)')
+    parser.add_argument('--pages-per-job', type=int,
+                        help='split documents with more pages into jobs of this many pages, spread over the workers')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='process documents even if their output is up to date')
+    add_generator_arguments(parser)
+    parser.add_argument('--report',
+                        help='file path to save the JSON run report to')
+
+    return parser.parse_args(argv)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_generator_kwargs(args : argparse.Namespace) -> dict:
+
+    generator_kwargs = {'memory_budget' : MemoryBudget(rss_ceiling_mb=args.max_rss_mb),
+                        'detector_backend' : args.detector_backend,
+                        'table_backend' : args.table_backend,
+                        'layout_mode' : args.layout,
+                        'text_layout_config' : TextLayoutConfig(min_page_confidence=args.min_layout_confidence),
+                        'warm_up_runs' : args.warm_up_runs}
+
+    if args.onnx_path is not None:
+        generator_kwargs['onnx_path'] = args.onnx_path
+
+    if args.torchscript_path is not None:
+        generator_kwargs['torchscript_path'] = args.torchscript_path
+
+    if args.cascade:
+        generator_kwargs['cascade_config'] = CascadeConfig()
+
+    if args.adaptive_table_dpi:
+        generator_kwargs['table_resolution'] = TableResolution()
+
+    if args.predict_running_blocks:
+        generator_kwargs['running_block_config'] = RunningBlockConfig(skip_extraction=True)
+
+    if args.postprocess_workers > 0:
+        generator_kwargs['postprocess_workers'] = args.postprocess_workers
+
+    if args.ocr_cache is not None:
+        generator_kwargs['ocr_cache'] = OcrCache(persistent_path=args.ocr_cache)
+
+    return generator_kwargs
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main(argv = None) -> int:
+
+    args = parse_args(argv)
+
+    pdf_file_paths = collect_input_paths(args.inputs)
+    if len(pdf_file_paths) == 0:
+        print('No pdf files found in the given inputs', file=sys.stderr)
+        return EXIT_USAGE_ERROR
+
+    # the worker processes of a batch can not start processes of their own
+    if args.postprocess_workers > 0 and args.workers > 1:
+        print('--postprocess-workers can only be used with --workers 1', file=sys.stderr)
+        return EXIT_USAGE_ERROR
+
+    include_pages = None
+    if args.pages is not None:
+        try:
+            include_pages = parse_page_spec(args.pages)
+        except ValueError:
+            print(f'--pages {args.pages} is not a list of page numbers and slices', file=sys.stderr)
+            return EXIT_USAGE_ERROR
+
+    if args.pages_per_job is not None and args.pages_per_job < 1:
+        print('--pages-per-job has to be at least 1', file=sys.stderr)
+        return EXIT_USAGE_ERROR
+
+    include_labels = None
+    if args.labels is not None or len(args.exclude_labels) > 0:
+        labels = args.labels if args.labels is not None else ALL_LABELS
+        include_labels = [label for label in labels if label not in args.exclude_labels]
+
+    batch_extractor = BatchExtractor(output_dir=args.output_dir,
+                                     num_workers=args.workers,
+                                     batch_size=args.batch_size,
+                                     include_labels=include_labels,
+                                     include_pages=include_pages,
+                                     pages_per_job=args.pages_per_job,
+                                     overwrite=args.overwrite,
+                                     generator_kwargs=get_generator_kwargs(args),
+                                     runtime_config=RuntimeConfig.for_workers(args.workers,
+                                                                              intra_op_threads=args.intra_op_threads,
+                                                                              inter_op_threads=args.inter_op_threads,
+                                                                              ocr_threads=args.ocr_threads,
+                                                                              cpu_affinity=args.cpu_affinity))
+
+    report = batch_extractor.run(pdf_file_paths)
+
+    print_error_summary(report)
+
+    if args.report is not None:
+        with open(args.report, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+    return report['exit_code']
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Speed and agreement of coarse-to-fine cascade detection against detection at
+full resolution, over the pdfs in data/.
+
+Every pdf is extracted once with the full resolution detector (baseline) and
+once with the cascade. The report gives the fraction of pages escalated to
+full resolution, the detection time and end-to-end time of both runs and the
+fraction of pages whose extracted text is identical.
+
+Usage:
+    python benchmarks/benchmark_cascade.py --coarse-size 512 --min-confidence 0.5 --max-boxes 30
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.ExtractedDocumentGenerator import ExtractedDocumentGenerator
+from ExDocGen.CascadeConfig import (CascadeConfig, DEFAULT_COARSE_SIZE, DEFAULT_MIN_CONFIDENCE,
+                                   DEFAULT_MAX_BOXES, DEFAULT_ESCALATE_LABELS)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DATA_DIR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'data')
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def run(doc_gen : ExtractedDocumentGenerator,
+        pdf_file_path : str) -> tuple:
+
+    start_time = time.perf_counter()
+    extracted_doc = doc_gen.extract_from_path(pdf_file_path)
+    total_seconds = time.perf_counter() - start_time
+
+    metrics = extracted_doc.metrics
+    detection_seconds = metrics.stage_seconds.get('detection', 0.) + metrics.stage_seconds.get('detection_coarse', 0.)
+
+    return extracted_doc, total_seconds, detection_seconds
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Compare cascade detection with full resolution detection.')
+    parser.add_argument('--coarse-size', type=int, default=max(DEFAULT_COARSE_SIZE),
+                        help='long side of the page at the coarse pass')
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE)
+    parser.add_argument('--max-boxes', type=int, default=DEFAULT_MAX_BOXES)
+    parser.add_argument('--escalate-labels', nargs='*', default=DEFAULT_ESCALATE_LABELS)
+    parser.add_argument('--pdfs', nargs='+',
+                        help='pdf files, defaults to every pdf in data/')
+    parser.add_argument('--output',
+                        help='file path to save the JSON report to')
+    args = parser.parse_args()
+
+    cascade_config = CascadeConfig(coarse_size=(args.coarse_size, args.coarse_size),
+                                   min_confidence=args.min_confidence,
+                                   max_boxes=args.max_boxes,
+                                   escalate_labels=args.escalate_labels)
+
+    pdf_file_paths = args.pdfs if args.pdfs else sorted(glob.glob(os.path.join(DATA_DIR_PATH, '*.pdf')))
+
+    doc_gen = ExtractedDocumentGenerator(collect_metrics=True)
+
+    # the first document warms up the model, it is not timed
+    doc_gen.extract_from_path(pdf_file_paths[0], include_pages=[0])
+
+    totals = {'pages' : 0, 'escalated' : 0, 'identical_pages' : 0,
+              'baseline_seconds' : 0., 'cascade_seconds' : 0.,
+              'baseline_detection_seconds' : 0., 'cascade_detection_seconds' : 0.}
+    documents = {}
+
+    for pdf_file_path in pdf_file_paths:
+        doc_gen.cascade_config = None
+        baseline_doc, baseline_seconds, baseline_detection = run(doc_gen, pdf_file_path)
+
+        doc_gen.cascade_config = cascade_config
+        cascade_doc, cascade_seconds, cascade_detection = run(doc_gen, pdf_file_path)
+
+        identical = sum(baseline_page.get_text() == cascade_page.get_text()
+                        for baseline_page, cascade_page in zip(baseline_doc.document_pages,
+                                                               cascade_doc.document_pages))
+
+        document = {'pages' : cascade_doc.num_pages,
+                    'escalated' : cascade_doc.metrics.counters.get('pages_escalated', 0),
+                    'identical_pages' : identical,
+                    'baseline_seconds' : baseline_seconds,
+                    'cascade_seconds' : cascade_seconds,
+                    'baseline_detection_seconds' : baseline_detection,
+                    'cascade_detection_seconds' : cascade_detection}
+        documents[os.path.basename(pdf_file_path)] = document
+
+        for key in totals:
+            totals[key] += document[key]
+
+    print(f'{"document":<28}{"pages":>6}{"escalated":>11}{"identical":>11}{"detect x":>10}{"total x":>9}')
+    for name, result in list(documents.items()) + [('TOTAL', totals)]:
+        print(f'{name:<28}{result["pages"]:>6}'
+              f'{result["escalated"] / max(result["pages"], 1):>10.0%} '
+              f'{result["identical_pages"] / max(result["pages"], 1):>10.0%} '
+              f'{result["baseline_detection_seconds"] / max(result["cascade_detection_seconds"], 1e-9):>9.2f}'
+              f'{result["baseline_seconds"] / max(result["cascade_seconds"], 1e-9):>9.2f}')
+
+    if args.output is not None:
+        with open(args.output, 'w') as report_file:
+            json.dump({'cascade' : vars(args), 'totals' : totals, 'documents' : documents}, report_file, indent=2)
+
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Table throughput with and without the OCR cache on tables that repeat their
+headers and row labels.
+
+Synthetic ruled tables are drawn at the same place on every page, with the
+same header row and row labels and different numbers, as in a statistical
+report. The tables are extracted by the generator once with an empty cache of
+size 0 (every cell is read) and once with a new OcrCache. The report gives the
+tables/sec of both runs, the hit rate, the OCR seconds the hits saved and the
+fraction of tables whose text is identical in both runs.
+
+Usage:
+    python benchmarks/benchmark_ocr_cache.py --pages 20
+"""
+import os
+import sys
+import time
+import argparse
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.ExtractedDocumentGenerator import ExtractedDocumentGenerator
+from ExDocGen.OcrCache import OcrCache
+from ExDocGen.Metrics import DocumentMetrics
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+HEADER = ['Region', 'Persons', 'Males', 'Females', 'Change (%)']
+ROW_LABELS = ['Total, all ages', '0 to 14 years', '15 to 64 years', '65 years and over',
+              'Urban', 'Rural', 'Not stated']
+ROW_HEIGHT = 18.
+FONT_SIZE = 9
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def create_table_pdf(num_pages : int) -> tuple:
+    """returns a pdf with the same table layout on every page and the table
+    rectangle
+    """
+    fitz_doc = fitz.open()
+
+    column_width = 468 / len(HEADER)
+    num_rows = len(ROW_LABELS) + 1
+    rect = fitz.Rect(72, 72, 540, 72 + num_rows * ROW_HEIGHT)
+
+    for page_num in range(num_pages):
+        page = fitz_doc.new_page(width=612, height=792)
+
+        for row in range(num_rows + 1):
+            page.draw_line((rect.x0, rect.y0 + row * ROW_HEIGHT), (rect.x1, rect.y0 + row * ROW_HEIGHT))
+        for column in range(len(HEADER) + 1):
+            page.draw_line((rect.x0 + column * column_width, rect.y0), (rect.x0 + column * column_width, rect.y1))
+
+        for row, row_label in enumerate([None] + ROW_LABELS):
+            for column in range(len(HEADER)):
+                if row_label is None:
+                    text = HEADER[column]
+                elif column == 0:
+                    text = row_label
+                elif column == len(HEADER) - 1 and row % 3 == 0:
+                    # some cells are left empty
+                    continue
+                else:
+                    text = f'{(page_num * 37 + row * 101 + column * 13) % 9000 + 100:,}'
+
+                page.insert_text((rect.x0 + column * column_width + 4, rect.y0 + row * ROW_HEIGHT + 13),
+                                 text, fontsize=FONT_SIZE)
+
+    return fitz_doc, rect
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def run(doc_gen : ExtractedDocumentGenerator,
+        fitz_doc : fitz.Document,
+        rect : fitz.Rect) -> tuple:
+
+    metrics = DocumentMetrics('tables')
+
+    start_time = time.perf_counter()
+    texts = [doc_gen._extract_table_text(page, rect, metrics) for page in fitz_doc]
+
+    return len(texts) / (time.perf_counter() - start_time), texts, metrics
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Compare table extraction with and without the OCR cache.')
+    parser.add_argument('--pages', type=int, default=20,
+                        help='number of pages (tables) extracted in a run')
+    args = parser.parse_args()
+
+    fitz_doc, rect = create_table_pdf(args.pages)
+    doc_gen = ExtractedDocumentGenerator()
+
+    # the first table warms up the models, it is not timed
+    doc_gen.table_extractor.ocr_cache = OcrCache(max_entries=0)
+    doc_gen._extract_table_text(fitz_doc[0], rect, DocumentMetrics('warmup'))
+
+    uncached_rate, uncached_texts, _ = run(doc_gen, fitz_doc, rect)
+
+    doc_gen.table_extractor.ocr_cache = OcrCache()
+    cached_rate, cached_texts, metrics = run(doc_gen, fitz_doc, rect)
+
+    hits = metrics.counters.get('ocr_cache_hits', 0)
+    misses = metrics.counters.get('ocr_cache_misses', 0)
+    identical = sum(uncached == cached for uncached, cached in zip(uncached_texts, cached_texts))
+
+    print(f'without cache: {uncached_rate:.3f} tables/s')
+    print(f'with cache:    {cached_rate:.3f} tables/s ({cached_rate / uncached_rate:.2f}x)')
+    print(f'hit rate {hits / max(hits + misses, 1):.1%} ({hits} hits, {misses} misses, '
+          f'{metrics.counters.get("ocr_blank_cells", 0)} blank cells), '
+          f'{metrics.stage_seconds.get("ocr_saved", 0.):.1f} OCR seconds saved')
+    print(f'identical tables: {identical}/{len(cached_texts)}')
+
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
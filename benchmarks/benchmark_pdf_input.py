@@ -0,0 +1,189 @@
+"""Peak memory of opening a large pdf upload with every kind of input taken
+by ExtractedDocumentGenerator.extract_from_stream.
+
+A pdf of the given size is written to a temporary directory (a few text
+pages and an embedded file of random bytes making up the size) and removed
+at the end, unless --pdf is given. Every input kind is then opened in
+its own process, the way a server or a batch job holds the pdf: as the bytes
+of an upload, a bytearray, an io.BytesIO, an open file or a path (read by
+MuPDF or memory mapped). The text of every page is read and the document is
+closed. The report gives the peak RSS of the process and how much of it came
+on top of the upload already in memory, for open_pdf and for the previous
+code, which needed the pdf as bytes (getvalue(), bytes() or read()) and
+wrapped them in another io.BytesIO.
+
+Memory mapped pages are counted in the RSS while they are read, but they are
+shared with the page cache and other processes and can be dropped by the
+kernel at any time.
+
+Usage:
+    python benchmarks/benchmark_pdf_input.py --size-mb 500
+"""
+import io
+import os
+import sys
+import json
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.PdfInput import open_pdf, close_pdf
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+INPUT_KINDS = ['bytes', 'bytearray', 'bytesio', 'file', 'path', 'path-mmap']
+
+# input kinds the previous code took
+PREVIOUS_KINDS = ['bytes', 'bytearray', 'bytesio', 'file']
+NUM_PAGES = 20
+CHUNK_SIZE = 1 << 24
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def create_large_pdf(pdf_file_path : str,
+                     size_mb : int) -> None:
+
+    fitz_doc = fitz.open()
+
+    for page_num in range(NUM_PAGES):
+        page = fitz_doc.new_page(width=612, height=792)
+        page.insert_text((72, 72), f'Page {page_num + 1} of a large document', fontsize=12)
+
+    # random bytes do not compress, the file ends up about size_mb large
+    fitz_doc.embfile_add('data.bin', os.urandom(size_mb << 20))
+    fitz_doc.save(pdf_file_path)
+    fitz_doc.close()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_peak_rss_mb() -> float:
+
+    # ru_maxrss survives the exec of the measuring process, the high water
+    # mark of its memory map does not
+    if os.path.isfile('/proc/self/status'):
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.
+
+    # in kilobytes on linux, bytes on macos
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def measure(input_kind : str,
+            pdf_file_path : str,
+            previous = False) -> dict:
+    """opens the pdf as input_kind in this process and returns the peak RSS
+    before (with the upload in memory) and after the extraction
+    """
+    pdf_file = None
+
+    if input_kind == 'bytes':
+        with open(pdf_file_path, 'rb') as upload:
+            source = upload.read()
+    elif input_kind == 'bytearray':
+        source = bytearray(os.path.getsize(pdf_file_path))
+        with open(pdf_file_path, 'rb') as upload:
+            upload.readinto(source)
+    elif input_kind == 'bytesio':
+        source = io.BytesIO()
+        with open(pdf_file_path, 'rb') as upload:
+            for chunk in iter(lambda: upload.read(CHUNK_SIZE), b''):
+                source.write(chunk)
+    elif input_kind == 'file':
+        source = pdf_file = open(pdf_file_path, 'rb')
+    else:
+        source = pdf_file_path
+
+    before_mb = get_peak_rss_mb()
+
+    if previous:
+        if isinstance(source, io.BytesIO):
+            source = source.getvalue()
+        elif isinstance(source, bytearray):
+            source = bytes(source)
+        elif pdf_file is not None:
+            source = pdf_file.read()
+        fitz_doc = fitz.open('pdf', io.BytesIO(source))
+    else:
+        fitz_doc = open_pdf(source, memory_map=input_kind == 'path-mmap')
+
+    if pdf_file is not None:
+        pdf_file.close()
+
+    num_chars = sum(len(page.get_text()) for page in fitz_doc)
+
+    if previous:
+        fitz_doc.close()
+    else:
+        close_pdf(fitz_doc)
+
+    return {'before_mb' : before_mb,
+            'peak_mb' : get_peak_rss_mb(),
+            'chars' : num_chars}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Measure the peak memory of opening a large pdf.')
+    parser.add_argument('--size-mb', type=int, default=500,
+                        help='size of the pdf')
+    parser.add_argument('--pdf',
+                        help='pdf file to write (or reuse if it exists) and keep, '
+                             'by default a temporary file is written and removed')
+    parser.add_argument('--measure', choices=INPUT_KINDS,
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--previous', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure is not None:
+        print(json.dumps(measure(args.measure, args.pdf, args.previous)))
+        return 0
+
+    temp_dir_path = None
+    if args.pdf is not None:
+        pdf_file_path = args.pdf
+    else:
+        temp_dir_path = tempfile.mkdtemp()
+        pdf_file_path = os.path.join(temp_dir_path, f'large_{args.size_mb}mb.pdf')
+
+    try:
+        if not os.path.isfile(pdf_file_path):
+            create_large_pdf(pdf_file_path, args.size_mb)
+
+        file_mb = os.path.getsize(pdf_file_path) / float(1 << 20)
+        print(f'{pdf_file_path}: {file_mb:.0f} MB\n')
+        print(f'{"input":<11}{"code":<10}{"upload RSS (MB)":>17}{"peak RSS (MB)":>15}{"added (MB)":>12}')
+
+        # every run is a fresh process so the peaks do not mix
+        for input_kind in INPUT_KINDS:
+            for previous in ([True, False] if input_kind in PREVIOUS_KINDS else [False]):
+                command = [sys.executable, os.path.realpath(__file__), '--measure', input_kind, '--pdf', pdf_file_path]
+                if previous:
+                    command.append('--previous')
+
+                output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+
+                print(f'{input_kind:<11}{"previous" if previous else "open_pdf":<10}'
+                      f'{result["before_mb"]:>17.0f}{result["peak_mb"]:>15.0f}'
+                      f'{result["peak_mb"] - result["before_mb"]:>12.0f}')
+    finally:
+        if temp_dir_path is not None:
+            shutil.rmtree(temp_dir_path, ignore_errors=True)
+
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""Per-stage benchmark of the extraction pipeline over the pdfs in data/.
+
+Usage:
+    python benchmarks/benchmark_pipeline.py --output bench.json
+    python benchmarks/benchmark_pipeline.py --output new.json --baseline bench.json
+
+When a baseline is given, every stage whose time per page grew by more than
+--threshold (relative) is reported as a regression and the exit code is 1.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.ExtractedDocumentGenerator import ExtractedDocumentGenerator
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DATA_DIR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'data')
+DEFAULT_PDF_FILES = ['sample_short.pdf',
+                     'sample_long.pdf',
+                     'national-capitals.pdf',
+                     'input1.pdf',
+                     'input2.pdf']
+
+STAGES = ['pixmap_render',
+          'detection',
+          'box_generation',
+          'get_textbox',
+          'table_render',
+          'table_structure',
+          'ocr',
+          'clean_text',
+          'segmentation',
+          'json_serialization']
+
+DEFAULT_REGRESSION_THRESHOLD = 0.1
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_peak_rss_mb() -> float:
+    """returns the peak resident set size of this process in MB"""
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    if sys.platform == 'darwin':
+        return peak_rss / (1024 * 1024)
+    return peak_rss / 1024
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def benchmark_document(doc_gen : ExtractedDocumentGenerator,
+                       pdf_file_path : str) -> dict:
+
+    start_time = time.perf_counter()
+    extracted_doc = doc_gen.extract_from_path(pdf_file_path)
+
+    metrics = extracted_doc.metrics
+    with metrics.time('json_serialization'):
+        json.dumps(extracted_doc.get_json_dict())
+
+    total_seconds = time.perf_counter() - start_time
+
+    return {'pages' : extracted_doc.num_pages,
+            'text_blocks' : extracted_doc.num_text_blocks,
+            'total_seconds' : total_seconds,
+            'pages_per_sec' : extracted_doc.num_pages / total_seconds,
+            'stage_seconds' : {stage : metrics.stage_seconds.get(stage, 0.) for stage in STAGES},
+            'stage_calls' : {stage : metrics.stage_calls.get(stage, 0) for stage in STAGES},
+            'counters' : dict(metrics.counters)}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def median_result(runs : list) -> dict:
+    """combines repeated runs of a document by taking the median of every time"""
+
+    result = dict(runs[0])
+    result['total_seconds'] = statistics.median(run['total_seconds'] for run in runs)
+    result['pages_per_sec'] = result['pages'] / result['total_seconds']
+    result['stage_seconds'] = {stage : statistics.median(run['stage_seconds'][stage] for run in runs)
+                               for stage in STAGES}
+    return result
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def summarize(documents : dict) -> dict:
+
+    total_pages = sum(doc['pages'] for doc in documents.values())
+    total_seconds = sum(doc['total_seconds'] for doc in documents.values())
+
+    stage_seconds = {stage : sum(doc['stage_seconds'][stage] for doc in documents.values())
+                     for stage in STAGES}
+
+    return {'pages' : total_pages,
+            'total_seconds' : total_seconds,
+            'pages_per_sec' : total_pages / total_seconds,
+            'stage_seconds' : stage_seconds,
+            'stage_ms_per_page' : {stage : 1000. * seconds / total_pages
+                                   for stage, seconds in stage_seconds.items()}}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def find_regressions(summary : dict,
+                     baseline_summary : dict,
+                     threshold : float) -> list:
+    """compares the per page stage times against a baseline run
+
+    Returns:
+        list: (stage, baseline ms/page, current ms/page) for each regression
+    """
+    regressions = []
+
+    ms_per_page = dict(summary['stage_ms_per_page'])
+    ms_per_page['total'] = 1000. / summary['pages_per_sec']
+
+    baseline_ms_per_page = dict(baseline_summary['stage_ms_per_page'])
+    baseline_ms_per_page['total'] = 1000. / baseline_summary['pages_per_sec']
+
+    for stage, current in ms_per_page.items():
+        baseline = baseline_ms_per_page.get(stage)
+        if baseline is None or baseline == 0.:
+            continue
+
+        if (current - baseline) / baseline > threshold:
+            regressions.append((stage, baseline, current))
+
+    return regressions
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def print_summary(summary : dict) -> None:
+
+    print(f'{summary["pages"]} pages in {summary["total_seconds"]:.2f}s '
+          f'({summary["pages_per_sec"]:.2f} pages/s), peak RSS {summary["peak_rss_mb"]:.0f} MB')
+
+    for stage in STAGES:
+        print(f'  {stage:<20} {summary["stage_seconds"][stage]:9.3f}s '
+              f'{summary["stage_ms_per_page"][stage]:9.2f} ms/page')
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Per-stage benchmark of the extraction pipeline.')
+    parser.add_argument('pdf_files', nargs='*',
+                        help='pdf files to benchmark. Defaults to the sample pdfs in data/')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='number of times each document is processed, the median is reported')
+    parser.add_argument('--output', help='file path to save the results to as JSON')
+    parser.add_argument('--baseline', help='results of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help='relative slow down of a stage that is flagged as a regression')
+    args = parser.parse_args()
+
+    pdf_file_paths = args.pdf_files
+    if len(pdf_file_paths) == 0:
+        pdf_file_paths = [os.path.join(DATA_DIR_PATH, name) for name in DEFAULT_PDF_FILES]
+
+    load_start_time = time.perf_counter()
+    doc_gen = ExtractedDocumentGenerator(collect_metrics=True)
+    load_seconds = time.perf_counter() - load_start_time
+
+    documents = {}
+    for pdf_file_path in pdf_file_paths:
+        runs = [benchmark_document(doc_gen, pdf_file_path) for _ in range(max(args.repeat, 1))]
+        documents[os.path.basename(pdf_file_path)] = median_result(runs)
+        print(f'{pdf_file_path}: {documents[os.path.basename(pdf_file_path)]["pages_per_sec"]:.2f} pages/s')
+
+    summary = summarize(documents)
+    summary['peak_rss_mb'] = get_peak_rss_mb()
+    summary['model_load_seconds'] = load_seconds
+
+    print_summary(summary)
+
+    results = {'timestamp' : time.time(),
+               'platform' : platform.platform(),
+               'python' : platform.python_version(),
+               'cpu_count' : os.cpu_count(),
+               'repeat' : args.repeat,
+               'summary' : summary,
+               'documents' : documents}
+
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    exit_code = 0
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = find_regressions(summary, baseline['summary'], args.threshold)
+        for stage, baseline_ms, current_ms in regressions:
+            print(f'REGRESSION {stage}: {baseline_ms:.2f} -> {current_ms:.2f} ms/page')
+
+        if len(regressions) > 0:
+            exit_code = 1
+
+    return exit_code
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Table throughput and OCR accuracy of adaptive table resolutions against the
+fixed 300 dpi render.
+
+Synthetic ruled tables of known text are drawn with font sizes from 6 to 12
+points, from a few rows up to a full page. Each table is extracted by the
+generator with the fixed resolution and with a TableResolution, and the
+extracted text is compared with the text drawn in the table. The report
+gives the tables/sec and the mean character accuracy of both.
+
+Usage:
+    python benchmarks/benchmark_table_resolution.py --ocr-text-height 32
+"""
+import os
+import sys
+import time
+import argparse
+import difflib
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.ExtractedDocumentGenerator import ExtractedDocumentGenerator, clean_text
+from ExDocGen.TableExtractor import table_to_text
+from ExDocGen.TableResolution import TableResolution, DEFAULT_OCR_TEXT_HEIGHT_PX
+from ExDocGen.Metrics import DocumentMetrics
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+FONT_SIZES = [6, 8, 10, 12]
+NUM_ROWS = [4, 12, 30]
+NUM_COLUMNS = 4
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def create_table_pdf() -> tuple:
+    """returns a pdf with one ruled table per page and, for every page, the
+    table rectangle and the expected table text
+    """
+    fitz_doc = fitz.open()
+    tables = []
+
+    for font_size in FONT_SIZES:
+        for num_rows in NUM_ROWS:
+            page = fitz_doc.new_page(width=612, height=792)
+
+            row_height = font_size * 2.
+            column_width = 468 / NUM_COLUMNS
+            num_rows = min(num_rows, int(700 // row_height))
+            rect = fitz.Rect(72, 48, 540, 48 + num_rows * row_height)
+
+            for row in range(num_rows + 1):
+                page.draw_line((rect.x0, rect.y0 + row * row_height), (rect.x1, rect.y0 + row * row_height))
+            for column in range(NUM_COLUMNS + 1):
+                page.draw_line((rect.x0 + column * column_width, rect.y0), (rect.x0 + column * column_width, rect.y1))
+
+            cells = []
+            for row in range(num_rows):
+                row_cells = []
+                for column in range(NUM_COLUMNS):
+                    text = f'Area {row + 1}' if column == 0 else f'{(row + 7) * (column + 3) * font_size:,}'
+                    page.insert_text((rect.x0 + column * column_width + 4,
+                                      rect.y0 + row * row_height + font_size * 1.4),
+                                     text, fontsize=font_size)
+                    row_cells.append(text)
+                cells.append(row_cells)
+
+            tables.append((rect, clean_text(table_to_text(cells)), font_size))
+
+    return fitz_doc, tables
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def run(doc_gen : ExtractedDocumentGenerator,
+        fitz_doc : fitz.Document,
+        tables : list) -> tuple:
+
+    metrics = DocumentMetrics('tables')
+    accuracies = []
+
+    start_time = time.perf_counter()
+    for page_number, (rect, expected_text, _) in enumerate(tables):
+        table_text = clean_text(doc_gen._extract_table_text(fitz_doc[page_number], rect, metrics))
+        accuracies.append(difflib.SequenceMatcher(None, expected_text, table_text).ratio())
+
+    return len(tables) / (time.perf_counter() - start_time), accuracies, metrics
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Compare adaptive table resolutions with the fixed 300 dpi render.')
+    parser.add_argument('--ocr-text-height', type=int, default=DEFAULT_OCR_TEXT_HEIGHT_PX,
+                        help='pixel height the table text is rendered at for the OCR')
+    args = parser.parse_args()
+
+    fitz_doc, tables = create_table_pdf()
+    doc_gen = ExtractedDocumentGenerator()
+
+    # the first table warms up the models, it is not timed
+    doc_gen._extract_table_text(fitz_doc[0], tables[0][0], DocumentMetrics('warmup'))
+
+    doc_gen.table_resolution = None
+    fixed_rate, fixed_accuracies, _ = run(doc_gen, fitz_doc, tables)
+
+    doc_gen.table_resolution = TableResolution(ocr_text_height_px=args.ocr_text_height)
+    adaptive_rate, adaptive_accuracies, metrics = run(doc_gen, fitz_doc, tables)
+
+    print(f'{"font":>5}{"rows":>6}{"structure dpi":>15}{"ocr dpi":>9}{"fixed acc":>11}{"adaptive acc":>14}')
+    for table_num, (rect, _, font_size) in enumerate(tables):
+        structure_dpi, ocr_dpi = doc_gen.table_resolution.get_table_dpis(fitz_doc[table_num], rect)
+        print(f'{font_size:>5}{int(rect.height // (font_size * 2)):>6}{structure_dpi:>15}{ocr_dpi:>9}'
+              f'{fixed_accuracies[table_num]:>11.3f}{adaptive_accuracies[table_num]:>14.3f}')
+
+    fixed_accuracy = sum(fixed_accuracies) / len(fixed_accuracies)
+    adaptive_accuracy = sum(adaptive_accuracies) / len(adaptive_accuracies)
+
+    print(f'\nfixed 300 dpi: {fixed_rate:.3f} tables/s, mean accuracy {fixed_accuracy:.3f}')
+    print(f'adaptive:      {adaptive_rate:.3f} tables/s, mean accuracy {adaptive_accuracy:.3f} '
+          f'({adaptive_rate / fixed_rate:.2f}x)')
+
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
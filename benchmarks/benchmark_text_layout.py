@@ -0,0 +1,225 @@
+"""Speed and accuracy of the layout found from the text layer of the pdfs
+(TextLayout) against the layout detector.
+
+Every page is classified from its text layer and timed. The boxes are scored
+with the COCO mAP of DetectionEval against a ground truth file (see
+benchmarks/sweep_detection.py), or without one against the boxes of the
+detector, which then tells how far the text layer agrees with the detector.
+For every --min-confidence the auto layout mode is simulated: the pages
+below it take the boxes and time of the detector, the others those of the
+text layer.
+
+Without --ground-truth and without a detector (--no-detector) only the
+speed, the confidences and the labels of the text layer are reported.
+
+Usage:
+    python benchmarks/benchmark_text_layout.py --pdfs data/*.pdf --no-detector
+    python benchmarks/benchmark_text_layout.py --ground-truth annotations.json --min-confidence 0.7 0.8 0.85
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from collections import Counter
+
+import fitz
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.ExtractedDocumentGenerator import (DEFAULT_MODEL_WEIGHTS_PATH, DEFAULT_MODEL_LOCATION,
+                                                 DEFAULT_MODEL_TYPE, DEFAULT_ONNX_MODEL_PATH)
+from ExDocGen.DetectorBackends import create_detector, BACKEND_TORCH, BACKEND_ONNX
+from ExDocGen.BoundingBox import generate_bounding_boxes, LABEL_DICT
+from ExDocGen.TextLayout import classify_page, TextLayoutConfig, DEFAULT_MIN_PAGE_CONFIDENCE
+from ExDocGen.DetectionEval import (create_coco_image, boxes_to_coco, create_coco_dataset, load_coco_dataset,
+                                    evaluate_detections, get_image_file_name)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DATA_DIR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'data')
+CONFIDENCE_BINS = [0., 0.5, 0.6, 0.7, 0.8, 0.9, 1.01]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def run_pages(pdf_file_paths : list,
+              detector = None,
+              image_ids = None) -> list:
+    """classifies every page from its text layer and, given a detector, detects
+    it. Given the image ids of a dataset only those pages are run.
+
+    Returns:
+        list: a dict per page with its COCO image, text layer labels,
+            confidence and time, and the detector labels and time
+    """
+    config = TextLayoutConfig()
+    pages = []
+
+    for pdf_file_path in pdf_file_paths:
+        with fitz.open(pdf_file_path) as fitz_doc:
+            for page_number, fitz_page in enumerate(fitz_doc):
+
+                file_name = get_image_file_name(pdf_file_path, page_number)
+                if image_ids is not None and file_name not in image_ids:
+                    continue
+
+                start_time = time.perf_counter()
+                labels, confidence = classify_page(fitz_page, config)
+                text_time = time.perf_counter() - start_time
+
+                # the same render as ExtractedDocumentGenerator._render_page
+                start_time = time.perf_counter()
+                pix = fitz_page.get_pixmap()
+                page_img = np.frombuffer(buffer=pix.samples, dtype=np.uint8).reshape((pix.height, pix.width, -1))
+
+                detected_labels = None
+                if detector is not None:
+                    detected_labels = detector.detect([page_img])[0]
+                detect_time = time.perf_counter() - start_time
+
+                image_id = image_ids[file_name] if image_ids is not None else len(pages) + 1
+                pages.append({'image' : create_coco_image(image_id, pdf_file_path, page_number, page_img),
+                              'text_labels' : labels,
+                              'confidence' : confidence,
+                              'text_time' : text_time,
+                              'detected_labels' : detected_labels,
+                              'detect_time' : detect_time})
+
+    return pages
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_detections(pages : list,
+                   min_confidence : float) -> tuple:
+    """returns the COCO detections and the time of the auto mode at
+    min_confidence, 0 is the text layer only and above 1 the detector only
+    """
+    detections = []
+    total_time = 0.
+
+    for page in pages:
+        if page['confidence'] >= min_confidence:
+            labels = page['text_labels']
+            total_time += page['text_time']
+        elif min_confidence > 1.:
+            labels = page['detected_labels']
+            total_time += page['detect_time']
+        else:
+            # the auto mode reads the text layer of the page first
+            labels = page['detected_labels']
+            total_time += page['text_time'] + page['detect_time']
+
+        detections.extend(boxes_to_coco(generate_bounding_boxes(labels), page['image']['id']))
+
+    return detections, total_time
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def print_text_layer_summary(pages : list) -> None:
+
+    text_time = sum(page['text_time'] for page in pages)
+    print(f'text layer: {len(pages)} pages, {len(pages) / text_time:.1f} pages/s, '
+          f'{1000. * text_time / len(pages):.2f} ms/page')
+
+    counts, _ = np.histogram([page['confidence'] for page in pages], bins=CONFIDENCE_BINS)
+    print('\npage confidence')
+    for low, high, count in zip(CONFIDENCE_BINS[:-1], CONFIDENCE_BINS[1:], counts):
+        print(f'  {low:.1f} - {min(high, 1.):.1f}: {count:>6}')
+
+    labels = Counter(LABEL_DICT[str(int(row[5]))] for page in pages for row in page['text_labels'])
+    print('\nboxes per label')
+    for label, count in labels.most_common():
+        print(f'  {label:<16}{count:>6}')
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Compare the layout from the text layer of pdfs with the detector.')
+    parser.add_argument('--pdfs', nargs='+',
+                        help='pdf files, defaults to every pdf in data/')
+    parser.add_argument('--ground-truth',
+                        help='COCO file with the ground truth boxes of the pages, defaults to the detector boxes')
+    parser.add_argument('--no-detector', action='store_true',
+                        help='only time the text layer (and score it against --ground-truth)')
+    parser.add_argument('--detector-backend', choices=[BACKEND_TORCH, BACKEND_ONNX], default=BACKEND_TORCH)
+    parser.add_argument('--onnx-path', default=DEFAULT_ONNX_MODEL_PATH)
+    parser.add_argument('--min-confidence', nargs='+', type=float, default=[DEFAULT_MIN_PAGE_CONFIDENCE],
+                        help='page confidences below which the auto mode detects a page')
+    parser.add_argument('--output',
+                        help='file path to save the JSON report to')
+    args = parser.parse_args()
+
+    pdf_file_paths = args.pdfs if args.pdfs else sorted(glob.glob(os.path.join(DATA_DIR_PATH, '*.pdf')))
+
+    detector = None
+    if not args.no_detector:
+        detector = create_detector(backend=args.detector_backend,
+                                   path_to_weights=DEFAULT_MODEL_WEIGHTS_PATH,
+                                   model_path=DEFAULT_MODEL_LOCATION,
+                                   model_type=DEFAULT_MODEL_TYPE,
+                                   onnx_path=args.onnx_path)
+
+    dataset = None
+    image_ids = None
+    if args.ground_truth is not None:
+        dataset = load_coco_dataset(args.ground_truth)
+        image_ids = {image['file_name'] : image['id'] for image in dataset['images']}
+
+    pages = run_pages(pdf_file_paths, detector, image_ids)
+    if len(pages) == 0:
+        print('no pages found', file=sys.stderr)
+        return 1
+
+    print_text_layer_summary(pages)
+
+    report = {'pages' : len(pages),
+              'text_layer_pages_per_sec' : len(pages) / sum(page['text_time'] for page in pages),
+              'settings' : []}
+
+    if dataset is None and detector is not None:
+        # the detector is the reference, it can not be scored itself
+        detections, _ = get_detections(pages, 2.)
+        dataset = create_coco_dataset([page['image'] for page in pages], detections)
+    elif dataset is not None:
+        # the pages not found in the pdfs are not scored
+        dataset['images'] = [page['image'] for page in pages]
+
+    if dataset is None:
+        return 0
+
+    settings = [('text', 0.)] + [(f'auto@{min_confidence:g}', min_confidence) for min_confidence in args.min_confidence]
+    if detector is not None and args.ground_truth is not None:
+        settings.append(('detector', 2.))
+
+    print(f'\nscored against {"the ground truth" if args.ground_truth is not None else "the detector"}')
+    print(f'{"setting":<16}{"pages/s":>9}{"detected":>10}{"mAP":>8}{"mAP50":>8}')
+
+    for name, min_confidence in settings:
+        if detector is None and 0. < min_confidence:
+            continue
+
+        detections, total_time = get_detections(pages, min_confidence)
+        num_detected = sum(page['confidence'] < min_confidence for page in pages)
+        result = {'name' : name,
+                  'min_confidence' : min_confidence,
+                  'pages_per_sec' : len(pages) / total_time,
+                  'pages_detected' : int(num_detected),
+                  **evaluate_detections(dataset, detections)}
+        report['settings'].append(result)
+
+        print(f'{name:<16}{result["pages_per_sec"]:>9.1f}{num_detected / len(pages):>10.0%}'
+              f'{result["map"]:>8.3f}{result["map50"]:>8.3f}')
+
+    if args.output is not None:
+        with open(args.output, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""First-page latency of a new generator, cold and warmed up.
+
+Every setting (detector backend, with or without warm-up) starts a fresh
+process, so the allocator, the kernel selection and the lazy initialization
+of the frameworks start from nothing as they do after a deploy. The process
+creates an ExtractedDocumentGenerator, extracts the first --pages pages of
+--pdf one at a time and then the first page again. The report gives the time
+to create the generator (of which warm-up), the latency of the first page,
+of the same page once the process is warm and the median of the other pages.
+
+Usage:
+    python benchmarks/benchmark_warm_up.py --pdf data/national-capitals.pdf --backends torch torchscript
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.DetectorBackends import DETECTOR_BACKENDS, BACKEND_TORCH, BACKEND_TORCHSCRIPT
+from ExDocGen.ExtractedDocumentGenerator import DEFAULT_WARM_UP_RUNS
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DATA_DIR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'data')
+DEFAULT_PDF_PATH = os.path.join(DATA_DIR_PATH, 'national-capitals.pdf')
+DEFAULT_PAGES = 5
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def run_setting(pdf_file_path : str,
+                num_pages : int,
+                generator_kwargs : dict) -> dict:
+    """runs in a fresh process, see the module docstring"""
+
+    from ExDocGen.ExtractedDocumentGenerator import ExtractedDocumentGenerator
+
+    with tempfile.TemporaryDirectory() as output_path:
+        start_time = time.perf_counter()
+        doc_gen = ExtractedDocumentGenerator(output_path=output_path, **generator_kwargs)
+        init_seconds = time.perf_counter() - start_time
+
+        page_seconds = []
+        start_time = time.perf_counter()
+        for _ in doc_gen.iter_pages_from_path(pdf_file_path, include_pages=[slice(0, num_pages)]):
+            page_seconds.append(time.perf_counter() - start_time)
+            start_time = time.perf_counter()
+
+        start_time = time.perf_counter()
+        for _ in doc_gen.iter_pages_from_path(pdf_file_path, include_pages=[0]):
+            pass
+        first_page_again = time.perf_counter() - start_time
+
+    return {'init_seconds' : init_seconds,
+            'warm_up_seconds' : sum(sum(seconds) for seconds in doc_gen.warm_up_seconds.values()),
+            'warm_up_runs' : doc_gen.warm_up_seconds,
+            'first_page_ms' : page_seconds[0] * 1000.,
+            'first_page_again_ms' : first_page_again * 1000.,
+            'later_pages_ms' : float(np.median(page_seconds[1:])) * 1000. if len(page_seconds) > 1 else None}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Compare the first-page latency of cold and warmed up generators.')
+    parser.add_argument('--pdf', default=DEFAULT_PDF_PATH,
+                        help='pdf extracted by every setting')
+    parser.add_argument('--pages', type=int, default=DEFAULT_PAGES,
+                        help='pages extracted after the generator is created')
+    parser.add_argument('--backends', nargs='+', choices=DETECTOR_BACKENDS, default=[BACKEND_TORCH, BACKEND_TORCHSCRIPT],
+                        help='detector backends to compare')
+    parser.add_argument('--onnx-path',
+                        help='model of the onnx backend')
+    parser.add_argument('--torchscript-path',
+                        help='traced model of the torchscript backend, traced from the weights when missing')
+    parser.add_argument('--warm-up-runs', type=int, default=DEFAULT_WARM_UP_RUNS)
+    parser.add_argument('--output',
+                        help='file path to save the JSON report to')
+    args = parser.parse_args()
+
+    settings = []
+    for backend in args.backends:
+        generator_kwargs = {'detector_backend' : backend}
+        if args.onnx_path is not None:
+            generator_kwargs['onnx_path'] = args.onnx_path
+        if args.torchscript_path is not None:
+            generator_kwargs['torchscript_path'] = args.torchscript_path
+
+        settings.append((f'{backend} cold', {**generator_kwargs, 'warm_up_runs' : 0}))
+        settings.append((f'{backend} warm', {**generator_kwargs, 'warm_up_runs' : args.warm_up_runs}))
+
+    # spawn, so no setting inherits the state of this process or of another
+    context = multiprocessing.get_context('spawn')
+    report = {}
+
+    print(f'{"setting":<20}{"init s":>9}{"warm-up s":>11}{"first page ms":>15}{"again ms":>10}'
+          f'{"later ms":>10}{"first/again":>13}')
+
+    for name, generator_kwargs in settings:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_setting, (args.pdf, args.pages, generator_kwargs))
+        report[name] = result
+
+        later_pages_ms = f'{result["later_pages_ms"]:>10.0f}' if result['later_pages_ms'] is not None else f'{"-":>10}'
+        print(f'{name:<20}{result["init_seconds"]:>9.1f}{result["warm_up_seconds"]:>11.1f}'
+              f'{result["first_page_ms"]:>15.0f}{result["first_page_again_ms"]:>10.0f}{later_pages_ms}'
+              f'{result["first_page_ms"] / result["first_page_again_ms"]:>12.2f}x')
+
+    if args.output is not None:
+        with open(args.output, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
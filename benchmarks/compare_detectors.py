@@ -0,0 +1,181 @@
+"""Accuracy vs speed of the layout detector backends on the pdfs in data/.
+
+The PyTorch backend is the reference. Every ONNX model given with --onnx (the
+float export and its quantized versions) is run over the same pages, and its
+boxes are matched to the reference boxes of the same label with an IoU of at
+least --iou. The report gives the time per page and the precision, recall and
+mean IoU of every backend against the reference.
+
+Usage:
+    python export_detector.py --quantize dynamic
+    python benchmarks/compare_detectors.py --onnx ExDocGen/weights/best.onnx ExDocGen/weights/best.dynamic-int8.onnx
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+import fitz
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.ExtractedDocumentGenerator import DEFAULT_MODEL_WEIGHTS_PATH, DEFAULT_MODEL_LOCATION, DEFAULT_MODEL_TYPE
+from ExDocGen.DetectorBackends import create_detector, BACKEND_TORCH, BACKEND_ONNX
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DATA_DIR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'data')
+DEFAULT_IOU_THRESHOLD = 0.5
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def load_page_images(pdf_file_paths : list) -> list:
+
+    page_imgs = []
+
+    for pdf_file_path in pdf_file_paths:
+        with fitz.open(pdf_file_path) as fitz_doc:
+            for page in fitz_doc:
+                pix = page.get_pixmap()
+                page_imgs.append(np.frombuffer(buffer=pix.samples, dtype=np.uint8).reshape((pix.height, pix.width, -1)))
+
+    return page_imgs
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def box_iou(box_a : np.array,
+            box_b : np.array) -> float:
+
+    inter_w = max(0., min(box_a[2], box_b[2]) - max(box_a[0], box_b[0]))
+    inter_h = max(0., min(box_a[3], box_b[3]) - max(box_a[1], box_b[1]))
+    inter = inter_w * inter_h
+
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+
+    return inter / (area_a + area_b - inter + 1e-9)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def match_boxes(reference : np.array,
+                candidate : np.array,
+                iou_threshold : float) -> list:
+    """greedily matches the candidate boxes (highest confidence first) to
+    unmatched reference boxes of the same class
+
+    Returns:
+        list: IoU of every matched pair
+    """
+    matched = set()
+    ious = []
+
+    for row in candidate[candidate[:, 4].argsort()[::-1]]:
+        best_iou, best_num = iou_threshold, None
+
+        for ref_num, ref_row in enumerate(reference):
+            if ref_num in matched or ref_row[5] != row[5]:
+                continue
+
+            iou = box_iou(ref_row, row)
+            if iou >= best_iou:
+                best_iou, best_num = iou, ref_num
+
+        if best_num is not None:
+            matched.add(best_num)
+            ious.append(best_iou)
+
+    return ious
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def run_detector(detector,
+                 page_imgs : list) -> tuple:
+
+    labels = []
+    start_time = time.perf_counter()
+
+    for page_img in page_imgs:
+        labels.extend(detector.detect([page_img]))
+
+    return labels, (time.perf_counter() - start_time) / max(len(page_imgs), 1)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def compare(reference_labels : list,
+            labels : list,
+            iou_threshold : float) -> dict:
+
+    num_reference = sum(len(page_labels) for page_labels in reference_labels)
+    num_detected = sum(len(page_labels) for page_labels in labels)
+
+    ious = []
+    for reference, candidate in zip(reference_labels, labels):
+        ious.extend(match_boxes(reference, candidate, iou_threshold))
+
+    return {'boxes' : num_detected,
+            'precision' : len(ious) / num_detected if num_detected > 0 else 1.,
+            'recall' : len(ious) / num_reference if num_reference > 0 else 1.,
+            'mean_iou' : float(np.mean(ious)) if len(ious) > 0 else 0.}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Compare the accuracy and speed of the detector backends.')
+    parser.add_argument('--onnx', nargs='+', default=[],
+                        help='ONNX models to compare with the PyTorch backend')
+    parser.add_argument('--pdfs', nargs='+',
+                        help='pdf files, defaults to every pdf in data/')
+    parser.add_argument('--threads', type=int,
+                        help='intra-op threads of the ONNX Runtime sessions')
+    parser.add_argument('--iou', type=float, default=DEFAULT_IOU_THRESHOLD,
+                        help='smallest IoU of a matching box')
+    parser.add_argument('--output',
+                        help='file path to save the JSON report to')
+    args = parser.parse_args()
+
+    pdf_file_paths = args.pdfs if args.pdfs else sorted(glob.glob(os.path.join(DATA_DIR_PATH, '*.pdf')))
+    page_imgs = load_page_images(pdf_file_paths)
+    print(f'{len(page_imgs)} pages from {len(pdf_file_paths)} pdfs')
+
+    reference = create_detector(BACKEND_TORCH,
+                                path_to_weights=DEFAULT_MODEL_WEIGHTS_PATH,
+                                model_path=DEFAULT_MODEL_LOCATION,
+                                model_type=DEFAULT_MODEL_TYPE)
+
+    # the first page warms up the model, it is not timed
+    reference.detect(page_imgs[:1])
+    reference_labels, seconds_per_page = run_detector(reference, page_imgs)
+
+    report = {BACKEND_TORCH : {'ms_per_page' : seconds_per_page * 1000.,
+                               **compare(reference_labels, reference_labels, args.iou)}}
+
+    for onnx_path in args.onnx:
+        detector = create_detector(BACKEND_ONNX, onnx_path=onnx_path, num_threads=args.threads)
+        detector.detect(page_imgs[:1])
+
+        labels, seconds_per_page = run_detector(detector, page_imgs)
+
+        report[os.path.basename(onnx_path)] = {'ms_per_page' : seconds_per_page * 1000.,
+                                               **compare(reference_labels, labels, args.iou)}
+
+    torch_ms = report[BACKEND_TORCH]['ms_per_page']
+
+    print(f'{"backend":<32}{"ms/page":>10}{"speedup":>9}{"boxes":>8}{"precision":>11}{"recall":>8}{"mean IoU":>10}')
+    for name, result in report.items():
+        print(f'{name:<32}{result["ms_per_page"]:>10.1f}{torch_ms / result["ms_per_page"]:>8.2f}x'
+              f'{result["boxes"]:>8}{result["precision"]:>11.3f}{result["recall"]:>8.3f}{result["mean_iou"]:>10.3f}')
+
+    if args.output is not None:
+        with open(args.output, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Regression check of the optimized TableExtractor backend against the eager one.
+
+Sample tables (ruled tables of a synthetic pdf with single and multi line
+cells, plus any table images given with --images) are read by both backends.
+The table text of every sample is compared and the time per table reported.
+The script exits with code 1 when the text of a table is less than
+--min-similarity similar to the eager text.
+
+Usage:
+    python benchmarks/compare_table_backends.py --images table.png
+"""
+import os
+import sys
+import time
+import argparse
+import difflib
+
+import fitz
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.TableExtractor import TableExtractor, table_to_text, TABLE_BACKEND_EAGER, TABLE_BACKEND_OPTIMIZED
+from ExDocGen.ExtractedDocumentGenerator import TABLE_RENDER_DPI
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DEFAULT_NUM_TABLES = 6
+DEFAULT_MIN_SIMILARITY = 0.95
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def create_sample_tables(num_tables : int) -> list:
+    """renders ruled tables like the ones found in statistical reports at the
+    resolution the generator renders tables at
+    """
+    table_imgs = []
+    fitz_doc = fitz.open()
+
+    for table_num in range(num_tables):
+        page = fitz_doc.new_page(width=612, height=792)
+        num_rows = 4 + table_num % 4
+        row_height = 20 if table_num % 2 == 0 else 34
+
+        table_rect = fitz.Rect(72, 72, 540, 72 + num_rows * row_height)
+
+        for row in range(num_rows + 1):
+            page.draw_line((72, 72 + row * row_height), (540, 72 + row * row_height))
+        for column in range(5):
+            page.draw_line((72 + column * 117, table_rect.y0), (72 + column * 117, table_rect.y1))
+
+        for row in range(num_rows):
+            for column in range(4):
+                # the taller rows of every other table hold two lines of text
+                text = f'Region {row + 1}' if column == 0 else f'{(row + 3) * (column + 7) * (table_num + 1):,}'
+                if row_height > 20 and column == 0:
+                    text += '\nTotal'
+                page.insert_textbox(fitz.Rect(76 + column * 117, 75 + row * row_height,
+                                              185 + column * 117, 72 + (row + 1) * row_height),
+                                    text, fontsize=10)
+
+        pix = page.get_pixmap(clip=table_rect, dpi=TABLE_RENDER_DPI)
+        table_imgs.append(np.frombuffer(buffer=pix.samples, dtype=np.uint8).reshape((pix.height, pix.width, -1)))
+
+    fitz_doc.close()
+
+    return table_imgs
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def read_tables(table_extractor : TableExtractor,
+                table_imgs : list) -> tuple:
+
+    # the first table warms up the models, it is not timed
+    table_extractor.extract_table(table_imgs[0])
+
+    table_texts = []
+    start_time = time.perf_counter()
+
+    for table_img in table_imgs:
+        table_texts.append(table_to_text(table_extractor.extract_table(table_img)))
+
+    return table_texts, (time.perf_counter() - start_time) / len(table_imgs)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Compare the table text of the TableExtractor backends.')
+    parser.add_argument('--tables', type=int, default=DEFAULT_NUM_TABLES,
+                        help='number of synthetic sample tables')
+    parser.add_argument('--images', nargs='+', default=[],
+                        help='images of tables rendered at 300 dpi')
+    parser.add_argument('--min-similarity', type=float, default=DEFAULT_MIN_SIMILARITY,
+                        help='smallest allowed similarity of a table text to the eager text')
+    args = parser.parse_args()
+
+    table_imgs = create_sample_tables(args.tables)
+    for image_path in args.images:
+        table_imgs.append(np.asarray(Image.open(image_path).convert('RGB')))
+
+    eager_texts, eager_seconds = read_tables(TableExtractor(backend=TABLE_BACKEND_EAGER), table_imgs)
+    optimized_texts, optimized_seconds = read_tables(TableExtractor(backend=TABLE_BACKEND_OPTIMIZED), table_imgs)
+
+    print(f'eager     {eager_seconds:.2f}s per table')
+    print(f'optimized {optimized_seconds:.2f}s per table ({eager_seconds / optimized_seconds:.2f}x)')
+
+    failed = 0
+    for table_num, (eager_text, optimized_text) in enumerate(zip(eager_texts, optimized_texts)):
+        similarity = difflib.SequenceMatcher(None, eager_text, optimized_text).ratio()
+        status = 'ok' if similarity >= args.min_similarity else 'FAILED'
+
+        print(f'table {table_num}: similarity {similarity:.3f} {status}')
+        if similarity < args.min_similarity:
+            failed += 1
+            print(f'  eager:     {eager_text}')
+            print(f'  optimized: {optimized_text}')
+
+    if failed > 0:
+        print(f'FAILED: {failed} of {len(table_imgs)} tables differ from the eager backend')
+        return 1
+
+    print('PASSED: the optimized backend matches the eager backend')
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
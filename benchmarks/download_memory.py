@@ -0,0 +1,115 @@
+"""Measures the memory and time needed to prepare an extracted document for
+download in the web app.
+
+A synthetic ExtractedDocument (1,000 pages by default) is serialized with the
+old method of the web app (json.dumps, base64 and an html page holding the data
+URI), with ExtractedDocument.to_bytes and with ExtractedDocument.write into
+a temporary file as the web app does now, in every format. The peak traced
+memory, the time and the size of the result are printed for each method.
+
+Usage:
+    python benchmarks/download_memory.py --pages 1000
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.ExtractedDocument import ExtractedDocument, DocumentPage, FORMAT_JSON, FORMAT_JSONL
+from ExDocGen.MemoryBudget import MB
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DEFAULT_NUM_PAGES = 1000
+BLOCKS_PER_PAGE = 12
+
+PARAGRAPH = ('The quick brown fox jumps over the lazy dog. Statistical tables are '
+             'repeated on many pages of a report. This sentence is here to fill the '
+             'page with text so the document has a realistic size. ')
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def create_synthetic_document(num_pages : int) -> ExtractedDocument:
+
+    extracted_doc = ExtractedDocument('synthetic.pdf')
+
+    for page_number in range(num_pages):
+        page = DocumentPage(page_number)
+        for block_number in range(BLOCKS_PER_PAGE):
+            page.add_text_block(PARAGRAPH * 2, .9, 'Text',
+                                bbox=[72., 60. * block_number, 540., 60. * block_number + 50.])
+        extracted_doc.add_page(page)
+
+    return extracted_doc
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def old_download(extracted_doc : ExtractedDocument) -> bytes:
+    """the html page the web app used to build for a download"""
+
+    json_string = json.dumps(extracted_doc.get_json_dict())
+    b64 = base64.b64encode(json_string.encode()).decode()
+    html = f'<a download="extracted_document.json" href="data:file/txt;base64,{b64}" id="download"></a>'
+    return html.encode()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def file_download(extracted_doc : ExtractedDocument,
+                  output_format : str,
+                  compress = False) -> int:
+    """writes the download to a temporary file like the web app, returns
+    its size
+    """
+    with tempfile.TemporaryFile() as download_file:
+        extracted_doc.write(download_file, output_format, compress)
+        return download_file.tell()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def measure(name : str,
+            function) -> None:
+
+    tracemalloc.start()
+    start_time = time.perf_counter()
+
+    data = function()
+
+    elapsed = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = data if isinstance(data, int) else len(data)
+    print(f'{name:<22} peak {peak / MB:8.1f} MB  time {elapsed:6.2f}s  size {size / MB:8.2f} MB')
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Compare the memory used to prepare a download.')
+    parser.add_argument('--pages', type=int, default=DEFAULT_NUM_PAGES,
+                        help='number of pages in the synthetic document')
+    args = parser.parse_args()
+
+    print(f'creating a {args.pages} page document')
+    extracted_doc = create_synthetic_document(args.pages)
+
+    measure('json + base64 + html', lambda: old_download(extracted_doc))
+    measure('json', lambda: extracted_doc.to_bytes(FORMAT_JSON))
+    measure('json gzip', lambda: extracted_doc.to_bytes(FORMAT_JSON, compress=True))
+    measure('jsonl', lambda: extracted_doc.to_bytes(FORMAT_JSONL))
+    measure('jsonl gzip', lambda: extracted_doc.to_bytes(FORMAT_JSONL, compress=True))
+    measure('json file', lambda: file_download(extracted_doc, FORMAT_JSON))
+    measure('json gzip file', lambda: file_download(extracted_doc, FORMAT_JSON, compress=True))
+
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Load test for the local extraction service started with serve.py.
+
+Sends --requests uploads of a pdf from --concurrency client threads and
+reports the time to the first page, the total latency and the page rate.
+
+Usage:
+    python serve.py --port 8080 &
+    python benchmarks/load_test_service.py data/sample_short.pdf --concurrency 8 --requests 32
+"""
+import sys
+import json
+import time
+import argparse
+import statistics
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def send_request(url : str,
+                 pdf_bytes : bytes) -> dict:
+
+    request = urllib.request.Request(url, data=pdf_bytes, method='POST',
+                                     headers={'Content-Type' : 'application/pdf'})
+    start_time = time.perf_counter()
+    first_page_seconds = None
+    num_pages = 0
+
+    try:
+        with urllib.request.urlopen(request) as response:
+            for line in response:
+                if first_page_seconds is None:
+                    first_page_seconds = time.perf_counter() - start_time
+                if 'page_number' in json.loads(line):
+                    num_pages += 1
+    except urllib.error.HTTPError as error:
+        return {'status' : error.code}
+
+    return {'status' : 200,
+            'pages' : num_pages,
+            'first_page_seconds' : first_page_seconds,
+            'total_seconds' : time.perf_counter() - start_time}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def percentile(values : list,
+               fraction : float) -> float:
+
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Load test the local extraction service.')
+    parser.add_argument('pdf_file', help='pdf file uploaded by every request')
+    parser.add_argument('--url', default='http://127.0.0.1:8080/extract')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=16)
+    args = parser.parse_args()
+
+    with open(args.pdf_file, 'rb') as pdf_file:
+        pdf_bytes = pdf_file.read()
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda _: send_request(args.url, pdf_bytes), range(args.requests)))
+    elapsed = time.perf_counter() - start_time
+
+    succeeded = [result for result in results if result['status'] == 200]
+    rejected = len(results) - len(succeeded)
+    total_pages = sum(result['pages'] for result in succeeded)
+
+    print(f'{len(succeeded)} requests succeeded, {rejected} rejected, in {elapsed:.2f}s')
+    print(f'{total_pages / elapsed:.2f} pages/s over all requests')
+
+    if len(succeeded) > 0:
+        first_page = [result['first_page_seconds'] for result in succeeded]
+        total = [result['total_seconds'] for result in succeeded]
+        print(f'time to first page: median {statistics.median(first_page):.3f}s p95 {percentile(first_page, .95):.3f}s')
+        print(f'request latency:    median {statistics.median(total):.3f}s p95 {percentile(total, .95):.3f}s')
+
+    return 0 if rejected == 0 else 1
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
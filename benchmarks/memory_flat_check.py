@@ -0,0 +1,139 @@
+"""Checks that the memory of a bounded-memory extraction stays flat.
+
+A synthetic pdf (5,000 pages by default) with headers, footers, paragraphs and
+a ruled table on every page is generated and streamed through the generator
+with a MemoryBudget into a JSON file. The RSS is sampled while the pages are
+processed. After a warm-up period (models and caches reaching their steady
+state) the RSS may not grow by more than --tolerance-mb, otherwise the script
+exits with code 1.
+
+This is a manual check of the full pipeline, it needs the detector and table
+models. tests/test_memory_budget.py runs the same check over the model-free
+part of the path with pytest.
+
+Usage:
+    python benchmarks/memory_flat_check.py --pages 5000 --max-rss-mb 4096
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.ExtractedDocumentGenerator import ExtractedDocumentGenerator
+from ExDocGen.ExtractedDocument import ExtractedDocumentWriter
+from ExDocGen.MemoryBudget import MemoryBudget, get_rss_bytes, MB
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DEFAULT_NUM_PAGES = 5000
+DEFAULT_WARMUP_FRACTION = 0.1
+DEFAULT_TOLERANCE_MB = 64.
+SAMPLE_INTERVAL = 25
+
+PARAGRAPH = ('The quick brown fox jumps over the lazy dog. Statistical tables are '
+             'repeated on many pages of a report. This sentence is here to fill the '
+             'page with text so the detector finds a paragraph. ')
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def create_synthetic_pdf(pdf_file_path : str,
+                         num_pages : int) -> None:
+    """writes a pdf of letter sized pages which all have a header, a footer,
+    two paragraphs and a 6 x 4 ruled table
+    """
+    fitz_doc = fitz.open()
+
+    for page_number in range(num_pages):
+        page = fitz_doc.new_page(width=612, height=792)
+
+        page.insert_text((72, 40), 'Synthetic Statistical Report', fontsize=9)
+        page.insert_text((300, 760), f'Page {page_number + 1}', fontsize=9)
+
+        page.insert_textbox(fitz.Rect(72, 80, 540, 220), PARAGRAPH * 3, fontsize=11)
+        page.insert_textbox(fitz.Rect(72, 230, 540, 370), PARAGRAPH * 3, fontsize=11)
+
+        for row in range(7):
+            y = 400 + row * 30
+            page.draw_line((72, y), (540, y))
+        for column in range(5):
+            x = 72 + column * 117
+            page.draw_line((x, 400), (x, 580))
+        for row in range(6):
+            for column in range(4):
+                page.insert_text((78 + column * 117, 420 + row * 30),
+                                 f'R{row}C{column} {row * column + page_number % 7}',
+                                 fontsize=10)
+
+    fitz_doc.save(pdf_file_path)
+    fitz_doc.close()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Check that a bounded-memory extraction has flat memory.')
+    parser.add_argument('--pages', type=int, default=DEFAULT_NUM_PAGES,
+                        help='number of pages in the synthetic pdf')
+    parser.add_argument('--max-rss-mb', type=float,
+                        help='RSS ceiling given to the MemoryBudget')
+    parser.add_argument('--warmup-fraction', type=float, default=DEFAULT_WARMUP_FRACTION,
+                        help='fraction of the pages processed before the RSS baseline is taken')
+    parser.add_argument('--tolerance-mb', type=float, default=DEFAULT_TOLERANCE_MB,
+                        help='allowed RSS growth after the warm-up')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_file_path = os.path.join(tmp_dir, 'synthetic.pdf')
+        json_file_path = os.path.join(tmp_dir, 'synthetic.json')
+
+        print(f'creating a {args.pages} page pdf')
+        create_synthetic_pdf(pdf_file_path, args.pages)
+
+        doc_gen = ExtractedDocumentGenerator(memory_budget=MemoryBudget(rss_ceiling_mb=args.max_rss_mb))
+
+        warmup_pages = max(int(args.pages * args.warmup_fraction), 1)
+        samples = []
+        start_time = time.perf_counter()
+
+        pages = doc_gen.iter_pages_from_path(pdf_file_path)
+
+        with ExtractedDocumentWriter(json_file_path, pdf_file_path) as writer:
+            for extracted_page in pages:
+                writer.write_page(extracted_page)
+
+                if writer.num_pages % SAMPLE_INTERVAL == 0:
+                    rss_mb = get_rss_bytes() / MB
+                    samples.append((writer.num_pages, rss_mb))
+                    print(f'\rpage {writer.num_pages}/{args.pages} RSS {rss_mb:.0f} MB', end='', flush=True)
+
+        elapsed = time.perf_counter() - start_time
+        print(f'\n{writer.num_pages} pages in {elapsed:.1f}s ({writer.num_pages / elapsed:.2f} pages/s)')
+
+    steady_samples = [rss_mb for num_pages, rss_mb in samples if num_pages >= warmup_pages]
+    if len(steady_samples) < 2:
+        print('not enough pages to measure the memory growth')
+        return 1
+
+    baseline_mb = steady_samples[0]
+    peak_mb = max(steady_samples)
+    growth_mb = peak_mb - baseline_mb
+
+    print(f'RSS after warm-up {baseline_mb:.0f} MB, peak {peak_mb:.0f} MB, '
+          f'final {steady_samples[-1]:.0f} MB, growth {growth_mb:.0f} MB')
+
+    if growth_mb > args.tolerance_mb:
+        print(f'FAILED: memory grew by more than {args.tolerance_mb:.0f} MB')
+        return 1
+
+    print('PASSED: memory is flat')
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
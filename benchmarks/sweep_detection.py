@@ -0,0 +1,254 @@
+"""Speed against accuracy of the layout detector settings, scored against
+ground truth annotations of our documents.
+
+Every combination of the detector backends, input sizes (PyTorch backend
+only, the ONNX models have the input size they were exported with),
+confidence thresholds, non max suppression IoU thresholds and with or
+without the removal of overlapping boxes by generate_bounding_boxes is run
+over the annotated pages. The boxes of generate_bounding_boxes are scored
+with the COCO mAP of every LABEL_DICT class. The report gives the pages/sec
+and mAP of every setting, marks the settings on the Pareto front (no other
+setting is both faster and more accurate) and lists the AP of every class.
+
+The ground truth is a COCO file whose images are named like the page images
+the generator saves (<pdf name>_page_<NNN>_image.png, at 72 dpi) and whose
+categories are named like the LABEL_DICT classes. --export-ground-truth
+writes the boxes of the default setting in that form, to be corrected by
+hand (e.g. in an annotation tool) into the ground truth.
+
+Usage:
+    python benchmarks/sweep_detection.py --export-ground-truth annotations.json
+    python benchmarks/sweep_detection.py --ground-truth annotations.json \\
+        --sizes 512 640 792 --conf 0.1 0.25 --iou 0.45 0.6 --onnx ExDocGen/weights/best.onnx
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import itertools
+
+import fitz
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.ExtractedDocumentGenerator import DEFAULT_MODEL_WEIGHTS_PATH, DEFAULT_MODEL_LOCATION, DEFAULT_MODEL_TYPE
+from ExDocGen.DetectorBackends import (create_detector, BACKEND_TORCH, BACKEND_ONNX, DETECTION_SIZE,
+                                       CONF_THRESHOLD, IOU_THRESHOLD)
+from ExDocGen.BoundingBox import generate_bounding_boxes
+from ExDocGen.DetectionEval import (create_coco_image, boxes_to_coco, create_coco_dataset, load_coco_dataset,
+                                    evaluate_detections, get_pareto_front, get_image_file_name, COCO_CATEGORIES)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DATA_DIR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'data')
+LABEL_COLUMN_WIDTH = 9
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def load_pages(pdf_file_paths : list,
+               images = None) -> tuple:
+    """returns the page images of the pdfs and their COCO images. Given the
+    images of a dataset, only the pages of those images are loaded, with
+    their ids.
+    """
+    image_ids = {image['file_name'] : image['id'] for image in images} if images is not None else None
+
+    page_imgs = []
+    coco_images = []
+
+    for pdf_file_path in pdf_file_paths:
+        with fitz.open(pdf_file_path) as fitz_doc:
+            for page_number, page in enumerate(fitz_doc):
+
+                file_name = get_image_file_name(pdf_file_path, page_number)
+                if image_ids is not None and file_name not in image_ids:
+                    continue
+
+                # the same render as ExtractedDocumentGenerator._render_page
+                pix = page.get_pixmap()
+                page_img = np.frombuffer(buffer=pix.samples, dtype=np.uint8).reshape((pix.height, pix.width, -1))
+
+                image_id = image_ids[file_name] if image_ids is not None else len(coco_images) + 1
+                page_imgs.append(page_img)
+                coco_images.append(create_coco_image(image_id, pdf_file_path, page_number, page_img))
+
+    return page_imgs, coco_images
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def run_setting(detector,
+                page_imgs : list,
+                coco_images : list,
+                size,
+                clean_boxes : bool) -> tuple:
+    """returns the COCO detections of the pages and the pages/sec of
+    detection and box generation
+    """
+    detections = []
+    start_time = time.perf_counter()
+
+    for page_img, coco_image in zip(page_imgs, coco_images):
+        if size is None:
+            labels = detector.detect([page_img])[0]
+        else:
+            labels = detector.detect([page_img], size=size)[0]
+
+        bounding_boxes = generate_bounding_boxes(labels, clean_boxes=clean_boxes)
+        detections.extend(boxes_to_coco(bounding_boxes, coco_image['id']))
+
+    return detections, len(page_imgs) / (time.perf_counter() - start_time)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def create_detectors(args : argparse.Namespace) -> dict:
+
+    detectors = {}
+
+    if not args.no_torch:
+        detectors[BACKEND_TORCH] = create_detector(BACKEND_TORCH,
+                                                   path_to_weights=DEFAULT_MODEL_WEIGHTS_PATH,
+                                                   model_path=DEFAULT_MODEL_LOCATION,
+                                                   model_type=DEFAULT_MODEL_TYPE)
+
+    for onnx_path in args.onnx:
+        detectors[os.path.basename(onnx_path)] = create_detector(BACKEND_ONNX,
+                                                                 onnx_path=onnx_path,
+                                                                 num_threads=args.threads)
+
+    return detectors
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def print_report(results : list) -> None:
+
+    pareto_names = set(result['name'] for result in get_pareto_front(results))
+    results = sorted(results, key=lambda result: -result['pages_per_sec'])
+
+    name_width = max(len(result['name']) for result in results) + 2
+
+    print(f'\n{"setting":<{name_width}}{"pages/s":>9}{"mAP":>8}{"mAP50":>8}{"boxes":>8}  pareto')
+    for result in results:
+        print(f'{result["name"]:<{name_width}}{result["pages_per_sec"]:>9.2f}{result["map"]:>8.3f}'
+              f'{result["map50"]:>8.3f}{result["num_boxes"]:>8}  {"*" if result["name"] in pareto_names else ""}')
+
+    labels = [category['name'] for category in COCO_CATEGORIES]
+
+    print(f'\nAP per class (- has no ground truth boxes)\n{"setting":<{name_width}}' +
+          ''.join(f'{label[:LABEL_COLUMN_WIDTH - 1]:>{LABEL_COLUMN_WIDTH}}' for label in labels))
+    for result in results:
+        print(f'{result["name"]:<{name_width}}' +
+              ''.join(f'{"-":>{LABEL_COLUMN_WIDTH}}' if result['classes'][label] is None else
+                      f'{result["classes"][label]["ap"]:>{LABEL_COLUMN_WIDTH}.3f}' for label in labels))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Sweep the layout detector settings and score them against ground truth.')
+    parser.add_argument('--ground-truth',
+                        help='COCO file with the ground truth boxes of the pages')
+    parser.add_argument('--export-ground-truth',
+                        help='write the boxes of the default setting as a COCO file to correct by hand, and stop')
+    parser.add_argument('--pdfs', nargs='+',
+                        help='pdf files, defaults to every pdf in data/')
+    parser.add_argument('--onnx', nargs='+', default=[],
+                        help='ONNX models to sweep as well')
+    parser.add_argument('--no-torch', action='store_true',
+                        help='only sweep the ONNX models')
+    parser.add_argument('--threads', type=int,
+                        help='intra-op threads of the ONNX Runtime sessions')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[max(DETECTION_SIZE)],
+                        help='longest side of the page image given to the PyTorch model')
+    parser.add_argument('--conf', nargs='+', type=float, default=[CONF_THRESHOLD],
+                        help='confidence thresholds')
+    parser.add_argument('--iou', nargs='+', type=float, default=[IOU_THRESHOLD],
+                        help='IoU thresholds of the non max suppression')
+    parser.add_argument('--clean-boxes', choices=['on', 'off', 'both'], default='both',
+                        help='remove overlapping boxes in generate_bounding_boxes')
+    parser.add_argument('--predictions-dir',
+                        help='directory the COCO detections of every setting are saved to')
+    parser.add_argument('--output',
+                        help='file path to save the JSON report to')
+    args = parser.parse_args()
+
+    if args.ground_truth is None and args.export_ground_truth is None:
+        parser.error('one of --ground-truth or --export-ground-truth is needed')
+
+    pdf_file_paths = args.pdfs if args.pdfs else sorted(glob.glob(os.path.join(DATA_DIR_PATH, '*.pdf')))
+    detectors = create_detectors(args)
+
+    if args.export_ground_truth is not None:
+        page_imgs, coco_images = load_pages(pdf_file_paths)
+        backend, detector = next(iter(detectors.items()))
+
+        detector.set_thresholds(CONF_THRESHOLD, IOU_THRESHOLD)
+        detections, _ = run_setting(detector, page_imgs, coco_images,
+                                    max(DETECTION_SIZE) if backend == BACKEND_TORCH else None, True)
+
+        with open(args.export_ground_truth, 'w') as dataset_file:
+            json.dump(create_coco_dataset(coco_images, detections), dataset_file, indent=2)
+
+        print(f'{len(detections)} boxes of {len(coco_images)} pages written to {args.export_ground_truth}')
+        return 0
+
+    dataset = load_coco_dataset(args.ground_truth)
+    page_imgs, coco_images = load_pages(pdf_file_paths, dataset['images'])
+    print(f'{len(page_imgs)} of {len(dataset["images"])} annotated pages found in {len(pdf_file_paths)} pdfs')
+
+    if len(page_imgs) == 0:
+        return 1
+
+    # the pages not found in the pdfs are not scored
+    dataset['images'] = coco_images
+
+    clean_options = {'on' : [True], 'off' : [False], 'both' : [True, False]}[args.clean_boxes]
+    results = []
+
+    for backend, detector in detectors.items():
+        sizes = args.sizes if backend == BACKEND_TORCH else [None]
+
+        for size in sizes:
+            # the first page warms up the model at this size, it is not timed
+            run_setting(detector, page_imgs[:1], coco_images[:1], size, True)
+
+            for conf_threshold, iou_threshold, clean_boxes in itertools.product(args.conf, args.iou, clean_options):
+                detector.set_thresholds(conf_threshold, iou_threshold)
+                detections, pages_per_sec = run_setting(detector, page_imgs, coco_images, size, clean_boxes)
+
+                name = (f'{backend}{"" if size is None else f"@{size}"} conf={conf_threshold:g} '
+                        f'iou={iou_threshold:g}{"" if clean_boxes else " no-clean"}')
+
+                result = {'name' : name,
+                          'backend' : backend,
+                          'size' : size,
+                          'conf_threshold' : conf_threshold,
+                          'iou_threshold' : iou_threshold,
+                          'clean_boxes' : clean_boxes,
+                          'pages_per_sec' : pages_per_sec,
+                          'num_boxes' : len(detections),
+                          **evaluate_detections(dataset, detections)}
+                results.append(result)
+                print(f'{name}: {pages_per_sec:.2f} pages/s, mAP {result["map"]:.3f}')
+
+                if args.predictions_dir is not None:
+                    os.makedirs(args.predictions_dir, exist_ok=True)
+                    with open(os.path.join(args.predictions_dir, name.replace(' ', '_') + '.json'), 'w') as predictions_file:
+                        json.dump(detections, predictions_file)
+
+    print_report(results)
+
+    if args.output is not None:
+        with open(args.output, 'w') as report_file:
+            json.dump({'pages' : len(page_imgs),
+                       'pareto_front' : [result['name'] for result in get_pareto_front(results)],
+                       'settings' : results}, report_file, indent=2)
+
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
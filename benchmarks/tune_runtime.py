@@ -0,0 +1,136 @@
+"""Finds the worker topology and thread budget with the best throughput on this
+machine.
+
+Every configuration of --workers and --threads (threads of each worker) that
+does not use more threads than there are cpus is run as a batch extraction of
+the pdfs in data/ (copied --copies times so the model loading is amortized)
+and its pages/sec is reported. The best configuration is printed as
+batch_extract.py arguments.
+
+Usage:
+    python benchmarks/tune_runtime.py --workers 1 2 4 --threads 1 2 4 8 --copies 4
+"""
+import os
+import sys
+import glob
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ExDocGen.BatchExtractor import BatchExtractor
+from ExDocGen.RuntimeConfig import RuntimeConfig, get_available_cpus, AFFINITY_NONE, AFFINITY_AUTO
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DATA_DIR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'data')
+DEFAULT_COPIES = 2
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def copy_inputs(pdf_file_paths : list,
+                input_dir : str,
+                copies : int) -> list:
+
+    input_paths = []
+
+    for copy_num in range(copies):
+        copy_dir = os.path.join(input_dir, f'copy_{copy_num}')
+        os.makedirs(copy_dir)
+
+        for pdf_file_path in pdf_file_paths:
+            input_paths.append(shutil.copy(pdf_file_path, copy_dir))
+
+    return sorted(os.path.abspath(path) for path in input_paths)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_configurations(workers : list,
+                       threads : list,
+                       num_cpus : int,
+                       cpu_affinity : str) -> list:
+
+    configurations = []
+
+    for num_workers in workers:
+        for num_threads in threads:
+            if num_workers * num_threads > num_cpus:
+                continue
+
+            configurations.append(RuntimeConfig(intra_op_threads=num_threads,
+                                                inter_op_threads=1,
+                                                num_workers=num_workers,
+                                                cpu_affinity=cpu_affinity))
+
+    return configurations
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    num_cpus = len(get_available_cpus())
+
+    parser = argparse.ArgumentParser(description='Sweep worker and thread configurations.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help='numbers of worker processes to try')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, num_cpus],
+                        help='threads per worker to try')
+    parser.add_argument('--cpu-affinity', choices=[AFFINITY_NONE, AFFINITY_AUTO], default=AFFINITY_AUTO)
+    parser.add_argument('--copies', type=int, default=DEFAULT_COPIES,
+                        help='times every pdf of data/ is extracted in a run')
+    parser.add_argument('--output',
+                        help='file path to save the JSON results to')
+    args = parser.parse_args()
+
+    configurations = get_configurations(sorted(set(args.workers)),
+                                        sorted(set(args.threads)),
+                                        num_cpus,
+                                        args.cpu_affinity)
+
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_paths = copy_inputs(sorted(glob.glob(os.path.join(DATA_DIR_PATH, '*.pdf'))),
+                                  os.path.join(tmp_dir, 'inputs'),
+                                  args.copies)
+
+        for runtime_config in configurations:
+            print(f'{runtime_config.num_workers} workers x {runtime_config.intra_op_threads} threads ...', flush=True)
+
+            with open(os.devnull, 'w') as devnull:
+                batch_extractor = BatchExtractor(output_dir=os.path.join(tmp_dir, 'outputs'),
+                                                 overwrite=True,
+                                                 progress_stream=devnull,
+                                                 runtime_config=runtime_config)
+                report = batch_extractor.run(input_paths)
+
+            results.append({**runtime_config.to_dict(),
+                            'pages' : report['num_pages'],
+                            'failed' : report['num_failed'],
+                            'pages_per_sec' : report['pages_per_sec']})
+
+    results.sort(key=lambda result: result['pages_per_sec'], reverse=True)
+
+    print(f'\n{num_cpus} cpus')
+    print(f'{"workers":>8}{"threads":>9}{"pages":>7}{"failed":>8}{"pages/s":>10}')
+    for result in results:
+        print(f'{result["num_workers"]:>8}{result["intra_op_threads"]:>9}{result["pages"]:>7}'
+              f'{result["failed"]:>8}{result["pages_per_sec"]:>10.2f}')
+
+    if len(results) > 0:
+        best = results[0]
+        print(f'\nbest: --workers {best["num_workers"]} --intra-op-threads {best["intra_op_threads"]} '
+              f'--inter-op-threads 1 --cpu-affinity {args.cpu_affinity} ({best["pages_per_sec"]:.2f} pages/s)')
+
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import os
+import sys
+import glob
+import argparse
+
+import fitz
+import numpy as np
+
+from ExDocGen.ExtractedDocumentGenerator import (DEFAULT_MODEL_WEIGHTS_PATH, DEFAULT_MODEL_LOCATION,
+                                                 DEFAULT_MODEL_TYPE, DEFAULT_ONNX_MODEL_PATH,
+                                                 DEFAULT_TORCHSCRIPT_MODEL_PATH)
+from ExDocGen.DetectorBackends import (export_onnx, quantize_onnx, export_torchscript, QUANTIZATION_DYNAMIC,
+                                       QUANTIZATION_STATIC)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+DEFAULT_CALIBRATION_PDFS = 'data/*.pdf'
+DEFAULT_CALIBRATION_PAGES = 64
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def load_calibration_images(pattern : str,
+                            max_pages : int) -> list:
+    """renders up to max_pages pages of the pdfs matching pattern, the same
+    way the generator renders pages for the detector
+    """
+    page_imgs = []
+
+    for pdf_file_path in sorted(glob.glob(pattern)):
+        with fitz.open(pdf_file_path) as fitz_doc:
+            for page in fitz_doc:
+                if len(page_imgs) >= max_pages:
+                    return page_imgs
+
+                pix = page.get_pixmap()
+                page_imgs.append(np.frombuffer(buffer=pix.samples, dtype=np.uint8).reshape((pix.height, pix.width, -1)))
+
+    return page_imgs
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description='Export the layout detector to ONNX and optionally quantize it.')
+    parser.add_argument('--weights', default=DEFAULT_MODEL_WEIGHTS_PATH,
+                        help='yolov5 weights to export')
+    parser.add_argument('--output', default=DEFAULT_ONNX_MODEL_PATH,
+                        help='ONNX model to create')
+    parser.add_argument('--quantize', choices=[QUANTIZATION_DYNAMIC, QUANTIZATION_STATIC],
+                        help='also write an int8 model next to the float one')
+    parser.add_argument('--calibration-pdfs', default=DEFAULT_CALIBRATION_PDFS,
+                        help='glob pattern of the pdfs used to calibrate static quantization')
+    parser.add_argument('--calibration-pages', type=int, default=DEFAULT_CALIBRATION_PAGES)
+    parser.add_argument('--torchscript-output', nargs='?', const=DEFAULT_TORCHSCRIPT_MODEL_PATH,
+                        help='also save the TorchScript trace used by the torchscript backend, '
+                             f'to {DEFAULT_TORCHSCRIPT_MODEL_PATH} by default')
+    args = parser.parse_args()
+
+    export_onnx(args.weights,
+                args.output,
+                model_path=DEFAULT_MODEL_LOCATION,
+                model_type=DEFAULT_MODEL_TYPE)
+    print(f'exported {args.weights} to {args.output}')
+
+    if args.quantize is not None:
+        root, extension = os.path.splitext(args.output)
+        quantized_path = f'{root}.{args.quantize}-int8{extension}'
+
+        calibration_images = None
+        if args.quantize == QUANTIZATION_STATIC:
+            calibration_images = load_calibration_images(args.calibration_pdfs, args.calibration_pages)
+            print(f'calibrating with {len(calibration_images)} pages')
+
+        quantize_onnx(args.output,
+                      quantized_path,
+                      mode=args.quantize,
+                      calibration_images=calibration_images)
+        print(f'quantized model written to {quantized_path}')
+
+    if args.torchscript_output is not None:
+        export_torchscript(args.weights,
+                           args.torchscript_output,
+                           model_path=DEFAULT_MODEL_LOCATION,
+                           model_type=DEFAULT_MODEL_TYPE)
+        print(f'traced {args.weights} to {args.torchscript_output}')
+
+    return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
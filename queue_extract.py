@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import argparse
+
+from ExDocGen.RuntimeConfig import RuntimeConfig
+from ExDocGen.PageSelection import parse_page_spec
+from ExDocGen.BatchExtractor import (collect_input_paths, ALL_LABELS, EXIT_SUCCESS, EXIT_DOCUMENT_ERRORS,
+                                     EXIT_USAGE_ERROR)
+from ExDocGen.WorkQueue import (WorkQueue, run_local_workers, DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS,
+                                DEFAULT_HEARTBEAT_SECONDS, DEFAULT_POLL_SECONDS)
+from batch_extract import add_generator_arguments, get_generator_kwargs
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def parse_args(argv = None) -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(description='Extract a batch of pdf files on several nodes through a queue '
+                                                 'in a shared directory.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    submit_parser = subparsers.add_parser('submit', help='add pdf files to the queue')
+    submit_parser.add_argument('inputs', nargs='+',
+                               help='directories, glob patterns, manifest files (.txt, .lst, .jsonl) or pdf files')
+    submit_parser.add_argument('-q', '--queue', required=True,
+                               help='queue directory shared by the nodes')
+    submit_parser.add_argument('-o', '--output-dir', required=True,
+                               help='directory the JSON files are written to, shared by the nodes')
+    submit_parser.add_argument('--labels', nargs='+', choices=ALL_LABELS,
+                               help='only extract text blocks with these labels')
+    submit_parser.add_argument('--exclude-labels', nargs='+', choices=ALL_LABELS, default=[],
+                               help='do not extract text blocks with these labels')
+    submit_parser.add_argument('--pages',
+                               help='pages to extract from every document, 0 based page numbers and python slices '
+                                    'separated by commas, negative from the end (e.g. 0:10,-1)')
+    submit_parser.add_argument('--pages-per-shard', type=int,
+                               help='split documents with more pages into tasks of this many pages')
+    submit_parser.add_argument('--overwrite', action='store_true',
+                               help='submit documents even if their output is up to date')
+    submit_parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                               help='time without a heartbeat after which a task is given to another worker '
+                                    '(only used when the queue is created)')
+    submit_parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                               help='attempts of a task before it is failed (only used when the queue is created)')
+
+    work_parser = subparsers.add_parser('work', help='run workers on this node until the queue is finished')
+    work_parser.add_argument('-q', '--queue', required=True,
+                             help='queue directory shared by the nodes')
+    work_parser.add_argument('-w', '--workers', type=int, default=1,
+                             help='number of worker processes on this node, each loads its own copy of the models')
+    work_parser.add_argument('--heartbeat-seconds', type=float, default=DEFAULT_HEARTBEAT_SECONDS,
+                             help='time between two renewals of the lease of a task')
+    work_parser.add_argument('--poll-seconds', type=float, default=DEFAULT_POLL_SECONDS,
+                             help='time between two looks for work while other workers hold the remaining tasks')
+    work_parser.add_argument('--wait', action='store_true',
+                             help='keep waiting for new tasks when the queue is finished')
+    add_generator_arguments(work_parser)
+
+    status_parser = subparsers.add_parser('status', help='print the progress and errors of the queue as JSON')
+    status_parser.add_argument('-q', '--queue', required=True,
+                               help='queue directory shared by the nodes')
+
+    return parser.parse_args(argv)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def submit(args : argparse.Namespace) -> int:
+
+    pdf_file_paths = collect_input_paths(args.inputs)
+    if len(pdf_file_paths) == 0:
+        print('No pdf files found in the given inputs', file=sys.stderr)
+        return EXIT_USAGE_ERROR
+
+    include_pages = None
+    if args.pages is not None:
+        try:
+            include_pages = parse_page_spec(args.pages)
+        except ValueError:
+            print(f'--pages {args.pages} is not a list of page numbers and slices', file=sys.stderr)
+            return EXIT_USAGE_ERROR
+
+    if args.pages_per_shard is not None and args.pages_per_shard < 1:
+        print('--pages-per-shard has to be at least 1', file=sys.stderr)
+        return EXIT_USAGE_ERROR
+
+    include_labels = None
+    if args.labels is not None or len(args.exclude_labels) > 0:
+        labels = args.labels if args.labels is not None else ALL_LABELS
+        include_labels = [label for label in labels if label not in args.exclude_labels]
+
+    work_queue = WorkQueue(args.queue,
+                           lease_seconds=args.lease_seconds,
+                           max_attempts=args.max_attempts)
+
+    # the paths are read by the other nodes
+    result = work_queue.submit([os.path.abspath(pdf_file_path) for pdf_file_path in pdf_file_paths],
+                               os.path.abspath(args.output_dir),
+                               include_pages=include_pages,
+                               include_labels=include_labels,
+                               pages_per_shard=args.pages_per_shard,
+                               overwrite=args.overwrite)
+
+    print(json.dumps(result, indent=2))
+    return EXIT_SUCCESS
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def work(args : argparse.Namespace) -> int:
+
+    if not os.path.isdir(args.queue):
+        print(f'{args.queue} is not a queue directory, submit documents first', file=sys.stderr)
+        return EXIT_USAGE_ERROR
+
+    # the worker processes can not start processes of their own
+    if args.postprocess_workers > 0 and args.workers > 1:
+        print('--postprocess-workers can only be used with --workers 1', file=sys.stderr)
+        return EXIT_USAGE_ERROR
+
+    runtime_config = RuntimeConfig.for_workers(args.workers,
+                                               intra_op_threads=args.intra_op_threads,
+                                               inter_op_threads=args.inter_op_threads,
+                                               ocr_threads=args.ocr_threads,
+                                               cpu_affinity=args.cpu_affinity)
+
+    run_local_workers(args.queue,
+                      args.workers,
+                      generator_kwargs=get_generator_kwargs(args),
+                      runtime_config=runtime_config,
+                      heartbeat_seconds=args.heartbeat_seconds,
+                      poll_seconds=args.poll_seconds,
+                      wait=args.wait)
+
+    return status(args)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def status(args : argparse.Namespace) -> int:
+
+    if not os.path.isdir(args.queue):
+        print(f'{args.queue} is not a queue directory', file=sys.stderr)
+        return EXIT_USAGE_ERROR
+
+    queue_status = WorkQueue(args.queue).status()
+    print(json.dumps(queue_status, indent=2))
+
+    return EXIT_DOCUMENT_ERRORS if queue_status['documents_failed'] > 0 else EXIT_SUCCESS
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main(argv = None) -> int:
+
+    args = parse_args(argv)
+
+    if args.command == 'submit':
+        return submit(args)
+    elif args.command == 'work':
+        return work(args)
+
+    return status(args)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    sys.exit(main())
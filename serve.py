@@ -0,0 +1,93 @@
+import logging
+import argparse
+
+from ExDocGen.ExtractionService import (ExtractionService, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_MAX_BATCH_SIZE,
+                                        DEFAULT_MAX_WAIT_MS, DEFAULT_MAX_QUEUED_REQUESTS, DEFAULT_PAGES_IN_FLIGHT,
+                                        DEFAULT_MAX_UPLOAD_MB)
+from ExDocGen.DetectorBackends import DETECTOR_BACKENDS, BACKEND_TORCH
+from ExDocGen.TableExtractor import TABLE_BACKENDS, TABLE_BACKEND_EAGER
+from ExDocGen.TextLayout import TextLayoutConfig, LAYOUT_MODES, LAYOUT_DETECTOR, DEFAULT_MIN_PAGE_CONFIDENCE
+from ExDocGen.RuntimeConfig import RuntimeConfig
+from ExDocGen.Metrics import LoggingMetricsSink, PrometheusTextFileSink
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description='Run the local pdf extraction HTTP service.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help='largest number of pages passed to the detector at once')
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help='longest time the first page of a batch waits for more pages')
+    parser.add_argument('--max-queued-requests', type=int, default=DEFAULT_MAX_QUEUED_REQUESTS,
+                        help='extractions in progress before new requests are refused with 503')
+    parser.add_argument('--pages-in-flight', type=int, default=DEFAULT_PAGES_IN_FLIGHT,
+                        help='pages of a single request queued at the same time')
+    parser.add_argument('--max-upload-mb', type=float, default=DEFAULT_MAX_UPLOAD_MB)
+    parser.add_argument('--detector-backend', choices=DETECTOR_BACKENDS, default=BACKEND_TORCH,
+                        help='run the layout detector with PyTorch, ONNX Runtime or as a TorchScript trace')
+    parser.add_argument('--onnx-path',
+                        help='exported (possibly quantized) ONNX model used by the onnx backend')
+    parser.add_argument('--torchscript-path',
+                        help='traced model used by the torchscript backend, traced from the weights when missing')
+    parser.add_argument('--warm-up-runs', type=int, default=0,
+                        help='run the models this many times over synthetic inputs before the first page')
+    parser.add_argument('--layout', choices=LAYOUT_MODES, default=LAYOUT_DETECTOR,
+                        help='find the blocks of the pages with the detector, from the text layer of the pdf only, '
+                             'or from the text layer and the detector for the pages it is not sure about (auto)')
+    parser.add_argument('--min-layout-confidence', type=float, default=DEFAULT_MIN_PAGE_CONFIDENCE,
+                        help='text layer confidence below which --layout auto detects a page')
+    parser.add_argument('--table-backend', choices=TABLE_BACKENDS, default=TABLE_BACKEND_EAGER,
+                        help='run the table transformer and OCR models as loaded or optimized for the cpu')
+    parser.add_argument('--intra-op-threads', type=int,
+                        help='threads of every model operation')
+    parser.add_argument('--inter-op-threads', type=int,
+                        help='torch inter-op threads')
+    parser.add_argument('--ocr-threads', type=int,
+                        help='threads used by easyocr, defaults to --intra-op-threads')
+    parser.add_argument('--log-metrics', action='store_true',
+                        help='log the stage times and counters of every extracted document')
+    parser.add_argument('--prometheus-file',
+                        help='text file the running metric totals are written to for the node_exporter '
+                             'textfile collector')
+    args = parser.parse_args()
+
+    metrics_sinks = []
+    if args.log_metrics:
+        metrics_sinks.append(LoggingMetricsSink())
+    if args.prometheus_file is not None:
+        metrics_sinks.append(PrometheusTextFileSink(args.prometheus_file))
+
+    generator_kwargs = {'detector_backend' : args.detector_backend,
+                        'table_backend' : args.table_backend,
+                        'layout_mode' : args.layout,
+                        'text_layout_config' : TextLayoutConfig(min_page_confidence=args.min_layout_confidence),
+                        'warm_up_runs' : args.warm_up_runs,
+                        'metrics_sinks' : metrics_sinks,
+                        'runtime_config' : RuntimeConfig(intra_op_threads=args.intra_op_threads,
+                                                         inter_op_threads=args.inter_op_threads,
+                                                         ocr_threads=args.ocr_threads)}
+    if args.onnx_path is not None:
+        generator_kwargs['onnx_path'] = args.onnx_path
+
+    if args.torchscript_path is not None:
+        generator_kwargs['torchscript_path'] = args.torchscript_path
+
+    logging.basicConfig(level=logging.INFO)
+
+    service = ExtractionService(generator_kwargs=generator_kwargs,
+                                host=args.host,
+                                port=args.port,
+                                max_batch_size=args.max_batch_size,
+                                max_wait_ms=args.max_wait_ms,
+                                max_queued_requests=args.max_queued_requests,
+                                pages_in_flight=args.pages_in_flight,
+                                max_upload_mb=args.max_upload_mb)
+    service.run()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+if __name__ == '__main__':
+    main()
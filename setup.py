@@ -4,6 +4,21 @@ setup(
     name="ExDocGen",
     version="0.0.1",
     description="Performs intelligent text extraction from highly structured PDF documents.",
-    install_requires=[],
+    install_requires=[
+        "fitz==0.0.1.dev2",
+        "pysbd==0.3.4",
+        "yolov5==7.0.13",
+        "numpy",
+        "pandas",
+        "pillow",
+        "torch",
+        "transformers",
+        "easyocr",
+    ],
+    extras_require={
+        "onnx": ["onnxruntime"],
+        "webapp": ["streamlit", "streamlit_image_coordinates"],
+        "test": ["pytest"],
+    },
     packages=["ExDocGen"],
-)
\ No newline at end of file
+)
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import fitz
+import pytest
+
+# the tests import ExDocGen from the repository, as the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def write_pdf(pdf_file_path : str,
+              num_pages = 1,
+              text = 'page') -> str:
+    """writes a pdf with one line of text on every page"""
+
+    fitz_doc = fitz.open()
+    for page_number in range(num_pages):
+        page = fitz_doc.new_page()
+        page.insert_text((72, 72), f'{text} {page_number}')
+
+    fitz_doc.save(pdf_file_path)
+    fitz_doc.close()
+
+    return pdf_file_path
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """returns a function writing a pdf below tmp_path"""
+
+    def _make_pdf(file_name = 'document.pdf',
+                  num_pages = 1,
+                  text = 'page') -> str:
+        pdf_file_path = tmp_path / file_name
+        pdf_file_path.parent.mkdir(parents=True, exist_ok=True)
+        return write_pdf(str(pdf_file_path), num_pages, text)
+
+    return _make_pdf
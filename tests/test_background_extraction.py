@@ -0,0 +1,148 @@
+import gc
+import queue
+import threading
+
+import fitz
+import pytest
+
+from ExDocGen.ExtractedDocument import DocumentPage
+from ExDocGen.GeneratorPool import GeneratorPool
+from ExDocGen.BackgroundExtraction import BackgroundExtraction, STATE_DONE, STATE_CANCELLED
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class FakeDocument:
+    """Stands in for the DocumentStream returned by open_stream"""
+
+    def __init__(self,
+                 doc_gen,
+                 pdf_bytes : bytes):
+
+        with fitz.open('pdf', pdf_bytes) as fitz_doc:
+            self.name = fitz_doc[0].get_text().split()[0]
+            self.page_numbers = list(range(fitz_doc.page_count))
+
+        self.doc_gen = doc_gen
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+        return False
+
+    def extract_page(self,
+                     page_number : int,
+                     labels = None,
+                     doc_gen = None) -> DocumentPage:
+
+        doc_gen.extract_calls.append((self.name, page_number))
+        doc_gen.before_page(self.name, page_number)
+
+        return DocumentPage(page_number)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class FakeGenerator:
+
+    def __init__(self,
+                 before_page = None):
+
+        self.extract_calls = []
+        self.before_page = before_page if before_page is not None else (lambda name, page_number : None)
+
+    def open_stream(self,
+                    pdf_file_stream,
+                    include_pages = [],
+                    include_labels = None) -> FakeDocument:
+
+        return FakeDocument(self, pdf_file_stream)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _read_pdf(make_pdf,
+              name : str,
+              num_pages : int) -> bytes:
+
+    with open(make_pdf(f'{name}.pdf', num_pages, text=name), 'rb') as pdf_file:
+        return pdf_file.read()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_pool_times_out_when_every_generator_is_busy():
+
+    pool = GeneratorPool(generators=[FakeGenerator()])
+
+    with pool.acquire():
+        with pytest.raises(queue.Empty):
+            with pool.acquire(timeout=0.05):
+                pass
+
+    assert pool.num_available == 1
+    assert pool.num_waiting == 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_jobs_take_turns_page_by_page(make_pdf):
+
+    second_job_waiting = threading.Event()
+
+    def before_page(name, page_number):
+        # the first page of the first job holds the only generator until
+        # the second job waits for it
+        if (name, page_number) == ('first', 0):
+            assert second_job_waiting.wait(5.)
+
+    doc_gen = FakeGenerator(before_page)
+    pool = GeneratorPool(generators=[doc_gen])
+
+    first = BackgroundExtraction(pool, _read_pdf(make_pdf, 'first', 3))
+    second = BackgroundExtraction(pool, _read_pdf(make_pdf, 'second', 3))
+
+    first.start()
+    while len(doc_gen.extract_calls) == 0:
+        first.thread.join(0.01)
+
+    second.start()
+    while pool.num_waiting == 0:
+        second.thread.join(0.01)
+    second_job_waiting.set()
+
+    first.thread.join(5.)
+    second.thread.join(5.)
+
+    assert first.state == STATE_DONE and second.state == STATE_DONE
+    # the second job's first turn opens its document
+    assert doc_gen.extract_calls == [('first', 0), ('first', 1), ('second', 0),
+                                     ('first', 2), ('second', 1), ('second', 2)]
+    assert first.pages_done == 3 and second.pages_done == 3
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_job_stops_once_it_is_no_longer_referenced(make_pdf):
+
+    page_started = threading.Event()
+    release_page = threading.Event()
+
+    def before_page(name, page_number):
+        page_started.set()
+        assert release_page.wait(5.)
+
+    pool = GeneratorPool(generators=[FakeGenerator(before_page)])
+
+    job = BackgroundExtraction(pool, _read_pdf(make_pdf, 'dropped', 5))
+    job.start()
+    assert page_started.wait(5.)
+
+    # what the web app keeps of a session which was replaced or closed
+    status, thread, extracted_doc = job.status, job.thread, job.extracted_doc
+    del job
+    gc.collect()
+
+    release_page.set()
+    thread.join(5.)
+
+    assert status.state == STATE_CANCELLED
+    assert extracted_doc.num_pages == 1
+    assert pool.num_available == 1
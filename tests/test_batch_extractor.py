@@ -0,0 +1,148 @@
+import io
+import os
+import json
+
+from ExDocGen import BatchExtractor as batch_module
+from ExDocGen.BatchExtractor import (BatchExtractor, read_manifest, collect_input_paths, get_output_path,
+                                     get_output_settings, is_up_to_date, merge_json_parts, STATUS_OK,
+                                     STATUS_SKIPPED, EXIT_INTERRUPTED)
+from ExDocGen.ExtractedDocument import ExtractedDocumentWriter, read_json_settings
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _write_output(output_path : str,
+                  pdf_file_path : str,
+                  settings = None,
+                  page_numbers = (0,)) -> None:
+
+    with ExtractedDocumentWriter(output_path, pdf_file_path, settings) as writer:
+        for page_number in page_numbers:
+            writer.write_page_dict({'page_number' : page_number, 'text_blocks' : []})
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_read_manifest_resolves_relative_paths(tmp_path):
+
+    (tmp_path / 'list.txt').write_text('# comment\n\na.pdf\n/abs/b.pdf\n')
+    (tmp_path / 'list.jsonl').write_text(json.dumps({'path' : 'c.pdf'}) + '\n')
+
+    assert read_manifest(str(tmp_path / 'list.txt')) == [str(tmp_path / 'a.pdf'), '/abs/b.pdf']
+    assert read_manifest(str(tmp_path / 'list.jsonl')) == [str(tmp_path / 'c.pdf')]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_collect_input_paths_deduplicates(tmp_path, make_pdf):
+
+    first = make_pdf('a/one.pdf')
+    second = make_pdf('a/b/two.pdf')
+    (tmp_path / 'list.txt').write_text('a/one.pdf\n')
+
+    paths = collect_input_paths([str(tmp_path / 'a'), str(tmp_path / 'list.txt'), first])
+
+    assert paths == sorted([first, second])
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_get_output_path_mirrors_the_input_tree():
+
+    assert get_output_path('/in/x/doc.pdf', '/in', '/out') == '/out/x/doc.json'
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_is_up_to_date_compares_times_and_settings(tmp_path, make_pdf):
+
+    pdf_file_path = make_pdf()
+    output_path = str(tmp_path / 'document.json')
+    settings = get_output_settings('0:2', ['Title', 'Text'])
+
+    assert not is_up_to_date(pdf_file_path, output_path, settings)
+
+    _write_output(output_path, pdf_file_path, settings)
+    assert is_up_to_date(pdf_file_path, output_path, settings)
+    assert is_up_to_date(pdf_file_path, output_path, get_output_settings([slice(0, 2)], ['Text', 'Title']))
+    assert not is_up_to_date(pdf_file_path, output_path, get_output_settings('0:3', ['Text', 'Title']))
+    assert not is_up_to_date(pdf_file_path, output_path, get_output_settings('0:2', None))
+
+    # an output older than the pdf
+    os.utime(output_path, (0, 0))
+    assert not is_up_to_date(pdf_file_path, output_path, settings)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_output_without_settings_is_not_up_to_date(tmp_path, make_pdf):
+
+    pdf_file_path = make_pdf()
+    output_path = str(tmp_path / 'document.json')
+    _write_output(output_path, pdf_file_path)
+
+    assert read_json_settings(output_path) is None
+    assert is_up_to_date(pdf_file_path, output_path)
+    assert not is_up_to_date(pdf_file_path, output_path, get_output_settings())
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_merge_json_parts_records_settings(tmp_path):
+
+    part_paths = []
+    for part in range(2):
+        part_path = str(tmp_path / f'doc.json.part{part:04d}')
+        _write_output(part_path, 'doc.pdf', page_numbers=[2 * part, 2 * part + 1])
+        part_paths.append(part_path)
+
+    output_path = str(tmp_path / 'doc.json')
+    settings = get_output_settings(None, ['Text'])
+
+    assert merge_json_parts(part_paths, output_path, 'doc.pdf', settings=settings) == 4
+
+    with open(output_path, 'r') as output_file:
+        output = json.load(output_file)
+
+    assert output['settings'] == settings
+    assert [page['page_number'] for page in output['document_pages']] == [0, 1, 2, 3]
+    assert not any(os.path.exists(part_path) for part_path in part_paths)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_interrupted_run_reports_finished_documents(tmp_path, make_pdf, monkeypatch):
+
+    pdf_file_paths = [make_pdf(f'in/doc{number}.pdf') for number in range(3)]
+    jobs_run = []
+
+    def process_job(job):
+        if len(jobs_run) == 2:
+            raise KeyboardInterrupt
+        jobs_run.append(job['input'])
+        return dict(job, status=STATUS_OK, pages=1, seconds=0.)
+
+    monkeypatch.setattr(batch_module, '_init_worker', lambda *args: None)
+    monkeypatch.setattr(batch_module, '_process_job', process_job)
+
+    batch_extractor = BatchExtractor(str(tmp_path / 'out'), progress_stream=io.StringIO())
+    report = batch_extractor.run(pdf_file_paths)
+
+    assert report['interrupted']
+    assert report['exit_code'] == EXIT_INTERRUPTED
+    assert report['num_processed'] == 2
+    assert report['num_pages'] == 2
+    assert [document['input'] for document in report['documents']] == jobs_run
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_outputs_of_other_settings_are_extracted_again(tmp_path, make_pdf, monkeypatch):
+
+    pdf_file_path = make_pdf('in/doc.pdf', num_pages=3)
+    output_path = str(tmp_path / 'out' / 'doc.json')
+    os.makedirs(os.path.dirname(output_path))
+    _write_output(output_path, pdf_file_path, get_output_settings('0:2', None))
+
+    monkeypatch.setattr(batch_module, '_init_worker', lambda *args: None)
+    monkeypatch.setattr(batch_module, '_process_job', lambda job: dict(job, status=STATUS_OK, pages=3, seconds=0.))
+
+    same_pages = BatchExtractor(str(tmp_path / 'out'), include_pages='0:2', progress_stream=io.StringIO())
+    assert same_pages.run([pdf_file_path])['documents'][0]['status'] == STATUS_SKIPPED
+
+    every_page = BatchExtractor(str(tmp_path / 'out'), progress_stream=io.StringIO())
+    report = every_page.run([pdf_file_path])
+
+    assert report['documents'][0]['status'] == STATUS_OK
+    assert report['include_pages'] is None
@@ -0,0 +1,75 @@
+import random
+
+from ExDocGen.ExtractedDocument import DocumentPage
+from ExDocGen.BlockIndex import BlockIndex, image_to_pdf_point
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _make_page(bboxes : list) -> DocumentPage:
+
+    document_page = DocumentPage(0)
+    for block_num, bbox in enumerate(bboxes):
+        document_page.add_text_block(f'block {block_num}', bbox=bbox)
+
+    return document_page
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_blocks_without_a_bbox_are_not_indexed():
+
+    index = BlockIndex(_make_page([(10, 10, 50, 50), None, (60, 10, 90, 50)]))
+
+    assert len(index) == 2
+    assert index.query(70, 20) == [2]
+    assert index.query(55, 20) == []
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_block_spanning_many_cells_is_found_in_each():
+
+    index = BlockIndex(_make_page([(0, 0, 500, 20)]), cell_size=32)
+
+    for x in (0, 31.9, 32, 250, 500):
+        assert index.query(x, 10) == [0]
+
+    assert index.query(501, 10) == []
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_nested_blocks_return_the_innermost_first():
+
+    index = BlockIndex(_make_page([(0, 0, 400, 400), (100, 100, 150, 120)]))
+
+    assert index.query(120, 110) == [1, 0]
+    assert index.find_block(120, 110) == 1
+    assert index.find_block(300, 300) == 0
+    assert index.find_block(401, 300) is None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_find_block_converts_image_pixels_to_pdf_points():
+
+    index = BlockIndex(_make_page([(100, 100, 200, 150)]))
+
+    assert image_to_pdf_point(300, 250, zoom=2) == (150, 125)
+    assert index.find_block(300, 250, zoom=2) == 0
+    assert index.find_block(150, 125, zoom=2) is None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_query_matches_a_linear_scan():
+
+    rng = random.Random(0)
+    bboxes = []
+    for _ in range(200):
+        x0, y0 = rng.uniform(0, 600), rng.uniform(0, 800)
+        bboxes.append((x0, y0, x0 + rng.uniform(1, 200), y0 + rng.uniform(1, 100)))
+
+    index = BlockIndex(_make_page(bboxes))
+
+    for _ in range(500):
+        x, y = rng.uniform(0, 800), rng.uniform(0, 900)
+        expected = {block_num for block_num, (x0, y0, x1, y1) in enumerate(bboxes)
+                    if x0 <= x <= x1 and y0 <= y <= y1}
+
+        assert set(index.query(x, y)) == expected
@@ -0,0 +1,118 @@
+import numpy as np
+
+from ExDocGen.DetectorBackends import letterbox, non_max_suppression, postprocess, LETTERBOX_COLOUR
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _prediction_row(box : tuple,
+                    objectness : float,
+                    class_scores : list) -> list:
+    """returns a raw yolov5 output row for an (x0, y0, x1, y1) box"""
+
+    x0, y0, x1, y1 = box
+    return [(x0 + x1) / 2, (y0 + y1) / 2, x1 - x0, y1 - y0, objectness] + list(class_scores)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_letterbox_keeps_the_aspect_ratio_and_centres_the_page():
+
+    page_img = np.zeros((400, 200, 3), dtype=np.uint8)
+
+    input_tensor, gain, (pad_x, pad_y) = letterbox(page_img, input_shape=(800, 640))
+
+    assert input_tensor.shape == (1, 3, 800, 640)
+    assert input_tensor.dtype == np.float32
+    assert gain == 2.
+    assert (pad_x, pad_y) == (120, 0)
+
+    # the page is black, the padding on either side grey
+    assert input_tensor[0, :, :, pad_x:pad_x + 400].max() == 0.
+    assert np.allclose(input_tensor[0, :, :, :pad_x], LETTERBOX_COLOUR / 255.)
+    assert np.allclose(input_tensor[0, :, :, pad_x + 400:], LETTERBOX_COLOUR / 255.)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_letterbox_drops_the_alpha_channel():
+
+    page_img = np.full((64, 64, 4), 255, dtype=np.uint8)
+
+    input_tensor, gain, pad = letterbox(page_img, input_shape=(64, 64))
+
+    assert input_tensor.shape == (1, 3, 64, 64)
+    assert gain == 1. and pad == (0, 0)
+    assert input_tensor.min() == 1.
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_non_max_suppression_keeps_the_best_of_overlapping_boxes():
+
+    boxes = np.array([[0, 0, 100, 100],
+                      [5, 5, 100, 100],
+                      [200, 200, 300, 300],
+                      [0, 0, 100, 40]], dtype=np.float32)
+    scores = np.array([0.8, 0.9, 0.5, 0.7], dtype=np.float32)
+
+    keep = non_max_suppression(boxes, scores, iou_threshold=0.45)
+
+    # box 0 overlaps box 1 (IoU 0.9), box 3 only overlaps box 1 by 0.4
+    assert keep.tolist() == [1, 3, 2]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_non_max_suppression_of_no_boxes():
+
+    keep = non_max_suppression(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32))
+
+    assert keep.tolist() == []
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_postprocess_maps_boxes_back_to_the_page():
+
+    prediction = np.array([_prediction_row((120, 40, 320, 240), 0.9, [0.1, 0.9]),
+                           # below the confidence threshold
+                           _prediction_row((120, 300, 320, 400), 0.2, [0.9, 0.1])], dtype=np.float32)
+
+    boxes = postprocess(prediction, gain=2., pad=(120, 0), page_shape=(400, 200))
+
+    assert boxes.shape == (1, 6)
+    assert np.allclose(boxes[0, :4], [0, 20, 100, 120])
+    assert np.isclose(boxes[0, 4], 0.81)
+    assert boxes[0, 5] == 1
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_postprocess_only_suppresses_boxes_of_the_same_class():
+
+    prediction = np.array([_prediction_row((10, 10, 110, 110), 0.9, [0.9, 0.1]),
+                           _prediction_row((12, 12, 110, 110), 0.9, [0.8, 0.1]),
+                           _prediction_row((10, 10, 110, 110), 0.9, [0.1, 0.7])], dtype=np.float32)
+
+    boxes = postprocess(prediction, gain=1., pad=(0, 0), page_shape=(200, 200))
+
+    assert sorted(boxes[:, 5].tolist()) == [0, 1]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_postprocess_clips_to_the_page_and_handles_no_boxes():
+
+    prediction = np.array([_prediction_row((-20, -20, 50, 50), 0.9, [0.9])], dtype=np.float32)
+
+    boxes = postprocess(prediction, gain=1., pad=(0, 0), page_shape=(40, 30))
+    assert np.allclose(boxes[0, :4], [0, 0, 30, 40])
+
+    empty = postprocess(prediction * [1, 1, 1, 1, 0, 1], gain=1., pad=(0, 0), page_shape=(40, 30))
+    assert empty.shape == (0, 6)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_postprocess_separates_the_classes_of_a_larger_input():
+
+    # a model exported for (1600, 1280), the class 1 box shifted by the
+    # default input size would land on the class 0 box
+    prediction = np.array([_prediction_row((820, 900, 1020, 1100), 0.9, [0.9, 0.1]),
+                           _prediction_row((20, 100, 220, 300), 0.9, [0.1, 0.8])], dtype=np.float32)
+
+    boxes = postprocess(prediction, gain=1., pad=(0, 0), page_shape=(1600, 1280))
+
+    assert sorted(boxes[:, 5].tolist()) == [0, 1]
@@ -0,0 +1,109 @@
+import io
+import os
+import gzip
+import json
+
+import pytest
+
+from ExDocGen.ExtractedDocument import (ExtractedDocument, ExtractedDocumentWriter, DocumentPage, FORMAT_JSON,
+                                        FORMAT_JSONL, read_json_settings)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _create_document(num_pages = 3) -> ExtractedDocument:
+
+    extracted_doc = ExtractedDocument('report "final".pdf')
+
+    for page_number in range(num_pages):
+        page = DocumentPage(page_number)
+        page.add_text_block(f'Title {page_number}', .9, 'Title', bbox=[72., 40., 540., 60.])
+        page.add_text_block('First sentence. Second sentence.', .8, 'Text', bbox=[72., 80., 540., 200.])
+        extracted_doc.add_page(page)
+
+    return extracted_doc
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_writer_matches_save_as_json(tmp_path):
+
+    extracted_doc = _create_document()
+    extracted_doc.save_as_json(str(tmp_path / 'saved.json'))
+
+    with ExtractedDocumentWriter(str(tmp_path / 'written.json'), extracted_doc.pdf_file_path) as writer:
+        for page in extracted_doc:
+            writer.write_page(page)
+
+    assert writer.num_pages == 3
+    assert (tmp_path / 'written.json').read_text() == (tmp_path / 'saved.json').read_text()
+    assert not os.path.exists(writer.tmp_file_path)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_writer_leaves_no_file_on_error(tmp_path):
+
+    output_path = str(tmp_path / 'document.json')
+
+    with pytest.raises(RuntimeError):
+        with ExtractedDocumentWriter(output_path, 'doc.pdf') as writer:
+            writer.write_page(DocumentPage(0))
+            raise RuntimeError('extraction failed')
+
+    assert os.listdir(tmp_path) == []
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_writer_records_settings(tmp_path):
+
+    output_path = str(tmp_path / 'document.json')
+    settings = {'pages' : '0:10', 'labels' : ['Text']}
+
+    with ExtractedDocumentWriter(output_path, 'a ", "document_pages": [.pdf', settings) as writer:
+        writer.write_page(DocumentPage(0))
+
+    with open(output_path, 'r') as output_file:
+        output = json.load(output_file)
+
+    assert output['settings'] == settings
+    assert len(output['document_pages']) == 1
+    assert read_json_settings(output_path) == settings
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_read_json_settings_of_other_files(tmp_path):
+
+    _create_document().save_as_json(str(tmp_path / 'saved.json'))
+    (tmp_path / 'other.json').write_text('[1, 2, 3]')
+
+    assert read_json_settings(str(tmp_path / 'saved.json')) is None
+    assert read_json_settings(str(tmp_path / 'other.json')) is None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_json_chunks_match_json_dumps():
+
+    extracted_doc = _create_document()
+
+    assert ''.join(extracted_doc.iter_json_chunks(FORMAT_JSON)) == json.dumps(extracted_doc.get_json_dict())
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_jsonl_has_one_page_per_line():
+
+    extracted_doc = _create_document()
+    lines = extracted_doc.to_bytes(FORMAT_JSONL).decode().splitlines()
+
+    assert len(lines) == 3
+    assert [json.loads(line)['file_path'] for line in lines] == [extracted_doc.pdf_file_path] * 3
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_compressed_output_decompresses_to_the_same_bytes():
+
+    extracted_doc = _create_document()
+    buffer = io.BytesIO()
+    extracted_doc.write(buffer, FORMAT_JSON, compress=True)
+
+    assert gzip.decompress(buffer.getvalue()) == extracted_doc.to_bytes(FORMAT_JSON)
+
+    with pytest.raises(ValueError):
+        extracted_doc.to_bytes('xml')
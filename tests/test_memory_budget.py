@@ -0,0 +1,227 @@
+import fitz
+import pytest
+
+from ExDocGen import MemoryBudget as budget_module
+from ExDocGen.MemoryBudget import MemoryBudget, MemoryBudgetExceeded, MIN_TABLE_PIXELS, MB, get_rss_bytes
+from ExDocGen.BoundingBox import LABEL_DICT
+from ExDocGen.ExtractedDocument import DocumentPage, ExtractedDocumentWriter
+from ExDocGen.Metrics import DocumentMetrics
+from ExDocGen.TextLayout import classify_page
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+FLAT_NUM_PAGES = 5000
+FLAT_WARMUP_PAGES = 500
+FLAT_TOLERANCE_MB = 64.
+SAMPLE_INTERVAL = 100
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class FakeRss:
+    """RSS reported to the budget, the releases of memory lower it by freed"""
+
+    def __init__(self,
+                 rss_mb : float,
+                 freed_mb = 0.):
+        self.rss_mb = rss_mb
+        self.freed_mb = freed_mb
+        self.releases = 0
+
+    def get_rss_bytes(self) -> int:
+        return int(self.rss_mb * MB)
+
+    def release_memory(self) -> None:
+        self.releases += 1
+        self.rss_mb -= self.freed_mb
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+@pytest.fixture
+def fake_rss(monkeypatch):
+
+    rss = FakeRss(1000.)
+    monkeypatch.setattr(budget_module, 'get_rss_bytes', rss.get_rss_bytes)
+    monkeypatch.setattr(budget_module, 'release_memory', rss.release_memory)
+
+    def no_sleep(seconds):
+        raise AssertionError('a budget without wait_for_release may not sleep')
+
+    monkeypatch.setattr(budget_module.time, 'sleep', no_sleep)
+
+    return rss
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_under_the_ceiling_nothing_is_released(fake_rss):
+
+    budget = MemoryBudget(rss_ceiling_mb=2000)
+    budget.check_headroom()
+
+    assert fake_rss.releases == 0
+    assert budget.table_pixels == budget.max_table_pixels
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_release_that_frees_enough_memory(fake_rss):
+
+    fake_rss.freed_mb = 200.
+    budget = MemoryBudget(rss_ceiling_mb=900)
+    budget.check_headroom()
+
+    assert fake_rss.releases == 1
+    assert budget.table_pixels == budget.max_table_pixels
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_single_extraction_over_the_ceiling_does_not_wait(fake_rss):
+
+    budget = MemoryBudget(rss_ceiling_mb=500, release_step_mb=100)
+    metrics = DocumentMetrics()
+
+    for _ in range(1000):
+        budget.check_headroom(metrics)
+
+    # released once, and not again until the RSS grows by release_step_mb
+    assert fake_rss.releases == 1
+    assert budget.table_pixels == budget.max_table_pixels // 2
+    assert metrics.to_dict()['counters'].get('backpressure_waits', 0) == 0
+
+    fake_rss.rss_mb += 150.
+    budget.check_headroom(metrics)
+
+    assert fake_rss.releases == 2
+    assert budget.table_pixels == budget.max_table_pixels // 4
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_table_cap_has_a_floor_and_is_restored(fake_rss):
+
+    budget = MemoryBudget(rss_ceiling_mb=500, release_step_mb=0)
+
+    for _ in range(100):
+        budget.check_headroom()
+
+    assert budget.table_pixels == MIN_TABLE_PIXELS
+
+    fake_rss.rss_mb = 400.
+    budget.check_headroom()
+
+    assert budget.table_pixels == budget.max_table_pixels
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_fail_over_ceiling_raises(fake_rss):
+
+    budget = MemoryBudget(rss_ceiling_mb=500, fail_over_ceiling=True)
+
+    with pytest.raises(MemoryBudgetExceeded):
+        budget.check_headroom()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_wait_for_release_waits_for_other_threads(fake_rss, monkeypatch):
+
+    sleeps = []
+
+    def sleep(seconds):
+        # another consumer frees its memory while this one waits
+        sleeps.append(seconds)
+        fake_rss.rss_mb -= 100.
+
+    monkeypatch.setattr(budget_module.time, 'sleep', sleep)
+
+    budget = MemoryBudget(rss_ceiling_mb=750, wait_for_release=True, poll_interval=0.1)
+    budget.check_headroom()
+
+    assert len(sleeps) == 3
+    assert budget.table_pixels == budget.max_table_pixels
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_wait_for_release_gives_up_after_the_timeout(fake_rss, monkeypatch):
+
+    sleeps = []
+    monkeypatch.setattr(budget_module.time, 'sleep', sleeps.append)
+
+    budget = MemoryBudget(rss_ceiling_mb=500, wait_for_release=True, backpressure_timeout=1., poll_interval=0.25)
+    budget.check_headroom()
+    budget.check_headroom()
+
+    # the second page does not wait again
+    assert len(sleeps) == 4
+    assert budget.table_pixels == budget.max_table_pixels // 2
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_table_tiles_follow_the_cap():
+
+    budget = MemoryBudget(max_table_pixels=4_000_000)
+    rect = fitz.Rect(0, 0, 612, 2000)
+
+    tiles, dpi = budget.get_table_tiles(rect, 300)
+
+    assert dpi == 300
+    assert tiles[0].y0 == 0 and tiles[-1].y1 == 2000
+    assert all((tile.width * dpi / 72.) * (tile.height * dpi / 72.) <= 4_000_001 for tile in tiles)
+
+    budget.table_pixels = 2_000_000
+    assert len(budget.get_table_tiles(rect, 300)[0]) > len(tiles)
+
+    small = fitz.Rect(0, 0, 100, 100)
+    assert budget.get_table_tiles(small, 300) == ([small], 300)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _create_report_pdf(pdf_file_path : str,
+                       num_pages : int) -> None:
+
+    fitz_doc = fitz.open()
+
+    for page_number in range(num_pages):
+        page = fitz_doc.new_page(width=612, height=792)
+        page.insert_text((72, 40), 'Synthetic Statistical Report', fontsize=9)
+        page.insert_text((300, 760), f'Page {page_number + 1}', fontsize=9)
+        page.insert_textbox(fitz.Rect(72, 80, 540, 300),
+                            f'Paragraph of page {page_number}. The quick brown fox jumps over the lazy dog. ' * 2,
+                            fontsize=11)
+
+    fitz_doc.save(pdf_file_path)
+    fitz_doc.close()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_memory_stays_flat_over_5000_pages(tmp_path):
+    """streams a 5,000 page pdf through the model-free part of the bounded
+    memory path: page loading, the text layer layout, the blocks of the page
+    and the JSON writer, with a budget checked before every page. The
+    detector and table models are covered by benchmarks/memory_flat_check.py.
+    """
+    pdf_file_path = str(tmp_path / 'synthetic.pdf')
+    _create_report_pdf(pdf_file_path, FLAT_NUM_PAGES)
+
+    budget = MemoryBudget(rss_ceiling_mb=get_rss_bytes() / MB + 1024)
+    samples = []
+
+    with fitz.open(pdf_file_path) as fitz_doc, \
+         ExtractedDocumentWriter(str(tmp_path / 'synthetic.json'), pdf_file_path) as writer:
+
+        for page_number in range(fitz_doc.page_count):
+            budget.check_headroom()
+
+            fitz_page = fitz_doc.load_page(page_number)
+            labels, _ = classify_page(fitz_page)
+
+            page = DocumentPage(page_number)
+            for row in labels:
+                rect = fitz.Rect(*[float(value) for value in row[:4]])
+                page.add_text_block(fitz_page.get_text('text', clip=rect), float(row[4]), LABEL_DICT[str(int(row[5]))],
+                                    bbox=list(rect))
+
+            writer.write_page(page)
+            del fitz_page, page
+
+            if page_number % SAMPLE_INTERVAL == 0 and page_number >= FLAT_WARMUP_PAGES:
+                samples.append(get_rss_bytes() / MB)
+
+    assert writer.num_pages == FLAT_NUM_PAGES
+    assert max(samples) - samples[0] < FLAT_TOLERANCE_MB
@@ -0,0 +1,124 @@
+import pickle
+
+import fitz
+import numpy as np
+
+from ExDocGen.OcrCache import OcrCache, get_cell_key, is_blank_cell
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def render_cell(text : str,
+                width = 96,
+                height = 20,
+                left_margin = 12,
+                fontsize = 10,
+                dpi = 300,
+                ruled = False,
+                text_colour = (0, 0, 0),
+                fill = None) -> np.array:
+    """returns the grey levels of a table cell holding text, the sizes are in
+    pdf points. The margins are whole pixels at 300 dpi so the glyphs are
+    anti-aliased the same way
+    """
+    fitz_doc = fitz.open()
+    page = fitz_doc.new_page(width=width, height=height)
+
+    if fill is not None:
+        page.draw_rect(page.rect, color=fill, fill=fill)
+    if ruled:
+        page.draw_rect(page.rect, color=(0, 0, 0), width=1)
+
+    page.insert_text((left_margin, height - 6), text, fontsize=fontsize, color=text_colour)
+
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    cell_grey = np.frombuffer(pix.samples, dtype=np.uint8).reshape((pix.height, pix.width)).copy()
+    fitz_doc.close()
+
+    return cell_grey
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_blank_cells_ignore_ink_along_the_edges():
+
+    assert is_blank_cell(render_cell(''))
+    assert is_blank_cell(render_cell('', ruled=True))
+    assert not is_blank_cell(render_cell('Total'))
+    assert is_blank_cell(np.zeros((0, 0), dtype=np.uint8))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_key_ignores_margins_rules_and_colours():
+
+    key = get_cell_key(render_cell('Total 1,234'))
+
+    assert get_cell_key(render_cell('Total 1,234', width=144, left_margin=36)) == key
+    assert get_cell_key(render_cell('Total 1,234', ruled=True)) == key
+    assert get_cell_key(render_cell('Total 1,234', text_colour=(0.1, 0.2, 0.5), fill=(0.9, 0.9, 0.8))) == key
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_key_tells_glyphs_of_the_same_shape_apart():
+
+    for texts in (('x', 'X'), ('o', 'O', '0'), ('.', '·'), ('l', '|'), ('I', '|'), ('c', 'C'), ('s', 'S')):
+        keys = {get_cell_key(render_cell(text)) for text in texts}
+        assert len(keys) == len(texts), texts
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_key_keeps_the_size_and_height_of_the_ink():
+
+    def square_cell(top : int, size : int, crop_height = 84) -> np.array:
+        cell_grey = np.full((crop_height, 200), 255, dtype=np.uint8)
+        cell_grey[top:top + size, 50:50 + size] = 0
+        return cell_grey
+
+    # the same square once trimmed and scaled to a fixed height
+    dot = get_cell_key(square_cell(60, 8))
+
+    assert get_cell_key(square_cell(60, 8)) == dot
+    assert get_cell_key(square_cell(30, 24)) != dot
+    assert get_cell_key(square_cell(38, 8)) != dot
+    assert get_cell_key(square_cell(60, 8, crop_height=168)) != dot
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_key_depends_on_the_text_and_the_namespace():
+
+    cell_grey = render_cell('2019')
+
+    assert get_cell_key(render_cell('2018')) != get_cell_key(cell_grey)
+    assert get_cell_key(cell_grey, 'eager') != get_cell_key(cell_grey, 'optimized:line')
+    assert get_cell_key(cell_grey, 'eager').startswith('eager:')
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_cache_evicts_the_least_recently_used_entry():
+
+    cache = OcrCache(max_entries=2)
+    cache.put('a', 'A', 1.)
+    cache.put('b', 'B', 1.)
+
+    assert cache.get('a') == ('A', 1.)
+    cache.put('c', 'C', 1.)
+
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == ('A', 1.)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_persistent_entries_are_shared(tmp_path):
+
+    cache_path = str(tmp_path / 'cache.sqlite')
+
+    cache = OcrCache(persistent_path=cache_path)
+    cache.put('key', 'text', 0.5)
+    cache.flush()
+
+    # the batch workers receive the cache pickled, without its connection
+    worker_cache = pickle.loads(pickle.dumps(cache))
+    assert len(worker_cache) == 0
+    assert worker_cache.get('key') == ('text', 0.5)
+
+    assert OcrCache(max_entries=0, persistent_path=cache_path).get('key') == ('text', 0.5)
+    assert OcrCache(persistent_path=cache_path).get('other') is None
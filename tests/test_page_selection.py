@@ -0,0 +1,63 @@
+import pytest
+
+from ExDocGen.PageSelection import parse_page_spec, format_page_spec, resolve_pages, split_pages
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_parse_page_spec():
+
+    assert parse_page_spec('0:10, 15,-1') == [slice(0, 10), 15, -1]
+    assert parse_page_spec('::2,') == [slice(None, None, 2)]
+    assert parse_page_spec('') == []
+
+    with pytest.raises(ValueError):
+        parse_page_spec('1:2:3:4')
+    with pytest.raises(ValueError):
+        parse_page_spec('first')
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_format_page_spec_is_the_reverse_of_parsing():
+
+    for spec in ['0:10,15,-1', '::2', '-3:', '4']:
+        assert format_page_spec(spec) == spec
+        assert format_page_spec(parse_page_spec(spec)) == spec
+
+    assert format_page_spec(range(2, 8, 2)) == '2:8:2'
+    assert format_page_spec([range(3), 5, '7:']) == '0:3,5,7:'
+    assert format_page_spec(None) is None
+    assert format_page_spec([]) is None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_resolve_pages_of_every_kind_of_selection():
+
+    assert resolve_pages(None, 4) == [0, 1, 2, 3]
+    assert resolve_pages([], 4) == [0, 1, 2, 3]
+    assert resolve_pages(-1, 4) == [3]
+    assert resolve_pages(slice(None, None, -2), 5) == [0, 2, 4]
+    assert resolve_pages(range(1, 3), 4) == [1, 2]
+    assert resolve_pages(range(-2, 0), 4) == [2, 3]
+    assert resolve_pages('0:2,-1', 10) == [0, 1, 9]
+
+    # duplicates are merged and the pages come out in document order
+    assert resolve_pages({3, 0, -4}, 4) == [0, 3]
+    assert resolve_pages((slice(2, 4), 1, '3'), 10) == [1, 2, 3]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_resolve_pages_leaves_out_pages_outside_of_the_document():
+
+    assert resolve_pages([2, 7, -9], 3) == [2]
+    assert resolve_pages(range(1, 100), 3) == [1, 2]
+    assert resolve_pages('5:', 3) == []
+    assert resolve_pages(0, 0) == []
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_split_pages():
+
+    assert split_pages([0, 1, 2, 3, 4], 2) == [[0, 1], [2, 3], [4]]
+    assert split_pages([0, 1], 5) == [[0, 1]]
+    assert split_pages([4, 5], 0) == [[4], [5]]
+    assert split_pages([], 3) == []
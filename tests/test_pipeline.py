@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ExDocGen.Pipeline import Pipeline, Stage, StageCache, PipelineError, STAGE_IO, STAGE_MODEL
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _make_pipeline(calls : list,
+                   **kwargs) -> Pipeline:
+    """returns page -> (words, lines) -> text, and page -> tables, recording
+    the name of every stage that runs in calls
+    """
+
+    def record(name, function):
+        def wrapper(**arguments):
+            calls.append(name)
+            return function(**arguments)
+        return wrapper
+
+    pipeline = Pipeline(**kwargs)
+    pipeline.add_stage(Stage('split', record('split', lambda page: (page.split(), page.split('|'))),
+                             {'page' : str}, {'words' : list, 'lines' : list}, kind=STAGE_IO))
+    pipeline.add_stage(Stage('join', record('join', lambda words, lines: f'{len(lines)}:{" ".join(words)}'),
+                             {'words' : list, 'lines' : list}, {'text' : str}))
+    pipeline.add_stage(Stage('tables', record('tables', lambda page: page.count('|')),
+                             {'page' : str}, {'tables' : int}, kind=STAGE_MODEL,
+                             cache_key=lambda page: page))
+
+    return pipeline
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_run_only_runs_the_stages_needed():
+
+    calls = []
+    pipeline = _make_pipeline(calls)
+
+    assert pipeline.run({'page' : 'a b|c'}, ['text']) == {'text' : '2:a b|c'}
+    assert calls == ['split', 'join']
+
+    assert pipeline.run({'page' : 'a|b'}, ['tables']) == {'tables' : 1}
+    assert calls == ['split', 'join', 'tables']
+
+    # values given as inputs are not produced again
+    assert pipeline.run({'words' : ['x'], 'lines' : []}, ['text']) == {'text' : '0:x'}
+    assert calls[-1] == 'join' and calls.count('split') == 1
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_values_are_released_once_read():
+
+    released = {}
+
+    class RecordingPipeline(Pipeline):
+        def _finish_stage(self, stage, stage_values, values, readers, outputs):
+            super()._finish_stage(stage, stage_values, values, readers, outputs)
+            released[stage.name] = set(values)
+
+    pipeline = RecordingPipeline()
+    for stage in _make_pipeline([]).stages:
+        pipeline.add_stage(stage)
+
+    assert pipeline.run({'page' : 'a|b'}, ['text', 'tables']) == {'text' : '2:a|b', 'tables' : 1}
+
+    # the page is kept until tables has read it, words and lines after join
+    assert released['split'] == {'page', 'words', 'lines'}
+    assert released['join'] == {'page', 'text'}
+    assert released['tables'] == {'text', 'tables'}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_stages_run_on_the_executor_of_their_kind():
+
+    with ThreadPoolExecutor(1) as io_executor, ThreadPoolExecutor(1) as model_executor:
+        pipeline = _make_pipeline([], executors={STAGE_IO : io_executor, STAGE_MODEL : model_executor})
+
+        for page_number in range(5):
+            page = f'page {page_number}' + '|' * page_number
+            assert pipeline.run({'page' : page}, ['text', 'tables']) == {'text' : f'{page_number + 1}:{page}',
+                                                                         'tables' : page_number}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_types_are_checked():
+
+    pipeline = _make_pipeline([])
+
+    with pytest.raises(PipelineError):
+        pipeline.run({'page' : 3}, ['text'])
+
+    pipeline.replace_stage(Stage('tables', lambda page: 'one', {'page' : str}, {'tables' : int}))
+    with pytest.raises(PipelineError):
+        pipeline.run({'page' : 'a'}, ['tables'])
+
+    # without the checks the value is passed on as it is
+    pipeline.check_types = False
+    assert pipeline.run({'page' : 'a'}, ['tables']) == {'tables' : 'one'}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_graph_edits():
+
+    pipeline = _make_pipeline([])
+
+    with pytest.raises(PipelineError):
+        pipeline.add_stage(Stage('join', str.upper, {'page' : str}, {'upper' : str}))
+    with pytest.raises(PipelineError):
+        pipeline.add_stage(Stage('upper', str.upper, {'page' : str}, {'text' : str}))
+    with pytest.raises(PipelineError):
+        pipeline.replace_stage(Stage('join', str.upper, {'page' : str}, {'upper' : str}))
+    with pytest.raises(ValueError):
+        Stage('upper', str.upper, {'page' : str}, {'upper' : str}, kind='gpu')
+
+    pipeline.add_stage(Stage('upper', lambda page: page.upper(), {'page' : str}, {'upper' : str}), before='join')
+    assert [stage.name for stage in pipeline.stages] == ['split', 'upper', 'join', 'tables']
+
+    pipeline.remove_stage('split')
+    with pytest.raises(KeyError):
+        pipeline.get_stage('split')
+    with pytest.raises(PipelineError):
+        pipeline.run({'page' : 'a'}, ['text'])
+
+    assert pipeline.run({'page' : 'a'}, ['upper']) == {'upper' : 'A'}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_cached_stages_run_once_per_key():
+
+    calls = []
+    cache = StageCache(max_entries=1)
+    pipeline = _make_pipeline(calls, cache=cache)
+
+    for page in ['a|b', 'a|b', 'c', 'a|b']:
+        pipeline.run({'page' : page}, ['tables'])
+
+    # the second page evicts the first
+    assert calls == ['tables', 'tables', 'tables']
+    assert (cache.hits, cache.misses) == (1, 3)
@@ -0,0 +1,111 @@
+from ExDocGen.ExtractedDocument import DocumentTextBlock
+from ExDocGen.RunningBlocks import RunningBlocks, RunningBlockConfig, fill_slots, MAX_TEMPLATES
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+FOOTER_BOX = (72., 750., 540., 770.)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _footer(page_number : int) -> str:
+    return f'Annual Report 2023. Page {page_number + 1} of 40'
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _seed(running_blocks : RunningBlocks,
+          page_number = 0,
+          bbox = FOOTER_BOX) -> DocumentTextBlock:
+    """extracts the footer of a page the normal way and starts its template"""
+
+    raw_text = _footer(page_number)
+    text_block = DocumentTextBlock(raw_text, 0.9, 'Page-footer', bbox)
+    running_blocks.add_template(raw_text, text_block, page_number)
+
+    return text_block
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_fill_slots_replaces_every_run_of_digits():
+
+    assert fill_slots('Page 0 of 0', ['3', '40']) == 'Page 3 of 40'
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_matching_block_reuses_the_template_sentences():
+
+    running_blocks = RunningBlocks(RunningBlockConfig())
+    first = _seed(running_blocks)
+
+    block = running_blocks.match_block(_footer(1), 'Page-footer', (73., 751., 539., 771.), 0.8, page_number=1)
+
+    assert block.text == 'Annual Report 2023. Page 2 of 40 \n'
+    assert block.conf == 0.8
+    # the sentence without a changed number is shared with the first page
+    assert block.sentences[0] is first.sentences[0]
+    assert block.sentences[1] is not first.sentences[1]
+
+    # the same text again shares every sentence
+    assert running_blocks.match_block(_footer(0), 'Page-footer', FOOTER_BOX, 0.8, 0).sentences == first.sentences
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_blocks_elsewhere_or_with_other_text_do_not_match():
+
+    running_blocks = RunningBlocks(RunningBlockConfig(geometry_tolerance=6.))
+    _seed(running_blocks)
+
+    assert running_blocks.match_block(_footer(1), 'Page-footer', (72., 740., 540., 760.), 0.9, 1) is None
+    assert running_blocks.match_block(_footer(1), 'Page-header', FOOTER_BOX, 0.9, 1) is None
+    assert running_blocks.match_block('Chapter 2', 'Page-footer', FOOTER_BOX, 0.9, 1) is None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_prediction_needs_skip_extraction_and_min_pages():
+
+    config = RunningBlockConfig(min_pages=3)
+    running_blocks = RunningBlocks(config)
+    _seed(running_blocks)
+    running_blocks.match_block(_footer(1), 'Page-footer', FOOTER_BOX, 0.9, 1)
+
+    assert running_blocks.predict_block('Page-footer', FOOTER_BOX, 0.9, 5) is None
+
+    config.skip_extraction = True
+    assert running_blocks.predict_block('Page-footer', FOOTER_BOX, 0.9, 5) is None
+
+    running_blocks.match_block(_footer(2), 'Page-footer', FOOTER_BOX, 0.9, 2)
+    block = running_blocks.predict_block('Page-footer', FOOTER_BOX, 0.9, 5)
+
+    # the year and the page count are constant, the page follows the page number
+    assert block.text == _footer(5) + ' \n'
+    assert block.bbox == FOOTER_BOX
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_slots_that_follow_nothing_are_not_predicted():
+
+    running_blocks = RunningBlocks(RunningBlockConfig(min_pages=2, skip_extraction=True))
+
+    raw_text = 'Issue 17'
+    running_blocks.add_template(raw_text, DocumentTextBlock(raw_text, 0.9, 'Page-header', FOOTER_BOX), 0)
+    running_blocks.match_block('Issue 4', 'Page-header', FOOTER_BOX, 0.9, 1)
+
+    assert running_blocks.predict_block('Page-header', FOOTER_BOX, 0.9, 2) is None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_templates_are_not_duplicated_nor_unbounded():
+
+    running_blocks = RunningBlocks(RunningBlockConfig())
+    _seed(running_blocks, 0)
+    _seed(running_blocks, 1)
+
+    assert len(running_blocks.templates) == 1
+
+    for page_number in range(2 * MAX_TEMPLATES):
+        raw_text = f'Section {chr(65 + page_number % 26)}{"x" * page_number}'
+        running_blocks.add_template(raw_text, DocumentTextBlock(raw_text, 0.9, 'Page-header', FOOTER_BOX),
+                                    page_number)
+
+    assert len(running_blocks.templates) == MAX_TEMPLATES
+    assert running_blocks.is_running('Page-header')
+    assert not running_blocks.is_running('Text')
@@ -0,0 +1,38 @@
+import os
+import difflib
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# the table models are downloaded on first use
+pytest.importorskip('torch')
+pytest.importorskip('transformers')
+pytest.importorskip('easyocr')
+
+from ExDocGen.TableExtractor import TableExtractor, table_to_text, TABLE_BACKEND_EAGER, TABLE_BACKEND_OPTIMIZED
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+SAMPLE_TABLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'table.png')
+
+# same threshold as benchmarks/compare_table_backends.py
+MIN_SIMILARITY = 0.95
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+@pytest.fixture(scope='module')
+def table_img():
+    return np.asarray(Image.open(SAMPLE_TABLE_PATH).convert('RGB'))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_optimized_table_text_matches_the_eager_text(table_img):
+
+    eager_text = table_to_text(TableExtractor(backend=TABLE_BACKEND_EAGER).extract_table(table_img))
+    optimized_text = table_to_text(TableExtractor(backend=TABLE_BACKEND_OPTIMIZED).extract_table(table_img))
+
+    assert len(eager_text.strip()) > 0
+
+    similarity = difflib.SequenceMatcher(None, eager_text, optimized_text).ratio()
+    assert similarity >= MIN_SIMILARITY, f'eager: {eager_text}\noptimized: {optimized_text}'
@@ -0,0 +1,109 @@
+import fitz
+import numpy as np
+
+from ExDocGen.TextLayout import classify_page, TextLayoutConfig, LABEL_CLASSES, CONFIDENCE_GUESS
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+BODY_TEXT = 'Body text of the page. ' * 20
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _get_labels(labels : np.array) -> list:
+    """returns the labels of the rows, top to bottom"""
+
+    class_labels = {class_id : label for label, class_id in LABEL_CLASSES.items()}
+    rows = sorted(labels.tolist(), key=lambda row: (row[1], row[0]))
+
+    return [class_labels[int(row[5])] for row in rows]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _find_row(labels : np.array,
+              label : str) -> np.array:
+    """returns the first row with the label"""
+
+    return next(row for row in labels if int(row[5]) == LABEL_CLASSES[label])
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _article_page(fitz_doc : fitz.Document) -> fitz.Page:
+
+    page = fitz_doc.new_page(width=612, height=792)
+
+    page.insert_text((72, 30), 'Annual Report 2023', fontsize=9)
+    page.insert_text((72, 110), 'A Title of the Page', fontsize=24)
+    page.insert_textbox(fitz.Rect(72, 140, 540, 260), BODY_TEXT, fontsize=10)
+    page.insert_text((72, 300), 'Introduction', fontsize=10, fontname='hebo')
+    page.insert_textbox(fitz.Rect(72, 320, 540, 380), '1. first item\n2. second item\n3. third item', fontsize=10)
+    page.insert_text((72, 430), 'Table 1: Revenue by year', fontsize=10)
+    page.insert_text((72, 700), '1 A footnote in small text', fontsize=7)
+    page.insert_text((300, 775), 'Page 3', fontsize=9)
+
+    return page
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_blocks_are_labelled_from_their_text_and_fonts():
+
+    fitz_doc = fitz.open()
+    labels, confidence = classify_page(_article_page(fitz_doc))
+
+    assert _get_labels(labels) == ['Page-header', 'Title', 'Text', 'Section-header',
+                                   'List-item', 'List-item', 'List-item', 'Caption', 'Footnote', 'Page-footer']
+    assert labels.shape == (10, 6) and labels.dtype == np.float32
+    assert 0.7 < confidence < 0.9
+
+    # the boxes are in page points
+    assert np.allclose(_find_row(labels, 'Page-footer')[:2], [300, 765], atol=1)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_config_moves_the_header_and_footer_bands():
+
+    fitz_doc = fitz.open()
+    labels, _ = classify_page(_article_page(fitz_doc), TextLayoutConfig(header_band=0., footer_band=0.))
+
+    assert 'Page-header' not in _get_labels(labels)
+    assert 'Page-footer' not in _get_labels(labels)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_columns_of_numbers_are_one_table_and_images_pictures():
+
+    fitz_doc = fitz.open()
+    page = fitz_doc.new_page(width=612, height=792)
+
+    page.insert_textbox(fitz.Rect(72, 100, 540, 220), BODY_TEXT, fontsize=10)
+    for row in range(4):
+        for column in range(4):
+            page.insert_text((72 + 120 * column, 300 + 14 * row), f'{1000 + row * 37 + column * 11:,}', fontsize=10)
+
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 50, 50), False)
+    pixmap.clear_with(128)
+    page.insert_image(fitz.Rect(72, 450, 300, 650), pixmap=pixmap)
+    page.insert_text((100, 550), 'on the picture', fontsize=10)
+
+    labels, _ = classify_page(page)
+
+    assert _get_labels(labels) == ['Text', 'Table', 'Picture']
+
+    # the text on the picture makes it less certain
+    assert np.isclose(_find_row(labels, 'Picture')[4], CONFIDENCE_GUESS)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_boxes_do_not_overlap_and_empty_pages_have_no_confidence():
+
+    fitz_doc = fitz.open()
+    labels, _ = classify_page(_article_page(fitz_doc))
+
+    for i in range(len(labels)):
+        for j in range(i + 1, len(labels)):
+            a, b = labels[i], labels[j]
+            assert min(a[2], b[2]) <= max(a[0], b[0]) or min(a[3], b[3]) <= max(a[1], b[1])
+
+    labels, confidence = classify_page(fitz_doc.new_page())
+
+    assert labels.shape == (0, 6)
+    assert confidence == 0.
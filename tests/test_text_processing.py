@@ -0,0 +1,40 @@
+from ExDocGen.TextProcessing import PostProcessor, clean_text, clean_texts, segment_text, PAGES_IN_FLIGHT_PER_WORKER
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+RAW_TEXTS = ['First line\nsecond line. Another sentence.', '', 'Café – menu.']
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_clean_text_keeps_printable_ascii():
+
+    assert clean_text(' a\nb\tcé ') == 'a bc'
+    assert clean_texts(['x\n', '', 'y']) == ['x', 'y']
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_segment_text_splits_sentences():
+
+    assert segment_text('One sentence. Another one.') == ['One sentence. ', 'Another one.']
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_pool_returns_the_sentences_in_order_and_closes():
+
+    postprocessor = PostProcessor(1)
+    assert postprocessor.max_pages_in_flight == PAGES_IN_FLIGHT_PER_WORKER
+    assert postprocessor.executor is None
+
+    try:
+        sentence_lists = postprocessor.submit(RAW_TEXTS).result(timeout=60)
+    finally:
+        postprocessor.close()
+
+    assert sentence_lists == [segment_text(clean_text(raw_text)) for raw_text in RAW_TEXTS]
+    assert postprocessor.executor is None
+
+    # a closed pool starts again on the next page
+    try:
+        assert postprocessor.submit(['Again.']).result(timeout=60) == [['Again.']]
+    finally:
+        postprocessor.close()
@@ -0,0 +1,130 @@
+import os
+
+from ExDocGen.WorkQueue import WorkQueue, TASK_EXTRACT, TASK_MERGE, LEASE_DIR, ATTEMPT_DIR
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+LEASE_SECONDS = 60.
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _expire(lease) -> None:
+    """makes a lease look as if its worker stopped renewing it"""
+
+    lease_time = os.stat(lease.path).st_mtime - 2 * LEASE_SECONDS
+    os.utime(lease.path, (lease_time, lease_time))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_tasks_are_claimed_once_and_committed(tmp_path, make_pdf):
+
+    work_queue = WorkQueue(str(tmp_path / 'queue'), lease_seconds=LEASE_SECONDS)
+    pdf_file_paths = [make_pdf('a.pdf'), make_pdf('b.pdf')]
+
+    assert work_queue.submit(pdf_file_paths, str(tmp_path / 'out')) == {'documents' : 2, 'tasks' : 2, 'skipped' : 0}
+
+    first = work_queue.claim('worker-1')
+    second = work_queue.claim('worker-2')
+
+    assert first.task['id'] != second.task['id']
+    assert work_queue.claim('worker-3') is None
+    assert work_queue.status()['leased'] == 2
+
+    assert work_queue.heartbeat(first)
+    assert work_queue.commit(first, {'pages' : 1})
+    assert not work_queue.commit(first, {'pages' : 1})
+
+    status = work_queue.status()
+    assert (status['done'], status['leased'], status['finished']) == (1, 1, False)
+
+    # the settings of the queue are kept by the first WorkQueue
+    assert WorkQueue(str(tmp_path / 'queue'), lease_seconds=1.).lease_seconds == LEASE_SECONDS
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_expired_leases_are_taken_over_and_live_ones_kept(tmp_path, make_pdf):
+
+    work_queue = WorkQueue(str(tmp_path / 'queue'), lease_seconds=LEASE_SECONDS)
+    work_queue.submit([make_pdf()], str(tmp_path / 'out'))
+
+    slow = work_queue.claim('slow')
+    assert work_queue.claim('other') is None
+
+    _expire(slow)
+    lease = work_queue.claim('other')
+
+    assert lease.task['id'] == slow.task['id']
+    assert lease.generation == slow.generation + 1
+    assert work_queue.status()['failed'] == 0
+    assert work_queue._get_errors(lease.task['id']) == ['lease of slow expired']
+
+    # the slow worker finds out but its lease file is left alone
+    assert os.path.exists(slow.path)
+    assert not work_queue.heartbeat(slow)
+    assert work_queue.heartbeat(lease)
+    assert work_queue.claim('third') is None
+
+    assert work_queue.commit(lease, {'pages' : 1})
+    assert not work_queue.commit(slow, {'pages' : 1})
+    assert work_queue.status()['finished']
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_failed_tasks_are_given_up_after_max_attempts(tmp_path, make_pdf):
+
+    work_queue = WorkQueue(str(tmp_path / 'queue'), lease_seconds=LEASE_SECONDS, max_attempts=2)
+    pdf_file_path = make_pdf()
+    work_queue.submit([pdf_file_path], str(tmp_path / 'out'))
+
+    for attempt in range(2):
+        lease = work_queue.claim('worker')
+        work_queue.fail(lease, f'ValueError: attempt {attempt}', 'worker')
+
+    assert work_queue.claim('worker') is None
+
+    status = work_queue.status()
+    assert (status['failed'], status['documents_failed'], status['finished']) == (1, 1, True)
+    assert status['errors'] == {pdf_file_path : ['ValueError: attempt 0', 'ValueError: attempt 1']}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_resubmitted_task_starts_without_attempts(tmp_path, make_pdf):
+
+    work_queue = WorkQueue(str(tmp_path / 'queue'), lease_seconds=LEASE_SECONDS)
+    pdf_file_path = make_pdf()
+    work_queue.submit([pdf_file_path], str(tmp_path / 'out'))
+
+    # a lease taken over and a failure leave the expired lease behind
+    slow = work_queue.claim('slow')
+    _expire(slow)
+    work_queue.fail(work_queue.claim('other'), 'ValueError: broken', 'other')
+    assert os.path.exists(slow.path)
+
+    work_queue.submit([pdf_file_path], str(tmp_path / 'out'), overwrite=True)
+    assert os.listdir(tmp_path / 'queue' / LEASE_DIR) == []
+
+    lease = work_queue.claim('worker')
+
+    assert lease.generation == 1
+    assert os.listdir(tmp_path / 'queue' / ATTEMPT_DIR) == []
+    assert work_queue.holds(lease)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def test_merge_waits_for_the_shards(tmp_path, make_pdf):
+
+    work_queue = WorkQueue(str(tmp_path / 'queue'), lease_seconds=LEASE_SECONDS)
+    work_queue.submit([make_pdf(num_pages=5)], str(tmp_path / 'out'), pages_per_shard=2)
+
+    shards = [work_queue.claim(f'worker-{shard}') for shard in range(3)]
+
+    assert [len(shard.task['pages']) for shard in shards] == [2, 2, 1]
+    assert all(shard.task['type'] == TASK_EXTRACT for shard in shards)
+    assert work_queue.claim('merger') is None
+
+    for shard in shards:
+        work_queue.commit(shard, {'pages' : len(shard.task['pages'])})
+
+    merge = work_queue.claim('merger')
+    assert merge.task['type'] == TASK_MERGE
+    assert merge.task['shards'] == [shard.task['id'] for shard in shards]